@@ -2,13 +2,25 @@
 论文匹配相关路由
 """
 from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
+from fastapi.responses import FileResponse
+from fastapi.security import HTTPAuthorizationCredentials
 from pydantic import BaseModel
+from pathlib import Path
 from typing import List, Optional
+import asyncio
+import hmac
 import threading
 
-from api.routes.auth import get_current_user_optional as get_current_user
-from services.matching_service import match_papers, match_all
-from services.vector_service import get_vector_service
+from api.routes.auth import get_current_user_optional as get_current_user, security
+from services.matching_service import match_papers, match_all, match_fast, fast_match_metrics
+from services.vector_service import get_vector_service, SUPPORTED_CHUNK_POOLINGS
+from services.paper_indexer import index_missing_papers, backfill_paper_metadata, rebuild_embedding_version
+from services.requirement_similarity import get_similar_papers, is_materialized, refresh_requirement_paper_similarity
+from services.paper_knn import build_paper_knn, read_paper_knn_meta
+from services.vector_snapshot import (
+    DEFAULT_SNAPSHOT_COLLECTIONS, export_snapshot, import_snapshot, download_snapshot,
+    read_snapshot_manifest, latest_snapshot_path, get_snapshot_dir, get_snapshot_token, check_snapshot_url
+)
 from database.database import get_db_connection, get_user_by_username, save_match_history, get_match_history, get_match_results_by_history_id, get_published_need_by_id
 import logging
 
@@ -21,6 +33,8 @@ _indexer_running = False
 _indexer_progress = {
     "status": "idle",  # idle, running, completed, error
     "total": 0,
+    "db_total": 0,
+    "indexed": 0,
     "processed": 0,
     "skipped": 0,
     "error": 0,
@@ -28,11 +42,58 @@ _indexer_progress = {
 }
 _indexer_lock = threading.Lock()
 
+# 向量快照导出/导入任务状态
+_snapshot_running = False
+_snapshot_progress = {
+    "status": "idle",  # idle, exporting, importing, completed, error
+    "collection": None,
+    "processed": 0,
+    "message": "",
+    "result": None
+}
+_snapshot_lock = threading.Lock()
+
+# 向量模型版本重建任务状态
+_rebuild_running = False
+_rebuild_stop_requested = False
+_rebuild_progress = {
+    "status": "idle",  # idle, running, completed, stopped, error
+    "version": None,
+    "model": None,
+    "stage": None,
+    "message": "",
+    "result": None
+}
+_rebuild_lock = threading.Lock()
+
+# 论文 kNN 图构建任务状态
+_knn_running = False
+_knn_progress = {
+    "status": "idle",  # idle, running, completed, error
+    "mode": None,
+    "processed": 0,
+    "total": 0,
+    "message": "",
+    "result": None
+}
+_knn_lock = threading.Lock()
+
 class MatchingRequest(BaseModel):
     requirement: str  # 用户需求文本
     top_k: int = 50   # 返回的论文数量
     match_mode: str = "enterprise"  # 匹配模式：enterprise（企业找成果）或 researcher（专家找需求）
     save_history: bool = True  # 是否保存匹配历史
+    categories: Optional[List[str]] = None  # 论文分类过滤（命中任意一个），如 ["cs.CV", "cs.LG"]
+    date_from: Optional[str] = None  # 论文发布日期下限 YYYY-MM-DD
+    date_to: Optional[str] = None  # 论文发布日期上限 YYYY-MM-DD
+    item_types: Optional[List[str]] = None  # /match-all 的条目类型：["paper", "achievement"]，默认两者都有
+    chunk_search: bool = False  # 同时检索论文全文分块（只覆盖解析过 PDF 的论文）
+    chunk_pooling: str = "max"  # 分块命中聚合到论文的方式：max / sum
+    fast: bool = False  # 快速匹配：只做向量检索，跳过查询扩展和 LLM 精排，不保存匹配历史
+
+    def paper_filters(self) -> dict:
+        """论文过滤条件（分类、发布日期），在向量检索内部执行"""
+        return {"categories": self.categories, "date_from": self.date_from, "date_to": self.date_to}
 
 class MatchingResponse(BaseModel):
     papers: List[dict]
@@ -46,6 +107,7 @@ class PaperToRequirementRequest(BaseModel):
     top_k: int = 20  # 返回的需求数量
     save_match: bool = True  # 是否保存匹配记录
     search_text: Optional[str] = ""  # 用户原始搜索文本（用于匹配历史）
+    paper_id: Optional[str] = None  # 库中论文的 arxiv_id（有预计算近邻时跳过查询扩展和向量检索）
 
 class RequirementResponse(BaseModel):
     requirement_id: str
@@ -94,7 +156,8 @@ async def match_paper_to_requirements(
             paper_title=request.paper_title,
             paper_abstract=request.paper_abstract,
             paper_categories=request.paper_categories,
-            top_k=request.top_k
+            top_k=request.top_k,
+            paper_id=request.paper_id
         )
         
         history_id = None
@@ -188,7 +251,7 @@ async def create_requirement(
         
         # 向量化需求
         vector_service = get_vector_service()
-        vector_service.add_requirement(
+        await vector_service.aadd_requirement(
             requirement_id=requirement.requirement_id,
             title=requirement.title,
             description=requirement.description,
@@ -260,11 +323,24 @@ async def match_user_requirement(
     try:
         if not request.requirement or not request.requirement.strip():
             raise HTTPException(status_code=400, detail="需求文本不能为空")
+        if request.chunk_pooling not in SUPPORTED_CHUNK_POOLINGS:
+            raise HTTPException(status_code=400, detail=f"chunk_pooling 只支持: {', '.join(SUPPORTED_CHUNK_POOLINGS)}")
+        
+        if request.fast:
+            results = await match_fast(
+                user_requirement=request.requirement,
+                top_k=request.top_k,
+                filters=request.paper_filters()
+            )
+            return {"papers": results, "total": len(results), "history_id": None}
         
         # 调用匹配服务
         results = await match_papers(
             user_requirement=request.requirement,
-            top_k=request.top_k
+            top_k=request.top_k,
+            filters=request.paper_filters(),
+            chunk_search=request.chunk_search,
+            chunk_pooling=request.chunk_pooling
         )
         
         history_id = None
@@ -294,15 +370,51 @@ async def match_user_requirement(
             "history_id": history_id
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"匹配失败: {str(e)}")
     
+def _get_precomputed_similar_papers(requirement_id: str, limit: int) -> List[dict]:
+    """读取需求的预计算近邻论文并补充论文信息"""
+    if limit <= 0:
+        return []
+    try:
+        neighbours = get_similar_papers(requirement_id, limit=limit)
+    except Exception as e:
+        logger.warning(f"读取需求 {requirement_id} 的相似论文失败: {e}")
+        return []
+    if not neighbours:
+        return []
+    
+    paper_ids = [paper_id for paper_id, _ in neighbours]
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        placeholders = ','.join(['?'] * len(paper_ids))
+        cursor.execute(f"""
+            SELECT arxiv_id, title, authors, categories, published_date, pdf_url
+            FROM papers WHERE arxiv_id IN ({placeholders})
+        """, paper_ids)
+        papers = {row["arxiv_id"]: dict(row) for row in cursor.fetchall()}
+    finally:
+        conn.close()
+    
+    return [
+        {**papers[paper_id], "paper_id": paper_id, "vector_score": round(score, 4)}
+        for paper_id, score in neighbours if paper_id in papers
+    ]
+
 @router.get("/requirements/{requirement_id}")
 async def get_requirement_detail(
     requirement_id: str,
+    similar_limit: int = 10,
     current_user: str = Depends(get_current_user)
 ):
-    """获取需求详情（支持系统需求和发布需求）"""
+    """
+    获取需求详情（支持系统需求和发布需求）
+    similar_limit: 附带的相似论文数量（读取预计算结果，见 services/requirement_similarity.py；0 为不附带）
+    """
     try:
         conn = get_db_connection()
         cursor = conn.cursor()
@@ -358,6 +470,9 @@ async def get_requirement_detail(
             requirement_dict = dict(requirement)
             requirement_dict["source"] = "system"  # 标记为系统需求
         
+        # 预计算的相似论文（没有预计算结果时为空列表，不做实时向量检索）
+        requirement_dict["similar_papers"] = _get_precomputed_similar_papers(requirement_id, similar_limit)
+        
         return requirement_dict
         
     except HTTPException:
@@ -381,11 +496,26 @@ async def match_all_items(
     try:
         if not request.requirement or not request.requirement.strip():
             raise HTTPException(status_code=400, detail="需求文本不能为空")
+        if request.chunk_pooling not in SUPPORTED_CHUNK_POOLINGS:
+            raise HTTPException(status_code=400, detail=f"chunk_pooling 只支持: {', '.join(SUPPORTED_CHUNK_POOLINGS)}")
+        
+        if request.fast:
+            results = await match_fast(
+                user_requirement=request.requirement,
+                top_k=request.top_k,
+                filters=request.paper_filters(),
+                item_types=request.item_types or ["paper", "achievement"]
+            )
+            return {"papers": results, "total": len(results), "history_id": None}
         
         # 调用统一匹配服务
         results = await match_all(
             user_requirement=request.requirement,
-            top_k=request.top_k
+            top_k=request.top_k,
+            filters=request.paper_filters(),
+            item_types=request.item_types,
+            chunk_search=request.chunk_search,
+            chunk_pooling=request.chunk_pooling
         )
         
         history_id = None
@@ -415,17 +545,26 @@ async def match_all_items(
             "history_id": history_id
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"匹配失败: {str(e)}")
 
+@router.get("/fast-match-stats")
+async def get_fast_match_stats(current_user: str = Depends(get_current_user)):
+    """快速匹配（fast=true）的请求数、超出延迟预算次数和各阶段耗时分位数"""
+    return fast_match_metrics.stats()
+
 @router.post("/index-papers")
 async def index_existing_papers(
     background_tasks: BackgroundTasks,
+    backfill_metadata: bool = False,
     current_user: str = Depends(get_current_user)
 ):
     """
-    将数据库中未向量化的论文索引到向量数据库
-    这是一个后台任务，会立即返回
+    将数据库中未向量化的论文索引到向量数据库（按ID差集增量索引，不限数量）
+    这是一个后台任务，会立即返回，进度通过 /index-status 查询
+    backfill_metadata: 索引完成后为已索引论文补写分类/发布日期元数据（旧版本索引的论文需要执行一次）
     """
     global _indexer_running, _indexer_progress
     
@@ -438,6 +577,8 @@ async def index_existing_papers(
         _indexer_progress = {
             "status": "running",
             "total": 0,
+            "db_total": 0,
+            "indexed": 0,
             "processed": 0,
             "skipped": 0,
             "error": 0,
@@ -445,101 +586,61 @@ async def index_existing_papers(
         }
     
     def _index_papers():
-        """后台任务：索引论文"""
+        """后台任务：按 SQLite 与向量库的ID差集增量索引论文（中断后重新启动即可继续）"""
         global _indexer_running, _indexer_progress
         
         try:
-            # 获取数据库连接
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            
-            # 获取所有论文
-            cursor.execute("""
-                SELECT arxiv_id, title, abstract 
-                FROM papers 
-                WHERE arxiv_id IS NOT NULL 
-                AND title IS NOT NULL
-                ORDER BY created_at DESC
-                LIMIT 300
-            """)
-            
-            papers = cursor.fetchall()
-            conn.close()
-            
-            total_papers = len(papers)
-            
             with _indexer_lock:
-                _indexer_progress["total"] = total_papers
-                _indexer_progress["message"] = f"找到 {total_papers} 篇论文，开始索引..."
+                _indexer_progress["message"] = "正在比对数据库与向量库中的论文..."
             
-            logger.info(f"找到 {total_papers} 篇论文需要索引")
-            
-            if not papers:
+            def _on_progress(stats):
                 with _indexer_lock:
-                    _indexer_progress["status"] = "completed"
-                    _indexer_progress["message"] = "数据库中没有论文，请先运行爬虫"
-                logger.warning("数据库中没有论文，请先运行爬虫")
-                _indexer_running = False
-                return
+                    _indexer_progress["total"] = stats["total"]
+                    _indexer_progress["db_total"] = stats["db_total"]
+                    _indexer_progress["indexed"] = stats["indexed"]
+                    _indexer_progress["processed"] = stats["added"]
+                    _indexer_progress["skipped"] = stats["skipped"]
+                    _indexer_progress["error"] = stats["error"]
+                    _indexer_progress["message"] = f"已处理 {stats['done']}/{stats['total']} 篇待索引论文..."
             
-            # 获取向量服务
-            vector_service = get_vector_service()
+            stats = index_missing_papers(get_vector_service(), progress_callback=_on_progress)
             
-            # 检查向量数据库中已有的论文
-            existing_count = vector_service.get_paper_count()
-            logger.info(f"向量数据库中已有 {existing_count} 篇论文")
-            
-            # 处理每篇论文
-            processed_count = 0
-            skipped_count = 0
-            error_count = 0
+            if backfill_metadata:
+                with _indexer_lock:
+                    _indexer_progress["message"] = "正在补写论文元数据..."
+                backfill_paper_metadata(get_vector_service())
             
-            for idx, paper in enumerate(papers):
+            # 已预计算过需求-论文相似度时，为新索引的论文增量刷新
+            if stats["added"] > 0 and is_materialized():
+                with _indexer_lock:
+                    _indexer_progress["message"] = "正在刷新需求-论文相似度..."
                 try:
-                    arxiv_id = paper["arxiv_id"]
-                    title = paper["title"]
-                    abstract = paper["abstract"] or ""
-                    
-                    if not title or not arxiv_id:
-                        skipped_count += 1
-                        continue
-                    
-                    # 添加到向量数据库（内部会检查是否已存在）
-                    added = vector_service.add_paper(arxiv_id, title, abstract)
-                    if added:
-                        processed_count += 1
-                    else:
-                        skipped_count += 1
-                    
-                    # 更新进度
-                    with _indexer_lock:
-                        _indexer_progress["processed"] = processed_count
-                        _indexer_progress["skipped"] = skipped_count
-                        _indexer_progress["error"] = error_count
-                        _indexer_progress["message"] = f"已处理 {idx + 1}/{total_papers} 篇论文..."
-                    
-                    if processed_count % 10 == 0:
-                        logger.info(f"已处理 {processed_count} 篇论文...")
-                        
+                    refresh_requirement_paper_similarity(get_vector_service())
                 except Exception as e:
-                    error_count += 1
-                    paper_id = paper["arxiv_id"] if "arxiv_id" in paper.keys() else 'unknown'
-                    logger.error(f"处理论文 {paper_id} 失败: {str(e)}")
-                    with _indexer_lock:
-                        _indexer_progress["error"] = error_count
-                    continue
+                    logger.error(f"需求-论文相似度增量刷新失败: {e}")
             
-            final_count = vector_service.get_paper_count()
+            # 已构建过论文 kNN 图时，为新索引的论文增量更新（正在全量构建时跳过，构建结束后再次运行即可补上）
+            if stats["added"] > 0 and read_paper_knn_meta() is not None:
+                with _indexer_lock:
+                    _indexer_progress["message"] = "正在更新论文 kNN 图..."
+                _run_paper_knn_build(full=False)
             
             with _indexer_lock:
                 _indexer_progress["status"] = "completed"
-                _indexer_progress["message"] = f"索引完成！成功: {processed_count} 篇，跳过: {skipped_count} 篇，失败: {error_count} 篇"
+                if stats["db_total"] == 0:
+                    _indexer_progress["message"] = "数据库中没有论文，请先运行爬虫"
+                elif stats["total"] == 0:
+                    _indexer_progress["message"] = f"所有论文均已索引（共 {stats['db_total']} 篇）"
+                else:
+                    _indexer_progress["message"] = (
+                        f"索引完成！成功: {stats['added']} 篇，跳过: {stats['skipped']} 篇，失败: {stats['error']} 篇"
+                    )
             
             logger.info(f"索引完成！")
-            logger.info(f"  - 成功处理: {processed_count} 篇")
-            logger.info(f"  - 跳过（已存在）: {skipped_count} 篇")
-            logger.info(f"  - 处理失败: {error_count} 篇")
-            logger.info(f"  - 向量数据库总数: {final_count} 篇")
+            logger.info(f"  - 数据库论文: {stats['db_total']} 篇（此前已索引 {stats['indexed']} 篇）")
+            logger.info(f"  - 成功处理: {stats['added']} 篇")
+            logger.info(f"  - 跳过: {stats['skipped']} 篇")
+            logger.info(f"  - 处理失败: {stats['error']} 篇")
             
         except Exception as e:
             with _indexer_lock:
@@ -557,6 +658,72 @@ async def index_existing_papers(
         "status": "started"
     }
 
+def _run_paper_knn_build(full: bool) -> Optional[dict]:
+    """构建论文 kNN 图并更新任务状态；已有构建任务在运行时直接返回 None"""
+    global _knn_running, _knn_progress
+    with _knn_lock:
+        if _knn_running:
+            logger.info("论文 kNN 图构建任务正在运行，跳过本次更新")
+            return None
+        _knn_running = True
+        _knn_progress = {"status": "running", "mode": "full" if full else "incremental", "processed": 0,
+                         "total": 0, "message": "正在读取论文向量...", "result": None}
+
+    def _on_progress(processed, total):
+        with _knn_lock:
+            _knn_progress["processed"] = processed
+            _knn_progress["total"] = total
+            _knn_progress["message"] = f"已计算 {processed}/{total} 篇论文的近邻..."
+
+    try:
+        result = build_paper_knn(get_vector_service(), full=full, progress_callback=_on_progress)
+        with _knn_lock:
+            _knn_progress["status"] = "completed"
+            _knn_progress["mode"] = result["mode"]
+            _knn_progress["result"] = result
+            _knn_progress["message"] = (
+                f"论文 kNN 图已更新：{result['papers']} 篇论文，新计算 {result['computed']} 篇，耗时 {result['elapsed']} 秒"
+            )
+        return result
+    except Exception as e:
+        logger.error(f"论文 kNN 图构建失败: {e}")
+        with _knn_lock:
+            _knn_progress["status"] = "error"
+            _knn_progress["message"] = f"论文 kNN 图构建失败: {str(e)}"
+        return None
+    finally:
+        with _knn_lock:
+            _knn_running = False
+
+@router.post("/paper-knn/build")
+async def build_paper_knn_graph(
+    background_tasks: BackgroundTasks,
+    full: bool = False,
+    current_user: str = Depends(get_current_user)
+):
+    """
+    在后台构建论文 kNN 图（/api/papers/{arxiv_id}/related 使用），进度通过 /paper-knn/status 查询
+    full: 全量重新构建；默认只计算图中还没有的新论文（首次构建、切换向量版本后自动全量）
+    """
+    with _knn_lock:
+        if _knn_running:
+            raise HTTPException(status_code=400, detail="论文 kNN 图构建任务正在运行中，请稍后再试")
+    background_tasks.add_task(_run_paper_knn_build, full)
+    return {"message": "论文 kNN 图构建任务已在后台启动", "status": "started"}
+
+@router.get("/paper-knn/status")
+async def get_paper_knn_status(current_user: str = Depends(get_current_user)):
+    """论文 kNN 图构建任务状态和当前图的信息（向量版本、K、论文数、更新时间）"""
+    with _knn_lock:
+        progress = _knn_progress.copy()
+    meta = read_paper_knn_meta()
+    return {
+        **progress,
+        "graph": meta,
+        # 图的向量版本与当前启用版本不同时不会被使用，需要重新构建
+        "stale": meta is not None and meta.get("embedding_version") != get_vector_service().active_version
+    }
+
 @router.get("/vector-stats")
 async def get_vector_stats(current_user: str = Depends(get_current_user)):
     """获取向量数据库统计信息"""
@@ -609,7 +776,15 @@ async def get_vector_stats(current_user: str = Depends(get_current_user)):
             "indexed_percentage": round(count / db_total * 100, 2) if db_total > 0 else 0,
             "unindexed_count": db_total - count,
             "healthy": True,
-            "indexer_status": indexer_status
+            "indexer_status": indexer_status,
+            "query_cache": vector_service.query_cache.stats(),
+            # 当前启用的向量模型版本（见 /embedding-versions）
+            "embedding_version": vector_service.active_version,
+            "embedding_model": vector_service.model_id,
+            # 模型加载来源 / 耗时 / 是否内存映射，以及本进程当前的 RSS / PSS（多 worker 时 PSS 之和为实际内存占用）
+            "model_memory": vector_service.model_memory_stats(),
+            # 论文按时间分片时各分片的日期范围和向量数（未分片时为 null）
+            "paper_shards": vector_service.collection.shard_stats() if vector_service.paper_sharding != "none" else None
         }
     except Exception as e:
         error_msg = str(e)
@@ -916,3 +1091,235 @@ async def get_index_status(current_user: str = Depends(get_current_user)):
     with _indexer_lock:
         return _indexer_progress.copy()
 
+
+class SnapshotExportRequest(BaseModel):
+    collections: Optional[List[str]] = None  # 要导出的集合，默认 papers / requirements / achievements
+
+class SnapshotImportRequest(BaseModel):
+    source: str  # 快照目录中的文件名，或 http(s) URL（如其他节点的 /api/matching/snapshot/latest）
+    replace: bool = False  # 导入后删除集合中快照里没有的向量
+    force: bool = False  # 忽略模型标识不一致
+
+def _start_snapshot_task(status: str, message: str) -> None:
+    """标记快照任务开始（同一时间只允许一个导出/导入任务）"""
+    global _snapshot_running, _snapshot_progress
+    with _snapshot_lock:
+        if _snapshot_running:
+            raise HTTPException(status_code=400, detail="快照任务正在运行中，请稍后再试")
+        _snapshot_running = True
+        _snapshot_progress = {"status": status, "collection": None, "processed": 0, "message": message, "result": None}
+
+def _run_snapshot_task(func, *args, **kwargs) -> None:
+    """后台执行快照导出/导入，进度写入 _snapshot_progress"""
+    global _snapshot_running
+
+    def _on_progress(name: str, count: int):
+        with _snapshot_lock:
+            _snapshot_progress["collection"] = name
+            _snapshot_progress["processed"] = count
+            _snapshot_progress["message"] = f"正在处理集合 {name}：已处理 {count} 条..."
+
+    try:
+        result = func(*args, progress_callback=_on_progress, **kwargs)
+        with _snapshot_lock:
+            _snapshot_progress["status"] = "completed"
+            _snapshot_progress["message"] = f"完成，耗时 {result['elapsed']} 秒"
+            _snapshot_progress["result"] = result
+    except Exception as e:
+        logger.error(f"快照任务失败: {e}", exc_info=True)
+        with _snapshot_lock:
+            _snapshot_progress["status"] = "error"
+            _snapshot_progress["message"] = f"快照任务失败: {str(e)}"
+    finally:
+        with _snapshot_lock:
+            _snapshot_running = False
+
+@router.post("/snapshot/export")
+async def export_vector_snapshot(
+    background_tasks: BackgroundTasks,
+    request: Optional[SnapshotExportRequest] = None,
+    current_user: str = Depends(get_current_user)
+):
+    """
+    导出向量快照（ID、float16 向量、元数据、模型标识）到快照目录
+    这是一个后台任务，会立即返回，进度通过 /snapshot/status 查询，完成后可通过 /snapshot/latest 下载
+    """
+    collections = (request.collections if request and request.collections else list(DEFAULT_SNAPSHOT_COLLECTIONS))
+    _start_snapshot_task("exporting", "正在导出向量快照...")
+    background_tasks.add_task(_run_snapshot_task, export_snapshot, get_vector_service(), collections=collections)
+    return {"message": "快照导出任务已在后台启动", "status": "started"}
+
+@router.post("/snapshot/import")
+async def import_vector_snapshot(
+    request: SnapshotImportRequest,
+    background_tasks: BackgroundTasks,
+    current_user: str = Depends(get_current_user)
+):
+    """
+    导入向量快照（批量写入），source 为快照目录中的文件名或 http(s) URL
+    这是一个后台任务，会立即返回，进度通过 /snapshot/status 查询
+    """
+    source = request.source
+    if source.startswith(("http://", "https://")):
+        try:
+            check_snapshot_url(source)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    else:
+        path = get_snapshot_dir() / Path(source).name
+        if not path.exists():
+            raise HTTPException(status_code=404, detail=f"快照文件不存在: {path.name}")
+        try:
+            manifest = read_snapshot_manifest(path)
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=f"无法读取快照文件: {str(e)}")
+        if manifest.get("model_id") != get_vector_service().model_id and not request.force:
+            raise HTTPException(
+                status_code=400,
+                detail=f"快照模型 {manifest.get('model_id')} 与当前模型 {get_vector_service().model_id} 不一致"
+            )
+
+    def _import(progress_callback):
+        local_path = download_snapshot(source) if source.startswith(("http://", "https://")) else path
+        return import_snapshot(get_vector_service(), local_path, replace=request.replace, force=request.force,
+                               progress_callback=progress_callback)
+
+    _start_snapshot_task("importing", "正在导入向量快照...")
+    background_tasks.add_task(_run_snapshot_task, _import)
+    return {"message": "快照导入任务已在后台启动", "status": "started"}
+
+@router.get("/snapshot/status")
+async def get_snapshot_status(current_user: str = Depends(get_current_user)):
+    """获取快照导出/导入任务状态"""
+    with _snapshot_lock:
+        return _snapshot_progress.copy()
+
+def _get_snapshot_peer(credentials: Optional[HTTPAuthorizationCredentials] = Depends(security)) -> str:
+    """下载快照的认证：节点令牌（VECTOR_SNAPSHOT_TOKEN）或登录用户令牌"""
+    token = get_snapshot_token()
+    if token and credentials and hmac.compare_digest(credentials.credentials.encode(), token.encode()):
+        return "snapshot_peer"
+    return get_current_user(credentials)
+
+@router.get("/snapshot/latest")
+async def download_latest_snapshot(current_user: str = Depends(_get_snapshot_peer)):
+    """
+    下载快照目录中最新的向量快照（新节点启动时通过 VECTOR_SNAPSHOT 指向该地址即可恢复向量库）
+    需要登录令牌，或以 Bearer 方式携带节点令牌 VECTOR_SNAPSHOT_TOKEN
+    """
+    path = latest_snapshot_path()
+    if path is None:
+        raise HTTPException(status_code=404, detail="没有可用的向量快照，请先调用 /snapshot/export")
+    return FileResponse(path, media_type="application/zip", filename=path.name)
+
+class EmbeddingRebuildRequest(BaseModel):
+    model: str  # 新版本使用的向量模型（sentence-transformers 模型名或本地路径）
+    activate: bool = True  # 重建完成后自动切换
+
+class EmbeddingActivateRequest(BaseModel):
+    version: str  # 要启用的版本，如 "v2"
+
+@router.get("/embedding-versions")
+async def get_embedding_versions(current_user: str = Depends(get_current_user)):
+    """获取向量模型版本列表、当前启用/可回滚的版本以及重建任务状态"""
+    vector_service = get_vector_service()
+    status = await asyncio.to_thread(vector_service.version_status)
+    with _rebuild_lock:
+        status["rebuild"] = _rebuild_progress.copy()
+    return status
+
+@router.post("/embedding-versions/rebuild")
+async def rebuild_embedding_versions(
+    request: EmbeddingRebuildRequest,
+    background_tasks: BackgroundTasks,
+    current_user: str = Depends(get_current_user)
+):
+    """
+    用新模型在后台重建向量版本（论文、需求、成果、全文分块全部从 SQLite 重新向量化），当前版本继续提供检索
+    这是一个后台任务，会立即返回，进度通过 /embedding-versions 查询；中断后再次提交同一模型会从断点继续
+    """
+    global _rebuild_running, _rebuild_stop_requested, _rebuild_progress
+    if request.model == get_vector_service().model_name:
+        raise HTTPException(status_code=400, detail=f"当前版本已经使用模型 {request.model}，无需重建")
+    with _rebuild_lock:
+        if _rebuild_running:
+            raise HTTPException(status_code=400, detail="向量版本重建任务正在运行中，请稍后再试")
+        _rebuild_running = True
+        _rebuild_stop_requested = False
+        _rebuild_progress = {"status": "running", "version": None, "model": request.model, "stage": None,
+                             "message": "正在初始化...", "result": None}
+
+    def _rebuild():
+        global _rebuild_running
+
+        def _on_progress(stats):
+            with _rebuild_lock:
+                _rebuild_progress["version"] = stats["version"]
+                _rebuild_progress["stage"] = stats["stage"]
+                if stats["stage"] == "papers":
+                    _rebuild_progress["message"] = f"正在向量化论文：{stats.get('done', 0)}/{stats.get('total', 0)}..."
+                else:
+                    _rebuild_progress["message"] = f"正在向量化 {stats['stage']}..."
+
+        try:
+            result = rebuild_embedding_version(
+                request.model, get_vector_service(), activate=request.activate,
+                progress_callback=_on_progress, should_stop=lambda: _rebuild_stop_requested
+            )
+            with _rebuild_lock:
+                _rebuild_progress["result"] = result
+                if result["status"] == "building":
+                    _rebuild_progress["status"] = "stopped"
+                    _rebuild_progress["message"] = f"已停止，再次提交模型 {request.model} 可从断点继续"
+                else:
+                    _rebuild_progress["status"] = "completed"
+                    _rebuild_progress["message"] = (
+                        f"版本 {result['version']} 重建完成，耗时 {result['elapsed']} 秒"
+                        + ("，已切换" if result["status"] == "active" else "，尚未启用")
+                    )
+        except Exception as e:
+            logger.error(f"向量版本重建失败: {e}", exc_info=True)
+            with _rebuild_lock:
+                _rebuild_progress["status"] = "error"
+                _rebuild_progress["message"] = f"向量版本重建失败: {str(e)}"
+        finally:
+            with _rebuild_lock:
+                _rebuild_running = False
+
+    background_tasks.add_task(_rebuild)
+    return {"message": "向量版本重建任务已在后台启动", "status": "started"}
+
+@router.post("/embedding-versions/stop")
+async def stop_embedding_rebuild(current_user: str = Depends(get_current_user)):
+    """停止正在运行的重建任务（当前批次完成后停止，已写入的向量保留）"""
+    global _rebuild_stop_requested
+    with _rebuild_lock:
+        if not _rebuild_running:
+            raise HTTPException(status_code=400, detail="没有正在运行的向量版本重建任务")
+        _rebuild_stop_requested = True
+    return {"message": "已请求停止重建任务"}
+
+@router.post("/embedding-versions/activate")
+async def activate_embedding_version(request: EmbeddingActivateRequest, current_user: str = Depends(get_current_user)):
+    """启用已重建完成的版本（原子切换，原版本可回滚）"""
+    try:
+        return await asyncio.to_thread(get_vector_service().activate_version, request.version)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/embedding-versions/rollback")
+async def rollback_embedding_version(current_user: str = Depends(get_current_user)):
+    """回滚到上一个版本（再次回滚即回到回滚前的版本）"""
+    try:
+        return await asyncio.to_thread(get_vector_service().rollback_version)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.delete("/embedding-versions/{version}")
+async def delete_embedding_version(version: str, current_user: str = Depends(get_current_user)):
+    """删除不再需要的版本及其集合（不能删除当前启用的版本；删除可回滚的版本后无法再回滚）"""
+    try:
+        collections = await asyncio.to_thread(get_vector_service().drop_version, version)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"message": f"已删除版本 {version}", "collections": collections}
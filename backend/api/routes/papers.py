@@ -28,6 +28,8 @@ router = APIRouter()
 
 from services.pdf import get_pdf_service
 from services.llm_service import get_llm_service
+from services.paper_knn import get_related_papers
+from services.vector_service import get_vector_service
 
 # =======================
 # 全局实现路径进度状态（本地模式）
@@ -161,6 +163,50 @@ async def local_search_papers(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"本地搜索失败: {str(e)}")
 
+@router.get("/{arxiv_id:path}/related")
+async def get_related(
+    arxiv_id: str,
+    limit: int = Query(10, ge=1, le=100, description="返回的相似论文数量"),
+    current_user: str = Depends(get_current_user)
+):
+    """
+    相似论文（“更多类似论文”）：从预计算的论文 kNN 图直接读取（见 scripts/build_paper_knn.py）
+    论文不在图中（刚索引、尚未更新图）或 limit 超过图中保存的近邻数时，用论文自身的向量做一次向量检索
+    """
+    try:
+        # limit 超过构建图时的 K 时 get_related_papers 返回 None
+        neighbours = await asyncio.to_thread(get_related_papers, arxiv_id, limit)
+        source = "graph"
+        if neighbours is None:
+            neighbours = await get_vector_service().asearch_similar_to_paper(arxiv_id, top_k=limit)
+            source = "vector"
+        if neighbours is None:
+            raise HTTPException(status_code=404, detail=f"论文 {arxiv_id} 未索引到向量库")
+
+        def _fetch_papers(paper_ids: List[str]) -> Dict[str, dict]:
+            conn = get_db_connection()
+            try:
+                cursor = conn.cursor()
+                placeholders = ','.join(['?'] * len(paper_ids))
+                cursor.execute(f"""
+                    SELECT arxiv_id, title, authors, abstract, categories, published_date, pdf_url
+                    FROM papers WHERE arxiv_id IN ({placeholders})
+                """, paper_ids)
+                return {row["arxiv_id"]: dict(row) for row in cursor.fetchall()}
+            finally:
+                conn.close()
+
+        papers = await asyncio.to_thread(_fetch_papers, [paper_id for paper_id, _ in neighbours]) if neighbours else {}
+        related = [
+            {**papers[paper_id], "paper_id": paper_id, "score": round(score, 4)}
+            for paper_id, score in neighbours if paper_id in papers
+        ]
+        return {"arxiv_id": arxiv_id, "related": related, "total": len(related), "source": source}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"获取相似论文失败: {str(e)}")
+
 @router.get("/categories")
 async def get_categories():
     """获取论文分类列表"""
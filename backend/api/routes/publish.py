@@ -78,63 +78,33 @@ class NeedUpdate(BaseModel):
 # 成果相关接口
 # =======================
 
-def _vectorize_achievement_sync(achievement_id: int, name: str, description: str, application: str = None, field: str = None):
-    """同步函数：将成果向量化（在线程池中执行）"""
+async def _vectorize_achievement_background(achievement_id: int, name: str, description: str, application: str = None, field: str = None):
+    """异步后台任务：将成果向量化（不阻塞响应，立即开始执行）"""
     try:
+        # 在向量服务的专用线程池中执行向量化，不阻塞事件循环
         vector_service = get_vector_service()
-        vector_service.add_achievement(
+        await vector_service.aadd_achievement(
             achievement_id=achievement_id,
             name=name,
             description=description,
             application=application,
             field=field
         )
-        logger.info(f"成果 {achievement_id} 向量化完成")
-    except Exception as e:
-        logger.error(f"成果 {achievement_id} 向量化失败: {str(e)}")
-
-async def _vectorize_achievement_background(achievement_id: int, name: str, description: str, application: str = None, field: str = None):
-    """异步后台任务：将成果向量化（不阻塞响应，立即开始执行）"""
-    try:
-        # 使用 asyncio.to_thread 在线程池中执行同步的向量化操作
-        # 这样可以立即开始执行，不等待响应返回
-        await asyncio.to_thread(
-            _vectorize_achievement_sync,
-            achievement_id,
-            name,
-            description,
-            application,
-            field
-        )
         logger.info(f"成果 {achievement_id} 向量化任务完成")
     except Exception as e:
         logger.error(f"成果 {achievement_id} 向量化任务失败: {str(e)}")
 
-def _vectorize_need_sync(need_id: int, title: str, description: str, industry: str = None):
-    """同步函数：将发布需求向量化（在线程池中执行）"""
+async def _vectorize_need_background(need_id: int, title: str, description: str, industry: str = None):
+    """异步后台任务：将发布需求向量化（不阻塞响应，立即开始执行）"""
     try:
+        # 在向量服务的专用线程池中执行向量化，不阻塞事件循环
         vector_service = get_vector_service()
-        vector_service.add_published_need(
+        await vector_service.aadd_published_need(
             need_id=need_id,
             title=title,
             description=description,
             industry=industry or ""
         )
-        logger.info(f"发布需求 {need_id} 向量化完成")
-    except Exception as e:
-        logger.error(f"发布需求 {need_id} 向量化失败: {str(e)}")
-
-async def _vectorize_need_background(need_id: int, title: str, description: str, industry: str = None):
-    """异步后台任务：将发布需求向量化（不阻塞响应，立即开始执行）"""
-    try:
-        # 使用 asyncio.to_thread 在线程池中执行同步的向量化操作
-        await asyncio.to_thread(
-            _vectorize_need_sync,
-            need_id,
-            title,
-            description,
-            industry
-        )
         logger.info(f"发布需求 {need_id} 向量化任务完成")
     except Exception as e:
         logger.error(f"发布需求 {need_id} 向量化任务失败: {str(e)}")
@@ -61,6 +61,36 @@ def init_db():
             )
         """)
 
+        # 论文全文检索表（FTS5，BM25 关键词检索用）：外部内容表，只存倒排索引，
+        # 由触发器在 papers 插入/更新/删除时同步；首次创建时从 papers 表重建索引
+        try:
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'papers_fts'")
+            fts_exists = cursor.fetchone() is not None
+            cursor.execute("""
+                CREATE VIRTUAL TABLE IF NOT EXISTS papers_fts USING fts5(
+                    title, abstract,
+                    content='papers', content_rowid='id',
+                    tokenize='porter unicode61'
+                )
+            """)
+            cursor.executescript("""
+                CREATE TRIGGER IF NOT EXISTS papers_fts_insert AFTER INSERT ON papers BEGIN
+                    INSERT INTO papers_fts(rowid, title, abstract) VALUES (new.id, new.title, new.abstract);
+                END;
+                CREATE TRIGGER IF NOT EXISTS papers_fts_delete AFTER DELETE ON papers BEGIN
+                    INSERT INTO papers_fts(papers_fts, rowid, title, abstract) VALUES ('delete', old.id, old.title, old.abstract);
+                END;
+                CREATE TRIGGER IF NOT EXISTS papers_fts_update AFTER UPDATE OF title, abstract ON papers BEGIN
+                    INSERT INTO papers_fts(papers_fts, rowid, title, abstract) VALUES ('delete', old.id, old.title, old.abstract);
+                    INSERT INTO papers_fts(rowid, title, abstract) VALUES (new.id, new.title, new.abstract);
+                END;
+            """)
+            if not fts_exists:
+                cursor.execute("INSERT INTO papers_fts(papers_fts) VALUES ('rebuild')")
+                logger.info("论文全文检索索引（papers_fts）已创建")
+        except sqlite3.OperationalError as e:
+            logger.warning(f"创建论文全文检索索引失败（SQLite 可能未启用 FTS5），关键词检索将不可用: {e}")
+
         # 创建需求表
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS requirements (
@@ -244,7 +274,26 @@ def init_db():
                 FOREIGN KEY (user_id) REFERENCES users (id)
             )
         """)
-        
+
+        # 创建需求-论文相似度预计算表（services/requirement_similarity.py 批量写入）
+        # direction: req2paper = 需求的 Top-N 论文，paper2req = 论文的 Top-N 需求
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS requirement_paper_similarity (
+                direction VARCHAR(10) NOT NULL,
+                requirement_id VARCHAR(50) NOT NULL,
+                paper_id VARCHAR(20) NOT NULL,
+                rank INTEGER NOT NULL,
+                score REAL NOT NULL,
+                embedding_version VARCHAR(20) NOT NULL,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (direction, requirement_id, paper_id)
+            )
+        """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_requirement_paper_similarity_paper
+            ON requirement_paper_similarity (paper_id, direction)
+        """)
+
         conn.commit()
         conn.close()
         logger.info("数据库初始化成功")
@@ -4,7 +4,8 @@ FastAPI 主应用文件
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, JSONResponse
+import asyncio
 import uvicorn
 import os
 from pathlib import Path
@@ -69,11 +70,54 @@ frontend_path = Path(__file__).parent.parent / "frontend" / "dist"
 if frontend_path.exists():
     app.mount("/static", StaticFiles(directory=str(frontend_path)), name="static")
 
+async def warm_up_vector_service():
+    """后台预热向量服务（模型加载、首次推理、集合查询在线程池中执行，不阻塞事件循环）"""
+    try:
+        from services.vector_service import get_vector_service
+        vector_service = await asyncio.to_thread(get_vector_service)
+        timings = await asyncio.to_thread(vector_service.warm_up)
+        app.state.ready = True
+        print(f"✅ 向量服务预热完成: {timings}")
+    except Exception as e:
+        app.state.warmup_error = str(e)
+        print(f"❌ 向量服务预热失败: {e}")
+
+async def restore_vector_snapshot(source: str):
+    """新节点启动时从向量快照恢复（论文集合为空时才导入），恢复完成前 /api/ready 返回 503"""
+    try:
+        from services.vector_service import get_vector_service
+        from services.vector_snapshot import restore_snapshot_if_empty
+        vector_service = await asyncio.to_thread(get_vector_service)
+        result = await asyncio.to_thread(restore_snapshot_if_empty, vector_service, source)
+        if result:
+            print(f"✅ 已从向量快照恢复: {result}")
+    except Exception as e:
+        app.state.warmup_error = f"向量快照恢复失败: {e}"
+        print(f"❌ 向量快照恢复失败: {e}")
+        return
+    if os.getenv("VECTOR_WARMUP", "False").lower() == "true":
+        await warm_up_vector_service()
+    else:
+        app.state.ready = True
+
 @app.on_event("startup")
 async def startup_event():
     """应用启动时初始化数据库，并尝试探测 Redis / 初始化 ARQ 连接池"""
     init_db()
 
+    # 可选：启动时预热向量服务（VECTOR_WARMUP=true），预热完成前 /api/ready 返回 503
+    app.state.warmup_error = None
+    # 可选：从向量快照恢复（VECTOR_SNAPSHOT 为快照文件路径或其他节点的 /api/matching/snapshot/latest 地址）
+    snapshot_source = os.getenv("VECTOR_SNAPSHOT")
+    if snapshot_source:
+        app.state.ready = False
+        app.state.warmup_task = asyncio.create_task(restore_vector_snapshot(snapshot_source))
+    elif os.getenv("VECTOR_WARMUP", "False").lower() == "true":
+        app.state.ready = False
+        app.state.warmup_task = asyncio.create_task(warm_up_vector_service())
+    else:
+        app.state.ready = True
+
     # 默认关闭 Redis 模式
     app.state.use_redis = False
     app.state.redis_pool = None
@@ -111,6 +155,20 @@ async def health_check():
     """健康检查接口"""
     return {"status": "healthy", "message": "服务运行正常"}
 
+@app.get("/api/ready")
+async def readiness_check():
+    """就绪检查接口（供负载均衡使用）：启用预热时，预热完成前返回 503"""
+    if getattr(app.state, "ready", False):
+        return {"status": "ready", "message": "服务已就绪"}
+    error = getattr(app.state, "warmup_error", None)
+    return JSONResponse(
+        status_code=503,
+        content={
+            "status": "error" if error else "warming_up",
+            "message": f"向量服务预热失败: {error}" if error else "向量服务预热中"
+        }
+    )
+
 if __name__ == "__main__":
     uvicorn.run(
         "main:app",
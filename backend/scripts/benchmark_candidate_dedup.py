@@ -0,0 +1,109 @@
+"""
+候选去重效果测试：LLM 精排前折叠近似重复候选，对比精排名额（前 10 篇）中的重复情况和提交给 LLM 的文本量
+
+用数据库中的论文标题作为查询，在当前向量库中检索 top-k 候选，分别按 cosine / simhash 去重：
+- 前 10 篇中的重复：不去重时前 10 篇里属于同一簇的多余候选数（按 cosine 阈值判定）
+- 前 10 篇不同簇数：交给 LLM 的候选实际覆盖的不同工作数
+- LLM 文本量：前 10 篇的标题 + 摘要前 400 字（score_papers_listwise 的提示词内容）
+- 去重耗时：读取候选向量 / 计算 SimHash 并聚类
+
+运行方式（在 backend 目录下）：
+    python scripts/benchmark_candidate_dedup.py
+    python scripts/benchmark_candidate_dedup.py --queries 100 --top-k 50 --threshold 0.93
+"""
+import sys
+import time
+import random
+import logging
+from pathlib import Path
+
+# 添加项目根目录到路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import numpy as np
+
+from database.database import get_db_connection
+from services.candidate_dedup import CANDIDATE_DEDUP_SIMHASH_DISTANCE, collapse_near_duplicates
+from services.vector_service import get_vector_service
+
+logging.basicConfig(level=logging.WARNING)
+logger = logging.getLogger(__name__)
+
+# score_papers_batch 只精排前 10 篇
+LLM_TOP_N = 10
+
+
+def load_papers(paper_ids=None, limit: int = 0) -> list:
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    if paper_ids is not None:
+        placeholders = ','.join(['?'] * len(paper_ids))
+        cursor.execute(f"SELECT arxiv_id, title, abstract FROM papers WHERE arxiv_id IN ({placeholders})", paper_ids)
+    else:
+        cursor.execute("SELECT arxiv_id, title, abstract FROM papers WHERE title IS NOT NULL LIMIT ?", (limit,))
+    rows = [dict(row) for row in cursor.fetchall()]
+    conn.close()
+    return rows
+
+
+def llm_chars(items: list) -> int:
+    return sum(len(item["title"] or "") + min(len(item["abstract"] or ""), 400) for item in items[:LLM_TOP_N])
+
+
+def cluster_count(items: list, vectors: dict, threshold: float) -> int:
+    """按 cosine 阈值统计候选覆盖的不同簇数"""
+    return len(collapse_near_duplicates(items, mode="cosine", vectors=vectors, threshold=threshold))
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="测量 LLM 精排前候选去重的效果")
+    parser.add_argument("--queries", type=int, default=50, help="查询数量（默认50）")
+    parser.add_argument("--top-k", type=int, default=50, help="每次检索的候选数（默认50）")
+    parser.add_argument("--threshold", type=float, default=0.95, help="cosine 去重阈值（默认0.95）")
+    parser.add_argument("--max-distance", type=int, default=CANDIDATE_DEDUP_SIMHASH_DISTANCE,
+                        help=f"simhash 汉明距离阈值（默认{CANDIDATE_DEDUP_SIMHASH_DISTANCE}）")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+
+    args = parser.parse_args()
+    logging.getLogger("services.candidate_dedup").setLevel(logging.WARNING)
+
+    vector_service = get_vector_service()
+    queries = load_papers(limit=100000)
+    if not queries or vector_service.collection.count() == 0:
+        print("数据库或向量库中没有论文，请先运行爬虫并索引")
+        sys.exit(1)
+    random.Random(args.seed).shuffle(queries)
+    queries = queries[:args.queries]
+
+    stats = {mode: {"dup": [], "clusters": [], "chars": [], "ms": []} for mode in ("none", "cosine", "simhash")}
+    for query in queries:
+        hits = vector_service.search_similar(query["title"], top_k=args.top_k)
+        details = {row["arxiv_id"]: row for row in load_papers([pid for pid, _ in hits])}
+        candidates = [dict(details[pid], paper_id=pid, vector_score=score) for pid, score in hits if pid in details]
+        all_vectors = vector_service.get_embeddings([c["paper_id"] for c in candidates])
+
+        for mode in stats:
+            start = time.perf_counter()
+            if mode == "cosine":
+                vectors = vector_service.get_embeddings([c["paper_id"] for c in candidates])
+                kept = collapse_near_duplicates(candidates, mode=mode, vectors=vectors, threshold=args.threshold)
+            elif mode == "simhash":
+                kept = collapse_near_duplicates(candidates, mode=mode, max_distance=args.max_distance)
+            else:
+                kept = candidates
+            elapsed = (time.perf_counter() - start) * 1000
+            clusters = cluster_count(kept[:LLM_TOP_N], all_vectors, args.threshold)
+            stats[mode]["dup"].append(min(len(kept), LLM_TOP_N) - clusters)
+            stats[mode]["clusters"].append(clusters)
+            stats[mode]["chars"].append(llm_chars(kept))
+            stats[mode]["ms"].append(elapsed)
+
+    print(f"\n{len(queries)} 次查询，每次 top-{args.top_k} 候选，向量库 {vector_service.collection.count()} 篇")
+    print(f"{'方式':<10}{'前10重复':>10}{'前10不同簇':>12}{'LLM文本(字)':>14}{'去重耗时(ms)':>14}")
+    for mode, values in stats.items():
+        print(f"{mode:<10}{np.mean(values['dup']):>10.2f}{np.mean(values['clusters']):>12.2f}"
+              f"{np.mean(values['chars']):>14.0f}{np.median(values['ms']):>14.2f}")
+    print("\n前10重复 / 不同簇均按 cosine 阈值判定；LLM 文本为前 10 篇候选的标题 + 摘要前 400 字")
@@ -0,0 +1,186 @@
+"""
+压缩向量检索基准：npy 后端 float32 / float16 精确检索 vs PQ 编码粗排 + 全精度精确重排
+
+使用合成的聚簇向量（默认 100 万条 384 维），以 float32 精确检索结果为基准：
+- 磁盘占用（向量矩阵 / PQ 编码）
+- 检索进程的常驻内存增量（每种模式在独立子进程中查询，读取 /proc/self/status 的 VmRSS，
+  内存映射文件中被访问过的页也计入；不含 Python 和 NumPy 本身）
+- 单条查询延迟 p50/p95、recall@k
+
+向量写入临时目录（--workdir），100 万条约需 3 GB 磁盘空间，不会影响项目数据。
+
+运行方式（在 backend 目录下）：
+    python scripts/benchmark_compressed_vectors.py
+    python scripts/benchmark_compressed_vectors.py --n 200000 --rerank-factors 4 8 16 --subspaces 48 96
+"""
+import sys
+import time
+import shutil
+import tempfile
+import logging
+import multiprocessing
+from pathlib import Path
+
+# 添加项目根目录到路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import numpy as np
+
+from services.vector_stores import VECTOR_STORE_NPY, NPY_COMPRESSION_PQ, create_vector_store
+
+logging.basicConfig(level=logging.WARNING)
+logger = logging.getLogger(__name__)
+
+
+def _rss_mb() -> float:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def _dir_size_mb(path: Path, pattern: str = "*") -> float:
+    return sum(f.stat().st_size for f in path.glob(pattern) if f.is_file()) / 1024 / 1024
+
+
+def build_collection(path: Path, n: int, dim: int, batch_size: int, npy_dtype: str, seed: int = 0) -> float:
+    """分批生成聚簇向量并写入 npy 集合（不在内存中保留全部向量），返回写入耗时"""
+    rng = np.random.default_rng(seed)
+    n_clusters = max(1, n // 200)
+    centers = rng.standard_normal((n_clusters, dim)).astype(np.float32)
+    collection = create_vector_store(VECTOR_STORE_NPY, path, npy_dtype=npy_dtype).get_or_create_collection("papers")
+    start = time.perf_counter()
+    for s in range(0, n, batch_size):
+        count = min(batch_size, n - s)
+        vectors = centers[rng.integers(0, n_clusters, count)] + 0.6 * rng.standard_normal((count, dim)).astype(np.float32)
+        collection.add(ids=[str(i) for i in range(s, s + count)], embeddings=vectors)
+    return time.perf_counter() - start
+
+
+def make_queries(path: Path, n_queries: int, seed: int = 1) -> np.ndarray:
+    """在已写入的向量附近取查询向量"""
+    matrix = np.load(path / "papers" / "vectors.npy", mmap_mode="r")
+    collection = create_vector_store(VECTOR_STORE_NPY, path).get_or_create_collection("papers")
+    rng = np.random.default_rng(seed)
+    base = np.asarray(matrix[np.sort(rng.integers(0, collection.count(), n_queries))], dtype=np.float32)
+    queries = base + 0.3 * rng.standard_normal(base.shape).astype(np.float32) / np.sqrt(base.shape[1])
+    return queries / np.linalg.norm(queries, axis=1, keepdims=True)
+
+
+def exact_top_k(path: Path, queries: np.ndarray, k: int, block: int = 65536) -> list:
+    """float32 精确 top-k（基准），返回每条查询的 ID 集合"""
+    matrix = np.load(path / "papers" / "vectors.npy", mmap_mode="r")
+    count = create_vector_store(VECTOR_STORE_NPY, path).get_or_create_collection("papers").count()
+    scores = np.concatenate([queries @ np.asarray(matrix[s:min(s + block, count)], dtype=np.float32).T
+                             for s in range(0, count, block)], axis=1)
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    return [{str(i) for i in row} for row in top]
+
+
+def _query_worker(path: str, compression: str, pq_options: dict, queries: np.ndarray, truth: list,
+                  k: int, result_queue) -> None:
+    """子进程：打开集合并查询，统计常驻内存增量、延迟和召回率"""
+    baseline = _rss_mb()
+    collection = create_vector_store(
+        VECTOR_STORE_NPY, Path(path), npy_compression=compression, pq_options=pq_options
+    ).get_or_create_collection("papers")
+    # 第一次查询打开矩阵，不计入延迟
+    collection.query(query_embeddings=[queries[0]], n_results=k)
+    latencies, recalls = [], []
+    for query, expected in zip(queries, truth):
+        start = time.perf_counter()
+        result = collection.query(query_embeddings=[query], n_results=k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        recalls.append(len(set(result["ids"][0]) & expected) / k)
+    result_queue.put({
+        "rss_mb": _rss_mb() - baseline,
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+        "recall": float(np.mean(recalls)),
+    })
+
+
+def run_queries(path: Path, queries: np.ndarray, truth: list, k: int,
+                compression: str = "none", pq_options: dict = None) -> dict:
+    ctx = multiprocessing.get_context("spawn")
+    result_queue = ctx.Queue()
+    process = ctx.Process(target=_query_worker,
+                          args=(str(path), compression, pq_options or {}, queries, truth, k, result_queue))
+    process.start()
+    result = result_queue.get()
+    process.join()
+    return result
+
+
+def _drop_page_cache(path: Path) -> None:
+    """尽量把向量文件移出页缓存（posix_fadvise），使各模式的常驻内存统计互不影响"""
+    import os
+    for f in path.rglob("*.npy"):
+        fd = os.open(f, os.O_RDONLY)
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        finally:
+            os.close(fd)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="对比 float32 / float16 精确检索与 PQ 压缩检索的内存、召回率和延迟")
+    parser.add_argument("--n", type=int, default=1000000, help="向量数量（默认1000000）")
+    parser.add_argument("--dim", type=int, default=384, help="向量维度（默认384）")
+    parser.add_argument("--queries", type=int, default=100, help="查询数量（默认100）")
+    parser.add_argument("--top-k", type=int, default=50, help="检索数量（默认50，与匹配接口一致）")
+    parser.add_argument("--batch-size", type=int, default=20000, help="写入批大小（默认20000）")
+    parser.add_argument("--subspaces", type=int, nargs="+", default=[48], help="PQ 段数（默认48）")
+    parser.add_argument("--rerank-factors", type=int, nargs="+", default=[4, 8, 16],
+                        help="PQ 粗排候选数 = top-k × 该系数（默认 4 8 16）")
+    parser.add_argument("--skip-float16", action="store_true", help="不测试 float16 精确检索")
+    parser.add_argument("--workdir", type=str, default=None, help="临时目录（默认系统临时目录）")
+
+    args = parser.parse_args()
+    workdir = Path(tempfile.mkdtemp(prefix="bench_pq_", dir=args.workdir))
+    try:
+        float32_path = workdir / "float32"
+        seconds = build_collection(float32_path, args.n, args.dim, args.batch_size, "float32")
+        print(f"向量数量: {args.n}，维度: {args.dim}，查询: {args.queries}，top-k: {args.top_k}，写入 {seconds:.1f} s")
+        queries = make_queries(float32_path, args.queries)
+        truth = exact_top_k(float32_path, queries, args.top_k)
+
+        print(f"\n{'模式':<22}{'矩阵(MB)':>10}{'编码(MB)':>10}{'常驻(MB)':>10}"
+              f"{'p50(ms)':>10}{'p95(ms)':>10}{'recall@k':>10}")
+
+        def report(name: str, path: Path, result: dict) -> None:
+            print(f"{name:<22}{_dir_size_mb(path / 'papers', 'vectors.npy'):>10.0f}"
+                  f"{_dir_size_mb(path / 'papers', 'pq_codes.npy'):>10.0f}{result['rss_mb']:>10.0f}"
+                  f"{result['p50_ms']:>10.1f}{result['p95_ms']:>10.1f}{result['recall']:>10.4f}")
+
+        _drop_page_cache(float32_path)
+        report("float32 精确", float32_path, run_queries(float32_path, queries, truth, args.top_k))
+
+        if not args.skip_float16:
+            float16_path = workdir / "float16"
+            build_collection(float16_path, args.n, args.dim, args.batch_size, "float16")
+            _drop_page_cache(float16_path)
+            report("float16 精确", float16_path, run_queries(float16_path, queries, truth, args.top_k))
+            shutil.rmtree(float16_path)
+
+        for m in args.subspaces:
+            pq_path = workdir / f"pq{m}"
+            shutil.copytree(float32_path, pq_path)
+            collection = create_vector_store(
+                VECTOR_STORE_NPY, pq_path, npy_compression=NPY_COMPRESSION_PQ, pq_options={"pq_subspaces": m}
+            ).get_or_create_collection("papers")
+            start = time.perf_counter()
+            collection.train_pq()
+            print(f"  （PQ m={m} 训练 + 编码 {time.perf_counter() - start:.1f} s）")
+            for factor in args.rerank_factors:
+                _drop_page_cache(pq_path)
+                result = run_queries(pq_path, queries, truth, args.top_k, NPY_COMPRESSION_PQ,
+                                     {"pq_subspaces": m, "pq_rerank_factor": factor})
+                report(f"PQ m={m} 重排×{factor}", pq_path, result)
+            shutil.rmtree(pq_path)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
@@ -0,0 +1,180 @@
+"""
+向量化推理后端基准测试与一致性检查：torch / onnx / onnx-int8
+
+- 一致性：以 torch 向量为基准，检查其他后端在测试文本上的余弦相似度（低于阈值时退出码为 1）
+- 性能：模型加载耗时、单条查询延迟 p50/p95、批量吞吐、进程 RSS
+
+每个后端在独立子进程中运行，保证内存统计互不影响；临时 ChromaDB 目录，不会影响项目数据。
+
+运行方式（在 backend 目录下）：
+    python scripts/benchmark_embedding_backends.py
+    python scripts/benchmark_embedding_backends.py --backends torch onnx-int8 --min-cosine 0.98
+"""
+import sys
+import os
+import json
+import time
+import tempfile
+import subprocess
+import logging
+from pathlib import Path
+
+# 添加项目根目录到路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import numpy as np
+
+logging.basicConfig(level=logging.WARNING)
+logger = logging.getLogger(__name__)
+
+# 查询类测试文本（短文本，对应匹配接口的查询向量）
+QUERY_FIXTURES = [
+    "工业质检中的表面缺陷检测",
+    "defect detection, surface anomaly detection, YOLO, CNN",
+    "大模型推理加速与量化部署",
+    "LoRA fine-tuning for domain adaptation",
+    "医疗影像分割",
+    "retrieval augmented generation for customer service",
+    "多模态情感分析",
+    "graph neural networks for recommendation",
+]
+
+
+def load_fixtures(limit: int) -> list:
+    """测试文本：数据库中的论文（与 add_paper 相同的文本拼接）+ requirements.json 中的需求 + 查询文本"""
+    from database.database import get_db_connection
+    from services.vector_service import VectorService
+
+    texts = list(QUERY_FIXTURES)
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute("SELECT title, abstract FROM papers WHERE title IS NOT NULL LIMIT ?", (limit,))
+        texts += [VectorService._build_paper_text(row["title"], row["abstract"] or "") for row in cursor.fetchall()]
+        conn.close()
+    except Exception as e:
+        logger.warning(f"读取论文失败，跳过: {e}")
+
+    requirements_file = project_root / "requirements.json"
+    if requirements_file.exists():
+        with open(requirements_file, "r", encoding="utf-8") as f:
+            for req in json.load(f)[:limit]:
+                texts.append(f"{req.get('title', '')}\n{req.get('description', '')}")
+    return texts
+
+
+def _rss_mb() -> float:
+    """当前进程常驻内存（MB），仅支持 Linux"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return float("nan")
+
+
+def run_worker(backend: str, fixtures_file: str, output_file: str, model_name: str, queries: int) -> None:
+    """子进程：加载指定后端，编码测试文本并测量性能，结果写入 output_file(.npy/.json)"""
+    os.environ["EMBEDDING_BACKEND"] = backend
+    from services.vector_service import VectorService
+
+    with open(fixtures_file, "r", encoding="utf-8") as f:
+        texts = json.load(f)
+
+    service = VectorService(db_path=Path(tempfile.mkdtemp(prefix="bench_chroma_")))
+    service.embedding_cache = None
+    if model_name:
+        service._model_name = model_name
+
+    start = time.perf_counter()
+    service._load_model()
+    service.embed_text("warm up", use_cache=False)
+    load_seconds = time.perf_counter() - start
+
+    latencies = []
+    for i in range(queries):
+        query = QUERY_FIXTURES[i % len(QUERY_FIXTURES)]
+        start = time.perf_counter()
+        service.embed_text(query, use_cache=False)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    vectors = np.asarray(service.embed_texts(texts, use_cache=False), dtype=np.float32)
+    batch_seconds = time.perf_counter() - start
+
+    np.save(output_file + ".npy", vectors)
+    with open(output_file + ".json", "w", encoding="utf-8") as f:
+        json.dump({
+            "backend": backend,
+            "load_seconds": load_seconds,
+            "query_p50_ms": float(np.percentile(latencies, 50)),
+            "query_p95_ms": float(np.percentile(latencies, 95)),
+            "batch_texts_per_sec": len(texts) / batch_seconds,
+            "rss_mb": _rss_mb(),
+        }, f)
+
+
+def cosine_rows(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """逐行余弦相似度"""
+    a = a / np.linalg.norm(a, axis=1, keepdims=True)
+    b = b / np.linalg.norm(b, axis=1, keepdims=True)
+    return (a * b).sum(axis=1)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="对比 torch / onnx / onnx-int8 向量化后端的一致性、延迟和内存")
+    parser.add_argument("--backends", nargs="+", default=["torch", "onnx", "onnx-int8"], help="参与对比的后端（第一个为基准）")
+    parser.add_argument("--limit", type=int, default=200, help="测试论文/需求数量上限（默认200）")
+    parser.add_argument("--queries", type=int, default=200, help="单条查询延迟测试次数（默认200）")
+    parser.add_argument("--min-cosine", type=float, default=0.99, help="与基准向量的最小余弦相似度（默认0.99）")
+    parser.add_argument("--model", type=str, default=None, help="覆盖模型名称或本地模型目录")
+    parser.add_argument("--worker", type=str, default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--fixtures-file", type=str, default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--output-file", type=str, default=None, help=argparse.SUPPRESS)
+
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.worker, args.fixtures_file, args.output_file, args.model, args.queries)
+        sys.exit(0)
+
+    work_dir = Path(tempfile.mkdtemp(prefix="bench_backends_"))
+    fixtures_file = work_dir / "fixtures.json"
+    texts = load_fixtures(args.limit)
+    with open(fixtures_file, "w", encoding="utf-8") as f:
+        json.dump(texts, f, ensure_ascii=False)
+    print(f"测试文本数量: {len(texts)}")
+
+    results = {}
+    for backend in args.backends:
+        output_file = str(work_dir / backend)
+        command = [sys.executable, __file__, "--worker", backend,
+                   "--fixtures-file", str(fixtures_file), "--output-file", output_file,
+                   "--queries", str(args.queries)]
+        if args.model:
+            command += ["--model", args.model]
+        subprocess.run(command, check=True, cwd=str(project_root))
+        with open(output_file + ".json", "r", encoding="utf-8") as f:
+            results[backend] = json.load(f)
+        results[backend]["vectors"] = np.load(output_file + ".npy")
+
+    baseline = args.backends[0]
+    print(f"\n{'后端':<12}{'加载(s)':>10}{'p50(ms)':>10}{'p95(ms)':>10}{'批量(条/s)':>12}{'RSS(MB)':>10}{'最小余弦':>10}{'平均余弦':>10}")
+    passed = True
+    for backend in args.backends:
+        r = results[backend]
+        cos = cosine_rows(r["vectors"], results[baseline]["vectors"])
+        if cos.min() < args.min_cosine:
+            passed = False
+        print(f"{backend:<12}{r['load_seconds']:>10.2f}{r['query_p50_ms']:>10.2f}{r['query_p95_ms']:>10.2f}"
+              f"{r['batch_texts_per_sec']:>12.1f}{r['rss_mb']:>10.0f}{cos.min():>10.4f}{cos.mean():>10.4f}")
+
+    if not passed:
+        print(f"\n一致性检查失败：存在与 {baseline} 向量余弦相似度低于 {args.min_cosine} 的文本")
+        sys.exit(1)
+    print(f"\n一致性检查通过（所有文本与 {baseline} 的余弦相似度 >= {args.min_cosine}）")
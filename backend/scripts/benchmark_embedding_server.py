@@ -0,0 +1,173 @@
+"""
+向量化服务（动态合批）基准测试：不同并发下单条文本编码的吞吐与延迟
+
+- local：本进程直接调用模型，每个请求一次 batch=1 的 encode（相当于每个 worker 各自编码）
+- server(max_wait=Xms)：启动 scripts/embedding_server.py 子进程（临时 Unix socket），
+  客户端通过 EmbeddingServerClient 请求，服务端合批编码；同时统计服务端的平均批大小
+
+每个并发级别用 N 个线程循环发送单条文本（查询 / 论文文本），统计吞吐（条/s）和单次请求延迟 p50/p95。
+同时检查服务返回的向量与本地编码一致（最小余弦）。
+
+运行方式（在 backend 目录下）：
+    python scripts/benchmark_embedding_server.py
+    python scripts/benchmark_embedding_server.py --concurrency 1 4 16 --max-wait-ms 0 2 5 --requests 300
+"""
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+# 添加项目根目录到路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import numpy as np
+
+from services.embedding_backends import BACKEND_TORCH
+from services.embedding_server import EmbeddingServerClient, load_encoder
+from services.embedding_versions import DEFAULT_EMBEDDING_MODEL
+import logging
+
+logging.basicConfig(level=logging.WARNING)
+logger = logging.getLogger(__name__)
+
+
+# 查询类测试文本（短文本，对应匹配接口的查询向量）
+QUERY_FIXTURES = [
+    "工业质检中的表面缺陷检测",
+    "大模型推理加速与量化部署",
+    "retrieval augmented generation for customer service",
+    "graph neural networks for recommendation",
+]
+
+
+def load_texts(limit: int) -> list:
+    """测试文本：查询文本 + 数据库中的论文（与 add_paper 相同的文本拼接）"""
+    from database.database import get_db_connection
+    from services.vector_service import VectorService
+
+    texts = list(QUERY_FIXTURES)
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute("SELECT title, abstract FROM papers WHERE title IS NOT NULL LIMIT ?", (limit,))
+        texts += [VectorService._build_paper_text(row["title"], row["abstract"] or "") for row in cursor.fetchall()]
+        conn.close()
+    except Exception as e:
+        logger.warning(f"读取论文失败，只使用查询文本: {e}")
+    return texts
+
+
+def run_load(encode, texts, concurrency: int, requests: int):
+    """concurrency 个线程共发送 requests 次单条编码请求，返回 (吞吐 条/s, p50 ms, p95 ms)"""
+    latencies = []
+    lock = threading.Lock()
+    counter = iter(range(requests))
+
+    def worker():
+        while True:
+            with lock:
+                i = next(counter, None)
+            if i is None:
+                return
+            start = time.perf_counter()
+            encode(texts[i % len(texts)])
+            elapsed = (time.perf_counter() - start) * 1000
+            with lock:
+                latencies.append(elapsed)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    total = time.perf_counter() - start
+    latencies.sort()
+    return requests / total, latencies[len(latencies) // 2], latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+
+
+def start_server(socket_path: str, model_name: str, backend: str, max_batch: int, max_wait_ms: float,
+                 timeout: float = 600) -> subprocess.Popen:
+    process = subprocess.Popen(
+        [sys.executable, str(project_root / "scripts" / "embedding_server.py"), "--socket", socket_path,
+         "--model", model_name, "--backend", backend, "--max-batch", str(max_batch),
+         "--max-wait-ms", str(max_wait_ms), "--preload"],
+        cwd=str(project_root), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    import httpx
+    client = httpx.Client(transport=httpx.HTTPTransport(uds=socket_path), base_url="http://embedding-server")
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("向量化服务启动失败")
+        try:
+            # --preload 完成后服务才开始接受请求
+            if client.get("/health", timeout=1).status_code == 200:
+                return process
+        except httpx.TransportError:
+            time.sleep(0.5)
+    process.kill()
+    raise RuntimeError("等待向量化服务启动超时")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="向量化服务动态合批基准测试")
+    parser.add_argument("--model", type=str, default=os.getenv("EMBEDDING_MODEL", DEFAULT_EMBEDDING_MODEL))
+    parser.add_argument("--backend", type=str, default=os.getenv("EMBEDDING_BACKEND", BACKEND_TORCH).lower())
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32], help="并发级别")
+    parser.add_argument("--max-wait-ms", type=float, nargs="+", default=[0, 2, 5], help="服务端合批等待时间")
+    parser.add_argument("--max-batch", type=int, default=64, help="服务端每批最多合并的文本数（默认64）")
+    parser.add_argument("--requests", type=int, default=200, help="每个并发级别的请求数（默认200）")
+    parser.add_argument("--skip-local", action="store_true", help="不测试本进程直接编码的基准")
+
+    args = parser.parse_args()
+
+    texts = load_texts(200)
+    print(f"测试文本数量: {len(texts)}，模型: {args.model}，后端: {args.backend}")
+
+    local_model = load_encoder(args.model, args.backend)
+    local_model.encode(texts[:4], convert_to_numpy=True, show_progress_bar=False)
+    rows = []
+    if not args.skip_local:
+        for concurrency in args.concurrency:
+            qps, p50, p95 = run_load(
+                lambda text: local_model.encode(text, convert_to_numpy=True, show_progress_bar=False),
+                texts, concurrency, args.requests)
+            rows.append(("local", concurrency, qps, p50, p95, 1.0))
+            print(f"local            并发 {concurrency:>3}: {qps:7.1f} 条/s  p50 {p50:7.1f} ms  p95 {p95:7.1f} ms")
+
+    with tempfile.TemporaryDirectory(prefix="embedding_server_") as tmp_dir:
+        socket_path = str(Path(tmp_dir) / "embedding.sock")
+        for max_wait in args.max_wait_ms:
+            server = start_server(socket_path, args.model, args.backend, args.max_batch, max_wait)
+            try:
+                client = EmbeddingServerClient(f"unix:{socket_path}", args.model, args.backend)
+                # 一致性：服务返回的向量与本地编码一致
+                sample = texts[:32]
+                remote = client.encode(sample)
+                local = local_model.encode(sample, convert_to_numpy=True, show_progress_bar=False)
+                cosine = np.sum(remote * local, axis=1) / (np.linalg.norm(remote, axis=1) * np.linalg.norm(local, axis=1))
+                print(f"\nserver(max_wait={max_wait}ms) 与本地编码的最小余弦: {cosine.min():.6f}")
+                for concurrency in args.concurrency:
+                    before = client._client.get("/info").json()["batcher"]
+                    qps, p50, p95 = run_load(client.encode, texts, concurrency, args.requests)
+                    after = client._client.get("/info").json()["batcher"]
+                    avg_batch = (after["texts"] - before["texts"]) / max(1, after["batches"] - before["batches"])
+                    label = f"server({max_wait:g}ms)"
+                    rows.append((label, concurrency, qps, p50, p95, avg_batch))
+                    print(f"{label:<16} 并发 {concurrency:>3}: {qps:7.1f} 条/s  p50 {p50:7.1f} ms  p95 {p95:7.1f} ms"
+                          f"  平均批大小 {avg_batch:.1f}")
+                client.close()
+            finally:
+                server.terminate()
+                server.wait()
+
+    print(f"\n{'模式':<16}{'并发':>6}{'吞吐(条/s)':>12}{'p50(ms)':>10}{'p95(ms)':>10}{'平均批大小':>12}")
+    for label, concurrency, qps, p50, p95, avg_batch in rows:
+        print(f"{label:<16}{concurrency:>6}{qps:>12.1f}{p50:>10.1f}{p95:>10.1f}{avg_batch:>12.1f}")
@@ -0,0 +1,125 @@
+"""
+事件循环延迟测试：并发匹配时，同步调用 search_similar 与异步 asearch_similar 对事件循环的阻塞对比
+
+测量方式：一个探测协程每隔 interval 毫秒 sleep 一次，记录实际唤醒时间与预期时间的差值（事件循环延迟）；
+同时并发执行若干个"匹配"协程，每个协程做一次向量检索（不调用 LLM）。
+- sync：在协程中直接调用 search_similar（改造前 match_papers / match_all 的写法）
+- async：await asearch_similar（在向量服务的专用线程池中执行）
+
+使用临时 ChromaDB 目录，不会影响项目数据。
+
+运行方式（在 backend 目录下）：
+    python scripts/benchmark_event_loop_lag.py
+    python scripts/benchmark_event_loop_lag.py --concurrency 16 --rounds 5 --model /path/to/local/model
+"""
+import sys
+import time
+import asyncio
+import tempfile
+import logging
+from pathlib import Path
+
+# 添加项目根目录到路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import numpy as np
+
+from database.database import get_db_connection
+from services.vector_service import VectorService
+
+logging.basicConfig(level=logging.WARNING)
+logger = logging.getLogger(__name__)
+
+
+def load_papers(limit: int) -> list:
+    """从数据库读取论文（作为检索库）"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT arxiv_id, title, abstract
+        FROM papers
+        WHERE arxiv_id IS NOT NULL
+        AND title IS NOT NULL
+        LIMIT ?
+    """, (limit,))
+    papers = [dict(row) for row in cursor.fetchall()]
+    conn.close()
+    return papers
+
+
+async def _probe(stop: asyncio.Event, interval: float, lags: list) -> None:
+    """事件循环延迟探测：记录每次 sleep 的超时量（毫秒）"""
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        lags.append(max(0.0, loop.time() - expected) * 1000)
+
+
+async def run_mode(service: VectorService, queries: list, mode: str, interval: float, top_k: int) -> dict:
+    """并发执行一轮检索，返回事件循环延迟和总耗时"""
+    # 清空查询缓存，保证每次都真实编码
+    service.query_cache.clear()
+
+    async def _match(query: str):
+        if mode == "sync":
+            return service.search_similar(query, top_k=top_k)
+        return await service.asearch_similar(query, top_k=top_k)
+
+    lags = []
+    stop = asyncio.Event()
+    probe = asyncio.create_task(_probe(stop, interval, lags))
+    await asyncio.sleep(interval * 2)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[_match(query) for query in queries])
+    elapsed = time.perf_counter() - start
+
+    stop.set()
+    await probe
+    return {
+        "elapsed": elapsed,
+        "lag_p50": float(np.percentile(lags, 50)) if lags else 0.0,
+        "lag_p99": float(np.percentile(lags, 99)) if lags else 0.0,
+        "lag_max": max(lags) if lags else 0.0,
+    }
+
+
+async def main(args) -> None:
+    papers = load_papers(args.limit)
+    if not papers:
+        print("数据库中没有论文，请先运行爬虫")
+        sys.exit(1)
+
+    service = VectorService(db_path=Path(tempfile.mkdtemp(prefix="bench_chroma_")))
+    service.embedding_cache = None
+    if args.model:
+        service._model_name = args.model
+    service.add_papers_bulk(papers)
+    service.embed_text("warm up", use_cache=False)
+    print(f"检索库论文数量: {len(papers)}，并发数: {args.concurrency}，"
+          f"向量线程池: {service.executor_workers}")
+
+    print(f"\n{'模式':<8}{'轮次':>6}{'总耗时(s)':>12}{'延迟p50(ms)':>14}{'延迟p99(ms)':>14}{'最大延迟(ms)':>14}")
+    for mode in ("sync", "async"):
+        for i in range(args.rounds):
+            # 每轮使用不同的查询文本（论文标题），避免查询缓存命中
+            offset = (i * args.concurrency) % len(papers)
+            queries = [papers[(offset + j) % len(papers)]["title"] + f" #{mode}{i}" for j in range(args.concurrency)]
+            r = await run_mode(service, queries, mode, args.interval / 1000, args.top_k)
+            print(f"{mode:<8}{i + 1:>6}{r['elapsed']:>12.2f}{r['lag_p50']:>14.1f}{r['lag_p99']:>14.1f}{r['lag_max']:>14.1f}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="测量并发向量检索时的事件循环延迟（同步调用 vs 异步接口）")
+    parser.add_argument("--limit", type=int, default=1000, help="检索库论文数量上限（默认1000）")
+    parser.add_argument("--concurrency", type=int, default=8, help="每轮并发匹配数（默认8）")
+    parser.add_argument("--rounds", type=int, default=3, help="每种模式的轮次（默认3）")
+    parser.add_argument("--interval", type=float, default=5, help="探测间隔（毫秒，默认5）")
+    parser.add_argument("--top-k", type=int, default=50, help="检索数量（默认50）")
+    parser.add_argument("--model", type=str, default=None, help="覆盖模型名称或本地模型目录")
+
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,168 @@
+"""
+HNSW 参数调优基准：在真实论文向量上对比 Chroma HNSW 与精确暴力检索，输出各组参数的 recall@k 和延迟
+
+从当前向量库的论文集合读取向量（--limit 篇），随机留出 --queries 条作为查询（不写入索引），
+其余写入临时目录中的 Chroma 集合。对 M × construction_ef 的每种组合建一次索引，
+再按每个 search_ef 在新进程中重新打开索引查询（同服务重启），与 numpy 精确 top-k 比较：
+- recall@k：HNSW 结果与精确结果的交集 / k（所有查询的平均值）
+- p50 / p95：单条查询延迟（毫秒）
+- 建索引：写入全部向量的耗时（M 和 construction_ef 越大越慢）
+
+选好参数后通过 HNSW_M / HNSW_CONSTRUCTION_EF / HNSW_SEARCH_EF 配置：
+search_ef 对已有集合重启即生效，M 和 construction_ef 只影响新建的集合（需要重建，见 rebuild_embeddings.py）。
+
+运行方式（在 backend 目录下）：
+    python scripts/benchmark_hnsw.py
+    python scripts/benchmark_hnsw.py --limit 200000 --m 16,32 --construction-ef 100,200 --search-ef 10,50,100,200
+    python scripts/benchmark_hnsw.py --synthetic 100000   # 没有真实数据时使用带簇结构的合成向量
+"""
+import sys
+import time
+import shutil
+import multiprocessing
+import tempfile
+import logging
+from pathlib import Path
+
+# 添加项目根目录到路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import numpy as np
+
+from services.vector_stores import VECTOR_STORE_CHROMA, create_vector_store
+
+logging.basicConfig(level=logging.WARNING)
+logger = logging.getLogger(__name__)
+
+# Chroma 单次写入的最大条数有限制，分批写入
+_ADD_BATCH = 4000
+
+
+def parse_grid(value: str) -> list:
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+def load_real_vectors(limit: int, page_size: int = 10000) -> np.ndarray:
+    """分页读取当前向量库论文集合中的向量"""
+    from services.vector_service import get_vector_service
+
+    collection = get_vector_service().collection
+    pages, offset = [], 0
+    while offset < limit:
+        page = collection.get(include=["embeddings"], limit=min(page_size, limit - offset), offset=offset)
+        if not page.get("ids"):
+            break
+        pages.append(np.asarray(page["embeddings"], dtype=np.float32))
+        offset += len(page["ids"])
+    return np.vstack(pages) if pages else np.empty((0, 0), dtype=np.float32)
+
+
+def synthetic_vectors(n: int, dim: int, clusters: int, seed: int) -> np.ndarray:
+    """带簇结构的合成向量（比均匀随机向量更接近真实文本向量的分布）"""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, clusters, n)
+    return centers[labels] + 0.6 * rng.standard_normal((n, dim)).astype(np.float32)
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+
+def exact_top_k(corpus: np.ndarray, queries: np.ndarray, k: int):
+    """精确 top-k（返回每条查询的行号集合）和单条查询延迟"""
+    results, latencies = [], []
+    for query in queries:
+        start = time.perf_counter()
+        scores = corpus @ query
+        top = np.argpartition(-scores, k - 1)[:k]
+        latencies.append((time.perf_counter() - start) * 1000)
+        results.append(set(top.tolist()))
+    return results, latencies
+
+
+def query_hnsw(path: str, hnsw_options: dict, queries: np.ndarray, k: int):
+    """
+    打开已建好的索引并逐条查询（在独立进程中执行：Chroma 在进程内缓存已加载的索引，
+    search_ef 的修改要重新打开索引才生效，与服务重启后生效一致）
+    """
+    # 与服务启动时相同：通过 hnsw_options 打开集合，search_ef 同步到集合配置
+    store = create_vector_store(VECTOR_STORE_CHROMA, Path(path), hnsw_options=hnsw_options)
+    collection = store.get_or_create_collection("papers", metadata={"hnsw:space": "cosine"})
+    collection.query(query_embeddings=[queries[0].tolist()], n_results=k)
+    results, latencies = [], []
+    for query in queries:
+        start = time.perf_counter()
+        result = collection.query(query_embeddings=[query.tolist()], n_results=k, include=[])
+        latencies.append((time.perf_counter() - start) * 1000)
+        results.append({int(i) for i in result["ids"][0]})
+    return results, latencies
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="HNSW 参数的召回率 / 延迟基准")
+    parser.add_argument("--limit", type=int, default=100000, help="读取的论文向量数量上限（默认100000）")
+    parser.add_argument("--synthetic", type=int, default=0, help="使用 N 条合成向量代替真实向量")
+    parser.add_argument("--dim", type=int, default=384, help="合成向量维度（默认384）")
+    parser.add_argument("--queries", type=int, default=200, help="留出作为查询的向量数量（默认200）")
+    parser.add_argument("--top-k", type=int, default=50, help="检索数量 k（默认50）")
+    parser.add_argument("--m", type=str, default="16,32", help="M 取值，逗号分隔（默认16,32）")
+    parser.add_argument("--construction-ef", type=str, default="100,200", help="construction_ef 取值（默认100,200）")
+    parser.add_argument("--search-ef", type=str, default="10,50,100,200", help="search_ef 取值（默认10,50,100,200）")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+
+    args = parser.parse_args()
+
+    if args.synthetic:
+        vectors = synthetic_vectors(args.synthetic, args.dim, clusters=max(10, args.synthetic // 1000), seed=args.seed)
+        source = f"合成向量 {args.synthetic} 条"
+    else:
+        vectors = load_real_vectors(args.limit)
+        source = f"论文向量 {len(vectors)} 条"
+    if len(vectors) <= args.queries + args.top_k:
+        print("向量数量不足，请先索引论文或使用 --synthetic")
+        sys.exit(1)
+
+    vectors = normalize(vectors.astype(np.float32))
+    rng = np.random.default_rng(args.seed)
+    order = rng.permutation(len(vectors))
+    queries, corpus = vectors[order[:args.queries]], vectors[order[args.queries:]]
+    k = args.top_k
+
+    exact, exact_latencies = exact_top_k(corpus, queries, k)
+    print(f"\n{source}（{len(corpus)} 条写入索引，{len(queries)} 条查询），k={k}")
+    print(f"{'M':>4}{'construction_ef':>17}{'search_ef':>11}{'recall@k':>10}{'p50(ms)':>10}{'p95(ms)':>10}{'建索引(s)':>11}")
+    print(f"{'精确检索（numpy 暴力）':<32}{1.0:>10.4f}{np.percentile(exact_latencies, 50):>10.2f}"
+          f"{np.percentile(exact_latencies, 95):>10.2f}{'-':>11}")
+
+    spawn = multiprocessing.get_context("spawn")
+    workdir = Path(tempfile.mkdtemp(prefix="bench_hnsw_"))
+    try:
+        for m in parse_grid(args.m):
+            for construction_ef in parse_grid(args.construction_ef):
+                path = workdir / f"m{m}_ef{construction_ef}"
+                store = create_vector_store(VECTOR_STORE_CHROMA, path,
+                                            hnsw_options={"M": m, "construction_ef": construction_ef})
+                collection = store.get_or_create_collection("papers", metadata={"hnsw:space": "cosine"})
+                start = time.perf_counter()
+                for s in range(0, len(corpus), _ADD_BATCH):
+                    block = corpus[s:s + _ADD_BATCH]
+                    collection.add(ids=[str(i) for i in range(s, s + len(block))], embeddings=block.tolist())
+                build_seconds = time.perf_counter() - start
+
+                for search_ef in parse_grid(args.search_ef):
+                    options = {"M": m, "construction_ef": construction_ef, "search_ef": search_ef}
+                    with spawn.Pool(1) as pool:
+                        approx, latencies = pool.apply(query_hnsw, (str(path), options, queries, k))
+                    recall = np.mean([len(a & e) / k for a, e in zip(approx, exact)])
+                    print(f"{m:>4}{construction_ef:>17}{search_ef:>11}{recall:>10.4f}"
+                          f"{np.percentile(latencies, 50):>10.2f}{np.percentile(latencies, 95):>10.2f}"
+                          f"{build_seconds:>11.1f}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print("\nsearch_ef 小于 k 时按 k 搜索；search_ef 越大召回越高、延迟越高，"
+          "M / construction_ef 主要影响召回上限、建索引时间和索引大小")
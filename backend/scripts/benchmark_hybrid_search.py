@@ -0,0 +1,124 @@
+"""
+混合检索评估：向量检索 vs 向量 + BM25（FTS5）融合的 recall@k 与粗排延迟
+
+评估集为 test/pdf/ragas_test_results.json 中的 test_cases（每篇论文若干条企业需求，目标是召回该论文），
+检索流程与 match_papers 的粗排阶段一致（查询扩展 -> 多路向量检索 / BM25 -> 融合），不调用 LLM 精排。
+
+查询扩展需要 DEEPSEEK_API_KEY；结果会缓存到 --expansions 文件，之后重复运行不再调用 LLM。
+没有配置 API Key 时不做扩展，BM25 只使用需求中的英文缩写/模型名。
+
+需要先索引论文（python scripts/index_existing_papers.py）。
+
+运行方式（在 backend 目录下）：
+    python scripts/benchmark_hybrid_search.py
+    python scripts/benchmark_hybrid_search.py --ks 5 10 20 50 --expansions /tmp/expansions.json
+"""
+import sys
+import json
+import time
+import asyncio
+import logging
+from pathlib import Path
+
+# 添加项目根目录到路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import numpy as np
+
+from database.database import init_db
+from services.vector_service import get_vector_service
+from services.llm_service import get_llm_service
+from services.keyword_search import search_papers_bm25
+from services.matching_service import _build_search_queries, _build_keyword_terms, _fuse_paper_channels
+
+logging.basicConfig(level=logging.WARNING)
+for name in ("services.vector_service", "services.keyword_search", "services.matching_service", "services.llm_service"):
+    logging.getLogger(name).setLevel(logging.WARNING)
+logger = logging.getLogger(__name__)
+
+DEFAULT_EVAL_SET = project_root / "test" / "pdf" / "ragas_test_results.json"
+
+
+def load_eval_set(path: Path) -> list:
+    """读取评估集：[(需求文本, 目标 arxiv_id), ...]"""
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    return [(question, case["arxiv_id"]) for case in data["test_cases"] for question in case["questions"]]
+
+
+async def load_expansions(questions: list, path: Path) -> dict:
+    """读取或生成查询扩展结果"""
+    expansions = {}
+    if path.exists():
+        with open(path, encoding="utf-8") as f:
+            expansions = json.load(f)
+    llm_service = get_llm_service()
+    missing = [q for q in questions if q not in expansions]
+    if missing and llm_service.api_key:
+        results = await asyncio.gather(*[llm_service.expand_query(q) for q in missing])
+        expansions.update(zip(missing, results))
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(expansions, f, ensure_ascii=False, indent=2)
+    elif missing:
+        print(f"未配置 DEEPSEEK_API_KEY，{len(missing)} 条需求不做查询扩展")
+    return expansions
+
+
+async def retrieve(vector_service, llm_service, question: str, expanded: str, top_k: int, hybrid: bool):
+    """执行一次粗排检索，返回 (论文ID列表, 耗时毫秒)"""
+    vector_service.query_cache.clear()
+    start = time.perf_counter()
+    search_queries = _build_search_queries(llm_service, question, expanded)
+    vector_search = vector_service.asearch_similar(search_queries, top_k=top_k)
+    keyword_terms = _build_keyword_terms(llm_service, question, expanded) if hybrid else []
+    if keyword_terms:
+        vector_items, keyword_items = await asyncio.gather(
+            vector_search, asyncio.to_thread(search_papers_bm25, keyword_terms, top_k)
+        )
+        items = await _fuse_paper_channels(vector_service, search_queries, vector_items, [keyword_items], top_k)
+    else:
+        items = await vector_search
+    return [pid for pid, _ in items], (time.perf_counter() - start) * 1000
+
+
+async def main(args) -> None:
+    init_db()
+    cases = load_eval_set(Path(args.eval_set))
+    expansions = await load_expansions([q for q, _ in cases], Path(args.expansions))
+
+    vector_service = get_vector_service()
+    if args.model:
+        vector_service._model_name = args.model
+    llm_service = get_llm_service()
+    vector_service.embed_text("warm up", use_cache=False)
+    top_k = max(args.ks)
+    print(f"评估集: {len(cases)} 条需求，向量库论文: {vector_service.get_paper_count()} 篇，"
+          f"已扩展: {sum(q in expansions for q, _ in cases)} 条")
+
+    header = "".join(f"{'recall@' + str(k):>11}" for k in args.ks)
+    print(f"\n{'模式':<10}{header}{'MRR':>8}{'p50(ms)':>10}{'p95(ms)':>10}")
+    for mode in ("vector", "hybrid"):
+        ranks, latencies = [], []
+        for question, expected in cases:
+            ids, elapsed = await retrieve(vector_service, llm_service, question,
+                                          expansions.get(question, question), top_k, hybrid=(mode == "hybrid"))
+            ranks.append(ids.index(expected) + 1 if expected in ids else None)
+            latencies.append(elapsed)
+        recalls = "".join(f"{np.mean([r is not None and r <= k for r in ranks]):>11.3f}" for k in args.ks)
+        mrr = np.mean([1 / r if r else 0 for r in ranks])
+        print(f"{mode:<10}{recalls}{mrr:>8.3f}"
+              f"{np.percentile(latencies, 50):>10.1f}{np.percentile(latencies, 95):>10.1f}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="评估向量检索与混合检索（向量 + BM25）的召回率和延迟")
+    parser.add_argument("--eval-set", type=str, default=str(DEFAULT_EVAL_SET), help="评估集 JSON（test_cases 格式）")
+    parser.add_argument("--expansions", type=str, default=str(project_root / "test" / "pdf" / "query_expansions.json"),
+                        help="查询扩展结果缓存文件")
+    parser.add_argument("--ks", type=int, nargs="+", default=[5, 10, 20, 50], help="计算 recall@k 的 k 值")
+    parser.add_argument("--model", type=str, default=None, help="覆盖模型名称或本地模型目录")
+
+    asyncio.run(main(parser.parse_args()))
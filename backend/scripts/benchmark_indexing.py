@@ -0,0 +1,121 @@
+"""
+索引吞吐基准测试：逐篇 add_paper、批量 add_papers_bulk 与向量缓存命中重建的 papers/sec 对比
+
+两种方式分别写入独立的临时 ChromaDB 目录，不会影响项目的 chroma_db。
+
+运行方式（在 backend 目录下）：
+    python scripts/benchmark_indexing.py --limit 2000
+    python scripts/benchmark_indexing.py --limit 300 --repeat 10
+    python scripts/benchmark_indexing.py --limit 2000 --batch-size 512 --model /path/to/local/model
+"""
+import sys
+import time
+import tempfile
+import logging
+from pathlib import Path
+
+# 添加项目根目录到路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from database.database import get_db_connection
+from services.vector_service import VectorService
+from services.embedding_cache import EmbeddingCache
+
+logging.basicConfig(level=logging.WARNING)
+logger = logging.getLogger(__name__)
+
+
+def load_papers(limit: int, repeat: int = 1) -> list:
+    """
+    从数据库读取论文
+    repeat > 1 时复制论文（ID 加后缀）以放大数据量，方便在小库上测吞吐
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT arxiv_id, title, abstract
+        FROM papers
+        WHERE arxiv_id IS NOT NULL
+        AND title IS NOT NULL
+        ORDER BY created_at DESC
+        LIMIT ?
+    """, (limit,))
+    rows = [dict(row) for row in cursor.fetchall()]
+    conn.close()
+
+    papers = []
+    for i in range(repeat):
+        for row in rows:
+            papers.append({**row, "arxiv_id": row["arxiv_id"] if i == 0 else f"{row['arxiv_id']}_r{i}"})
+    return papers
+
+
+def _new_service(model_name: str = None, cache: EmbeddingCache = None) -> VectorService:
+    """
+    在临时目录中创建向量服务，并预先加载模型（模型加载时间不计入吞吐）
+    cache: 使用的向量缓存，默认不使用缓存，保证每次都真实调用模型
+    """
+    service = VectorService(db_path=Path(tempfile.mkdtemp(prefix="bench_chroma_")))
+    service.embedding_cache = cache
+    if model_name:
+        service._model_name = model_name
+    service._load_model()
+    service.embed_text("warm up")
+    return service
+
+
+def bench_per_paper(papers: list, model_name: str = None) -> float:
+    """基线：逐篇 encode + add"""
+    service = _new_service(model_name)
+    start = time.perf_counter()
+    for paper in papers:
+        service.add_paper(paper["arxiv_id"], paper["title"], paper["abstract"] or "")
+    elapsed = time.perf_counter() - start
+    return len(papers) / elapsed
+
+
+def bench_bulk(papers: list, batch_size: int, model_name: str = None) -> float:
+    """批量：按批 encode + 分块 add"""
+    service = _new_service(model_name)
+    start = time.perf_counter()
+    service.add_papers_bulk(papers, batch_size=batch_size)
+    elapsed = time.perf_counter() - start
+    return len(papers) / elapsed
+
+
+def bench_rebuild_from_cache(papers: list, batch_size: int, model_name: str = None) -> float:
+    """重建：向量缓存已填充（例如 chroma_db 损坏后删除重建），只计第二次全新写入"""
+    cache = EmbeddingCache(Path(tempfile.mkdtemp(prefix="bench_cache_")) / "embedding_cache.db")
+    _new_service(model_name, cache).add_papers_bulk(papers, batch_size=batch_size)
+    service = _new_service(model_name, cache)
+    start = time.perf_counter()
+    service.add_papers_bulk(papers, batch_size=batch_size)
+    elapsed = time.perf_counter() - start
+    return len(papers) / elapsed
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="对比逐篇索引与批量索引的吞吐（papers/sec）")
+    parser.add_argument("--limit", type=int, default=1000, help="从数据库读取的论文数量（默认1000）")
+    parser.add_argument("--repeat", type=int, default=1, help="将读取的论文复制多少份参与测试（默认1）")
+    parser.add_argument("--batch-size", type=int, default=256, help="add_papers_bulk 的批大小（默认256）")
+    parser.add_argument("--model", type=str, default=None, help="覆盖模型名称或本地模型目录")
+
+    args = parser.parse_args()
+
+    papers = load_papers(args.limit, args.repeat)
+    if not papers:
+        print("数据库中没有论文，请先运行爬虫")
+        sys.exit(1)
+
+    print(f"测试论文数量: {len(papers)}")
+    per_paper = bench_per_paper(papers, args.model)
+    print(f"逐篇 add_paper:          {per_paper:8.1f} papers/sec")
+    bulk = bench_bulk(papers, args.batch_size, args.model)
+    print(f"批量 add_papers_bulk:    {bulk:8.1f} papers/sec (batch_size={args.batch_size})")
+    print(f"加速比: {bulk / per_paper:.1f}x")
+    rebuild = bench_rebuild_from_cache(papers, args.batch_size, args.model)
+    print(f"缓存命中重建:            {rebuild:8.1f} papers/sec")
@@ -0,0 +1,99 @@
+"""
+多进程模型内存基准测试：模拟多个 worker 同时加载向量模型，对比每个进程的加载耗时和内存占用
+
+模式：
+- copy：权重复制到每个进程的私有内存（相当于 transformers 4.x 普通加载）
+- default：EMBEDDING_MMAP=false，按所装 transformers 版本的默认方式加载
+- mmap：EMBEDDING_MMAP=true，权重替换为 safetensors 文件的内存映射，多个进程共享页缓存
+
+每种模式启动 --workers 个进程，全部加载并编码一次后再统计内存；PSS 按共享进程数分摊，
+各进程 PSS 之和即这组 worker 实际占用的物理内存（需要 Linux 的 /proc/self/smaps_rollup）。
+模型需要有本地目录（先运行 scripts/pin_embedding_model.py，或把 --model 设为本地目录）。
+
+运行方式（在 backend 目录下）：
+    python scripts/benchmark_model_sharing.py
+    python scripts/benchmark_model_sharing.py --workers 4 --modes copy,mmap
+"""
+import multiprocessing
+import os
+import sys
+from pathlib import Path
+
+# 添加项目根目录到路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from services.embedding_versions import DEFAULT_EMBEDDING_MODEL
+from services.model_store import resolve_model_path
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MODES = ("copy", "default", "mmap")
+
+
+def _worker(model_name: str, mode: str, barrier, results) -> None:
+    """子进程：加载模型、编码一次，等所有进程加载完成后统计内存"""
+    os.environ["EMBEDDING_MMAP"] = "true" if mode == "mmap" else "false"
+    sys.path.insert(0, str(project_root))
+    from services.model_store import load_sentence_transformer, process_memory
+
+    model, stats = load_sentence_transformer(model_name)
+    if mode == "copy":
+        # 把参数复制到私有内存，相当于不共享的普通加载
+        for tensor in list(model.parameters()) + list(model.buffers()):
+            tensor.data = tensor.data.clone()
+    model.encode(["memory mapped model warmup"])
+
+    barrier.wait()
+    results.put({"pid": os.getpid(), "load_seconds": stats["load_seconds"], **process_memory()})
+    # 所有进程统计完之前保持存活，保证共享页的 PSS 按 workers 个进程分摊
+    barrier.wait()
+
+
+def run_mode(model_name: str, mode: str, workers: int):
+    ctx = multiprocessing.get_context("spawn")
+    barrier = ctx.Barrier(workers)
+    results = ctx.Queue()
+    processes = [ctx.Process(target=_worker, args=(model_name, mode, barrier, results)) for _ in range(workers)]
+    for p in processes:
+        p.start()
+    rows = [results.get() for _ in range(workers)]
+    for p in processes:
+        p.join()
+    return sorted(rows, key=lambda row: row["pid"])
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="多进程模型内存基准测试")
+    parser.add_argument("--model", type=str, default=os.getenv("EMBEDDING_MODEL", DEFAULT_EMBEDDING_MODEL),
+                        help="模型名或本地目录（默认 EMBEDDING_MODEL 环境变量）")
+    parser.add_argument("--workers", type=int, default=4, help="并发进程数（默认4）")
+    parser.add_argument("--modes", type=str, default=",".join(MODES), help=f"测试的模式，逗号分隔（默认 {','.join(MODES)}）")
+
+    args = parser.parse_args()
+    modes = [m.strip() for m in args.modes.split(",") if m.strip() in MODES]
+
+    if resolve_model_path(args.model) is None:
+        logger.error(f"{args.model} 没有本地模型目录，请先运行 python scripts/pin_embedding_model.py --model {args.model}")
+        sys.exit(1)
+
+    summary = []
+    for mode in modes:
+        logger.info(f"模式 {mode}：启动 {args.workers} 个进程...")
+        rows = run_mode(args.model, mode, args.workers)
+        for row in rows:
+            logger.info(f"  - pid {row['pid']}: 加载 {row['load_seconds']}s，RSS {row['rss_mb']} MB，"
+                        f"PSS {row['pss_mb']} MB，共享 {row['shared_mb']} MB，私有 {row['private_mb']} MB")
+        load = sorted(row["load_seconds"] for row in rows)
+        total_pss = sum(row["pss_mb"] or 0 for row in rows)
+        summary.append((mode, load[len(load) // 2], rows[0]["rss_mb"], total_pss,
+                        sum(row["private_mb"] or 0 for row in rows) / len(rows)))
+
+    logger.info("")
+    logger.info(f"{'模式':<10}{'加载耗时(中位)':>16}{'单进程RSS(MB)':>16}{'平均私有(MB)':>14}{'PSS合计(MB)':>14}")
+    for mode, load_seconds, rss, total_pss, private in summary:
+        logger.info(f"{mode:<10}{load_seconds:>16.2f}{rss:>16.1f}{private:>14.1f}{total_pss:>14.1f}")
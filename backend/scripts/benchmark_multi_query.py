@@ -0,0 +1,98 @@
+"""
+多查询检索延迟测试：单路扩展文本检索 vs 多路查询逐条检索 vs 多路查询批量检索（一次编码 + 一次向量查询 + RRF 融合）
+
+查询扩展结果拆分后通常有 6~8 路查询（原始需求、每个技术术语、Context 段落），
+这里用数据库中的论文标题模拟各路查询文本，每次检索前清空查询向量缓存，保证每路都真实编码：
+- single：各路文本拼接成一段，编码并检索一次（改造前的写法）
+- sequential：每路文本分别调用 search_similar，再做 RRF 融合
+- batched：search_similar(多条文本)，批量编码，一次多向量查询后 RRF 融合
+
+使用临时向量库目录，不会影响项目数据。
+
+运行方式（在 backend 目录下）：
+    python scripts/benchmark_multi_query.py
+    python scripts/benchmark_multi_query.py --sub-queries 8 --rounds 50 --model /path/to/local/model
+"""
+import sys
+import time
+import tempfile
+import logging
+from pathlib import Path
+
+# 添加项目根目录到路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import numpy as np
+
+from database.database import get_db_connection
+from services.vector_service import VectorService
+
+logging.basicConfig(level=logging.WARNING)
+logging.getLogger("services.vector_service").setLevel(logging.WARNING)
+logger = logging.getLogger(__name__)
+
+
+def load_papers(limit: int) -> list:
+    """从数据库读取论文（作为检索库）"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT arxiv_id, title, abstract
+        FROM papers
+        WHERE arxiv_id IS NOT NULL
+        AND title IS NOT NULL
+        LIMIT ?
+    """, (limit,))
+    papers = [dict(row) for row in cursor.fetchall()]
+    conn.close()
+    return papers
+
+
+def run_mode(service: VectorService, sub_queries: list, mode: str, top_k: int) -> float:
+    """执行一次检索，返回耗时（毫秒）"""
+    service.query_cache.clear()
+    start = time.perf_counter()
+    if mode == "single":
+        service.search_similar(" ".join(sub_queries), top_k=top_k)
+    elif mode == "sequential":
+        ranked_lists = [service.search_similar(query, top_k=top_k) for query in sub_queries]
+        service.reciprocal_rank_fusion(ranked_lists, top_k)
+    else:
+        service.search_similar(sub_queries, top_k=top_k)
+    return (time.perf_counter() - start) * 1000
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="测量多查询批量检索 + RRF 融合的延迟")
+    parser.add_argument("--limit", type=int, default=1000, help="检索库论文数量上限（默认1000）")
+    parser.add_argument("--sub-queries", type=int, default=7, help="每次检索的查询路数（默认7）")
+    parser.add_argument("--rounds", type=int, default=30, help="每种模式的检索次数（默认30）")
+    parser.add_argument("--top-k", type=int, default=50, help="检索数量（默认50）")
+    parser.add_argument("--model", type=str, default=None, help="覆盖模型名称或本地模型目录")
+
+    args = parser.parse_args()
+
+    papers = load_papers(args.limit)
+    if len(papers) < args.sub_queries:
+        print("数据库中的论文不足，请先运行爬虫")
+        sys.exit(1)
+
+    service = VectorService(db_path=Path(tempfile.mkdtemp(prefix="bench_multi_query_")))
+    service.embedding_cache = None
+    if args.model:
+        service._model_name = args.model
+    service.add_papers_bulk(papers)
+    service.embed_text("warm up", use_cache=False)
+    print(f"检索库论文数量: {len(papers)}，查询路数: {args.sub_queries}，top-k: {args.top_k}")
+
+    rng = np.random.default_rng(0)
+    print(f"\n{'模式':<12}{'p50(ms)':>10}{'p95(ms)':>10}")
+    for mode in ("single", "sequential", "batched"):
+        latencies = []
+        for _ in range(args.rounds):
+            picks = rng.choice(len(papers), args.sub_queries, replace=False)
+            latencies.append(run_mode(service, [papers[i]["title"] for i in picks], mode, args.top_k))
+        print(f"{mode:<12}{np.percentile(latencies, 50):>10.1f}{np.percentile(latencies, 95):>10.1f}")
@@ -0,0 +1,92 @@
+"""
+论文时间分片检索基准：单一 papers 集合 vs 按月分片并发查询
+
+合成向量均匀分布在 --months 个月内，分别写入单一集合和按月分片的集合（临时目录），比较：
+- 不限日期：单一集合一次查询 vs 全部分片并发查询后合并
+- 最近 3 个月：单一集合用 where 过滤 vs 只查询范围内的分片
+并统计分片结果与单一集合结果的重合比例（npy 为精确检索，应为 100%；chroma 为近似检索，两种方式各自有召回损失）。
+
+运行方式（在 backend 目录下）：
+    python scripts/benchmark_paper_shards.py
+    python scripts/benchmark_paper_shards.py --n 500000 --months 36 --store chroma --workers 4
+"""
+import sys
+import time
+import shutil
+import tempfile
+import logging
+from pathlib import Path
+
+# 添加项目根目录到路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import numpy as np
+
+from services.vector_stores import VECTOR_STORE_NPY, create_vector_store
+from services.paper_shards import SHARD_BY_MONTH, ShardedPaperCollection
+
+logging.basicConfig(level=logging.WARNING)
+logger = logging.getLogger(__name__)
+
+
+def month_ts(index: int, day: int = 15) -> int:
+    """从 2023-01 起第 index 个月的 YYYYMMDD"""
+    year, month = 2023 + index // 12, index % 12 + 1
+    return year * 10000 + month * 100 + day
+
+
+def measure(collection, queries: np.ndarray, k: int, where=None):
+    kwargs = {"where": where} if where else {}
+    collection.query(query_embeddings=[queries[0]], n_results=k, **kwargs)
+    latencies, results = [], []
+    for query in queries:
+        start = time.perf_counter()
+        result = collection.query(query_embeddings=[query.tolist()], n_results=k, **kwargs)
+        latencies.append((time.perf_counter() - start) * 1000)
+        results.append(set(result["ids"][0]))
+    return np.percentile(latencies, 50), np.percentile(latencies, 95), results
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="对比单一论文集合与按月分片并发查询的延迟")
+    parser.add_argument("--n", type=int, default=240000, help="向量数量（默认240000）")
+    parser.add_argument("--months", type=int, default=24, help="论文覆盖的月数（默认24）")
+    parser.add_argument("--dim", type=int, default=384, help="向量维度（默认384）")
+    parser.add_argument("--queries", type=int, default=100, help="查询数量（默认100）")
+    parser.add_argument("--top-k", type=int, default=50, help="检索数量（默认50）")
+    parser.add_argument("--store", type=str, default=VECTOR_STORE_NPY, help="向量存储后端（默认 npy）")
+    parser.add_argument("--workers", type=int, default=4, help="并发查询分片的线程数（默认4）")
+
+    args = parser.parse_args()
+    workdir = Path(tempfile.mkdtemp(prefix="bench_shards_"))
+    try:
+        rng = np.random.default_rng(0)
+        single = create_vector_store(args.store, workdir / "single").get_or_create_collection(
+            "papers", metadata={"hnsw:space": "cosine"}
+        )
+        sharded = ShardedPaperCollection(create_vector_store(args.store, workdir / "sharded"), SHARD_BY_MONTH,
+                                         max_workers=args.workers)
+        batch = 5000
+        for s in range(0, args.n, batch):
+            count = min(batch, args.n - s)
+            vectors = rng.standard_normal((count, args.dim)).astype(np.float32)
+            ids = [str(i) for i in range(s, s + count)]
+            metadatas = [{"type": "paper", "published_ts": month_ts(i * args.months // args.n)} for i in range(s, s + count)]
+            single.add(ids=ids, embeddings=vectors.tolist(), metadatas=metadatas)
+            sharded.add(ids=ids, embeddings=vectors.tolist(), metadatas=metadatas)
+
+        queries = rng.standard_normal((args.queries, args.dim)).astype(np.float32)
+        recent = {"published_ts": {"$gte": month_ts(args.months - 3, day=1)}}
+        print(f"向量数量: {args.n}，{args.months} 个月分片，后端: {args.store}，并发线程: {args.workers}，top-k: {args.top_k}")
+        print(f"\n{'场景':<24}{'p50(ms)':>10}{'p95(ms)':>10}{'结果重合':>10}")
+        for label, where in (("不限日期", None), ("最近 3 个月", recent)):
+            p50_single, p95_single, expected = measure(single, queries, args.top_k, where)
+            p50_sharded, p95_sharded, found = measure(sharded, queries, args.top_k, where)
+            overlap = np.mean([len(a & b) / max(len(a), 1) for a, b in zip(expected, found)])
+            print(f"{label + ' 单一集合':<24}{p50_single:>10.1f}{p95_single:>10.1f}{'':>10}")
+            print(f"{label + ' 分片':<24}{p50_sharded:>10.1f}{p95_sharded:>10.1f}{overlap:>10.0%}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
@@ -0,0 +1,112 @@
+"""
+向量存储后端对比：ChromaDB（HNSW）与本地 npy 内存映射矩阵（精确检索）
+
+使用合成的聚簇向量（模拟句向量的分布），以 float32 精确检索结果为基准：
+- 写入耗时、磁盘占用
+- 单条查询延迟 p50/p95
+- recall@k（与精确 top-k 的重合比例）
+
+两个后端分别写入独立的临时目录，不会影响项目数据。
+
+运行方式（在 backend 目录下）：
+    python scripts/benchmark_vector_stores.py
+    python scripts/benchmark_vector_stores.py --n 300000 --queries 200 --top-k 50
+"""
+import sys
+import time
+import tempfile
+import logging
+from pathlib import Path
+
+# 添加项目根目录到路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import numpy as np
+
+from services.vector_stores import VECTOR_STORE_CHROMA, VECTOR_STORE_NPY, create_vector_store
+
+logging.basicConfig(level=logging.WARNING)
+logger = logging.getLogger(__name__)
+
+
+def make_vectors(n: int, dim: int, n_queries: int, seed: int = 0):
+    """生成聚簇向量和查询向量（均已归一化）"""
+    rng = np.random.default_rng(seed)
+    n_clusters = max(1, n // 200)
+    centers = rng.standard_normal((n_clusters, dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, n_clusters, n)] + 0.6 * rng.standard_normal((n, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    queries = vectors[rng.integers(0, n, n_queries)] + 0.3 * rng.standard_normal((n_queries, dim)).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    return vectors, queries
+
+
+def exact_top_k(vectors: np.ndarray, queries: np.ndarray, k: int, block: int = 65536) -> np.ndarray:
+    """float32 精确 top-k（基准）"""
+    scores = np.concatenate([queries @ vectors[s:s + block].T for s in range(0, len(vectors), block)], axis=1)
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    return top
+
+
+def _dir_size_mb(path: Path) -> float:
+    return sum(f.stat().st_size for f in path.rglob("*") if f.is_file()) / 1024 / 1024
+
+
+def bench_store(store_type: str, vectors: np.ndarray, queries: np.ndarray, truth: np.ndarray,
+                k: int, batch_size: int, npy_dtype: str = "float32") -> dict:
+    path = Path(tempfile.mkdtemp(prefix=f"bench_{store_type}_"))
+    collection = create_vector_store(store_type, path, npy_dtype=npy_dtype).get_or_create_collection(
+        "papers", metadata={"hnsw:space": "cosine"}
+    )
+
+    start = time.perf_counter()
+    for s in range(0, len(vectors), batch_size):
+        chunk = vectors[s:s + batch_size]
+        collection.add(ids=[str(i) for i in range(s, s + len(chunk))], embeddings=chunk.tolist())
+    build_seconds = time.perf_counter() - start
+
+    # 第一次查询加载索引，不计入延迟
+    collection.query(query_embeddings=[queries[0].tolist()], n_results=k)
+
+    latencies, recalls = [], []
+    for query, expected in zip(queries, truth):
+        start = time.perf_counter()
+        result = collection.query(query_embeddings=[query.tolist()], n_results=k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        found = {int(i) for i in result["ids"][0]}
+        recalls.append(len(found & set(expected.tolist())) / k)
+
+    return {
+        "build_seconds": build_seconds,
+        "disk_mb": _dir_size_mb(path),
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+        "recall": float(np.mean(recalls)),
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="对比 ChromaDB 与 npy 内存映射后端的召回率和查询延迟")
+    parser.add_argument("--n", type=int, default=50000, help="向量数量（默认50000）")
+    parser.add_argument("--dim", type=int, default=384, help="向量维度（默认384）")
+    parser.add_argument("--queries", type=int, default=200, help="查询数量（默认200）")
+    parser.add_argument("--top-k", type=int, default=50, help="检索数量（默认50，与匹配接口一致）")
+    parser.add_argument("--batch-size", type=int, default=5000, help="写入批大小（默认5000）")
+    parser.add_argument("--stores", nargs="+", default=[VECTOR_STORE_CHROMA, VECTOR_STORE_NPY, "npy-float16"],
+                        help="参与对比的后端（npy-float16 为 float16 存储的 npy 后端）")
+
+    args = parser.parse_args()
+
+    vectors, queries = make_vectors(args.n, args.dim, args.queries)
+    truth = exact_top_k(vectors, queries, args.top_k)
+    print(f"向量数量: {args.n}，维度: {args.dim}，查询: {args.queries}，top-k: {args.top_k}")
+
+    print(f"\n{'后端':<12}{'写入(s)':>10}{'磁盘(MB)':>10}{'p50(ms)':>10}{'p95(ms)':>10}{'recall@k':>10}")
+    for name in args.stores:
+        store_type, _, npy_dtype = name.partition("-")
+        r = bench_store(store_type, vectors, queries, truth, args.top_k, args.batch_size, npy_dtype or "float32")
+        print(f"{name:<12}{r['build_seconds']:>10.1f}{r['disk_mb']:>10.0f}"
+              f"{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}{r['recall']:>10.4f}")
@@ -0,0 +1,44 @@
+"""
+构建论文 kNN 图（每篇论文最相似的 K 篇论文，供 /api/papers/{arxiv_id}/related 使用）
+
+默认增量更新：只计算图中还没有的新论文；首次运行、有论文被删除、K 变化或切换向量模型版本后自动全量构建。
+/index-papers 新增论文后会自动增量更新，一般只需在首次和切换向量版本后手动运行
+（也可以调用 POST /api/matching/paper-knn/build 在后台执行）。
+
+运行方式（在 backend 目录下）：
+    python scripts/build_paper_knn.py
+    python scripts/build_paper_knn.py --full
+    python scripts/build_paper_knn.py --full --k 50 --block-size 4096
+"""
+import sys
+from pathlib import Path
+
+# 添加项目根目录到路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from services.paper_knn import DEFAULT_BLOCK_SIZE, PAPER_KNN_K, build_paper_knn, get_paper_knn_dir
+from services.vector_service import get_vector_service
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="构建论文 kNN 图")
+    parser.add_argument("--full", action="store_true", help="全量重新构建（默认只计算新索引的论文）")
+    parser.add_argument("--k", type=int, default=PAPER_KNN_K, help=f"每篇论文保留的近邻数（默认{PAPER_KNN_K}）")
+    parser.add_argument("--block-size", type=int, default=DEFAULT_BLOCK_SIZE,
+                        help=f"每块参与矩阵乘法的论文数（默认{DEFAULT_BLOCK_SIZE}）")
+
+    args = parser.parse_args()
+
+    result = build_paper_knn(get_vector_service(), full=args.full, k=args.k, block_size=args.block_size)
+
+    mode = "全量构建" if result["mode"] == "full" else "增量更新"
+    logger.info(f"{mode}完成（向量版本 {result['embedding_version']}，目录 {get_paper_knn_dir()}）")
+    logger.info(f"  - 论文: {result['papers']} 篇，K={result['k']}")
+    logger.info(f"  - 新计算: {result['computed']} 篇")
+    logger.info(f"  - 耗时: {result['elapsed']} 秒")
@@ -0,0 +1,72 @@
+"""
+检查（并修复）SQLite 与向量库的一致性：论文、需求、发布需求、成果
+
+- missing：SQLite 中有、向量库中没有；orphaned：向量库中有、SQLite 中已删除或不再有效
+- stale：向量化文本已变化（按元数据中的 text_hash 判断）；unhashed：旧版本写入、没有 text_hash 的向量
+两边的ID分页流式读取，差集在临时 SQLite 文件中计算，内存占用与条目数无关。
+不加 --repair 时只检查，发现问题时退出码为 1（可用于定时巡检）。
+
+运行方式（在 backend 目录下）：
+    python scripts/check_vector_consistency.py
+    python scripts/check_vector_consistency.py --kinds papers achievements
+    python scripts/check_vector_consistency.py --repair
+    python scripts/check_vector_consistency.py --repair --issues orphaned unhashed   # 只删除孤立向量、补写哈希，不调用模型
+"""
+import json
+import sys
+from pathlib import Path
+
+# 添加项目根目录到路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from services.vector_consistency import (
+    DEFAULT_BATCH_SIZE, DEFAULT_PAGE_SIZE, DEFAULT_SAMPLE_SIZE, ISSUES, ITEM_KINDS, check_consistency
+)
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="检查并修复 SQLite 与向量库的一致性")
+    parser.add_argument("--kinds", nargs="+", choices=list(ITEM_KINDS), default=None, help="检查的条目类型（默认全部）")
+    parser.add_argument("--repair", action="store_true", help="修复发现的问题（默认只检查）")
+    parser.add_argument("--issues", nargs="+", choices=list(ISSUES), default=list(ISSUES),
+                        help="修复的问题类型（默认全部）")
+    parser.add_argument("--page-size", type=int, default=DEFAULT_PAGE_SIZE, help=f"读取ID时每页的数量（默认{DEFAULT_PAGE_SIZE}）")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help=f"修复时每批的条目数（默认{DEFAULT_BATCH_SIZE}）")
+    parser.add_argument("--sample", type=int, default=DEFAULT_SAMPLE_SIZE, help=f"每类问题列出的示例ID数（默认{DEFAULT_SAMPLE_SIZE}）")
+    parser.add_argument("--json", action="store_true", help="以 JSON 输出完整结果")
+
+    args = parser.parse_args()
+
+    result = check_consistency(
+        kinds=args.kinds,
+        repair=args.repair,
+        repair_issues=args.issues,
+        page_size=args.page_size,
+        batch_size=args.batch_size,
+        sample_size=args.sample
+    )
+
+    if args.json:
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+
+    logger.info(f"检查完成（向量版本 {result['embedding_version']}，扫描 {result['scan_elapsed']} 秒，总耗时 {result['elapsed']} 秒）")
+    found = 0
+    for name, report in result["kinds"].items():
+        issues = {issue: report[issue] for issue in ISSUES if report[issue]}
+        found += sum(issues.values())
+        logger.info(f"  - {ITEM_KINDS[name].label}: SQLite {report['db']}，向量库 {report['vector']}，"
+                    f"{issues or '一致'}")
+        for issue, ids in report["samples"].items():
+            logger.info(f"      {issue} 示例: {', '.join(ids)}")
+        if "repaired" in report:
+            logger.info(f"      修复: {report['repaired']}")
+
+    if found and not args.repair:
+        logger.info("发现不一致，使用 --repair 修复")
+        sys.exit(1)
@@ -0,0 +1,61 @@
+"""
+预计算需求-论文相似度（双向 Top-N，写入 requirement_paper_similarity 表）
+
+默认增量刷新：只计算表中还没有结果的新论文；首次运行、需求集合变化或切换向量模型版本后自动全量计算。
+修改了需求内容（向量已更新但ID不变）时用 --full 重新计算。
+/index-papers 新增论文后会自动增量刷新，一般只需在首次和需求变化后手动运行。
+
+运行方式（在 backend 目录下）：
+    python scripts/compute_requirement_similarity.py
+    python scripts/compute_requirement_similarity.py --full
+    python scripts/compute_requirement_similarity.py --full --top-papers 100 --top-requirements 50
+"""
+import sys
+from pathlib import Path
+
+# 添加项目根目录到路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from database.database import init_db
+from services.requirement_similarity import (
+    DEFAULT_BLOCK_SIZE, DEFAULT_TOP_PAPERS, DEFAULT_TOP_REQUIREMENTS, refresh_requirement_paper_similarity
+)
+from services.vector_service import get_vector_service
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="预计算需求-论文相似度")
+    parser.add_argument("--full", action="store_true", help="全量重新计算（默认只计算新索引的论文）")
+    parser.add_argument("--top-papers", type=int, default=DEFAULT_TOP_PAPERS,
+                        help=f"每条需求保留的论文数（默认{DEFAULT_TOP_PAPERS}）")
+    parser.add_argument("--top-requirements", type=int, default=DEFAULT_TOP_REQUIREMENTS,
+                        help=f"每篇论文保留的需求数（默认{DEFAULT_TOP_REQUIREMENTS}）")
+    parser.add_argument("--block-size", type=int, default=DEFAULT_BLOCK_SIZE,
+                        help=f"每块参与矩阵乘法的论文数（默认{DEFAULT_BLOCK_SIZE}）")
+
+    args = parser.parse_args()
+
+    # 确保 requirement_paper_similarity 表存在
+    init_db()
+    result = refresh_requirement_paper_similarity(
+        get_vector_service(),
+        full=args.full,
+        top_papers=args.top_papers,
+        top_requirements=args.top_requirements,
+        block_size=args.block_size
+    )
+
+    mode = "全量计算" if result["mode"] == "full" else "增量刷新"
+    logger.info(f"{mode}完成（向量版本 {result['embedding_version']}）")
+    logger.info(f"  - 需求: {result['requirements']} 条")
+    logger.info(f"  - 计算论文: {result['papers']} 篇")
+    logger.info(f"  - 写入记录: {result['rows']} 条")
+    logger.info(f"  - 耗时: {result['elapsed']} 秒")
+    if result["papers"]:
+        logger.info(f"  - 速度: {result['papers'] / max(result['elapsed'], 1e-6):.0f} 篇/秒")
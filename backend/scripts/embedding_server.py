@@ -0,0 +1,58 @@
+"""
+启动本地向量化服务：一个进程持有向量模型，并发请求动态合批后统一编码（见 services/embedding_server.py）
+
+API 服务的各个 worker、ARQ worker 和索引脚本设置 EMBEDDING_SERVER 后通过该服务编码，不再各自加载模型：
+    EMBEDDING_SERVER=unix:/tmp/techmatch-embedding.sock     # Unix socket（同一台机器，推荐）
+    EMBEDDING_SERVER=http://127.0.0.1:8765                  # localhost HTTP
+服务使用的 EMBEDDING_BACKEND 必须与客户端一致（客户端首次请求时核对）。模型按客户端请求的模型名延迟加载，
+--preload 在启动时加载 EMBEDDING_MODEL。
+
+运行方式（在 backend 目录下）：
+    python scripts/embedding_server.py --socket /tmp/techmatch-embedding.sock --preload
+    python scripts/embedding_server.py --port 8765 --max-batch 64 --max-wait-ms 5
+"""
+import os
+import sys
+from pathlib import Path
+
+# 添加项目根目录到路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from services.embedding_backends import BACKEND_TORCH, SUPPORTED_BACKENDS
+from services.embedding_server import DEFAULT_MAX_BATCH, DEFAULT_MAX_WAIT_MS, create_app
+from services.embedding_versions import DEFAULT_EMBEDDING_MODEL
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+if __name__ == "__main__":
+    import argparse
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="本地向量化服务（动态合批）")
+    parser.add_argument("--socket", type=str, default=None, help="监听的 Unix socket 路径（优先于 --host/--port）")
+    parser.add_argument("--host", type=str, default="127.0.0.1", help="监听地址（默认127.0.0.1，只接受本机请求）")
+    parser.add_argument("--port", type=int, default=8765, help="监听端口（默认8765）")
+    parser.add_argument("--model", type=str, default=os.getenv("EMBEDDING_MODEL", DEFAULT_EMBEDDING_MODEL),
+                        help="默认模型（请求未指定模型时使用，默认 EMBEDDING_MODEL 环境变量）")
+    parser.add_argument("--backend", type=str, choices=SUPPORTED_BACKENDS,
+                        default=os.getenv("EMBEDDING_BACKEND", BACKEND_TORCH).lower(), help="推理后端（默认 EMBEDDING_BACKEND）")
+    parser.add_argument("--max-batch", type=int, default=DEFAULT_MAX_BATCH, help=f"每批最多合并的文本数（默认{DEFAULT_MAX_BATCH}）")
+    parser.add_argument("--max-wait-ms", type=float, default=DEFAULT_MAX_WAIT_MS,
+                        help=f"收到第一条请求后等待合批的最长时间（毫秒，默认{DEFAULT_MAX_WAIT_MS}）")
+    parser.add_argument("--preload", action="store_true", help="启动时加载默认模型")
+
+    args = parser.parse_args()
+
+    app = create_app(args.model, args.backend, max_batch=args.max_batch, max_wait_ms=args.max_wait_ms,
+                     preload=args.preload)
+    if args.socket:
+        if os.path.exists(args.socket):
+            os.unlink(args.socket)
+        logger.info(f"向量化服务监听 unix:{args.socket}")
+        uvicorn.run(app, uds=args.socket, log_level="warning")
+    else:
+        logger.info(f"向量化服务监听 http://{args.host}:{args.port}")
+        uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
@@ -8,87 +8,32 @@ from pathlib import Path
 project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
 
-from database.database import get_db_connection
 from services.vector_service import get_vector_service
+from services.paper_indexer import index_missing_papers, backfill_paper_metadata
 import logging
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def index_existing_papers():
-    """将数据库中所有论文添加到向量数据库"""
+def index_existing_papers(batch_size: int = 256):
+    """
+    将数据库中尚未索引的论文添加到向量数据库
+    按 SQLite 与向量库的ID差集只处理缺失的论文，中断后重新运行即可继续
+    batch_size: 每批向量化并写入的论文数量
+    """
     try:
-        # 获取数据库连接
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # 获取所有论文
-        cursor.execute("""
-            SELECT arxiv_id, title, abstract 
-            FROM papers 
-            WHERE arxiv_id IS NOT NULL 
-            AND title IS NOT NULL
-            ORDER BY created_at DESC
-        """)
-        
-        papers = cursor.fetchall()
-        conn.close()
-        
-        logger.info(f"找到 {len(papers)} 篇论文需要索引")
+        vector_service = get_vector_service()
+        stats = index_missing_papers(vector_service, batch_size=batch_size)
         
-        if not papers:
+        if stats["db_total"] == 0:
             logger.warning("数据库中没有论文，请先运行爬虫")
             return
         
-        # 获取向量服务
-        vector_service = get_vector_service()
-        
-        # 检查向量数据库中已有的论文
-        existing_count = vector_service.get_paper_count()
-        logger.info(f"向量数据库中已有 {existing_count} 篇论文")
-        
-        # 处理每篇论文
-        processed_count = 0
-        skipped_count = 0
-        error_count = 0
-        
-        for paper in papers:
-            try:
-                arxiv_id = paper["arxiv_id"]
-                title = paper["title"]
-                abstract = paper["abstract"] or ""
-                
-                if not title or not arxiv_id:
-                    skipped_count += 1
-                    continue
-                
-                # 检查是否已存在（通过尝试查询）
-                try:
-                    # 尝试获取，如果不存在会抛出异常或返回空
-                    results = vector_service.collection.get(ids=[arxiv_id])
-                    if results and results.get('ids') and len(results['ids']) > 0:
-                        skipped_count += 1
-                        logger.debug(f"论文 {arxiv_id} 已存在于向量数据库，跳过")
-                        continue
-                except:
-                    pass  # 不存在，继续添加
-                
-                # 添加到向量数据库
-                vector_service.add_paper(arxiv_id, title, abstract)
-                processed_count += 1
-                
-                if processed_count % 10 == 0:
-                    logger.info(f"已处理 {processed_count} 篇论文...")
-                    
-            except Exception as e:
-                error_count += 1
-                logger.error(f"处理论文 {paper.get('arxiv_id', 'unknown')} 失败: {str(e)}")
-                continue
-        
         logger.info(f"索引完成！")
-        logger.info(f"  - 成功处理: {processed_count} 篇")
-        logger.info(f"  - 跳过（已存在）: {skipped_count} 篇")
-        logger.info(f"  - 处理失败: {error_count} 篇")
+        logger.info(f"  - 数据库论文: {stats['db_total']} 篇（此前已索引 {stats['indexed']} 篇）")
+        logger.info(f"  - 成功处理: {stats['added']} 篇")
+        logger.info(f"  - 跳过: {stats['skipped']} 篇")
+        logger.info(f"  - 处理失败: {stats['error']} 篇")
         logger.info(f"  - 向量数据库总数: {vector_service.get_paper_count()} 篇")
         
     except Exception as e:
@@ -96,5 +41,16 @@ def index_existing_papers():
         raise
 
 if __name__ == "__main__":
-    index_existing_papers()
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="将数据库中已有的论文索引到向量数据库")
+    parser.add_argument("--batch-size", type=int, default=256, help="每批向量化并写入的论文数量（默认256）")
+    parser.add_argument("--backfill-metadata", action="store_true",
+                        help="为已索引的论文补写分类/发布日期等过滤用元数据（旧版本索引的论文需要执行一次）")
+    
+    args = parser.parse_args()
+    
+    index_existing_papers(batch_size=args.batch_size)
+    if args.backfill_metadata:
+        backfill_paper_metadata(get_vector_service())
 
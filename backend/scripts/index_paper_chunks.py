@@ -0,0 +1,40 @@
+"""
+为 paper_content_cache 中已解析的论文全文补建分块向量索引（paper_chunks 集合）
+
+新解析的论文会在 PDFService.get_paper_content 保存缓存后自动分块索引；
+本脚本用于首次启用分块检索时处理已有缓存，或补齐后台分块索引失败的论文。
+按论文ID差集增量处理，中断后重新运行即可继续。
+
+运行方式（在 backend 目录下）：
+    python scripts/index_paper_chunks.py
+    python scripts/index_paper_chunks.py --batch-size 16
+"""
+import sys
+from pathlib import Path
+
+# 添加项目根目录到路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from services.vector_service import get_vector_service
+from services.paper_indexer import index_missing_chunks
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="为已解析的论文全文补建分块向量索引")
+    parser.add_argument("--batch-size", type=int, default=32, help="每批读取的论文数量（默认32）")
+
+    args = parser.parse_args()
+
+    vector_service = get_vector_service()
+    stats = index_missing_chunks(vector_service, batch_size=args.batch_size)
+    logger.info("全文分块索引完成！")
+    logger.info(f"  - 待处理论文: {stats['total']} 篇")
+    logger.info(f"  - 成功处理: {stats['papers']} 篇，共 {stats['chunks']} 个分块")
+    logger.info(f"  - 处理失败: {stats['error']} 篇")
+    logger.info(f"  - 分块集合总数: {vector_service.chunk_collection.count()} 个分块")
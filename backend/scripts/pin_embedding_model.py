@@ -0,0 +1,53 @@
+"""
+固定向量模型：下载模型并以 safetensors 格式保存到本地模型目录（默认 backend/models/pinned/<模型名>/）
+
+服务、worker 和索引脚本加载模型时优先使用该目录，权重以内存映射方式加载，多个进程共享同一份页缓存；
+部署机器不能联网时，在可以联网的机器上运行本脚本，再把目录复制过去，并设置 HF_HUB_OFFLINE=1（或 EMBEDDING_OFFLINE=true）。
+目录中的 pinned_model.json 记录每个文件的大小和 sha256，复制后可用 --verify 校验。
+
+运行方式（在 backend 目录下）：
+    python scripts/pin_embedding_model.py                                   # 固定 EMBEDDING_MODEL（默认模型）
+    python scripts/pin_embedding_model.py --model paraphrase-multilingual-MiniLM-L12-v2
+    python scripts/pin_embedding_model.py --verify                          # 校验已固定的模型目录
+"""
+import os
+import sys
+from pathlib import Path
+
+# 添加项目根目录到路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from services.embedding_versions import DEFAULT_EMBEDDING_MODEL
+from services.model_store import get_pinned_model_root, pin_model, pinned_dir_for, verify_pinned_model
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="固定向量模型到本地目录（safetensors）")
+    parser.add_argument("--model", type=str, default=os.getenv("EMBEDDING_MODEL", DEFAULT_EMBEDDING_MODEL),
+                        help="模型名（默认 EMBEDDING_MODEL 环境变量）")
+    parser.add_argument("--output", type=str, default=None,
+                        help=f"固定模型的根目录（默认 {get_pinned_model_root()}）")
+    parser.add_argument("--verify", action="store_true", help="只校验已固定的模型目录，不下载")
+
+    args = parser.parse_args()
+    root = Path(args.output) if args.output else None
+
+    if args.verify:
+        model_dir = pinned_dir_for(args.model, root)
+        problems = verify_pinned_model(model_dir)
+        if problems:
+            for name, problem in problems.items():
+                logger.error(f"  - {name}: {problem}")
+            logger.error(f"模型目录校验失败: {model_dir}")
+            sys.exit(1)
+        logger.info(f"模型目录校验通过: {model_dir}")
+        sys.exit(0)
+
+    model_dir = pin_model(args.model, root)
+    logger.info(f"完成。服务会自动使用 {model_dir}；离线部署时复制该目录并设置 HF_HUB_OFFLINE=1")
@@ -0,0 +1,78 @@
+"""
+向量模型版本管理：用新模型重建向量版本、切换、回滚、删除旧版本
+
+重建时论文、需求、成果、全文分块全部从 SQLite 重新向量化，写入新版本的集合（papers_v2 等），
+当前版本在重建期间照常提供检索；完成后原子切换，原版本保留为可回滚的版本。
+中断后用同一模型重新运行即可从断点继续。运行中的 API 服务会在一秒内发现切换。
+多核机器上可用 scripts/reindex.py --model <新模型> 多进程重建同一版本。
+
+运行方式（在 backend 目录下）：
+    python scripts/rebuild_embeddings.py list
+    python scripts/rebuild_embeddings.py rebuild --model BAAI/bge-small-zh-v1.5
+    python scripts/rebuild_embeddings.py rebuild --model BAAI/bge-small-zh-v1.5 --no-activate
+    python scripts/rebuild_embeddings.py activate v2
+    python scripts/rebuild_embeddings.py rollback
+    python scripts/rebuild_embeddings.py drop v1
+"""
+import sys
+import json
+from pathlib import Path
+
+# 添加项目根目录到路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from services.vector_service import get_vector_service
+from services.paper_indexer import rebuild_embedding_version
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="向量模型版本管理")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    subparsers.add_parser("list", help="查看版本列表")
+
+    rebuild_parser = subparsers.add_parser("rebuild", help="用新模型重建向量版本")
+    rebuild_parser.add_argument("--model", type=str, default=None,
+                                help="新版本使用的模型（默认为环境变量 EMBEDDING_MODEL）")
+    rebuild_parser.add_argument("--batch-size", type=int, default=256, help="每批向量化的论文数量（默认256）")
+    rebuild_parser.add_argument("--no-activate", action="store_true", help="重建完成后不自动切换")
+
+    activate_parser = subparsers.add_parser("activate", help="启用已重建完成的版本")
+    activate_parser.add_argument("version", type=str, help="版本号，如 v2")
+
+    subparsers.add_parser("rollback", help="回滚到上一个版本")
+
+    drop_parser = subparsers.add_parser("drop", help="删除版本及其集合")
+    drop_parser.add_argument("version", type=str, help="版本号，如 v1")
+
+    args = parser.parse_args()
+    vector_service = get_vector_service()
+
+    try:
+        if args.command == "list":
+            print(json.dumps(vector_service.version_status(), ensure_ascii=False, indent=2))
+        elif args.command == "rebuild":
+            model = args.model or vector_service.configured_model
+            result = rebuild_embedding_version(model, vector_service, batch_size=args.batch_size,
+                                               activate=not args.no_activate)
+            logger.info(f"版本 {result['version']}（{model}）: {result['status']}，耗时 {result['elapsed']} 秒")
+            for name, count in (result.get("counts") or {}).items():
+                logger.info(f"  - {name}: {count} 条")
+        elif args.command == "activate":
+            result = vector_service.activate_version(args.version)
+            logger.info(f"已切换: {result['previous']} -> {result['active']}（{result['model']}）")
+        elif args.command == "rollback":
+            result = vector_service.rollback_version()
+            logger.info(f"已回滚: {result['previous']} -> {result['active']}（{result['model']}）")
+        else:
+            names = vector_service.drop_version(args.version)
+            logger.info(f"已删除版本 {args.version}: {', '.join(names)}")
+    except ValueError as e:
+        logger.error(str(e))
+        sys.exit(1)
@@ -0,0 +1,89 @@
+"""
+多进程批量重新向量化：论文、需求、发布需求、成果按主键范围分片，编码进程池并行向量化，主进程统一写入向量库
+
+- 默认原地重建当前启用版本；--model 指定新模型时写入新版本，完成后补齐全文分块并切换（--no-activate 只标记 ready）
+- 每个编码进程加载一份模型，--workers × --threads 不应超过 CPU 核数（默认每进程 1 线程、进程数 = 核数）
+- 进度保存在向量存储目录下的检查点文件，崩溃或 Ctrl-C 后重新运行同一命令即可继续；
+  第一次 Ctrl-C 等待在途分片写入后退出，第二次立即退出
+- 未完成（中断或有分片失败）时退出码为 1
+
+运行方式（在 backend 目录下）：
+    python scripts/reindex.py
+    python scripts/reindex.py --workers 16 --threads 2 --kinds papers
+    python scripts/reindex.py --model BAAI/bge-small-zh-v1.5 --no-activate
+    python scripts/reindex.py --restart   # 丢弃检查点，重新开始
+"""
+import json
+import signal
+import sys
+from pathlib import Path
+
+# 添加项目根目录到路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from services.parallel_reindex import DEFAULT_SHARD_SIZE, DEFAULT_THREADS, reindex
+from services.vector_consistency import ITEM_KINDS
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="多进程批量重新向量化")
+    parser.add_argument("--kinds", nargs="+", choices=list(ITEM_KINDS), default=None, help="重建的条目类型（默认全部）")
+    parser.add_argument("--model", type=str, default=None, help="写入该模型的新版本（默认原地重建当前启用版本）")
+    parser.add_argument("--workers", type=int, default=None, help="编码进程数（默认 CPU 核数 / threads）")
+    parser.add_argument("--threads", type=int, default=DEFAULT_THREADS, help=f"每个编码进程的推理线程数（默认{DEFAULT_THREADS}）")
+    parser.add_argument("--shard-size", type=int, default=DEFAULT_SHARD_SIZE,
+                        help=f"每个分片的条目数（默认{DEFAULT_SHARD_SIZE}）")
+    parser.add_argument("--batch-size", type=int, default=None, help="模型前向的批大小（默认 EMBEDDING_BATCH_SIZE）")
+    parser.add_argument("--restart", action="store_true", help="丢弃已有检查点，重新规划全部分片")
+    parser.add_argument("--no-activate", action="store_true", help="新版本重建完成后不自动切换")
+    parser.add_argument("--json", action="store_true", help="以 JSON 输出完整结果")
+
+    args = parser.parse_args()
+
+    stop_requested = False
+
+    def _request_stop(signum, frame):
+        global stop_requested
+        stop_requested = True
+        logger.info("收到中断，等待在途分片写入后退出（再按一次 Ctrl-C 立即退出）")
+        signal.signal(signal.SIGINT, signal.default_int_handler)
+
+    signal.signal(signal.SIGINT, _request_stop)
+
+    try:
+        result = reindex(
+            kinds=args.kinds,
+            model_name=args.model,
+            workers=args.workers,
+            threads=args.threads,
+            shard_size=args.shard_size,
+            batch_size=args.batch_size,
+            restart=args.restart,
+            activate=not args.no_activate,
+            should_stop=lambda: stop_requested
+        )
+    except ValueError as e:
+        logger.error(str(e))
+        sys.exit(1)
+
+    if args.json:
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+
+    logger.info(f"版本 {result['version']}（{result['model']}）: {result['status']}，"
+                f"{result['workers']} 个编码进程 × {result['threads']} 线程，耗时 {result['elapsed']} 秒"
+                f"（规划和加载模型 {result['startup_seconds']} 秒），写入 {result['written']} 条，{result['rate']} 条/s")
+    for name, stats in result["kinds"].items():
+        logger.info(f"  - {ITEM_KINDS[name].label}: {stats['written']}/{stats['total']} 条，"
+                    f"失败 {stats['error']}，{stats['rate']} 条/s")
+    if result["elapsed"]:
+        logger.info(f"  写入方占用 {result['write_seconds']} 秒（{result['write_seconds'] / result['elapsed']:.0%}），"
+                    f"编码进程合计 {result['encode_seconds']} 秒")
+
+    if result["status"] in ("stopped", "incomplete"):
+        sys.exit(1)
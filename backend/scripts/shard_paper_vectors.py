@@ -0,0 +1,60 @@
+"""
+将启用分片前写入的 papers 集合迁移到按发布时间划分的分片集合
+
+需要先设置 PAPER_SHARDING=month 或 quarter。迁移直接搬运已有向量和元数据，不重新调用模型；
+每批写入分片后从 papers 集合删除，中断后重新运行即可继续。迁移期间检索照常可用
+（未迁移的论文仍在遗留集合中，检索时一并查询）。
+
+运行方式（在 backend 目录下）：
+    PAPER_SHARDING=month python scripts/shard_paper_vectors.py
+    PAPER_SHARDING=quarter python scripts/shard_paper_vectors.py --batch-size 2000
+"""
+import sys
+import time
+from pathlib import Path
+
+# 添加项目根目录到路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from services.vector_service import get_vector_service
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="将 papers 集合迁移到按发布时间划分的分片集合")
+    parser.add_argument("--batch-size", type=int, default=1000, help="每批迁移的论文数量（默认1000）")
+
+    args = parser.parse_args()
+
+    vector_service = get_vector_service()
+    if vector_service.paper_sharding == "none":
+        logger.error("未启用论文分片，请设置 PAPER_SHARDING=month 或 quarter 后运行")
+        sys.exit(1)
+
+    legacy = vector_service.paper_collection
+    total = legacy.count()
+    logger.info(f"papers 集合中待迁移 {total} 篇论文")
+    start = time.perf_counter()
+    moved = 0
+    while True:
+        # 已迁移的条目会从遗留集合删除，因此总是读取第一页
+        page = legacy.get(include=["embeddings", "metadatas"], limit=args.batch_size)
+        ids = page.get("ids") or []
+        if not ids:
+            break
+        vector_service.collection.upsert(
+            ids=ids,
+            embeddings=[list(map(float, e)) for e in page["embeddings"]],
+            metadatas=page["metadatas"]
+        )
+        moved += len(ids)
+        logger.info(f"已迁移 {moved}/{total} 篇论文")
+
+    logger.info(f"迁移完成，共 {moved} 篇，耗时 {time.perf_counter() - start:.1f} 秒")
+    for shard in vector_service.collection.shard_stats():
+        logger.info(f"  - {shard['name']}: {shard['count']} 篇")
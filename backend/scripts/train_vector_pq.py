@@ -0,0 +1,39 @@
+"""
+训练 npy 压缩检索（NPY_COMPRESSION=pq）的 PQ 码本
+
+写入时不训练码本：行数达到 PQ_MIN_TRAIN_ROWS 的集合在索引任务（/index-papers、爬虫、快照导入、
+重新向量化）结束时自动训练，训练前为精确检索。已有集合开启压缩、或数据分布变化较大需要重新训练时手动运行。
+k-means 不持有锁，只有替换编码和码本文件时短暂阻塞检索和写入，可以在服务运行时执行。
+
+运行方式（在 backend 目录下）：
+    VECTOR_STORE=npy NPY_COMPRESSION=pq python scripts/train_vector_pq.py
+    VECTOR_STORE=npy NPY_COMPRESSION=pq python scripts/train_vector_pq.py --force   # 重新训练全部压缩集合
+"""
+import sys
+import time
+from pathlib import Path
+
+# 添加项目根目录到路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from services.vector_service import get_vector_service
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="训练 npy 压缩检索的 PQ 码本")
+    parser.add_argument("--force", action="store_true", help="已有码本的集合也重新训练")
+
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    trained = get_vector_service().train_pending_pq(force=args.force)
+    if trained:
+        logger.info(f"已训练 {len(trained)} 个集合的 PQ 码本: {', '.join(trained)}，耗时 {time.perf_counter() - start:.1f} 秒")
+    else:
+        logger.info("没有需要训练的集合（未启用 NPY_COMPRESSION=pq，或行数未达到 PQ_MIN_TRAIN_ROWS，或已有码本）")
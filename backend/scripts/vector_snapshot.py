@@ -0,0 +1,77 @@
+"""
+向量快照导出 / 导入
+
+导出论文、需求、成果集合的 ID、向量（float16）、元数据和模型标识到单个 zip 文件；
+新节点导入快照即可直接提供检索，无需重新编码全部论文。导入前会校验模型标识，不一致时拒绝导入。
+
+运行方式（在 backend 目录下）：
+    python scripts/vector_snapshot.py export
+    python scripts/vector_snapshot.py export --output /data/vectors.zip --collections papers requirements achievements paper_chunks
+    python scripts/vector_snapshot.py import /data/vectors.zip
+    python scripts/vector_snapshot.py import http://node-1:8000/api/matching/snapshot/latest
+    python scripts/vector_snapshot.py info /data/vectors.zip
+"""
+import sys
+import json
+from pathlib import Path
+
+# 添加项目根目录到路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from services.vector_service import get_vector_service
+from services.vector_snapshot import (
+    DEFAULT_SNAPSHOT_COLLECTIONS, export_snapshot, import_snapshot, download_snapshot, read_snapshot_manifest
+)
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def _log_progress(name: str, count: int) -> None:
+    logger.info(f"  - {name}: {count} 条")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="向量快照导出 / 导入")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = subparsers.add_parser("export", help="导出向量快照")
+    export_parser.add_argument("--output", type=str, default=None, help="输出文件（默认为 snapshots/vectors-<时间戳>.zip）")
+    export_parser.add_argument("--collections", type=str, nargs="+", default=list(DEFAULT_SNAPSHOT_COLLECTIONS),
+                               help="要导出的集合（默认 papers requirements achievements）")
+
+    import_parser = subparsers.add_parser("import", help="导入向量快照")
+    import_parser.add_argument("source", type=str, help="快照文件路径或 http(s) URL")
+    import_parser.add_argument("--collections", type=str, nargs="+", default=None, help="只导入其中的集合")
+    import_parser.add_argument("--keep-existing", action="store_true", help="保留集合中快照里没有的向量（默认删除）")
+    import_parser.add_argument("--force", action="store_true", help="忽略模型标识不一致")
+
+    info_parser = subparsers.add_parser("info", help="查看快照信息")
+    info_parser.add_argument("path", type=str, help="快照文件路径")
+
+    args = parser.parse_args()
+
+    if args.command == "info":
+        print(json.dumps(read_snapshot_manifest(Path(args.path)), ensure_ascii=False, indent=2))
+        sys.exit(0)
+
+    vector_service = get_vector_service()
+    if args.command == "export":
+        result = export_snapshot(vector_service, Path(args.output) if args.output else None,
+                                 collections=args.collections, progress_callback=_log_progress)
+        logger.info(f"快照导出完成: {result['path']}（{result['size_bytes'] / 1024 / 1024:.1f} MB，"
+                    f"耗时 {result['elapsed']} 秒）")
+        for name, info in result["collections"].items():
+            logger.info(f"  - {name}: {info['count']} 条，{info['dim']} 维")
+    else:
+        source = args.source
+        path = download_snapshot(source) if source.startswith(("http://", "https://")) else Path(source)
+        result = import_snapshot(vector_service, path, collections=args.collections,
+                                 replace=not args.keep_existing, force=args.force, progress_callback=_log_progress)
+        logger.info(f"快照导入完成（模型 {result['model_id']}，耗时 {result['elapsed']} 秒）")
+        for name, info in result["collections"].items():
+            logger.info(f"  - {name}: 导入 {info['count']} 条，删除多余 {info['deleted']} 条")
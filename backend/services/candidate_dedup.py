@@ -0,0 +1,118 @@
+"""
+检索候选去重 - LLM 精排前把近似重复的候选折叠成簇
+
+arXiv 上同一工作的多个版本、同一团队的系列论文经常同时出现在召回的前 50 篇里，
+而 LLM 只精排排在最前面的 10 篇（score_papers_batch），重复的候选会挤占精排名额。
+这里按召回排名做贪心聚类：依次检查每个候选，与某个已有簇的代表足够相似则并入该簇，
+否则成为新簇的代表。代表总是簇内排名最高的候选，只有代表交给 LLM，
+其余成员放在代表的 related 字段中随结果返回。
+
+相似度判定（CANDIDATE_DEDUP）：
+- cosine：论文向量的余弦相似度 ≥ CANDIDATE_DEDUP_THRESHOLD（默认 0.95）
+- simhash：标题 64 位 SimHash 的汉明距离 ≤ CANDIDATE_DEDUP_SIMHASH_DISTANCE（默认 3），不读取向量
+- none：不去重
+"""
+import hashlib
+import logging
+import os
+import re
+from typing import Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+CANDIDATE_DEDUP = os.getenv("CANDIDATE_DEDUP", "cosine").lower()
+CANDIDATE_DEDUP_THRESHOLD = float(os.getenv("CANDIDATE_DEDUP_THRESHOLD", "0.95"))
+CANDIDATE_DEDUP_SIMHASH_DISTANCE = int(os.getenv("CANDIDATE_DEDUP_SIMHASH_DISTANCE", "3"))
+SUPPORTED_DEDUP_MODES = ("cosine", "simhash", "none")
+
+# related 中保留的字段（兄弟候选不经过 LLM，只返回用于展示的基本信息）
+RELATED_FIELDS = ("paper_id", "title", "authors", "published_date", "pdf_url", "vector_score")
+
+_WORD_PATTERN = re.compile(r"[a-z0-9]+|[\u4e00-\u9fff]")
+_SIMHASH_BITS = 64
+
+
+def _title_features(title: str) -> List[str]:
+    """标题特征：英文单词 / 单个汉字，加相邻两个词组成的短语（保留词序信息）"""
+    tokens = _WORD_PATTERN.findall((title or "").lower())
+    return tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+
+
+def title_simhash(title: str) -> Optional[int]:
+    """标题的 64 位 SimHash；标题为空时返回 None"""
+    features = _title_features(title)
+    if not features:
+        return None
+    digests = b"".join(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest() for feature in features)
+    # 每个特征 64 位，按位统计 +1/-1，多数为 1 的位置 1
+    bits = np.unpackbits(np.frombuffer(digests, dtype=np.uint8)).reshape(len(features), _SIMHASH_BITS)
+    weights = bits.sum(axis=0, dtype=np.int32) * 2 - len(features)
+    return int("".join("1" if weight > 0 else "0" for weight in weights), 2)
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def collapse_near_duplicates(
+    items: List[Dict],
+    mode: str = CANDIDATE_DEDUP,
+    vectors: Optional[Dict[str, np.ndarray]] = None,
+    threshold: float = CANDIDATE_DEDUP_THRESHOLD,
+    max_distance: int = CANDIDATE_DEDUP_SIMHASH_DISTANCE,
+    key: str = "paper_id"
+) -> List[Dict]:
+    """
+    折叠近似重复的候选
+    items: 按召回排名排列的候选（需要 key 与 title 字段）
+    vectors: cosine 模式下的 {id: 归一化向量}，没有向量的候选不参与折叠
+    返回: 各簇代表组成的列表（保持原顺序），每个代表带 related 字段：
+          [{paper_id, title, authors, published_date, pdf_url, vector_score, similarity}, ...]
+    """
+    if mode not in SUPPORTED_DEDUP_MODES:
+        raise ValueError(f"不支持的去重方式: {mode}，可选值: {', '.join(SUPPORTED_DEDUP_MODES)}")
+
+    representatives: List[Dict] = []
+    if mode == "none":
+        for item in items:
+            representatives.append(dict(item, related=[]))
+        return representatives
+
+    # 每个簇代表的签名：cosine 为向量，simhash 为标题哈希
+    signatures = []
+    for item in items:
+        if mode == "cosine":
+            signature = (vectors or {}).get(item[key])
+        else:
+            signature = title_simhash(item.get("title") or "")
+
+        best_index, best_similarity = None, None
+        if signature is not None:
+            for index, other in enumerate(signatures):
+                if other is None:
+                    continue
+                if mode == "cosine":
+                    similarity = float(np.dot(signature, other))
+                    matched = similarity >= threshold
+                else:
+                    distance = hamming_distance(signature, other)
+                    similarity = 1.0 - distance / _SIMHASH_BITS
+                    matched = distance <= max_distance
+                if matched and (best_similarity is None or similarity > best_similarity):
+                    best_index, best_similarity = index, similarity
+
+        if best_index is None:
+            representatives.append(dict(item, related=[]))
+            signatures.append(signature)
+        else:
+            sibling = {field: item.get(field) for field in RELATED_FIELDS}
+            sibling["similarity"] = round(best_similarity, 4)
+            representatives[best_index]["related"].append(sibling)
+
+    collapsed = len(items) - len(representatives)
+    if collapsed:
+        logger.info(f"候选去重（{mode}）：{len(items)} 个候选折叠为 {len(representatives)} 个，"
+                    f"去掉近似重复 {collapsed} 个")
+    return representatives
@@ -66,6 +66,70 @@ def start_arxiv_crawl_task(keywords: List[str], background_tasks: BackgroundTask
         "status": "started"
     }
 
+def _save_scraped_papers(papers) -> tuple:
+    """将爬取的论文保存到项目数据库（同步，在线程中调用），返回 (新增数, 已存在数)"""
+    from database.database import save_paper
+    
+    saved_count = 0
+    skipped_count = 0
+    for paper in papers:
+        # 检查是否应该停止
+        if _crawler_should_stop:
+            logger.info(f"收到停止请求，已保存 {saved_count} 篇新论文，跳过 {skipped_count} 篇已存在论文，停止保存")
+            break
+        
+        try:
+            # 从URL中提取arxiv_id
+            # URL格式: https://arxiv.org/abs/2401.12345 或 https://arxiv.org/abs/cs/0001001
+            # 提取最后一个路径段作为arxiv_id
+            arxiv_id = paper.url.split('/')[-1]
+            if not arxiv_id or arxiv_id == 'abs':
+                logger.warning(f"无法从URL提取arxiv_id: {paper.url}")
+                continue
+            
+            # 准备论文数据
+            paper_data = {
+                'arxiv_id': arxiv_id,
+                'title': paper.title,
+                'authors': paper.authors,
+                'abstract': paper.abstract,
+                'published_date': paper.first_announced_date.strftime('%Y-%m-%d') if paper.first_announced_date else paper.first_submitted_date.strftime('%Y-%m-%d'),
+                'categories': ','.join(paper.categories),
+                'pdf_url': paper.pdf_url
+            }
+            
+            # 保存到数据库（如果已存在会返回已存在的ID，不会重复插入）
+            paper_id, is_new = save_paper(paper_data)
+            if paper_id:
+                if is_new:
+                    saved_count += 1
+                else:
+                    skipped_count += 1
+            else:
+                logger.warning(f"保存论文失败: {arxiv_id}")
+            
+        except Exception as e:
+            logger.error(f"保存论文失败: {paper.url}, 错误: {str(e)}")
+            continue
+    return saved_count, skipped_count
+
+def _fetch_papers_in_range(date_from: str, date_until: str) -> list:
+    """读取发布日期在范围内的论文（同步，在线程中调用）"""
+    from database.database import get_db_connection
+    
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT arxiv_id, title, abstract, categories, published_date
+            FROM papers 
+            WHERE published_date >= ? AND published_date <= ?
+            ORDER BY published_date DESC
+        """, (date_from, date_until))
+        return cursor.fetchall()
+    finally:
+        conn.close()
+
 async def run_crawler(keywords: List[str], date_from: str, date_until: str):
     """
     实际执行爬虫的后台任务函数
@@ -88,7 +152,6 @@ async def run_crawler(keywords: List[str], date_from: str, date_until: str):
         
         from arxiv_crawler import ArxivScraper
         from services.vector_service import get_vector_service
-        from database.database import get_db_connection, save_paper
         import re
         
         # 创建爬虫实例（不翻译，加快速度）
@@ -133,132 +196,45 @@ async def run_crawler(keywords: List[str], date_from: str, date_until: str):
         
         logger.info(f"爬虫任务完成，共爬取 {len(scraper.papers)} 篇论文，开始保存到项目数据库...")
         
-        # 将爬取的论文保存到项目数据库
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        saved_count = 0
-        skipped_count = 0
-        for paper in scraper.papers:
-            # 检查是否应该停止
-            if _crawler_should_stop:
-                logger.info(f"收到停止请求，已保存 {saved_count} 篇新论文，跳过 {skipped_count} 篇已存在论文，停止保存")
-                break
-            
-            try:
-                # 从URL中提取arxiv_id
-                # URL格式: https://arxiv.org/abs/2401.12345 或 https://arxiv.org/abs/cs/0001001
-                # 提取最后一个路径段作为arxiv_id
-                arxiv_id = paper.url.split('/')[-1]
-                if not arxiv_id or arxiv_id == 'abs':
-                    logger.warning(f"无法从URL提取arxiv_id: {paper.url}")
-                    continue
-                
-                # 准备论文数据
-                paper_data = {
-                    'arxiv_id': arxiv_id,
-                    'title': paper.title,
-                    'authors': paper.authors,
-                    'abstract': paper.abstract,
-                    'published_date': paper.first_announced_date.strftime('%Y-%m-%d') if paper.first_announced_date else paper.first_submitted_date.strftime('%Y-%m-%d'),
-                    'categories': ','.join(paper.categories),
-                    'pdf_url': paper.pdf_url
-                }
-                
-                # 保存到数据库（如果已存在会返回已存在的ID，不会重复插入）
-                paper_id, is_new = save_paper(paper_data)
-                if paper_id:
-                    if is_new:
-                        saved_count += 1
-                    else:
-                        skipped_count += 1
-                else:
-                    logger.warning(f"保存论文失败: {arxiv_id}")
-                
-            except Exception as e:
-                logger.error(f"保存论文失败: {paper.url}, 错误: {str(e)}")
-                continue
-        
-        conn.close()
+        # 将爬取的论文保存到项目数据库（SQLite 写入在线程中执行，不阻塞事件循环）
+        saved_count, skipped_count = await asyncio.to_thread(_save_scraped_papers, scraper.papers)
         logger.info(f"数据库保存完成，共保存 {saved_count} 篇新论文，跳过 {skipped_count} 篇已存在论文")
         
         # 立即进行向量化处理
         logger.info(f"开始向量化处理...")
         vector_service = get_vector_service()
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
         # 获取最近爬取的论文（根据时间范围筛选）
-        cursor.execute("""
-            SELECT arxiv_id, title, abstract 
-            FROM papers 
-            WHERE published_date >= ? AND published_date <= ?
-            ORDER BY published_date DESC
-        """, (date_from, date_until))
-        
-        papers = cursor.fetchall()
-        conn.close()
+        papers = await asyncio.to_thread(_fetch_papers_in_range, date_from, date_until)
         
-        # 将每篇论文添加到向量数据库
+        # 批量向量化（按批编码并写入 ChromaDB，内部按批检查是否已存在）
         processed_count = 0
         skipped_count = 0
         error_count = 0
         model_load_failed = False
         
-        for paper in papers:
-            # 检查是否应该停止
-            if _crawler_should_stop:
-                logger.info(f"收到停止请求，已向量化 {processed_count} 篇论文，停止向量化")
-                break
-            
-            try:
-                arxiv_id = paper["arxiv_id"]
-                title = paper["title"]
-                abstract = paper["abstract"] or ""
-                
-                # 检查是否已存在并添加（add_paper 内部会检查）
-                added = vector_service.add_paper(arxiv_id, title, abstract)
-                if added:
-                    processed_count += 1
-                else:
-                    skipped_count += 1
-                
-                if processed_count % 10 == 0:
-                    logger.info(f"已向量化 {processed_count} 篇论文...")
-                
-            except RuntimeError as e:
-                # 如果是模型加载失败，只记录一次，然后跳过所有后续论文
-                if not model_load_failed and ('DLL load failed' in str(e) or 'tensorflow' in str(e).lower() or '向量模型加载失败' in str(e)):
-                    model_load_failed = True
-                    logger.error("=" * 60)
-                    logger.error("向量模型加载失败，无法继续向量化处理")
-                    logger.error("错误信息: " + str(e))
-                    logger.error("")
-                    logger.error("解决方案：")
-                    logger.error("  1. 重新安装 tensorflow: pip install --upgrade tensorflow")
-                    logger.error("  2. 或者安装 CPU 版本: pip install tensorflow-cpu")
-                    logger.error("  3. 或者使用 conda 安装: conda install tensorflow")
-                    logger.error("  4. 检查是否安装了 Visual C++ Redistributable")
-                    logger.error("  5. 或者使用其他向量化方案（如 OpenAI embeddings）")
-                    logger.error("=" * 60)
-                    logger.warning("跳过向量化步骤，已保存的论文可以在修复环境后手动索引")
-                    break  # 模型加载失败，无法继续
-                error_count += 1
-                try:
-                    paper_id = paper["arxiv_id"] if "arxiv_id" in paper.keys() else "unknown"
-                except:
-                    paper_id = "unknown"
-                logger.error(f"向量化论文 {paper_id} 失败: {str(e)[:200]}")
-                continue
-            except Exception as e:
-                error_count += 1
-                # sqlite3.Row 对象使用字典访问方式
-                try:
-                    paper_id = paper["arxiv_id"] if "arxiv_id" in paper.keys() else "unknown"
-                except:
-                    paper_id = "unknown"
-                logger.error(f"向量化论文 {paper_id} 失败: {str(e)[:200]}")
-                continue
+        try:
+            stats = await vector_service.aadd_papers_bulk(
+                papers,
+                should_stop=lambda: _crawler_should_stop
+            )
+            processed_count = stats["added"]
+            skipped_count = stats["skipped"]
+            error_count = stats["error"]
+        except (RuntimeError, ImportError) as e:
+            # 模型加载失败（add_papers_bulk 会在处理前先加载模型）
+            model_load_failed = True
+            logger.error("=" * 60)
+            logger.error("向量模型加载失败，无法继续向量化处理")
+            logger.error("错误信息: " + str(e))
+            logger.error("")
+            logger.error("解决方案：")
+            logger.error("  1. 重新安装 tensorflow: pip install --upgrade tensorflow")
+            logger.error("  2. 或者安装 CPU 版本: pip install tensorflow-cpu")
+            logger.error("  3. 或者使用 conda 安装: conda install tensorflow")
+            logger.error("  4. 检查是否安装了 Visual C++ Redistributable")
+            logger.error("  5. 或者使用其他向量化方案（如 OpenAI embeddings）")
+            logger.error("=" * 60)
+            logger.warning("跳过向量化步骤，已保存的论文可以在修复环境后手动索引")
         
         if model_load_failed:
             logger.warning(f"向量化处理中断（模型加载失败）")
@@ -266,14 +242,17 @@ async def run_crawler(keywords: List[str], date_from: str, date_until: str):
             logger.warning(f"  - 已向量化: {processed_count} 篇")
             logger.warning(f"  - 跳过（已存在）: {skipped_count} 篇")
             logger.warning(f"  - 错误: {error_count} 篇")
-            logger.warning(f"  - 向量数据库总数: {vector_service.get_paper_count()} 篇")
+            logger.warning(f"  - 向量数据库总数: {await asyncio.to_thread(vector_service.get_paper_count)} 篇")
             logger.warning(f"提示：修复环境后可以使用 /api/matching/index-papers 接口索引剩余论文")
         else:
+            if processed_count:
+                # npy 压缩模式：行数达到阈值的集合在向量化结束后训练 PQ 码本（写入路径上不训练）
+                await asyncio.to_thread(vector_service.train_pending_pq)
             logger.info(f"向量化处理完成！")
             logger.info(f"  - 新增向量化: {processed_count} 篇")
             logger.info(f"  - 跳过（已存在）: {skipped_count} 篇")
             logger.info(f"  - 错误: {error_count} 篇")
-            logger.info(f"  - 向量数据库总数: {vector_service.get_paper_count()} 篇")
+            logger.info(f"  - 向量数据库总数: {await asyncio.to_thread(vector_service.get_paper_count)} 篇")
         
         logger.info(f"爬虫任务完成: {keywords}")
         
@@ -0,0 +1,221 @@
+"""
+向量化推理后端 - ONNX Runtime（可选 int8 动态量化）
+
+通过环境变量 EMBEDDING_BACKEND 选择：
+- torch（默认）：SentenceTransformer + PyTorch
+- onnx：导出为 ONNX，使用 onnxruntime 推理（float32）
+- onnx-int8：在 onnx 基础上做动态 int8 量化，CPU 延迟和内存占用最低
+
+首次使用时需要 torch + sentence-transformers 完成导出，导出结果缓存在
+backend/models/onnx/<模型名>/ 下，之后的进程只需要 onnxruntime 和 tokenizers（不导入 torch）。
+"""
+import inspect
+import json
+import logging
+import os
+from pathlib import Path
+from typing import List, Optional, Union
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# 支持的后端
+BACKEND_TORCH = "torch"
+BACKEND_ONNX = "onnx"
+BACKEND_ONNX_INT8 = "onnx-int8"
+SUPPORTED_BACKENDS = (BACKEND_TORCH, BACKEND_ONNX, BACKEND_ONNX_INT8)
+
+# ONNX 导出目录
+DEFAULT_EXPORT_DIR = Path(__file__).parent.parent / "models" / "onnx"
+
+_CONFIG_FILE = "embedding_config.json"
+_FP32_FILE = "model.onnx"
+_INT8_FILE = "model-int8.onnx"
+
+
+def _export_dir_for(model_name: str, export_root: Path) -> Path:
+    """模型名可能是 HF 名称或本地路径，取最后一段作为目录名"""
+    return Path(export_root) / Path(model_name.rstrip("/\\")).name
+
+
+def export_onnx(model_name: str, export_dir: Path) -> None:
+    """
+    使用 SentenceTransformer 加载模型，导出 Transformer 部分为 ONNX，并保存 tokenizer 和池化配置
+    输出 last_hidden_state，池化（mean/cls/max）和归一化在 numpy 中完成
+    """
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    logger.info(f"开始导出 ONNX 模型: {model_name} -> {export_dir}")
+    export_dir.mkdir(parents=True, exist_ok=True)
+
+    # 有固定的本地模型目录时从本地导出（离线部署不访问网络，见 model_store）
+    from services.model_store import resolve_model_path
+    st_model = SentenceTransformer(str(resolve_model_path(model_name) or model_name), device="cpu")
+    transformer = st_model[0].auto_model.eval()
+    tokenizer = st_model.tokenizer
+
+    # 池化方式兼容新旧版本 sentence-transformers 的配置格式
+    pooling_config = st_model[1].get_config_dict()
+    pooling_mode = pooling_config.get("pooling_mode")
+    if not pooling_mode:
+        if pooling_config.get("pooling_mode_cls_token"):
+            pooling_mode = "cls"
+        elif pooling_config.get("pooling_mode_max_tokens"):
+            pooling_mode = "max"
+        else:
+            pooling_mode = "mean"
+    normalize = any(type(module).__name__ == "Normalize" for module in st_model)
+
+    input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids")
+                   if name in tokenizer.model_input_names]
+
+    class _TransformerWrapper(torch.nn.Module):
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+
+        def forward(self, *inputs):
+            return self.model(**dict(zip(input_names, inputs))).last_hidden_state
+
+    dummy = tokenizer(["warm up"], return_tensors="pt")
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+
+    export_kwargs = {}
+    # 新版本 torch 默认使用 dynamo 导出器，这里固定使用 TorchScript 导出器（不依赖 onnxscript）
+    if "dynamo" in inspect.signature(torch.onnx.export).parameters:
+        export_kwargs["dynamo"] = False
+
+    with torch.no_grad():
+        torch.onnx.export(
+            _TransformerWrapper(transformer),
+            tuple(dummy[name] for name in input_names),
+            str(export_dir / _FP32_FILE),
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=14,
+            **export_kwargs
+        )
+
+    tokenizer.save_pretrained(str(export_dir))
+    with open(export_dir / _CONFIG_FILE, "w", encoding="utf-8") as f:
+        json.dump({
+            "model_name": model_name,
+            "input_names": input_names,
+            "pooling_mode": pooling_mode,
+            "normalize": normalize,
+            "max_seq_length": st_model.max_seq_length,
+            "pad_token": tokenizer.pad_token,
+            "pad_token_id": tokenizer.pad_token_id,
+        }, f, ensure_ascii=False, indent=2)
+
+    logger.info(f"ONNX 模型导出完成: {export_dir / _FP32_FILE}")
+
+
+def quantize_int8(export_dir: Path) -> None:
+    """对导出的 ONNX 模型做动态 int8 量化（权重 int8，激活运行时量化）"""
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+
+    logger.info(f"开始 int8 动态量化: {export_dir / _FP32_FILE}")
+    quantize_dynamic(
+        str(export_dir / _FP32_FILE),
+        str(export_dir / _INT8_FILE),
+        weight_type=QuantType.QInt8
+    )
+    logger.info(f"int8 量化完成: {export_dir / _INT8_FILE}")
+
+
+class OnnxEncoder:
+    """
+    ONNX Runtime 向量编码器
+    encode() 与 SentenceTransformer.encode 的常用参数保持一致，VectorService 可以直接替换使用
+    """
+
+    def __init__(self, export_dir: Path, quantized: bool = True, num_threads: Optional[int] = None):
+        # 只依赖 onnxruntime 和 tokenizers，不导入 transformers（它会连带导入 torch，占用数百 MB 内存）
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        with open(export_dir / _CONFIG_FILE, "r", encoding="utf-8") as f:
+            self.config = json.load(f)
+        self.input_names = self.config["input_names"]
+        self.pooling_mode = self.config["pooling_mode"]
+        self.normalize = self.config["normalize"]
+        self.max_seq_length = self.config["max_seq_length"]
+
+        self.tokenizer = Tokenizer.from_file(str(export_dir / "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=self.max_seq_length)
+        self.tokenizer.enable_padding(pad_id=self.config["pad_token_id"], pad_token=self.config["pad_token"])
+
+        # 线程设置：单个请求内并行（intra-op），算子间串行，避免与 uvicorn 线程池互相抢占
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = num_threads or os.cpu_count() or 1
+        options.inter_op_num_threads = 1
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        # 关闭内存池：批量编码后不长期保留峰值内存，降低常驻内存
+        options.enable_cpu_mem_arena = False
+
+        model_file = export_dir / (_INT8_FILE if quantized else _FP32_FILE)
+        self.session = ort.InferenceSession(
+            str(model_file),
+            sess_options=options,
+            providers=["CPUExecutionProvider"]
+        )
+        logger.info(f"ONNX 模型加载完成: {model_file}（intra_op_num_threads={options.intra_op_num_threads}）")
+
+    @classmethod
+    def load_or_export(cls, model_name: str, quantized: bool = True,
+                       export_root: Path = DEFAULT_EXPORT_DIR,
+                       num_threads: Optional[int] = None) -> "OnnxEncoder":
+        """加载已导出的 ONNX 模型；不存在时先导出（以及量化）"""
+        export_dir = _export_dir_for(model_name, export_root)
+        if not (export_dir / _CONFIG_FILE).exists() or not (export_dir / _FP32_FILE).exists():
+            export_onnx(model_name, export_dir)
+        if quantized and not (export_dir / _INT8_FILE).exists():
+            quantize_int8(export_dir)
+        return cls(export_dir, quantized=quantized, num_threads=num_threads)
+
+    def _pool(self, hidden: np.ndarray, attention_mask: np.ndarray) -> np.ndarray:
+        if self.pooling_mode == "cls":
+            return hidden[:, 0]
+        mask = attention_mask[..., None].astype(hidden.dtype)
+        if self.pooling_mode == "max":
+            return np.where(mask > 0, hidden, -1e9).max(axis=1)
+        return (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+
+    def encode(self, sentences: Union[str, List[str]], batch_size: int = 32,
+               convert_to_numpy: bool = True, show_progress_bar: bool = False, **kwargs) -> np.ndarray:
+        """
+        编码文本，返回 float32 numpy 数组（单条文本返回一维数组）
+        按长度排序后分批，减少 padding 浪费；结果按输入顺序返回
+        """
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+
+        order = np.argsort([-len(text) for text in texts], kind="stable")
+        results = [None] * len(texts)
+
+        for start in range(0, len(texts), batch_size):
+            batch_idx = order[start:start + batch_size]
+            encodings = self.tokenizer.encode_batch([texts[i] for i in batch_idx])
+            encoded = {
+                "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+                "attention_mask": np.array([e.attention_mask for e in encodings], dtype=np.int64),
+                "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64),
+            }
+            feeds = {name: encoded[name] for name in self.input_names}
+            hidden = self.session.run(None, feeds)[0]
+            embeddings = self._pool(hidden, encoded["attention_mask"])
+            if self.normalize:
+                embeddings = embeddings / np.clip(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12, None)
+            for i, embedding in zip(batch_idx, embeddings):
+                results[i] = embedding
+
+        embeddings = np.vstack(results).astype(np.float32)
+        return embeddings[0] if single else embeddings
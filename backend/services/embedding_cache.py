@@ -0,0 +1,185 @@
+"""
+向量缓存
+- EmbeddingCache: 持久化缓存，按 (模型名, 文本 sha256) 存储 float16 向量。
+  重建 chroma_db 或重新导入 requirements.json 时，文本未变化的论文/需求/成果
+  直接从缓存读取向量，不再调用模型。缓存放在 chroma_db 目录之外，删除向量库不会影响它。
+- QueryEmbeddingCache: 进程内 LRU 缓存，按规范化后的查询文本缓存查询向量。
+"""
+import hashlib
+import logging
+import re
+import sqlite3
+import threading
+import unicodedata
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# 默认缓存文件路径（与 app.db 同目录）
+DEFAULT_CACHE_PATH = Path(__file__).parent.parent / "database" / "embedding_cache.db"
+
+# SQLite 单条语句的参数数量上限较低，IN 查询按此大小分块
+_QUERY_CHUNK_SIZE = 500
+
+
+def text_hash(text: str) -> str:
+    """计算文本的 sha256（向量化文本必须与 add_* 中构建的完全一致）"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    def __init__(self, db_path: Path = DEFAULT_CACHE_PATH):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+
+        conn = self._connect()
+        try:
+            # WAL 模式：索引写入时不阻塞其他进程读取
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS embedding_cache (
+                    model VARCHAR(200) NOT NULL,
+                    text_hash CHAR(64) NOT NULL,
+                    dim INTEGER NOT NULL,
+                    vector BLOB NOT NULL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    PRIMARY KEY (model, text_hash)
+                )
+            """)
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(str(self.db_path), timeout=30)
+
+    def get_many(self, model: str, texts: Sequence[str]) -> Dict[str, List[float]]:
+        """
+        批量读取缓存
+        返回: {text: vector}，只包含命中的文本
+        """
+        hash_to_texts: Dict[str, List[str]] = {}
+        for text in texts:
+            hash_to_texts.setdefault(text_hash(text), []).append(text)
+        if not hash_to_texts:
+            return {}
+
+        found = {}
+        hashes = list(hash_to_texts.keys())
+        conn = self._connect()
+        try:
+            for start in range(0, len(hashes), _QUERY_CHUNK_SIZE):
+                chunk = hashes[start:start + _QUERY_CHUNK_SIZE]
+                placeholders = ",".join(["?"] * len(chunk))
+                rows = conn.execute(
+                    f"SELECT text_hash, vector FROM embedding_cache WHERE model = ? AND text_hash IN ({placeholders})",
+                    [model, *chunk]
+                ).fetchall()
+                for h, blob in rows:
+                    vector = np.frombuffer(blob, dtype=np.float16).astype(np.float32).tolist()
+                    for text in hash_to_texts[h]:
+                        found[text] = vector
+        finally:
+            conn.close()
+        return found
+
+    def put_many(self, model: str, texts: Sequence[str], vectors) -> None:
+        """批量写入缓存（已存在的键会被覆盖）"""
+        if len(texts) == 0:
+            return
+        vectors = np.asarray(vectors, dtype=np.float16)
+        rows = [
+            (model, text_hash(text), int(vector.shape[0]), vector.tobytes())
+            for text, vector in zip(texts, vectors)
+        ]
+        conn = self._connect()
+        try:
+            conn.executemany(
+                "INSERT OR REPLACE INTO embedding_cache (model, text_hash, dim, vector) VALUES (?, ?, ?, ?)",
+                rows
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+    def count(self, model: str = None) -> int:
+        """缓存中的向量数量（可按模型过滤）"""
+        conn = self._connect()
+        try:
+            if model:
+                row = conn.execute("SELECT COUNT(*) FROM embedding_cache WHERE model = ?", (model,)).fetchone()
+            else:
+                row = conn.execute("SELECT COUNT(*) FROM embedding_cache").fetchone()
+            return row[0]
+        finally:
+            conn.close()
+
+
+def normalize_query(text: str) -> str:
+    """规范化查询文本：Unicode NFKC、合并连续空白、去掉首尾空白（不改变大小写，模型区分大小写）"""
+    text = unicodedata.normalize("NFKC", text or "")
+    return re.sub(r"\s+", " ", text).strip()
+
+
+class QueryEmbeddingCache:
+    """
+    查询向量 LRU 缓存（线程安全）
+    缓存记录所属模型，模型变化时自动清空，避免用旧模型的查询向量检索新模型的文档向量
+    """
+
+    def __init__(self, max_size: int = 1024):
+        self.max_size = max_size
+        self._model: Optional[str] = None
+        self._items: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _check_model(self, model: str) -> None:
+        """模型变化时清空缓存（调用方需持有锁）"""
+        if self._model != model:
+            if self._items:
+                logger.info(f"向量模型已变化（{self._model} -> {model}），清空查询向量缓存")
+            self._items.clear()
+            self._model = model
+
+    def get(self, model: str, key: str) -> Optional[List[float]]:
+        with self._lock:
+            self._check_model(model)
+            vector = self._items.get(key)
+            if vector is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return vector
+
+    def put(self, model: str, key: str, vector: List[float]) -> None:
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._check_model(model)
+            self._items[key] = vector
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "model": self._model,
+                "size": len(self._items),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0
+            }
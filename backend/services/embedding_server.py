@@ -0,0 +1,307 @@
+"""
+本地向量化服务 - 一个进程持有模型，多个 worker 通过 Unix socket / localhost HTTP 共享，并发请求动态合批
+
+每个 uvicorn worker 各自加载模型时，并发请求在各自进程中做 batch=1 的前向，CPU 的向量化吞吐大部分被浪费，
+模型也在每个进程中各有一份。启用向量化服务后：
+
+- 服务进程（scripts/embedding_server.py）按模型名延迟加载编码器（与 VectorService 相同的 torch / onnx 后端）
+- MicroBatcher：请求进入队列，收到第一条后最多再等 max_wait_ms 毫秒或凑满 max_batch 条文本，
+  合并为一次 encode，结果按请求拆分返回；编码期间到达的请求自动进入下一批（负载越高批越大）
+- VectorService 设置 EMBEDDING_SERVER 后用 EmbeddingServerClient 代替本地模型（encode 接口一致），
+  缓存、版本、检索等逻辑不变；服务不可用时按 EMBEDDING_SERVER_FALLBACK 回退到本地模型或直接报错
+
+协议：POST /embed，请求 {"model": 模型名, "texts": [...]}，响应为 float32 行优先的原始字节，
+响应头 X-Embedding-Dim 为向量维度；GET /info 返回后端、已加载模型和合批统计。
+"""
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Union
+
+import numpy as np
+
+from services.embedding_backends import BACKEND_ONNX_INT8, BACKEND_TORCH, SUPPORTED_BACKENDS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BATCH = int(os.getenv("EMBEDDING_SERVER_MAX_BATCH", "64"))
+DEFAULT_MAX_WAIT_MS = float(os.getenv("EMBEDDING_SERVER_MAX_WAIT_MS", "5"))
+# 客户端单次请求的文本数上限：大批量向量化拆成多次请求，与其他请求交替合批
+CLIENT_CHUNK_SIZE = 256
+
+_UNIX_PREFIX = "unix:"
+
+
+def load_encoder(model_name: str, backend: str):
+    """加载编码器（与 VectorService 本地加载相同：torch 走 model_store，onnx 走 OnnxEncoder）"""
+    if backend == BACKEND_TORCH:
+        os.environ.setdefault("TRANSFORMERS_NO_TF", "1")
+        from services.model_store import load_sentence_transformer
+        model, stats = load_sentence_transformer(model_name)
+        logger.info(f"已加载向量模型: {model_name}（耗时 {stats['load_seconds']} 秒）")
+        return model
+    from services.embedding_backends import OnnxEncoder
+    threads = os.getenv("ONNX_NUM_THREADS")
+    return OnnxEncoder.load_or_export(model_name, quantized=backend == BACKEND_ONNX_INT8,
+                                      num_threads=int(threads) if threads else None)
+
+
+class _Pending:
+    __slots__ = ("model_name", "texts", "future", "enqueued")
+
+    def __init__(self, model_name: str, texts: List[str], future: asyncio.Future):
+        self.model_name = model_name
+        self.texts = texts
+        self.future = future
+        self.enqueued = time.perf_counter()
+
+
+class MicroBatcher:
+    """
+    动态合批：队列中的请求合并为一次 encode，在单独的线程中执行（不阻塞事件循环）
+    encode_fn(model_name, texts) -> np.ndarray，同一时间只有一个批在编码，模型内部的线程数不受影响
+    """
+
+    def __init__(self, encode_fn: Callable[[str, List[str]], np.ndarray],
+                 max_batch: int = DEFAULT_MAX_BATCH, max_wait_ms: float = DEFAULT_MAX_WAIT_MS,
+                 stats_window: int = 1000):
+        self.encode_fn = encode_fn
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="embedding-batch")
+        self.requests = 0
+        self.batches = 0
+        self.texts = 0
+        self.errors = 0
+        self._batch_sizes = deque(maxlen=stats_window)
+        self._queue_ms = deque(maxlen=stats_window)
+
+    def start(self) -> None:
+        self._queue = asyncio.Queue()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+        self._executor.shutdown(wait=False)
+
+    async def submit(self, model_name: str, texts: List[str]) -> np.ndarray:
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait(_Pending(model_name, texts, future))
+        self.requests += 1
+        return await future
+
+    async def _collect(self) -> List[_Pending]:
+        """取出第一条请求后，在 max_wait 内继续收集，直到凑满 max_batch 条文本"""
+        items = [await self._queue.get()]
+        size = len(items[0].texts)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.max_wait
+        while size < self.max_batch:
+            try:
+                # 已经排队的请求直接取走，不等待
+                item = self._queue.get_nowait()
+            except asyncio.QueueEmpty:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+            items.append(item)
+            size += len(item.texts)
+        return items
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            items = await self._collect()
+            started = time.perf_counter()
+            by_model: Dict[str, List[_Pending]] = {}
+            for item in items:
+                by_model.setdefault(item.model_name, []).append(item)
+                self._queue_ms.append((started - item.enqueued) * 1000)
+            for model_name, group in by_model.items():
+                texts = [text for item in group for text in item.texts]
+                try:
+                    vectors = await loop.run_in_executor(self._executor, self.encode_fn, model_name, texts)
+                except Exception as e:
+                    self.errors += len(group)
+                    for item in group:
+                        if not item.future.done():
+                            item.future.set_exception(e)
+                    continue
+                self.batches += 1
+                self.texts += len(texts)
+                self._batch_sizes.append(len(texts))
+                offset = 0
+                for item in group:
+                    if not item.future.done():
+                        item.future.set_result(vectors[offset:offset + len(item.texts)])
+                    offset += len(item.texts)
+
+    def stats(self) -> Dict:
+        sizes = sorted(self._batch_sizes)
+        waits = sorted(self._queue_ms)
+        return {
+            "requests": self.requests,
+            "batches": self.batches,
+            "texts": self.texts,
+            "errors": self.errors,
+            "max_batch": self.max_batch,
+            "max_wait_ms": self.max_wait * 1000,
+            "avg_batch_size": round(sum(sizes) / len(sizes), 2) if sizes else None,
+            "max_batch_size": sizes[-1] if sizes else None,
+            "queue_p50_ms": round(waits[len(waits) // 2], 2) if waits else None,
+            "queue_p95_ms": round(waits[min(len(waits) - 1, int(len(waits) * 0.95))], 2) if waits else None,
+        }
+
+
+def create_app(default_model: str, backend: str, max_batch: int = DEFAULT_MAX_BATCH,
+               max_wait_ms: float = DEFAULT_MAX_WAIT_MS, preload: bool = False):
+    """创建向量化服务的 FastAPI 应用"""
+    from fastapi import FastAPI, HTTPException
+    from fastapi.responses import Response
+    from pydantic import BaseModel
+
+    if backend not in SUPPORTED_BACKENDS:
+        raise ValueError(f"不支持的后端: {backend}（可选: {', '.join(SUPPORTED_BACKENDS)}）")
+
+    models: Dict[str, object] = {}
+    models_lock = threading.Lock()
+
+    def get_model(model_name: str):
+        with models_lock:
+            if model_name not in models:
+                models[model_name] = load_encoder(model_name, backend)
+            return models[model_name]
+
+    def encode(model_name: str, texts: List[str]) -> np.ndarray:
+        vectors = get_model(model_name).encode(texts, batch_size=max_batch, convert_to_numpy=True,
+                                               show_progress_bar=False)
+        return np.ascontiguousarray(vectors, dtype=np.float32)
+
+    batcher = MicroBatcher(encode, max_batch=max_batch, max_wait_ms=max_wait_ms)
+    app = FastAPI(title="Embedding Server")
+
+    class EmbedRequest(BaseModel):
+        model: Optional[str] = None
+        texts: List[str]
+
+    @app.on_event("startup")
+    async def _startup():
+        batcher.start()
+        if preload:
+            await asyncio.get_running_loop().run_in_executor(None, get_model, default_model)
+        logger.info(f"向量化服务已启动（后端 {backend}，max_batch={max_batch}，max_wait_ms={max_wait_ms}）")
+
+    @app.on_event("shutdown")
+    async def _shutdown():
+        await batcher.stop()
+
+    @app.post("/embed")
+    async def embed(request: EmbedRequest):
+        if not request.texts:
+            return Response(content=b"", media_type="application/octet-stream", headers={"X-Embedding-Dim": "0"})
+        try:
+            vectors = await batcher.submit(request.model or default_model, request.texts)
+        except Exception as e:
+            logger.error(f"向量化失败: {e}")
+            raise HTTPException(status_code=500, detail=f"向量化失败: {str(e)[:200]}")
+        return Response(content=vectors.tobytes(), media_type="application/octet-stream",
+                        headers={"X-Embedding-Dim": str(vectors.shape[1])})
+
+    @app.get("/info")
+    async def info():
+        return {"backend": backend, "default_model": default_model, "models": list(models),
+                "batcher": batcher.stats()}
+
+    @app.get("/health")
+    async def health():
+        return {"status": "ok"}
+
+    return app
+
+
+def _make_http_client(address: str, timeout: float):
+    """address 为 unix:/path/to.sock 或 http://127.0.0.1:8765"""
+    import httpx
+    if address.startswith(_UNIX_PREFIX):
+        path = address[len(_UNIX_PREFIX):]
+        if path.startswith("//"):
+            path = path[2:]
+        return httpx.Client(transport=httpx.HTTPTransport(uds=path), base_url="http://embedding-server",
+                            timeout=timeout)
+    return httpx.Client(base_url=address.rstrip("/"), timeout=timeout)
+
+
+class EmbeddingServerClient:
+    """
+    向量化服务的客户端，encode() 与 SentenceTransformer.encode 的常用参数一致，VectorService 可以直接替换本地模型
+    首次调用时核对服务的推理后端与本地配置一致（否则向量缓存和已入库向量的模型标识不一致）
+    服务不可用（连接失败 / 超时）时：fallback 不为 None 则调用 fallback() 得到本地模型编码，否则抛出异常
+    """
+
+    def __init__(self, address: str, model_name: str, backend: str, timeout: float = 30.0,
+                 fallback: Optional[Callable[[], object]] = None):
+        self.address = address
+        self.model_name = model_name
+        self.backend = backend
+        self.fallback = fallback
+        self._client = _make_http_client(address, timeout)
+        self._verified = False
+        self._last_warning = 0.0
+
+    def _verify(self) -> None:
+        if self._verified:
+            return
+        info = self._client.get("/info")
+        info.raise_for_status()
+        server_backend = info.json().get("backend")
+        if server_backend != self.backend:
+            raise RuntimeError(
+                f"向量化服务 {self.address} 的推理后端为 {server_backend}，本地 EMBEDDING_BACKEND 为 {self.backend}，"
+                f"两者必须一致（向量缓存和向量版本按 模型名@后端 区分）"
+            )
+        self._verified = True
+
+    def _request(self, texts: List[str]) -> np.ndarray:
+        response = self._client.post("/embed", json={"model": self.model_name, "texts": texts})
+        response.raise_for_status()
+        dim = int(response.headers.get("X-Embedding-Dim", "0"))
+        return np.frombuffer(response.content, dtype=np.float32).reshape(len(texts), dim)
+
+    def encode(self, sentences: Union[str, List[str]], batch_size: Optional[int] = None,
+               convert_to_numpy: bool = True, show_progress_bar: bool = False, **kwargs) -> np.ndarray:
+        """编码文本，返回 float32 numpy 数组（单条文本返回一维数组）"""
+        import httpx
+
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        try:
+            self._verify()
+            parts = [self._request(texts[start:start + CLIENT_CHUNK_SIZE])
+                     for start in range(0, len(texts), CLIENT_CHUNK_SIZE)]
+            vectors = np.concatenate(parts) if len(parts) > 1 else parts[0]
+        except (httpx.TransportError, httpx.HTTPStatusError) as e:
+            if self.fallback is None:
+                raise RuntimeError(f"向量化服务 {self.address} 不可用: {e}") from e
+            now = time.time()
+            if now - self._last_warning > 60:
+                logger.warning(f"向量化服务 {self.address} 不可用，回退到本地模型: {e}")
+                self._last_warning = now
+            return self.fallback().encode(sentences, batch_size=batch_size or 32, convert_to_numpy=convert_to_numpy,
+                                          show_progress_bar=show_progress_bar, **kwargs)
+        return vectors[0] if single else vectors
+
+    def close(self) -> None:
+        self._client.close()
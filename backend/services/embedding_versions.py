@@ -0,0 +1,212 @@
+"""
+向量模型版本：版本化集合、后台重建与原子切换
+
+向量库中的一组集合（papers / requirements / achievements / paper_chunks）属于同一个“版本”，
+版本记录生成这些向量的模型。版本信息保存在向量存储目录下的 embedding_versions.json：
+
+    {"active": "v2", "previous": "v1",
+     "versions": {"v1": {"model": "...", "status": "ready", ...}, "v2": {...}}}
+
+- v1 使用原有的集合名（papers），之后的版本带后缀（papers_v2 / requirements_v2 ...），
+  集合元数据的 embedding_model 字段记录模型名，启用版本时校验
+- 更换模型时在后台从 SQLite 重建新版本（paper_indexer.rebuild_embedding_version），旧版本继续提供检索
+- 重建完成后改写 active 指针（临时文件 + os.replace，原子生效），原版本记为 previous，可以随时回滚；
+  其他进程按文件修改时间发现切换
+- 修改（创建 / 更新状态 / 切换 / 删除）在排他文件锁（embedding_versions.json.lock）内重新读取文件后进行，
+  多个进程同时修改时不会互相覆盖（Windows 上没有 fcntl，只有进程内的线程锁）
+- 查询向量总是用 active 版本的模型编码，与被检索的集合来自同一个模型
+"""
+import json
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows：只有进程内的线程锁
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# 默认向量模型（早期版本硬编码在 VectorService 中，未记录模型的向量库视为由它生成）
+DEFAULT_EMBEDDING_MODEL = "paraphrase-multilingual-MiniLM-L12-v2"
+
+REGISTRY_FILE_NAME = "embedding_versions.json"
+# 集合元数据中记录模型名的字段
+MODEL_METADATA_KEY = "embedding_model"
+# 属于同一版本的集合（基础名）
+VERSIONED_COLLECTIONS = ("papers", "requirements", "achievements", "paper_chunks")
+LEGACY_VERSION = "v1"
+
+# 版本状态
+VERSION_BUILDING = "building"
+VERSION_READY = "ready"
+VERSION_FAILED = "failed"
+
+
+class EmbeddingModelMismatchError(ValueError):
+    """集合中的向量与查询使用的模型不一致"""
+
+
+def collection_name(base: str, version: str) -> str:
+    """版本中集合的实际名称：v1 为原集合名，其他版本加后缀（papers_v2）"""
+    return base if version == LEGACY_VERSION else f"{base}_{version}"
+
+
+def _now() -> str:
+    return datetime.now().isoformat(timespec="seconds")
+
+
+class EmbeddingVersionRegistry:
+    """embedding_versions.json 的读写（写入为临时文件 + os.replace，修改在文件锁内进行）"""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._lock_file = self.path.with_name(self.path.name + ".lock")
+        self._lock = threading.Lock()
+        self._data: Dict = {}
+        self._mtime: Optional[float] = None
+
+    # ---------- 读取 ----------
+
+    def exists(self) -> bool:
+        return self.path.exists()
+
+    def reload_if_changed(self) -> bool:
+        """文件被其他进程改写时重新读取，返回是否有变化"""
+        try:
+            mtime = self.path.stat().st_mtime
+        except FileNotFoundError:
+            return False
+        if mtime == self._mtime:
+            return False
+        with self._lock:
+            self._read()
+        return True
+
+    def _read(self) -> None:
+        mtime = self.path.stat().st_mtime
+        with open(self.path, encoding="utf-8") as f:
+            self._data = json.load(f)
+        self._mtime = mtime
+
+    @property
+    def active_version(self) -> str:
+        return self._data.get("active", LEGACY_VERSION)
+
+    @property
+    def previous_version(self) -> Optional[str]:
+        return self._data.get("previous")
+
+    def get(self, version: str) -> Optional[Dict]:
+        info = self._data.get("versions", {}).get(version)
+        return dict(info, version=version) if info else None
+
+    def list_versions(self) -> List[Dict]:
+        versions = self._data.get("versions", {})
+        return [dict(versions[v], version=v) for v in sorted(versions, key=lambda v: int(v[1:]))]
+
+    def to_dict(self) -> Dict:
+        return {"active": self.active_version, "previous": self.previous_version, "versions": self.list_versions()}
+
+    # ---------- 写入 ----------
+
+    @contextmanager
+    def _modifying(self):
+        """
+        修改锁：线程锁 + 排他文件锁，加锁后重新读取文件（不依赖修改时间），
+        保证 读取 -> 修改 -> 保存 在进程间串行，不覆盖其他进程刚写入的修改
+        """
+        with self._lock:
+            f = None
+            if fcntl is not None:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                f = open(self._lock_file, "a+")
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                if self.path.exists():
+                    self._read()
+                yield
+            finally:
+                if f is not None:
+                    f.close()
+
+    def _save(self) -> None:
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._data, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        self._mtime = self.path.stat().st_mtime
+
+    def initialize(self, model: str) -> None:
+        """首次启动：把现有集合登记为 v1（其他进程已登记时不覆盖）"""
+        with self._modifying():
+            if self.path.exists():
+                return
+            self._data = {
+                "active": LEGACY_VERSION,
+                "previous": None,
+                "versions": {LEGACY_VERSION: {"model": model, "status": VERSION_READY, "created_at": _now()}},
+            }
+            self._save()
+        logger.info(f"向量模型版本登记：{LEGACY_VERSION} -> {model}")
+
+    def create(self, model: str) -> str:
+        """
+        为模型创建新版本（状态 building）；同一模型有未完成或失败的版本时复用它（重建从断点继续）
+        返回: 版本号
+        """
+        with self._modifying():
+            versions = self._data.setdefault("versions", {})
+            for version, info in versions.items():
+                if info["model"] == model and info["status"] in (VERSION_BUILDING, VERSION_FAILED):
+                    info["status"] = VERSION_BUILDING
+                    info.pop("error", None)
+                    self._save()
+                    return version
+            version = f"v{max(int(v[1:]) for v in versions) + 1 if versions else 1}"
+            versions[version] = {"model": model, "status": VERSION_BUILDING, "created_at": _now()}
+            self._save()
+        logger.info(f"创建向量模型版本 {version}（{model}）")
+        return version
+
+    def update(self, version: str, **fields) -> None:
+        with self._modifying():
+            self._data["versions"][version].update(fields)
+            self._save()
+
+    def activate(self, version: str) -> Optional[str]:
+        """启用版本（原子切换 active 指针），原 active 版本记为 previous，返回原版本"""
+        with self._modifying():
+            info = self._data.get("versions", {}).get(version)
+            if info is None:
+                raise ValueError(f"向量模型版本不存在: {version}")
+            if info["status"] != VERSION_READY:
+                raise ValueError(f"向量模型版本 {version} 尚未重建完成（状态: {info['status']}）")
+            previous = self._data.get("active")
+            if previous == version:
+                return previous
+            self._data["active"] = version
+            self._data["previous"] = previous
+            info["activated_at"] = _now()
+            self._save()
+        return previous
+
+    def remove(self, version: str) -> Dict:
+        """删除版本记录（不能删除 active 版本；删除 previous 版本后无法再回滚），返回被删除的记录"""
+        with self._modifying():
+            if version == self._data.get("active"):
+                raise ValueError(f"不能删除当前启用的版本: {version}")
+            info = self._data.get("versions", {}).pop(version, None)
+            if info is None:
+                raise ValueError(f"向量模型版本不存在: {version}")
+            if version == self._data.get("previous"):
+                self._data["previous"] = None
+            self._save()
+        return info
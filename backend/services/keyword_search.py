@@ -0,0 +1,112 @@
+"""
+关键词检索 - 基于 SQLite FTS5 的 BM25 检索（论文标题 + 摘要）
+
+papers_fts 是 papers 表的外部内容 FTS5 表（init_db 创建，触发器保持同步）。
+向量模型对缩写、模型名、数据集名（如 YOLOv8、LoRA、SAM）区分度较差，
+匹配时用查询扩展得到的技术术语做 BM25 检索，与向量检索结果融合后再交给 LLM 精排。
+"""
+import logging
+import re
+import sqlite3
+from typing import List, Optional, Tuple
+
+from database.database import get_db_connection
+
+logger = logging.getLogger(__name__)
+
+# 每次 BM25 检索最多使用的检索词数量
+MAX_TERMS = 16
+# 标题命中的权重高于摘要（bm25() 的列权重）
+TITLE_WEIGHT = 2.0
+ABSTRACT_WEIGHT = 1.0
+
+# 原始需求中的英文缩写、模型名（含大写字母缩写或数字的词，如 YOLOv8、LoRA、SAM、GPT-4）
+_ACRONYM_PATTERN = re.compile(r"[A-Za-z][A-Za-z0-9]*(?:[-.+][A-Za-z0-9]+)*")
+
+
+def extract_keyword_terms(user_requirement: str, keywords: Optional[List[str]] = None) -> List[str]:
+    """
+    生成 BM25 检索词：查询扩展得到的技术术语 + 原始需求中的英文缩写/模型名
+    返回: 去重后的检索词列表（查询扩展失败且需求中没有缩写时为空）
+    """
+    terms = list(keywords or [])
+    for token in _ACRONYM_PATTERN.findall(user_requirement or ""):
+        if any(c.isdigit() for c in token) or sum(c.isupper() for c in token) >= 2:
+            terms.append(token)
+
+    seen = set()
+    unique = []
+    for term in terms:
+        key = term.strip().lower()
+        if key and key not in seen:
+            seen.add(key)
+            unique.append(term.strip())
+    return unique[:MAX_TERMS]
+
+
+def build_fts_query(terms: List[str]) -> str:
+    """
+    构建 FTS5 MATCH 表达式：每个检索词作为一个短语（多个词需相邻出现），短语之间为 OR
+    只保留字母数字，避免检索词中的符号（如 C++、"-"）被解析为 FTS5 语法
+    """
+    phrases = []
+    for term in terms:
+        tokens = re.findall(r"\w+", term)
+        if tokens:
+            phrases.append('"' + " ".join(tokens) + '"')
+    return " OR ".join(phrases)
+
+
+def search_papers_bm25(
+    terms: List[str],
+    top_k: int = 50,
+    categories: Optional[List[str]] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None
+) -> List[Tuple[str, float]]:
+    """
+    BM25 检索论文
+    terms: 检索词（见 extract_keyword_terms）
+    categories / date_from / date_to: 与向量检索相同的过滤条件
+    返回: [(arxiv_id, bm25_score), ...]，分数越大越相关；FTS5 不可用时返回空列表
+    """
+    match_query = build_fts_query(terms)
+    if not match_query:
+        return []
+
+    conditions = ["papers_fts MATCH ?"]
+    params = [match_query]
+    categories = [c.strip() for c in (categories or []) if c and c.strip()]
+    if categories:
+        conditions.append("(" + " OR ".join(
+            ["(',' || REPLACE(p.categories, ' ', '') || ',') LIKE ?"] * len(categories)
+        ) + ")")
+        params.extend(f"%,{c},%" for c in categories)
+    if date_from:
+        conditions.append("substr(p.published_date, 1, 10) >= ?")
+        params.append(date_from[:10])
+    if date_to:
+        conditions.append("substr(p.published_date, 1, 10) <= ?")
+        params.append(date_to[:10])
+
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(f"""
+            SELECT p.arxiv_id, bm25(papers_fts, {TITLE_WEIGHT}, {ABSTRACT_WEIGHT}) AS rank
+            FROM papers_fts
+            JOIN papers p ON p.id = papers_fts.rowid
+            WHERE {" AND ".join(conditions)}
+            ORDER BY rank
+            LIMIT ?
+        """, params + [top_k])
+        # bm25() 返回负数，越小越相关，这里取反
+        results = [(row["arxiv_id"], -row["rank"]) for row in cursor.fetchall()]
+    except sqlite3.OperationalError as e:
+        logger.warning(f"BM25 检索失败（papers_fts 不可用），跳过关键词检索: {e}")
+        return []
+    finally:
+        conn.close()
+
+    logger.info(f"BM25 检索找到 {len(results)} 篇论文（检索词 {len(terms)} 个）")
+    return results
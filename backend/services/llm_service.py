@@ -7,10 +7,13 @@ import json
 import re
 import random
 import time
+from collections import OrderedDict
 from typing import Dict, List, Optional
 import httpx
 import asyncio
 
+from services.embedding_cache import normalize_query
+
 logger = logging.getLogger(__name__)
 
 class LLMService:
@@ -24,6 +27,9 @@ class LLMService:
             headers={"Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json"}
         )
+        # 查询扩展结果的进程内 LRU 缓存（键为规范化后的需求文本）；快速匹配只读这个缓存，不调用 LLM
+        self.expansion_cache_size = int(os.getenv("QUERY_EXPANSION_CACHE_SIZE", "1024"))
+        self._expansion_cache: "OrderedDict[str, str]" = OrderedDict()
 
     async def close(self):
         await self.client.aclose()
@@ -206,11 +212,70 @@ class LLMService:
             # 去除可能产生的换行符，保证是一行
             content = content.replace("\n", " ").strip()
             logger.info(f"查询扩展(v2): {user_requirement}... -> {content}...")
+            self._remember_expansion(user_requirement, content)
             return content
         except Exception as e:
             logger.warning(f"查询扩展失败: {e}")
             return user_requirement
 
+    def _remember_expansion(self, user_requirement: str, expanded_query: str) -> None:
+        """缓存查询扩展结果（扩展失败时返回的原始需求不会走到这里）"""
+        if self.expansion_cache_size <= 0 or not expanded_query:
+            return
+        key = normalize_query(user_requirement)
+        self._expansion_cache[key] = expanded_query
+        self._expansion_cache.move_to_end(key)
+        while len(self._expansion_cache) > self.expansion_cache_size:
+            self._expansion_cache.popitem(last=False)
+
+    def get_cached_expansion(self, user_requirement: str) -> Optional[str]:
+        """读取已缓存的查询扩展结果（不调用 LLM），没有时返回 None"""
+        key = normalize_query(user_requirement)
+        expanded_query = self._expansion_cache.get(key)
+        if expanded_query is not None:
+            self._expansion_cache.move_to_end(key)
+        return expanded_query
+
+    @staticmethod
+    def parse_expanded_query(expanded_query: str, max_keywords: int = 8) -> Optional[Dict]:
+        """
+        解析 expand_query 的结果 "[Keywords]: ... [Context]: ..."
+        返回: {"keywords": [技术术语, ...], "context": Context 段落}，格式不符时返回 None
+        """
+        match = re.search(r"\[Keywords\]\s*[:：]\s*(.*?)\s*\[Context\]\s*[:：]\s*(.*)", expanded_query or "", re.S)
+        if not match:
+            return None
+        keywords = [k.strip(" .。") for k in re.split(r"[,，、;；]", match.group(1))]
+        return {
+            "keywords": [k for k in keywords if k][:max_keywords],
+            "context": match.group(2).strip()
+        }
+
+    @staticmethod
+    def split_expanded_query(user_requirement: str, expanded_query: str, max_keywords: int = 8) -> List[str]:
+        """
+        将 expand_query 的结果拆分为多路检索文本：原始需求、每个技术术语、[Context] 段落
+        扩展结果不符合 "[Keywords]: ... [Context]: ..." 格式时，返回原始需求和整段扩展文本
+        返回: 去重后的查询文本列表（原始需求在第一位）
+        """
+        queries = [user_requirement]
+        parsed = LLMService.parse_expanded_query(expanded_query, max_keywords=max_keywords)
+        if parsed:
+            queries.extend(parsed["keywords"])
+            if parsed["context"]:
+                queries.append(parsed["context"])
+        elif expanded_query:
+            queries.append(expanded_query)
+
+        seen = set()
+        unique = []
+        for query in queries:
+            key = query.strip().lower()
+            if key and key not in seen:
+                seen.add(key)
+                unique.append(query.strip())
+        return unique
+
     async def score_paper(self, user_requirement: str, paper_title: str, paper_abstract: str) -> Dict:
         """
         [精排优化] 专家级评分
@@ -205,7 +205,7 @@ def create_matching_graph():
         """向量检索节点"""
         from services.vector_service import get_vector_service
         vector_service = get_vector_service()
-        results = vector_service.search_similar(state["expanded_query"], top_k=50)
+        results = await vector_service.asearch_similar(state["expanded_query"], top_k=50)
         return {"vector_results": results}
     
     # 节点 3: Data Hydration
@@ -1,5 +1,6 @@
 """
 匹配服务 - 整合 Query Expansion + Vector Search + LLM Re-ranking
+快速匹配（match_fast）只做向量检索，不调用 LLM，用于自动补全、看板组件等需要毫秒级响应的场景
 """
 import asyncio
 import logging
@@ -7,13 +8,29 @@ import json
 import time
 import re
 import math
-from typing import List, Dict, Tuple
+import os
+import threading
+from collections import deque
+from typing import List, Dict, Tuple, Optional
 from database.database import get_db_connection
 from services.vector_service import get_vector_service
 from services.llm_service import get_llm_service
+from services.keyword_search import extract_keyword_terms, search_papers_bm25
+from services.candidate_dedup import CANDIDATE_DEDUP, collapse_near_duplicates
 
 logger = logging.getLogger(__name__)
 
+# 多查询检索：把查询扩展结果拆成 原始需求 / 各技术术语 / Context 段落 多路检索后用 RRF 融合；
+# 设为 false 时退回为整段扩展文本的单路检索
+MULTI_QUERY_SEARCH = os.getenv("MULTI_QUERY_SEARCH", "true").lower() == "true"
+# 混合检索：用查询扩展的技术术语做 BM25 检索（SQLite FTS5），与向量检索结果融合
+HYBRID_SEARCH = os.getenv("HYBRID_SEARCH", "true").lower() == "true"
+# 快速匹配的延迟预算（毫秒）：超出时记录告警并计入 over_budget；统计最近 FAST_MATCH_METRICS_WINDOW 次请求
+FAST_MATCH_BUDGET_MS = float(os.getenv("FAST_MATCH_BUDGET_MS", "100"))
+FAST_MATCH_METRICS_WINDOW = int(os.getenv("FAST_MATCH_METRICS_WINDOW", "1000"))
+# 快速匹配结果的标签（分数是向量相似度 × 100，与 LLM 评分的 S/A/B/C 等级不可比）
+FAST_MATCH_LABEL = "快速匹配（向量）"
+
 # 常见技术词汇列表（用于检测输入是否有意义）
 COMMON_TECH_WORDS = {
     'ai', 'ml', 'dl', 'nlp', 'cv', 'llm', 'transformer', 'cnn', 'rnn', 'lstm',
@@ -29,6 +46,83 @@ COMMON_TECH_WORDS = {
     'transfer', 'few-shot', 'zero-shot', 'multimodal', 'fusion'
 }
 
+def _build_search_queries(llm_service, user_requirement: str, expanded_query: str) -> List[str]:
+    """根据查询扩展结果生成向量检索使用的查询文本列表"""
+    if not MULTI_QUERY_SEARCH:
+        return [expanded_query]
+    return llm_service.split_expanded_query(user_requirement, expanded_query)
+
+def _build_keyword_terms(llm_service, user_requirement: str, expanded_query: str) -> List[str]:
+    """根据查询扩展结果生成 BM25 检索词（关闭混合检索时为空）"""
+    if not HYBRID_SEARCH:
+        return []
+    parsed = llm_service.parse_expanded_query(expanded_query)
+    return extract_keyword_terms(user_requirement, parsed["keywords"] if parsed else None)
+
+def _paper_channel_searches(vector_service, search_queries: List[str], keyword_terms: List[str], top_k: int,
+                            filters: Optional[Dict], chunk_search: bool, chunk_pooling: str) -> list:
+    """
+    论文向量检索之外的召回通道（与向量检索并发执行）：
+    - BM25 关键词检索（有检索词时）
+    - 全文分块检索，分块命中按 chunk_pooling 聚合到论文（chunk_search=True 时）
+    """
+    searches = []
+    if keyword_terms:
+        searches.append(asyncio.to_thread(search_papers_bm25, keyword_terms, top_k, **(filters or {})))
+    if chunk_search:
+        where = vector_service.build_where(**(filters or {}))
+        searches.append(vector_service.asearch_chunks(search_queries, top_k=top_k, where=where, pooling=chunk_pooling))
+    return searches
+
+async def _fuse_paper_channels(vector_service, search_queries: List[str], vector_items: List[Tuple[str, float]],
+                               channel_results: List[List[Tuple[str, float]]], top_k: int) -> List[Tuple[str, float]]:
+    """
+    向量检索结果与其他召回通道（BM25 / 全文分块）的结果做 RRF 融合
+    只由其他通道命中的论文补算论文级向量相似度作为 vector_score（尚未向量化的论文为 0）
+    """
+    channel_results = [items for items in channel_results if items]
+    if not channel_results:
+        return vector_items
+    fused = vector_service.reciprocal_rank_fusion(
+        [vector_items] + [[(pid, None) for pid, _ in items] for items in channel_results], top_k
+    )
+    channel_only = [pid for pid, score in fused if score is None]
+    if channel_only:
+        scores = await vector_service.asimilarity_to_ids(search_queries, channel_only)
+        fused = [(pid, scores.get(pid, 0.0) if score is None else score) for pid, score in fused]
+    logger.info(f"多通道融合：向量 {len(vector_items)} 篇 + 其他通道 {[len(items) for items in channel_results]} 篇，"
+                f"融合后 {len(fused)} 篇（其中仅其他通道命中 {len(channel_only)} 篇）")
+    return fused
+
+async def _collapse_candidates(vector_service, items: List[Dict]) -> List[Dict]:
+    """
+    LLM 精排前折叠近似重复的论文候选（见 candidate_dedup），只有各簇代表交给 LLM，其余放在代表的 related 中
+    成果不参与折叠；去重失败时原样返回，不影响匹配
+    """
+    def _is_paper(item: Dict) -> bool:
+        return item.get("item_type", "paper") == "paper"
+
+    papers = [item for item in items if _is_paper(item)]
+    if CANDIDATE_DEDUP == "none" or len(papers) < 2:
+        return items
+    try:
+        vectors = None
+        if CANDIDATE_DEDUP == "cosine":
+            vectors = await vector_service.aget_embeddings([item["paper_id"] for item in papers])
+        representatives = {
+            item["paper_id"]: item
+            for item in collapse_near_duplicates(papers, mode=CANDIDATE_DEDUP, vectors=vectors)
+        }
+    except Exception as e:
+        logger.warning(f"候选去重失败，跳过: {e}")
+        return items
+    # 代表保持原排名，被折叠的论文从候选中移除，成果原样保留
+    return [
+        representatives[item["paper_id"]] if _is_paper(item) else item
+        for item in items
+        if not _is_paper(item) or item["paper_id"] in representatives
+    ]
+
 def validate_user_input(text: str) -> Tuple[bool, str]:
     """
     检测用户输入是否有意义（快速规则检测）
@@ -113,7 +207,15 @@ def validate_user_input(text: str) -> Tuple[bool, str]:
     # 如果通过所有检测，认为输入有意义
     return True, ""
 
-async def match_papers(user_requirement: str, top_k: int = 50) -> List[Dict]:
+async def match_papers(user_requirement: str, top_k: int = 50, filters: Optional[Dict] = None,
+                       chunk_search: bool = False, chunk_pooling: str = "max") -> List[Dict]:
+    """
+    匹配论文
+    filters: 可选的论文过滤条件 {"categories": [...], "date_from": "YYYY-MM-DD", "date_to": "YYYY-MM-DD"}，
+             在向量检索内部执行，返回的仍是 top_k 篇满足条件的论文
+    chunk_search: 同时检索论文全文分块（只覆盖解析过 PDF 的论文），分块命中聚合到论文后与摘要检索结果融合
+    chunk_pooling: 分块聚合方式 max / sum
+    """
     try:
         start_time = time.time()
         llm_service = get_llm_service()
@@ -143,9 +245,21 @@ async def match_papers(user_requirement: str, top_k: int = 50) -> List[Dict]:
         # 步骤 2: 向量搜索 (Coarse Ranking)
         # ---------------------------------------------------------
         # 使用扩展后的 query 去搜索，但保留原始 query 用于后续 LLM 评分
-        logger.info(f"使用增强Query进行向量搜索...")
+        # 原始需求、各技术术语、Context 段落批量编码后在一次向量查询中检索，RRF 融合后再交给 LLM 精排
+        # 同时用技术术语做 BM25 关键词检索（缩写、模型名等向量模型不擅长的词），两路结果融合
+        search_queries = _build_search_queries(llm_service, user_requirement, expanded_query)
+        keyword_terms = _build_keyword_terms(llm_service, user_requirement, expanded_query)
+        logger.info(f"使用增强Query进行向量搜索（{len(search_queries)} 路查询，{len(keyword_terms)} 个关键词）...")
         coarse_start_time = time.time()
-        similar_papers = vector_service.search_similar(expanded_query, top_k=top_k)
+        where = vector_service.build_where(**(filters or {}))
+        similar_papers, *channel_results = await asyncio.gather(
+            vector_service.asearch_similar(search_queries, top_k=top_k, where=where),
+            *_paper_channel_searches(vector_service, search_queries, keyword_terms, top_k,
+                                     filters, chunk_search, chunk_pooling)
+        )
+        similar_papers = await _fuse_paper_channels(
+            vector_service, search_queries, similar_papers, channel_results, top_k
+        )
         coarse_elapsed = time.time() - coarse_start_time
         
         if not similar_papers:
@@ -156,8 +270,8 @@ async def match_papers(user_requirement: str, top_k: int = 50) -> List[Dict]:
         # ---------------------------------------------------------
         # 步骤 3: 数据填充 (Hydration) - 使用线程池执行，避免阻塞事件循环
         # ---------------------------------------------------------
-        # 过滤掉成果ID（achievement_* 前缀），只处理论文
-        paper_ids = [p[0] for p in similar_papers if not p[0].startswith("achievement_")]
+        # 成果在独立的 achievements 集合中，论文集合的检索结果都是论文
+        paper_ids = [p[0] for p in similar_papers]
         
         if not paper_ids:
             return []
@@ -179,14 +293,10 @@ async def match_papers(user_requirement: str, top_k: int = 50) -> List[Dict]:
         rows = await asyncio.to_thread(fetch_papers_from_db, paper_ids)
 
         # 构建详细列表，保持向量搜索的顺序（因为 SQL 返回顺序是不定的）
-        # 只处理论文ID，过滤掉成果ID
         row_dict = {row["arxiv_id"]: row for row in rows}
         paper_details = []
         
         for pid, vec_score in similar_papers:
-            # 跳过成果ID
-            if pid.startswith("achievement_"):
-                continue
             if pid in row_dict:
                 row = row_dict[pid]
                 paper_details.append({
@@ -202,10 +312,14 @@ async def match_papers(user_requirement: str, top_k: int = 50) -> List[Dict]:
         # ---------------------------------------------------------
         # 步骤 4: 防御性排序
         # ---------------------------------------------------------
-        # 虽然 similar_papers 通常是有序的，但为了防止上游（VectorService）乱序，
-        # 或者 row_dict 处理过程中出现的意外，
-        # 这里显式地按 vector_score 从大到小再排一次，确保万无一失。
-        paper_details.sort(key=lambda x: x["vector_score"], reverse=True)
+        # 虽然 similar_papers 通常是有序的，但为了防止 row_dict 处理过程中出现的意外，
+        # 这里显式地按向量检索（多路融合）的排名再排一次，确保万无一失。
+        # 注意不能按 vector_score 排序：多路检索时 vector_score 是各路中的最高相似度，顺序以 RRF 排名为准，
+        # 而 LLM 只精排排在最前面的候选。
+        fused_rank = {pid: rank for rank, (pid, _) in enumerate(similar_papers)}
+        paper_details.sort(key=lambda x: fused_rank[x["paper_id"]])
+        # 折叠近似重复的候选（同一工作的多个版本等），LLM 精排名额留给不同的论文
+        paper_details = await _collapse_candidates(vector_service, paper_details)
         # ---------------------------------------------------------
         # 步骤 5: LLM 精排 (Re-ranking)
         # ---------------------------------------------------------
@@ -291,9 +405,96 @@ def _normalize_for_llm(items: List[Dict]) -> List[Dict]:
             })
     return normalized
 
-async def match_all(user_requirement: str, top_k: int = 50) -> List[Dict]:
+def _fetch_items_from_db(paper_ids: List[str], achievement_ids: List[int]):
+    """从数据库批量获取论文和成果详细信息（同步函数，在线程池中执行）"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    papers = []
+    achievements = []
+    
+    # 查询论文
+    if paper_ids:
+        placeholders = ','.join(['?'] * len(paper_ids))
+        query = f"SELECT * FROM papers WHERE arxiv_id IN ({placeholders})"
+        cursor.execute(query, paper_ids)
+        papers = cursor.fetchall()
+    
+    # 查询成果
+    if achievement_ids:
+        placeholders = ','.join(['?'] * len(achievement_ids))
+        query = f"SELECT * FROM published_achievements WHERE id IN ({placeholders}) AND status = 'published'"
+        cursor.execute(query, achievement_ids)
+        achievements = cursor.fetchall()
+    
+    conn.close()
+    return papers, achievements
+
+def _build_item_details(similar_items: List[Tuple[str, float]], papers_rows, achievements_rows) -> List[Dict]:
+    """按向量检索结果的顺序构建论文和成果的统一格式详细列表（带 item_type 标记）"""
+    # 构建映射表（转换为字典，方便使用 .get() 方法）
+    paper_dict = {row["arxiv_id"]: dict(row) for row in papers_rows}
+    achievement_dict = {row["id"]: dict(row) for row in achievements_rows}
+    
+    all_details = []
+    
+    # 处理向量搜索结果，保持顺序
+    for vid, vec_score in similar_items:
+        if vid.startswith("achievement_"):
+            # 处理成果
+            try:
+                achievement_id = int(vid.replace("achievement_", ""))
+                if achievement_id in achievement_dict:
+                    row = achievement_dict[achievement_id]
+                    # 解析 JSON 字段
+                    cooperation_mode = []
+                    if row.get('cooperation_mode'):
+                        try:
+                            cooperation_mode = json.loads(row['cooperation_mode'])
+                        except:
+                            pass
+                    
+                    all_details.append({
+                        "item_type": "achievement",
+                        "achievement_id": achievement_id,
+                        "name": row.get("name", ""),
+                        "description": row.get("description", ""),
+                        "application": row.get("application"),
+                        "field": row.get("field"),
+                        "cooperation_mode": cooperation_mode,
+                        "contact_name": row.get("contact_name"),
+                        "contact_phone": row.get("contact_phone"),
+                        "contact_email": row.get("contact_email"),
+                        "pdf_url": None,  # 成果没有 PDF
+                        "vector_score": vec_score
+                    })
+            except ValueError:
+                logger.warning(f"无法解析成果ID: {vid}")
+        else:
+            # 处理论文
+            if vid in paper_dict:
+                row = paper_dict[vid]
+                all_details.append({
+                    "item_type": "paper",
+                    "paper_id": vid,
+                    "title": row.get("title", ""),
+                    "abstract": row.get("abstract", ""),
+                    "authors": row.get("authors", ""),
+                    "published_date": row.get("published_date"),
+                    "categories": row.get("categories"),
+                    "pdf_url": row.get("pdf_url"),
+                    "vector_score": vec_score
+                })
+    return all_details
+
+async def match_all(user_requirement: str, top_k: int = 50, filters: Optional[Dict] = None,
+                    item_types: Optional[List[str]] = None, chunk_search: bool = False,
+                    chunk_pooling: str = "max") -> List[Dict]:
     """
     统一匹配论文和成果
+    filters: 论文过滤条件（同 match_papers，只作用于论文）
+    item_types: 参与匹配的条目类型，默认 ["paper", "achievement"]
+    chunk_search / chunk_pooling: 论文全文分块检索（同 match_papers）
     返回混合结果，包含 item_type 标记
     """
     try:
@@ -323,9 +524,37 @@ async def match_all(user_requirement: str, top_k: int = 50) -> List[Dict]:
         # ---------------------------------------------------------
         # 步骤 2: 向量搜索 (Coarse Ranking) - 返回论文和成果的混合结果
         # ---------------------------------------------------------
-        logger.info(f"使用增强Query进行向量搜索（包含论文和成果）...")
+        search_queries = _build_search_queries(llm_service, user_requirement, expanded_query)
+        item_types = item_types or ["paper", "achievement"]
+        keyword_terms = _build_keyword_terms(llm_service, user_requirement, expanded_query) if "paper" in item_types else []
+        logger.info(f"使用增强Query进行向量搜索（包含论文和成果，{len(search_queries)} 路查询，{len(keyword_terms)} 个关键词）...")
         coarse_start_time = time.time()
-        similar_items = vector_service.search_similar(expanded_query, top_k=top_k)
+        # 先批量编码查询向量，两个集合的检索都直接命中查询向量缓存
+        await vector_service.aembed_queries(search_queries)
+        searches = []
+        if "paper" in item_types:
+            where = vector_service.build_where(**(filters or {}))
+            searches.append(vector_service.asearch_ranked_lists(search_queries, top_k=top_k, where=where))
+        if "achievement" in item_types:
+            searches.append(vector_service.asearch_ranked_lists(search_queries, top_k=top_k, item_type="achievement"))
+        # BM25 关键词检索、全文分块检索只作用于论文，与向量检索并发执行
+        channels = _paper_channel_searches(vector_service, search_queries, keyword_terms, top_k, filters,
+                                           chunk_search and "paper" in item_types, chunk_pooling)
+        # 论文和成果集合并发检索；每路查询先把两个集合的结果按相似度合并，再对各路做 RRF 融合取 top_k
+        results = await asyncio.gather(*searches, *channels)
+        search_results, channel_results = results[:len(searches)], results[len(searches):]
+        merged_lists = [
+            sorted(
+                [item for ranked_lists in search_results for item in ranked_lists[i]],
+                key=lambda item: item[1],
+                reverse=True
+            )[:top_k]
+            for i in range(len(search_queries))
+        ]
+        similar_items = vector_service.reciprocal_rank_fusion(merged_lists, top_k)
+        similar_items = await _fuse_paper_channels(
+            vector_service, search_queries, similar_items, channel_results, top_k
+        )
         coarse_elapsed = time.time() - coarse_start_time
         
         if not similar_items:
@@ -343,96 +572,24 @@ async def match_all(user_requirement: str, top_k: int = 50) -> List[Dict]:
         # ---------------------------------------------------------
         # 步骤 4: 数据填充 (Hydration) - 分别查询两个表
         # ---------------------------------------------------------
-        def fetch_data_from_db(paper_ids: List[str], achievement_ids: List[int]):
-            """从数据库批量获取论文和成果详细信息（同步函数，在线程池中执行）"""
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            
-            papers = []
-            achievements = []
-            
-            # 查询论文
-            if paper_ids:
-                placeholders = ','.join(['?'] * len(paper_ids))
-                query = f"SELECT * FROM papers WHERE arxiv_id IN ({placeholders})"
-                cursor.execute(query, paper_ids)
-                papers = cursor.fetchall()
-            
-            # 查询成果
-            if achievement_ids:
-                placeholders = ','.join(['?'] * len(achievement_ids))
-                query = f"SELECT * FROM published_achievements WHERE id IN ({placeholders}) AND status = 'published'"
-                cursor.execute(query, achievement_ids)
-                achievements = cursor.fetchall()
-            
-            conn.close()
-            return papers, achievements
-        
         papers_rows, achievements_rows = await asyncio.to_thread(
-            fetch_data_from_db, paper_ids, achievement_ids
+            _fetch_items_from_db, paper_ids, achievement_ids
         )
 
         # ---------------------------------------------------------
         # 步骤 5: 构建统一格式的详细列表
         # ---------------------------------------------------------
-        # 构建映射表（转换为字典，方便使用 .get() 方法）
-        paper_dict = {row["arxiv_id"]: dict(row) for row in papers_rows}
-        achievement_dict = {row["id"]: dict(row) for row in achievements_rows}
-        
-        all_details = []
-        
-        # 处理向量搜索结果，保持顺序
-        for vid, vec_score in similar_items:
-            if vid.startswith("achievement_"):
-                # 处理成果
-                try:
-                    achievement_id = int(vid.replace("achievement_", ""))
-                    if achievement_id in achievement_dict:
-                        row = achievement_dict[achievement_id]
-                        # 解析 JSON 字段
-                        cooperation_mode = []
-                        if row.get('cooperation_mode'):
-                            try:
-                                cooperation_mode = json.loads(row['cooperation_mode'])
-                            except:
-                                pass
-                        
-                        all_details.append({
-                            "item_type": "achievement",
-                            "achievement_id": achievement_id,
-                            "name": row.get("name", ""),
-                            "description": row.get("description", ""),
-                            "application": row.get("application"),
-                            "field": row.get("field"),
-                            "cooperation_mode": cooperation_mode,
-                            "contact_name": row.get("contact_name"),
-                            "contact_phone": row.get("contact_phone"),
-                            "contact_email": row.get("contact_email"),
-                            "pdf_url": None,  # 成果没有 PDF
-                            "vector_score": vec_score
-                        })
-                except ValueError:
-                    logger.warning(f"无法解析成果ID: {vid}")
-            else:
-                # 处理论文
-                if vid in paper_dict:
-                    row = paper_dict[vid]
-                    all_details.append({
-                        "item_type": "paper",
-                        "paper_id": vid,
-                        "title": row.get("title", ""),
-                        "abstract": row.get("abstract", ""),
-                        "authors": row.get("authors", ""),
-                        "published_date": row.get("published_date"),
-                        "categories": row.get("categories"),
-                        "pdf_url": row.get("pdf_url"),
-                        "vector_score": vec_score
-                    })
+        all_details = _build_item_details(similar_items, papers_rows, achievements_rows)
         
         # ---------------------------------------------------------
-        # 步骤 6: 防御性排序
+        # 步骤 6: 防御性排序（按向量检索的融合排名，同 match_papers）
         # ---------------------------------------------------------
-        all_details.sort(key=lambda x: x["vector_score"], reverse=True)
+        fused_rank = {vid: rank for rank, (vid, _) in enumerate(similar_items)}
+        all_details.sort(key=lambda x: fused_rank[
+            x["paper_id"] if x["item_type"] == "paper" else f"achievement_{x['achievement_id']}"
+        ])
+        # 折叠近似重复的论文候选（同 match_papers）
+        all_details = await _collapse_candidates(vector_service, all_details)
         
         # ---------------------------------------------------------
         # 步骤 7: LLM 精排 (Re-ranking) - 一起评分
@@ -482,4 +639,150 @@ async def match_all(user_requirement: str, top_k: int = 50) -> List[Dict]:
 
     except Exception as e:
         logger.error(f"统一匹配流程异常: {str(e)}")
-        raise
\ No newline at end of file
+        raise
+
+class FastMatchMetrics:
+    """
+    快速匹配的延迟统计（线程安全）
+    累计请求数、超出预算次数、查询扩展缓存命中次数，并保留最近 window 次请求各阶段的耗时用于计算分位数
+    """
+
+    STAGES = ("embed", "search", "hydrate", "total")
+
+    def __init__(self, budget_ms: float = FAST_MATCH_BUDGET_MS, window: int = FAST_MATCH_METRICS_WINDOW):
+        self.budget_ms = budget_ms
+        self._samples = {stage: deque(maxlen=max(window, 1)) for stage in self.STAGES}
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.over_budget = 0
+        self.expansion_hits = 0
+        self.empty_results = 0
+
+    def record(self, timings: Dict[str, float], expansion_hit: bool, result_count: int) -> None:
+        with self._lock:
+            self.requests += 1
+            self.over_budget += timings["total"] > self.budget_ms
+            self.expansion_hits += expansion_hit
+            self.empty_results += result_count == 0
+            for stage in self.STAGES:
+                if stage in timings:
+                    self._samples[stage].append(timings[stage])
+
+    @staticmethod
+    def _percentiles(samples) -> Dict:
+        if not samples:
+            return {"p50": None, "p95": None, "p99": None, "max": None}
+        ordered = sorted(samples)
+
+        def pick(q: float) -> float:
+            return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 2)
+
+        return {"p50": pick(0.5), "p95": pick(0.95), "p99": pick(0.99), "max": round(ordered[-1], 2)}
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "budget_ms": self.budget_ms,
+                "requests": self.requests,
+                "over_budget": self.over_budget,
+                "over_budget_rate": round(self.over_budget / self.requests, 4) if self.requests else 0.0,
+                "expansion_cache_hits": self.expansion_hits,
+                "empty_results": self.empty_results,
+                "window": len(self._samples["total"]),
+                # 最近 window 次请求各阶段耗时（毫秒）
+                "latency_ms": {stage: self._percentiles(self._samples[stage]) for stage in self.STAGES}
+            }
+
+
+fast_match_metrics = FastMatchMetrics()
+
+
+async def match_fast(user_requirement: str, top_k: int = 50, filters: Optional[Dict] = None,
+                     item_types: Optional[List[str]] = None) -> List[Dict]:
+    """
+    快速匹配：只用向量检索，不调用 LLM（跳过查询扩展和 LLM 精排）
+    查询文本为原始需求；同一需求之前走过完整匹配时，复用缓存的查询扩展结果做多路检索（不会为此调用 LLM）
+    filters: 论文过滤条件（同 match_papers）
+    item_types: 参与匹配的条目类型，默认只匹配论文（/match-all 传 ["paper", "achievement"]）
+    返回按向量相似度排序的结果：score 为向量相似度 × 100，reason 为空，match_type 为 FAST_MATCH_LABEL
+    各阶段耗时记入 fast_match_metrics
+    """
+    start_time = time.perf_counter()
+    timings: Dict[str, float] = {}
+    expansion_hit = False
+    results: List[Dict] = []
+    try:
+        is_valid, reason = validate_user_input(user_requirement)
+        if not is_valid:
+            logger.warning(f"输入质量检测失败: {reason}, 输入: {user_requirement[:50]}...")
+            return results
+
+        llm_service = get_llm_service()
+        vector_service = get_vector_service()
+        expanded_query = llm_service.get_cached_expansion(user_requirement)
+        if expanded_query and expanded_query.strip().upper() == "[INVALID_INPUT]":
+            return results
+        expansion_hit = expanded_query is not None
+        search_queries = (
+            _build_search_queries(llm_service, user_requirement, expanded_query) if expansion_hit
+            else [user_requirement]
+        )
+
+        # 查询向量（命中查询向量缓存时不经过模型）
+        stage_start = time.perf_counter()
+        await vector_service.aembed_queries(search_queries)
+        timings["embed"] = (time.perf_counter() - stage_start) * 1000
+
+        # 向量检索：各集合并发检索，每路查询先按相似度合并两个集合的结果，多路查询再做 RRF 融合
+        stage_start = time.perf_counter()
+        item_types = item_types or ["paper"]
+        searches = []
+        if "paper" in item_types:
+            where = vector_service.build_where(**(filters or {}))
+            searches.append(vector_service.asearch_ranked_lists(search_queries, top_k=top_k, where=where))
+        if "achievement" in item_types:
+            searches.append(vector_service.asearch_ranked_lists(search_queries, top_k=top_k, item_type="achievement"))
+        search_results = await asyncio.gather(*searches)
+        merged_lists = [
+            sorted(
+                [item for ranked_lists in search_results for item in ranked_lists[i]],
+                key=lambda item: item[1],
+                reverse=True
+            )[:top_k]
+            for i in range(len(search_queries))
+        ]
+        similar_items = (
+            merged_lists[0] if len(merged_lists) == 1
+            else vector_service.reciprocal_rank_fusion(merged_lists, top_k)
+        )
+        timings["search"] = (time.perf_counter() - stage_start) * 1000
+        if not similar_items:
+            return results
+
+        # 数据填充，按向量相似度排序（多路查询时为各路中的最高相似度）
+        stage_start = time.perf_counter()
+        paper_ids, achievement_ids = _classify_ids([item[0] for item in similar_items])
+        papers_rows, achievements_rows = await asyncio.to_thread(
+            _fetch_items_from_db, paper_ids, achievement_ids
+        )
+        details = _build_item_details(similar_items, papers_rows, achievements_rows)
+        details.sort(key=lambda item: item["vector_score"], reverse=True)
+        results = [
+            {
+                **item,
+                "score": round(item["vector_score"] * 100, 1),
+                "reason": "",
+                "match_type": FAST_MATCH_LABEL
+            }
+            for item in details
+        ]
+        timings["hydrate"] = (time.perf_counter() - stage_start) * 1000
+        return results
+    finally:
+        timings["total"] = (time.perf_counter() - start_time) * 1000
+        fast_match_metrics.record(timings, expansion_hit, len(results))
+        if timings["total"] > FAST_MATCH_BUDGET_MS:
+            logger.warning(
+                f"快速匹配超出延迟预算: {timings['total']:.1f}ms > {FAST_MATCH_BUDGET_MS:.0f}ms "
+                f"（{', '.join(f'{stage} {value:.1f}ms' for stage, value in timings.items() if stage != 'total')}）"
+            )
@@ -0,0 +1,268 @@
+"""
+本地模型目录 - 固定版本的 safetensors 模型，内存映射加载，多个进程共享同一份权重
+
+默认情况下 SentenceTransformer(模型名) 通过 Hugging Face 缓存解析模型，每个 uvicorn worker、
+ARQ worker、索引脚本各自在私有内存中持有一份权重。这里支持：
+
+- 固定的本地模型目录：EMBEDDING_MODEL_DIR（默认 backend/models/pinned/）下与模型名最后一段同名的目录，
+  由 scripts/pin_embedding_model.py 下载并以 safetensors 格式保存（附 pinned_model.json 记录文件校验和）；
+  EMBEDDING_MODEL 本身是本地目录时直接使用该目录
+- 内存映射加载（EMBEDDING_MMAP=true，默认）：模型结构加载后，把 Transformer 的参数替换为
+  直接指向 safetensors 文件的写时复制（MAP_PRIVATE）映射，权重页属于操作系统页缓存，
+  同一台机器上加载同一文件的进程共享一份物理内存；推理不写权重，不会产生私有副本
+- 离线时快速失败：HF_HUB_OFFLINE / TRANSFORMERS_OFFLINE / EMBEDDING_OFFLINE 任一为真时，
+  只从本地目录或 HF 缓存加载（local_files_only），找不到模型立即报错，不访问网络、不重试
+- 加载耗时和进程内存（RSS / PSS / 共享 / 私有）记录在 VectorService.model_load_stats 中，
+  /api/matching/vector-stats 返回，便于核对多个 worker 的实际内存占用
+"""
+import gc
+import hashlib
+import json
+import logging
+import mmap
+import os
+import struct
+import time
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PINNED_MODEL_DIR = Path(__file__).parent.parent / "models" / "pinned"
+PINNED_MANIFEST = "pinned_model.json"
+
+_TRUE_VALUES = ("1", "true", "yes", "on")
+
+# safetensors 头部的 dtype -> torch dtype 名称
+_SAFETENSORS_DTYPES = {
+    "F64": "float64", "F32": "float32", "F16": "float16", "BF16": "bfloat16",
+    "I64": "int64", "I32": "int32", "I16": "int16", "I8": "int8", "U8": "uint8", "BOOL": "bool",
+}
+
+
+def get_pinned_model_root() -> Path:
+    """固定模型目录：EMBEDDING_MODEL_DIR 环境变量，默认为 backend/models/pinned"""
+    return Path(os.getenv("EMBEDDING_MODEL_DIR") or DEFAULT_PINNED_MODEL_DIR)
+
+
+def pinned_dir_for(model_name: str, root: Optional[Path] = None) -> Path:
+    """模型名可能是 HF 名称（org/name）或本地路径，取最后一段作为目录名"""
+    return Path(root or get_pinned_model_root()) / Path(model_name.rstrip("/\\")).name
+
+
+def is_offline() -> bool:
+    return any(os.getenv(name, "").lower() in _TRUE_VALUES
+               for name in ("HF_HUB_OFFLINE", "TRANSFORMERS_OFFLINE", "EMBEDDING_OFFLINE"))
+
+
+def resolve_model_path(model_name: str) -> Optional[Path]:
+    """
+    本地模型目录：EMBEDDING_MODEL 本身是目录时为该目录，否则为固定模型目录下的同名目录
+    返回 None 表示没有本地目录（需要通过 HF 缓存 / 网络加载）
+    """
+    path = Path(model_name).expanduser()
+    if path.is_dir():
+        return path
+    pinned = pinned_dir_for(model_name)
+    if (pinned / "modules.json").exists():
+        return pinned
+    return None
+
+
+def process_memory() -> Dict[str, Optional[float]]:
+    """
+    当前进程的内存占用（MB）：
+    - rss：驻留内存（共享的页在每个进程中都会计入）
+    - pss：按共享进程数分摊后的内存，各进程 PSS 之和即实际占用的物理内存
+    - shared / private：共享页 / 私有页
+    读取 /proc/self/smaps_rollup（Linux）；其他平台只返回 rss 峰值
+    """
+    stats = {"rss_mb": None, "pss_mb": None, "shared_mb": None, "private_mb": None}
+    try:
+        values = {}
+        with open("/proc/self/smaps_rollup", "r") as f:
+            for line in f:
+                key, _, rest = line.partition(":")
+                if rest.strip().endswith("kB"):
+                    values[key] = int(rest.split()[0]) / 1024
+        stats["rss_mb"] = round(values["Rss"], 1)
+        stats["pss_mb"] = round(values["Pss"], 1)
+        stats["shared_mb"] = round(values.get("Shared_Clean", 0) + values.get("Shared_Dirty", 0), 1)
+        stats["private_mb"] = round(values.get("Private_Clean", 0) + values.get("Private_Dirty", 0), 1)
+    except (OSError, KeyError, ValueError):
+        try:
+            import resource
+            # Linux 单位为 KB，macOS 为字节
+            maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            stats["rss_mb"] = round(maxrss / (1024 * 1024 if os.uname().sysname == "Darwin" else 1024), 1)
+        except Exception:
+            pass
+    return stats
+
+
+def _mmap_safetensors(path: Path) -> Dict[str, object]:
+    """
+    以写时复制方式映射 safetensors 文件，返回 {参数名: 指向映射的 torch 张量}（不复制数据）
+    文件格式：8 字节小端头部长度 + JSON 头部（dtype / shape / data_offsets）+ 数据区
+    """
+    import torch
+
+    with open(path, "rb") as f:
+        header_size = struct.unpack("<Q", f.read(8))[0]
+        header = json.loads(f.read(header_size))
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+    data_start = 8 + header_size
+    tensors = {}
+    for name, info in header.items():
+        if name == "__metadata__":
+            continue
+        dtype_name = _SAFETENSORS_DTYPES.get(info["dtype"])
+        if dtype_name is None:
+            continue
+        dtype = getattr(torch, dtype_name)
+        begin, end = info["data_offsets"]
+        count = (end - begin) // torch.empty((), dtype=dtype).element_size()
+        if count == 0:
+            continue
+        # 张量持有 buffer 的引用，映射在参数释放前一直有效
+        tensors[name] = torch.frombuffer(buffer, dtype=dtype, count=count, offset=data_start + begin).view(info["shape"])
+    return tensors
+
+
+def map_weights(model, model_dir: Path) -> Dict[str, int]:
+    """
+    把 SentenceTransformer 第一个模块（Transformer）的参数替换为 safetensors 文件的内存映射
+    名称、形状、dtype 都一致的参数才替换，其余保留原样；原来的私有副本随后释放
+    返回: {"mapped": 替换的张量数, "total": 参数和缓冲区总数, "mapped_bytes": 映射的字节数}
+    """
+    files = sorted(Path(model_dir).glob("*.safetensors"))
+    transformer = model[0]
+    hf_model = getattr(transformer, "auto_model", None) or getattr(transformer, "model", None)
+    # 只映射 CPU 上的模型（GPU 上的权重在显存中，映射没有意义）
+    if not files or hf_model is None or next(hf_model.parameters()).device.type != "cpu":
+        return {"mapped": 0, "total": 0, "mapped_bytes": 0}
+
+    targets = dict(hf_model.named_parameters())
+    targets.update(dict(hf_model.named_buffers()))
+    prefix = f"{getattr(hf_model, 'base_model_prefix', '')}."
+    mapped, mapped_bytes = 0, 0
+    for path in files:
+        for name, tensor in _mmap_safetensors(path).items():
+            target = targets.get(name)
+            if target is None and name.startswith(prefix):
+                target = targets.get(name[len(prefix):])
+            if target is None or target.shape != tensor.shape or target.dtype != tensor.dtype:
+                continue
+            # 替换 .data 而不是重建 Parameter：共享（tied）的参数仍是同一个对象
+            target.data = tensor
+            mapped += 1
+            mapped_bytes += tensor.numel() * tensor.element_size()
+    gc.collect()
+    return {"mapped": mapped, "total": len(targets), "mapped_bytes": mapped_bytes}
+
+
+def load_sentence_transformer(model_name: str) -> Tuple[object, Dict]:
+    """
+    加载 SentenceTransformer 模型
+    优先使用本地模型目录；离线时只读本地文件，找不到立即抛出 RuntimeError；
+    EMBEDDING_MMAP=true（默认）且目录中有 safetensors 权重时把权重替换为内存映射
+    返回: (模型, 加载统计 {source, offline, mmap, mapped_mb, load_seconds, rss_mb, pss_mb, shared_mb, private_mb})
+    """
+    start_time = time.time()
+    offline = is_offline()
+    local_path = resolve_model_path(model_name)
+    source = str(local_path) if local_path else model_name
+    if offline and local_path is None:
+        logger.info(f"离线模式：{model_name} 没有本地模型目录，尝试从 HF 缓存加载（不访问网络）")
+
+    from sentence_transformers import SentenceTransformer
+    # 本地目录本身不会访问网络；离线且没有本地目录时只读 HF 缓存
+    kwargs = {"local_files_only": True} if offline and local_path is None else {}
+    try:
+        model = SentenceTransformer(source, **kwargs)
+    except Exception as e:
+        if offline or local_path is not None:
+            raise RuntimeError(
+                f"无法从本地加载向量模型 {model_name}（{source}）：{e}。"
+                f"请先在可以联网的环境中运行 python scripts/pin_embedding_model.py --model {model_name}，"
+                f"并把 {pinned_dir_for(model_name)} 复制到部署机器（或设置 EMBEDDING_MODEL_DIR）"
+            ) from e
+        raise
+
+    mapped = {"mapped": 0, "total": 0, "mapped_bytes": 0}
+    use_mmap = os.getenv("EMBEDDING_MMAP", "true").lower() in _TRUE_VALUES
+    if use_mmap and local_path is not None:
+        try:
+            mapped = map_weights(model, local_path)
+        except Exception as e:
+            logger.warning(f"权重内存映射失败，使用普通加载的权重: {e}")
+
+    stats = {
+        "source": source,
+        "offline": offline,
+        "mmap": mapped["mapped"] > 0,
+        "mapped_tensors": mapped["mapped"],
+        "mapped_mb": round(mapped["mapped_bytes"] / (1024 * 1024), 1),
+        "load_seconds": round(time.time() - start_time, 2),
+        **process_memory()
+    }
+    if use_mmap and local_path is not None and mapped["mapped"] < mapped["total"]:
+        logger.info(f"内存映射了 {mapped['mapped']}/{mapped['total']} 个权重张量（其余与文件中的名称/形状/精度不一致）")
+    return model, stats
+
+
+def _sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def pin_model(model_name: str, root: Optional[Path] = None) -> Path:
+    """
+    下载模型并以 safetensors 格式保存到固定模型目录，写入 pinned_model.json（文件大小和 sha256）
+    返回: 模型目录
+    """
+    from sentence_transformers import SentenceTransformer
+    import sentence_transformers
+
+    target = pinned_dir_for(model_name, root)
+    logger.info(f"开始固定向量模型: {model_name} -> {target}")
+    model = SentenceTransformer(model_name, device="cpu")
+    target.mkdir(parents=True, exist_ok=True)
+    model.save(str(target), safe_serialization=True)
+
+    files = {}
+    for path in sorted(p for p in target.rglob("*") if p.is_file() and p.name != PINNED_MANIFEST):
+        files[str(path.relative_to(target))] = {"size": path.stat().st_size, "sha256": _sha256(path)}
+    manifest = {
+        "model_name": model_name,
+        "sentence_transformers": sentence_transformers.__version__,
+        "pinned_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "files": files
+    }
+    (target / PINNED_MANIFEST).write_text(json.dumps(manifest, ensure_ascii=False, indent=2), encoding="utf-8")
+    logger.info(f"向量模型已固定: {target}（{len(files)} 个文件）")
+    return target
+
+
+def verify_pinned_model(model_dir: Path) -> Dict[str, str]:
+    """
+    按 pinned_model.json 校验模型目录中的文件
+    返回: {文件名: 问题描述}，为空表示全部一致
+    """
+    manifest_path = Path(model_dir) / PINNED_MANIFEST
+    if not manifest_path.exists():
+        return {PINNED_MANIFEST: "缺少清单文件"}
+    manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+    problems = {}
+    for name, expected in manifest.get("files", {}).items():
+        path = Path(model_dir) / name
+        if not path.exists():
+            problems[name] = "文件不存在"
+        elif path.stat().st_size != expected["size"]:
+            problems[name] = "文件大小不一致"
+        elif _sha256(path) != expected["sha256"]:
+            problems[name] = "sha256 不一致"
+    return problems
@@ -0,0 +1,410 @@
+"""
+增量论文索引 - 按 SQLite 与 ChromaDB 的ID差集只向量化缺失的论文
+
+1. 分页读取论文集合中已有的全部ID（只读ID，不读向量）
+2. 流式读取 papers 表的 arxiv_id，与已有ID做差集，得到未索引的论文
+3. 按批读取缺失论文的标题/摘要，批量向量化并写入
+
+差集每次运行时重新计算，已写入的批次下次不会重复处理：
+任务中断（服务重启、手动停止、进程崩溃）后重新运行即可从断点继续。
+
+更换向量模型时，rebuild_embedding_version 用同样的差集方式把论文、需求、成果和全文分块
+写入一个新的向量版本（见 embedding_versions 模块），完成后原子切换。
+"""
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from database.database import get_db_connection
+from services.embedding_versions import VERSIONED_COLLECTIONS, VERSION_BUILDING, VERSION_FAILED, VERSION_READY
+from services.vector_consistency import ISSUE_ORPHANED, check_consistency
+from services.vector_service import VectorService, get_vector_service
+
+logger = logging.getLogger(__name__)
+
+# SQLite IN 查询每次的参数数量
+_QUERY_CHUNK_SIZE = 500
+
+
+def find_unindexed_paper_ids(vector_service: VectorService, page_size: int = 10000) -> Dict:
+    """
+    计算未索引的论文ID
+    返回: {"db_total": 数据库论文数, "indexed": 已索引数, "missing": [未索引的 arxiv_id，按入库时间倒序]}
+    """
+    indexed_ids = set()
+    for ids in vector_service.iter_ids(page_size=page_size):
+        indexed_ids.update(ids)
+
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT arxiv_id
+            FROM papers
+            WHERE arxiv_id IS NOT NULL
+            AND title IS NOT NULL
+            ORDER BY created_at DESC
+        """)
+        db_total = 0
+        missing = []
+        seen = set()
+        while True:
+            rows = cursor.fetchmany(page_size)
+            if not rows:
+                break
+            for row in rows:
+                paper_id = row[0]
+                if paper_id in seen:
+                    continue
+                seen.add(paper_id)
+                db_total += 1
+                if paper_id not in indexed_ids:
+                    missing.append(paper_id)
+    finally:
+        conn.close()
+
+    return {"db_total": db_total, "indexed": db_total - len(missing), "missing": missing}
+
+
+def _fetch_papers(paper_ids: List[str]) -> List[Dict]:
+    """按ID批量读取论文标题、摘要以及用于过滤的分类和发布日期"""
+    papers = []
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        for start in range(0, len(paper_ids), _QUERY_CHUNK_SIZE):
+            chunk = paper_ids[start:start + _QUERY_CHUNK_SIZE]
+            placeholders = ",".join(["?"] * len(chunk))
+            cursor.execute(
+                f"SELECT arxiv_id, title, abstract, categories, published_date FROM papers WHERE arxiv_id IN ({placeholders})",
+                chunk
+            )
+            papers.extend(dict(row) for row in cursor.fetchall())
+    finally:
+        conn.close()
+    return papers
+
+
+def index_missing_papers(
+    vector_service: Optional[VectorService] = None,
+    batch_size: int = 256,
+    page_size: int = 10000,
+    progress_callback: Optional[Callable[[Dict], None]] = None,
+    should_stop: Optional[Callable[[], bool]] = None
+) -> Dict[str, int]:
+    """
+    只向量化数据库中尚未索引的论文
+    batch_size: 每批读取、向量化并写入的论文数量
+    page_size: 读取ID时每页的数量
+    progress_callback: 每批完成后调用，参数为当前统计信息（包含 done 字段）
+    should_stop: 每批开始前调用，返回 True 时停止处理（下次运行从剩余论文继续）
+    返回: {"db_total", "indexed", "total", "added", "skipped", "error"}，total 为本次需要索引的论文数
+    """
+    vector_service = vector_service or get_vector_service()
+
+    diff = find_unindexed_paper_ids(vector_service, page_size=page_size)
+    missing = diff["missing"]
+    stats = {
+        "db_total": diff["db_total"],
+        "indexed": diff["indexed"],
+        "total": len(missing),
+        "added": 0,
+        "skipped": 0,
+        "error": 0
+    }
+    logger.info(f"数据库论文 {stats['db_total']} 篇，已索引 {stats['indexed']} 篇，待索引 {stats['total']} 篇")
+    if progress_callback:
+        progress_callback(dict(stats, done=0))
+
+    for start in range(0, len(missing), batch_size):
+        if should_stop and should_stop():
+            logger.info(f"收到停止请求，已索引 {stats['added']} 篇论文，剩余论文下次运行时继续")
+            break
+
+        chunk_ids = missing[start:start + batch_size]
+        papers = _fetch_papers(chunk_ids)
+        # 读取期间被删除的论文计为跳过
+        stats["skipped"] += len(chunk_ids) - len(papers)
+
+        # 差集已确认这些论文不在向量库中，直接写入，不再逐批检查是否存在
+        batch_stats = vector_service.add_papers_bulk(papers, batch_size=batch_size, skip_existing=False)
+        for key in ("added", "skipped", "error"):
+            stats[key] += batch_stats[key]
+
+        done = min(start + batch_size, len(missing))
+        logger.info(f"增量索引进度 {done}/{stats['total']} "
+                    f"(新增 {stats['added']}, 跳过 {stats['skipped']}, 失败 {stats['error']})")
+        if progress_callback:
+            progress_callback(dict(stats, done=done))
+
+    if stats["added"]:
+        # npy 压缩模式：行数达到阈值的集合在索引结束后训练 PQ 码本（写入路径上不训练）
+        vector_service.train_pending_pq()
+    return stats
+
+
+def backfill_paper_metadata(
+    vector_service: Optional[VectorService] = None,
+    batch_size: int = 1000,
+    page_size: int = 10000
+) -> int:
+    """
+    为已索引的论文补写过滤用的元数据（type / 分类 / 发布日期），不重新计算向量
+    旧版本索引的论文没有这些字段，按分类或日期过滤时会被排除
+    返回: 更新的论文数量
+    """
+    vector_service = vector_service or get_vector_service()
+
+    indexed_ids = []
+    for ids in vector_service.iter_ids(page_size=page_size):
+        indexed_ids.extend(ids)
+
+    updated = 0
+    for start in range(0, len(indexed_ids), batch_size):
+        papers = _fetch_papers(indexed_ids[start:start + batch_size])
+        if not papers:
+            continue
+        vector_service.collection.update(
+            ids=[paper["arxiv_id"] for paper in papers],
+            metadatas=[
+                VectorService._build_paper_metadata(
+                    paper["title"], paper["abstract"] or "", paper["categories"], paper["published_date"]
+                )
+                for paper in papers
+            ]
+        )
+        updated += len(papers)
+        logger.info(f"元数据补写进度 {min(start + batch_size, len(indexed_ids))}/{len(indexed_ids)}")
+
+    logger.info(f"元数据补写完成，共更新 {updated} 篇论文")
+    return updated
+
+
+def _fetch_paper_contents(paper_ids: List[str]) -> Dict[str, str]:
+    """按ID批量读取 PDF 解析文本（同一论文有多条缓存时取页数最多的一条）"""
+    contents = {}
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        for start in range(0, len(paper_ids), _QUERY_CHUNK_SIZE):
+            chunk = paper_ids[start:start + _QUERY_CHUNK_SIZE]
+            placeholders = ",".join(["?"] * len(chunk))
+            cursor.execute(
+                f"SELECT arxiv_id, content FROM paper_content_cache WHERE arxiv_id IN ({placeholders}) ORDER BY max_pages",
+                chunk
+            )
+            contents.update((row["arxiv_id"], row["content"]) for row in cursor.fetchall())
+    finally:
+        conn.close()
+    return contents
+
+
+async def aindex_paper_chunks(arxiv_id: str, content: str, vector_service: Optional[VectorService] = None) -> int:
+    """
+    将一篇论文的全文分块写入分块集合（PDFService 保存新解析内容后调用）
+    分类和发布日期从 papers 表读取，写入分块元数据用于过滤
+    返回: 写入的分块数量
+    """
+    vector_service = vector_service or get_vector_service()
+    papers = await asyncio.to_thread(_fetch_papers, [arxiv_id])
+    paper = papers[0] if papers else {}
+    return await vector_service.aadd_paper_chunks(
+        arxiv_id, content, categories=paper.get("categories"), published_date=paper.get("published_date")
+    )
+
+
+def index_missing_chunks(
+    vector_service: Optional[VectorService] = None,
+    batch_size: int = 32,
+    page_size: int = 10000,
+    should_stop: Optional[Callable[[], bool]] = None
+) -> Dict[str, int]:
+    """
+    为 paper_content_cache 中尚未分块索引的论文补建全文分块（按论文ID差集，中断后重新运行即可继续）
+    batch_size: 每批读取的论文数量（每篇论文的分块在一次 encode 调用中批量向量化）
+    返回: {"total": 待处理论文数, "papers": 成功论文数, "chunks": 写入分块数, "error": 失败论文数}
+    """
+    vector_service = vector_service or get_vector_service()
+
+    indexed = set()
+    for ids in vector_service.iter_ids(collection=vector_service.chunk_collection, page_size=page_size):
+        indexed.update(chunk_id.rsplit("#", 1)[0] for chunk_id in ids)
+
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT DISTINCT arxiv_id FROM paper_content_cache")
+        missing = [row[0] for row in cursor.fetchall() if row[0] not in indexed]
+    finally:
+        conn.close()
+
+    stats = {"total": len(missing), "papers": 0, "chunks": 0, "error": 0}
+    logger.info(f"已分块索引 {len(indexed)} 篇论文，待处理 {stats['total']} 篇")
+
+    for start in range(0, len(missing), batch_size):
+        if should_stop and should_stop():
+            logger.info(f"收到停止请求，已处理 {stats['papers']} 篇论文，剩余论文下次运行时继续")
+            break
+        chunk_ids = missing[start:start + batch_size]
+        contents = _fetch_paper_contents(chunk_ids)
+        papers = {paper["arxiv_id"]: paper for paper in _fetch_papers(chunk_ids)}
+        for arxiv_id, content in contents.items():
+            paper = papers.get(arxiv_id, {})
+            try:
+                stats["chunks"] += vector_service.add_paper_chunks(
+                    arxiv_id, content, categories=paper.get("categories"), published_date=paper.get("published_date")
+                )
+                stats["papers"] += 1
+            except Exception as e:
+                stats["error"] += 1
+                logger.error(f"论文 {arxiv_id} 全文分块索引失败: {e}")
+        logger.info(f"全文分块索引进度 {min(start + batch_size, len(missing))}/{stats['total']} "
+                    f"(论文 {stats['papers']}, 分块 {stats['chunks']}, 失败 {stats['error']})")
+
+    return stats
+
+
+def _index_missing_requirements(vector_service: VectorService, page_size: int = 10000) -> int:
+    """为需求集合补建 requirements 表（active）和 published_needs 表（published）中缺失的需求，返回新增数量"""
+    indexed = set()
+    for ids in vector_service.iter_ids(collection=vector_service.requirement_collection, page_size=page_size):
+        indexed.update(ids)
+
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT requirement_id, title, description, industry, pain_points
+            FROM requirements WHERE status = 'active'
+        """)
+        requirements = [dict(row) for row in cursor.fetchall() if row["requirement_id"] not in indexed]
+        cursor.execute("SELECT id, title, description, industry FROM published_needs WHERE status = 'published'")
+        needs = [dict(row) for row in cursor.fetchall() if f"published_need_{row['id']}" not in indexed]
+    finally:
+        conn.close()
+
+    added = 0
+    for row in requirements:
+        if vector_service.add_requirement(row["requirement_id"], row["title"] or "", row["description"] or "",
+                                          row["industry"] or "", row["pain_points"] or ""):
+            added += 1
+    for row in needs:
+        try:
+            if vector_service.add_published_need(row["id"], row["title"], row["description"] or "", row["industry"] or ""):
+                added += 1
+        except Exception as e:
+            logger.error(f"发布需求 {row['id']} 向量化失败: {e}")
+    return added
+
+
+def _index_missing_achievements(vector_service: VectorService, page_size: int = 10000) -> int:
+    """为成果集合补建 published_achievements 表（published）中缺失的成果，返回新增数量"""
+    indexed = set()
+    for ids in vector_service.iter_ids(collection=vector_service.achievement_collection, page_size=page_size):
+        indexed.update(ids)
+
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT id, name, description, application, field
+            FROM published_achievements WHERE status = 'published'
+        """)
+        achievements = [dict(row) for row in cursor.fetchall() if f"achievement_{row['id']}" not in indexed]
+    finally:
+        conn.close()
+
+    added = 0
+    for row in achievements:
+        try:
+            if vector_service.add_achievement(row["id"], row["name"], row["description"] or "",
+                                              row["application"], row["field"]):
+                added += 1
+        except Exception as e:
+            logger.error(f"成果 {row['id']} 向量化失败: {e}")
+    return added
+
+
+def rebuild_embedding_version(
+    model_name: str,
+    vector_service: Optional[VectorService] = None,
+    batch_size: int = 256,
+    activate: bool = True,
+    progress_callback: Optional[Callable[[Dict], None]] = None,
+    should_stop: Optional[Callable[[], bool]] = None
+) -> Dict:
+    """
+    用指定模型重建一个新的向量版本：论文、需求、成果、全文分块全部从 SQLite 重新向量化
+    重建期间当前版本照常提供检索和写入；第一轮完成后再补一轮重建期间新增的数据，然后切换
+    （activate=False 时只标记为 ready，之后通过 VectorService.activate_version 切换）
+    中断或失败后用同一模型再次调用会复用该版本，按ID差集从断点继续
+    progress_callback: 参数为当前统计信息（含 stage 字段：papers / requirements / achievements / chunks）
+    切换前删除新版本中 SQLite 已删除或失效的条目（重建期间发生的删除只作用于当前版本）
+    返回: {"version", "model", "status", "papers", "requirements", "achievements", "chunks", "orphaned",
+           "counts", "elapsed"}
+    """
+    vector_service = vector_service or get_vector_service()
+    if model_name == vector_service.model_name:
+        raise ValueError(f"当前版本 {vector_service.active_version} 已经使用模型 {model_name}，无需重建")
+    start = time.perf_counter()
+    version = vector_service.registry.create(model_name)
+    view = vector_service.version_view(version)
+    result = {"version": version, "model": model_name, "status": VERSION_BUILDING,
+              "papers": 0, "requirements": 0, "achievements": 0, "chunks": 0}
+    logger.info(f"开始重建向量版本 {version}（{model_name}），当前版本 {vector_service.active_version} 继续提供检索")
+
+    def _report(stage: str, **stats) -> None:
+        if progress_callback:
+            progress_callback(dict(result, stage=stage, **stats))
+
+    try:
+        stopped = False
+        for _ in range(2):
+            paper_stats = index_missing_papers(
+                view, batch_size=batch_size, should_stop=should_stop,
+                progress_callback=lambda stats: _report("papers", **stats)
+            )
+            result["papers"] += paper_stats["added"]
+            if should_stop and should_stop():
+                stopped = True
+                break
+            _report("requirements")
+            result["requirements"] += _index_missing_requirements(view)
+            _report("achievements")
+            result["achievements"] += _index_missing_achievements(view)
+            _report("chunks")
+            result["chunks"] += index_missing_chunks(view, should_stop=should_stop)["chunks"]
+            if should_stop and should_stop():
+                stopped = True
+                break
+    except Exception as e:
+        vector_service.registry.update(version, status=VERSION_FAILED, error=str(e))
+        logger.error(f"向量版本 {version} 重建失败: {e}")
+        raise
+
+    if stopped:
+        result["elapsed"] = round(time.perf_counter() - start, 1)
+        logger.info(f"向量版本 {version} 重建已停止，再次运行时继续")
+        return result
+
+    # 重建期间在当前版本上删除 / 下架的条目不会同步到新版本，切换前按 SQLite 删除新版本中的孤立向量
+    orphan_report = check_consistency(vector_service, repair=True, repair_issues=(ISSUE_ORPHANED,),
+                                      embedding_version=version)
+    result["orphaned"] = sum(report["repaired"][ISSUE_ORPHANED] for report in orphan_report["kinds"].values())
+    if result["orphaned"]:
+        logger.info(f"向量版本 {version} 已删除 {result['orphaned']} 条重建期间失效的向量")
+
+    result["elapsed"] = round(time.perf_counter() - start, 1)
+    counts = {base: getattr(view, attr).count()
+              for base, attr in zip(VERSIONED_COLLECTIONS, ("collection", "requirement_collection",
+                                                            "achievement_collection", "chunk_collection"))}
+    vector_service.registry.update(version, status=VERSION_READY, counts=counts,
+                                   built_at=datetime.now().isoformat(timespec="seconds"))
+    result.update(status=VERSION_READY, counts=counts)
+    logger.info(f"向量版本 {version} 重建完成，耗时 {result['elapsed']} 秒: {counts}")
+    if activate:
+        vector_service.activate_version(version)
+        result["status"] = "active"
+    return result
@@ -0,0 +1,317 @@
+"""
+论文 kNN 图 - 预计算每篇论文最相似的 K 篇论文（“更多类似论文”）
+
+查看匹配结果中的某篇论文时，用户常常想看同类论文。实时做的话需要再走一次查询扩展 + 向量检索，
+这里离线算好全部论文两两之间的 Top-K，接口按行号直接读取，不经过模型和向量查询。
+
+- 全量构建：论文向量按页读到临时内存映射矩阵中，查询行和候选列都按 block_size 分块做矩阵乘法，
+  每块与当前 Top-K 合并（排除自身），内存中只有一块分数矩阵
+- 增量更新：只为新索引的论文计算 Top-K（新论文 × 全部论文），同时用旧论文 × 新论文的分数
+  更新旧论文的 Top-K（Top-K(旧 ∪ 新) = Top-K(旧 Top-K ∪ 新)），结果与全量构建一致；
+  有论文从向量库删除、K 变化或切换向量模型版本后自动改为全量构建
+- 向量集合为余弦空间，分数为余弦相似度
+
+存储（PAPER_KNN_DIR，默认项目根目录下的 paper_knn/），写入临时目录后整体替换，读取方不会看到中间状态：
+    meta.json        向量版本、K、论文数、更新时间
+    ids.npy          行号 -> arxiv_id
+    neighbors.npy    int32 (论文数, K)，近邻的行号，不足 K 个时为 -1
+    scores.npy       float32 (论文数, K)，余弦相似度（不用 float16：增量合并时精度损失会改变边界上的排序）
+读取时 neighbors / scores 以内存映射方式打开，查询一篇论文只读一行；图的向量版本与当前启用版本不同时不使用。
+
+运行方式见 scripts/build_paper_knn.py；/index-papers 新增论文后自动增量更新。
+"""
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from services.requirement_similarity import _normalize, _top_k
+from services.vector_service import VectorService, get_vector_service
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PAPER_KNN_DIR = Path(__file__).parent.parent.parent / "paper_knn"
+# 每篇论文保留的近邻数，存储大小 = 论文数 × K × 8 字节
+PAPER_KNN_K = int(os.getenv("PAPER_KNN_K", "20"))
+# 每次参与矩阵乘法的行数（分数矩阵为 block_size × block_size）
+DEFAULT_BLOCK_SIZE = 2048
+
+_META_FILE = "meta.json"
+_IDS_FILE = "ids.npy"
+_NEIGHBORS_FILE = "neighbors.npy"
+_SCORES_FILE = "scores.npy"
+
+
+def get_paper_knn_dir() -> Path:
+    """kNN 图目录：PAPER_KNN_DIR 环境变量，默认为项目根目录下的 paper_knn"""
+    return Path(os.getenv("PAPER_KNN_DIR") or DEFAULT_PAPER_KNN_DIR)
+
+
+def read_paper_knn_meta(graph_dir: Optional[Path] = None) -> Optional[Dict]:
+    """读取 kNN 图的 meta.json，图不存在时返回 None"""
+    meta_path = Path(graph_dir or get_paper_knn_dir()) / _META_FILE
+    if not meta_path.exists():
+        return None
+    return json.loads(meta_path.read_text(encoding="utf-8"))
+
+
+def _load_matrix(collection, row_of: Dict[str, int], path: Path, dim: int, page_size: int) -> np.ndarray:
+    """
+    分页读取集合中的向量，按 row_of 中的行号写入内存映射矩阵（float32，归一化）
+    row_of 中没有的ID（读取期间新增的论文）跳过，留给下次增量更新
+    """
+    matrix = np.lib.format.open_memmap(path, mode="w+", dtype=np.float32, shape=(len(row_of), dim))
+    offset = 0
+    while True:
+        page = collection.get(include=["embeddings"], limit=page_size, offset=offset)
+        page_ids = page.get("ids") or []
+        if not page_ids:
+            break
+        vectors = _normalize(page["embeddings"])
+        for position, paper_id in enumerate(page_ids):
+            row = row_of.get(paper_id)
+            if row is not None:
+                matrix[row] = vectors[position]
+        if len(page_ids) < page_size:
+            break
+        offset += len(page_ids)
+    matrix.flush()
+    return matrix
+
+
+def _block_top_k(matrix: np.ndarray, row_start: int, row_end: int, col_start: int, col_end: int, k: int,
+                 block_size: int, best: Optional[Tuple[np.ndarray, np.ndarray]] = None
+                 ) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    matrix[row_start:row_end] 在 matrix[col_start:col_end] 中的 Top-K（排除自身）
+    best: 这些行已有的 (近邻行号, 分数)，与新算出的结果合并
+    返回: (近邻行号 int64, 分数 float32)，每行按分数降序，不足 K 个的位置为 (-1, -inf)
+    """
+    rows = row_end - row_start
+    if best is None:
+        best_idx = np.full((rows, 0), -1, dtype=np.int64)
+        best_scores = np.full((rows, 0), -np.inf, dtype=np.float32)
+    else:
+        best_idx, best_scores = best
+    queries = np.asarray(matrix[row_start:row_end])
+    local_rows = np.arange(rows)
+    for start in range(col_start, col_end, block_size):
+        end = min(start + block_size, col_end)
+        scores = queries @ np.asarray(matrix[start:end]).T
+        # 查询行与候选列重叠的部分：排除论文自身
+        self_rows = local_rows[(local_rows + row_start >= start) & (local_rows + row_start < end)]
+        scores[self_rows, self_rows + row_start - start] = -np.inf
+        merged_scores = np.concatenate([best_scores, scores], axis=1)
+        merged_idx = np.concatenate([best_idx, np.broadcast_to(np.arange(start, end), scores.shape)], axis=1)
+        keep, best_scores = _top_k(merged_scores, k)
+        best_idx = np.take_along_axis(merged_idx, keep, axis=1)
+    best_idx = np.where(np.isfinite(best_scores), best_idx, -1)
+    return best_idx, best_scores
+
+
+def _write_graph(graph_dir: Path, meta: Dict, ids: List[str], neighbors: np.ndarray, scores: np.ndarray) -> None:
+    """写入临时目录后整体替换旧图"""
+    tmp_dir = graph_dir.with_name(f"{graph_dir.name}.tmp")
+    old_dir = graph_dir.with_name(f"{graph_dir.name}.old")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp_dir.mkdir(parents=True)
+    np.save(tmp_dir / _IDS_FILE, np.array(ids, dtype=str))
+    np.save(tmp_dir / _NEIGHBORS_FILE, neighbors.astype(np.int32))
+    np.save(tmp_dir / _SCORES_FILE, np.where(np.isfinite(scores), scores, 0).astype(np.float32))
+    (tmp_dir / _META_FILE).write_text(json.dumps(meta, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    shutil.rmtree(old_dir, ignore_errors=True)
+    if graph_dir.exists():
+        graph_dir.rename(old_dir)
+    tmp_dir.rename(graph_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+
+
+def build_paper_knn(
+    vector_service: Optional[VectorService] = None,
+    full: bool = False,
+    k: int = PAPER_KNN_K,
+    block_size: int = DEFAULT_BLOCK_SIZE,
+    graph_dir: Optional[Path] = None,
+    progress_callback: Optional[Callable[[int, int], None]] = None
+) -> Dict:
+    """
+    构建或增量更新论文 kNN 图
+    full: 强制全量构建；默认只计算新索引的论文
+    progress_callback: 每算完一块调用 (已完成行数, 需计算的行数)
+    返回: {"mode": "full"/"incremental", "embedding_version", "papers", "computed", "k", "elapsed"}
+    """
+    start_time = time.time()
+    vector_service = vector_service or get_vector_service()
+    graph_dir = Path(graph_dir or get_paper_knn_dir())
+    # 固定在当前版本上，构建期间切换版本不影响本次结果
+    version = vector_service.active_version
+    view = vector_service.version_view(version)
+    collection = view.collection
+
+    current_ids: List[str] = []
+    for ids in view.iter_ids(page_size=max(block_size, 10000)):
+        current_ids.extend(ids)
+
+    meta = read_paper_knn_meta(graph_dir)
+    old_ids: List[str] = []
+    if not full:
+        if meta is None:
+            full = True
+        elif meta.get("embedding_version") != version or meta.get("k") != k:
+            logger.info("向量版本或 K 已变化，改为全量构建论文 kNN 图")
+            full = True
+        else:
+            old_ids = np.load(graph_dir / _IDS_FILE).tolist()
+            current = set(current_ids)
+            if any(paper_id not in current for paper_id in old_ids):
+                logger.info("有论文已从向量库删除，改为全量构建论文 kNN 图")
+                full, old_ids = True, []
+    if full:
+        old_ids = []
+
+    old_set = set(old_ids)
+    new_ids = [paper_id for paper_id in current_ids if paper_id not in old_set]
+    if not full and not new_ids:
+        logger.info("没有新索引的论文，论文 kNN 图无需更新")
+        return {"mode": "incremental", "embedding_version": version, "papers": len(old_ids),
+                "computed": 0, "k": k, "elapsed": round(time.time() - start_time, 2)}
+
+    ids = old_ids + new_ids
+    total_rows, old_rows = len(ids), len(old_ids)
+    neighbors = np.full((total_rows, k), -1, dtype=np.int32)
+    scores = np.full((total_rows, k), -np.inf, dtype=np.float32)
+    if total_rows:
+        work_dir = graph_dir.with_name(f"{graph_dir.name}.work")
+        shutil.rmtree(work_dir, ignore_errors=True)
+        work_dir.mkdir(parents=True)
+        try:
+            dim = len(collection.get(ids=[ids[0]], include=["embeddings"])["embeddings"][0])
+            matrix = _load_matrix(collection, {paper_id: row for row, paper_id in enumerate(ids)},
+                                  work_dir / "vectors.npy", dim, max(block_size, 1000))
+            load_elapsed = time.time() - start_time
+
+            if old_rows:
+                old_neighbors = np.load(graph_dir / _NEIGHBORS_FILE).astype(np.int64)
+                old_scores = np.load(graph_dir / _SCORES_FILE).astype(np.float32)
+                old_scores[old_neighbors < 0] = -np.inf
+
+            # 需要计算的行：全量时为全部论文；增量时旧论文只与新论文比较，新论文与全部论文比较
+            for start in range(0, total_rows, block_size):
+                end = min(start + block_size, total_rows)
+                if end <= old_rows:
+                    best = (old_neighbors[start:end], old_scores[start:end])
+                    block = _block_top_k(matrix, start, end, old_rows, total_rows, k, block_size, best)
+                elif start < old_rows:
+                    # 跨越新旧边界的块拆成两段
+                    best = (old_neighbors[start:old_rows], old_scores[start:old_rows])
+                    head = _block_top_k(matrix, start, old_rows, old_rows, total_rows, k, block_size, best)
+                    tail = _block_top_k(matrix, old_rows, end, 0, total_rows, k, block_size)
+                    block = (np.vstack([head[0], tail[0]]), np.vstack([head[1], tail[1]]))
+                else:
+                    block = _block_top_k(matrix, start, end, 0, total_rows, k, block_size)
+                width = block[0].shape[1]
+                neighbors[start:end, :width] = block[0]
+                scores[start:end, :width] = block[1]
+                if progress_callback:
+                    progress_callback(end, total_rows)
+                logger.info(f"论文 kNN 图计算进度: {end}/{total_rows}")
+            del matrix
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    else:
+        load_elapsed = time.time() - start_time
+
+    now = datetime.now().isoformat(timespec="seconds")
+    new_meta = {
+        "embedding_version": version,
+        "k": k,
+        "count": total_rows,
+        "built_at": now if full else meta.get("built_at", now),
+        "updated_at": now
+    }
+    _write_graph(graph_dir, new_meta, ids, neighbors, scores)
+
+    elapsed = time.time() - start_time
+    mode = "full" if full else "incremental"
+    logger.info(f"论文 kNN 图{'全量构建' if full else '增量更新'}完成: {total_rows} 篇论文，新计算 {len(new_ids)} 篇，"
+                f"K={k}，读取向量 {load_elapsed:.2f} 秒，总耗时 {elapsed:.2f} 秒")
+    return {"mode": mode, "embedding_version": version, "papers": total_rows, "computed": len(new_ids),
+            "k": k, "elapsed": round(elapsed, 2)}
+
+
+class _PaperKnnGraph:
+    """已加载的 kNN 图（meta.json 变化后自动重新加载；neighbors / scores 为内存映射，只读取被查询的行）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stamp = None
+        # (meta, {arxiv_id: 行号}, ids, neighbors, scores)，整体替换，读取方不会拿到新旧混合的状态
+        self._state: Optional[Tuple] = None
+
+    def _load(self, graph_dir: Path) -> Optional[Tuple]:
+        meta_path = graph_dir / _META_FILE
+        try:
+            stat = meta_path.stat()
+            stamp = (str(graph_dir), stat.st_mtime_ns, stat.st_ino)
+        except FileNotFoundError:
+            stamp = None
+        if stamp == self._stamp:
+            return self._state
+        with self._lock:
+            if stamp != self._stamp:
+                if stamp is None:
+                    self._state = None
+                else:
+                    ids = np.load(graph_dir / _IDS_FILE)
+                    meta = json.loads(meta_path.read_text(encoding="utf-8"))
+                    self._state = (
+                        meta,
+                        {paper_id: row for row, paper_id in enumerate(ids.tolist())},
+                        ids,
+                        np.load(graph_dir / _NEIGHBORS_FILE, mmap_mode="r"),
+                        np.load(graph_dir / _SCORES_FILE, mmap_mode="r")
+                    )
+                    logger.info(f"已加载论文 kNN 图: {len(ids)} 篇论文，K={meta.get('k')}，"
+                                f"向量版本 {meta.get('embedding_version')}")
+                self._stamp = stamp
+            return self._state
+
+    def related(self, paper_id: str, limit: int, embedding_version: str,
+                graph_dir: Path) -> Optional[List[Tuple[str, float]]]:
+        state = self._load(graph_dir)
+        if state is None:
+            return None
+        meta, row_of, ids, neighbors, scores = state
+        row = row_of.get(paper_id)
+        if meta.get("embedding_version") != embedding_version or row is None:
+            return None
+        if limit > meta.get("k", neighbors.shape[1]):
+            # 图按构建时的 K 保存近邻（可能与当前 PAPER_KNN_K 不同），不足 limit 时由调用方回退到向量检索
+            return None
+        return [
+            (str(ids[neighbor]), round(float(score), 4))
+            for neighbor, score in zip(neighbors[row, :limit], scores[row, :limit])
+            if neighbor >= 0
+        ]
+
+
+_graph = _PaperKnnGraph()
+
+
+def get_related_papers(paper_id: str, limit: int = 10, embedding_version: Optional[str] = None,
+                       graph_dir: Optional[Path] = None) -> Optional[List[Tuple[str, float]]]:
+    """
+    从 kNN 图读取论文的近邻论文
+    返回: [(arxiv_id, score), ...]，按分数降序；图不存在、不是当前向量版本、论文不在图中
+          或 limit 超过构建图时的 K（meta.json 的 k）时返回 None
+    """
+    embedding_version = embedding_version or get_vector_service().active_version
+    return _graph.related(paper_id, limit, embedding_version, Path(graph_dir or get_paper_knn_dir()))
@@ -0,0 +1,397 @@
+"""
+按发布时间分片的论文向量集合
+
+论文向量按 published_date 写入按月（papers_2025_01）或按季度（papers_2025q1）划分的集合，
+没有发布日期的论文写入 papers_undated。ShardedPaperCollection 实现与单个集合相同的接口
+（见 vector_stores 模块说明），VectorService 的其余代码不区分是否分片：
+- 写入按元数据中的 published_ts 路由到对应分片，新爬取的论文只会写入最近的分片
+- 检索并发查询各分片后按距离合并 top-k；where 条件中的 published_ts 范围会先裁剪掉不相交的分片
+- 旧分片是独立的集合，可以单独压缩、导出或归档，不影响新分片
+
+启用分片前写入的单一 papers 集合作为“遗留分片”继续参与检索（不参与日期裁剪），
+可以用 scripts/shard_paper_vectors.py 迁移到分片后清空。
+向量模型的其他版本（见 embedding_versions 模块）以 papers_v2 等为前缀分片：papers_v2_2025_01。
+"""
+import logging
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 分片粒度
+SHARD_BY_MONTH = "month"
+SHARD_BY_QUARTER = "quarter"
+SUPPORTED_SHARD_GRANULARITIES = (SHARD_BY_MONTH, SHARD_BY_QUARTER)
+
+DEFAULT_SHARD_BASE = "papers"
+UNDATED_SUFFIX = "undated"
+UNDATED_SHARD = f"{DEFAULT_SHARD_BASE}_{UNDATED_SUFFIX}"
+_SHARD_NAME_PATTERN = re.compile(r"^(.+)_(\d{4})(?:_(\d{2})|q([1-4]))$")
+
+
+def shard_name(published_ts: Optional[int], granularity: str, base: str = DEFAULT_SHARD_BASE) -> str:
+    """发布日期（YYYYMMDD 整数）-> 分片集合名"""
+    if not published_ts:
+        return f"{base}_{UNDATED_SUFFIX}"
+    year, month = published_ts // 10000, published_ts // 100 % 100
+    if granularity == SHARD_BY_QUARTER:
+        return f"{base}_{year}q{(month - 1) // 3 + 1}"
+    return f"{base}_{year}_{month:02d}"
+
+
+def shard_base(name: str) -> Optional[str]:
+    """分片集合名 -> 所属的论文集合名（papers / papers_v2），不是分片时返回 None"""
+    if name.endswith(f"_{UNDATED_SUFFIX}"):
+        return name[:-len(UNDATED_SUFFIX) - 1]
+    match = _SHARD_NAME_PATTERN.match(name)
+    return match.group(1) if match else None
+
+
+def shard_range(name: str) -> Optional[Tuple[int, int]]:
+    """分片覆盖的 published_ts 范围（含边界），无日期分片或非分片集合返回 None"""
+    match = _SHARD_NAME_PATTERN.match(name)
+    if not match:
+        return None
+    year = int(match.group(2))
+    if match.group(3):
+        first_month = last_month = int(match.group(3))
+    else:
+        quarter = int(match.group(4))
+        first_month, last_month = 3 * quarter - 2, 3 * quarter
+    return year * 10000 + first_month * 100 + 1, year * 10000 + last_month * 100 + 31
+
+
+# 可以随分片整体覆盖而去掉的日期条件运算符（含边界的范围）；$gt / $lt / $eq / $ne / $in 等条件保留，逐条过滤
+_STRIPPABLE_TS_OPS = frozenset(("$gte", "$lte"))
+
+# 日期边界：(值, 是否含边界)
+_Bound = Optional[Tuple[int, bool]]
+
+
+def _ts_conditions(where: Optional[Dict]) -> List[Dict]:
+    """where 条件（顶层或 $and 中）对 published_ts 的比较，如 {"$gte": 20250101}；直接写值视为 $eq"""
+    if not where:
+        return []
+    conditions = where["$and"] if "$and" in where else [where]
+    result = []
+    for condition in conditions:
+        if isinstance(condition, dict) and "published_ts" in condition:
+            ts = condition["published_ts"]
+            result.append(ts if isinstance(ts, dict) else {"$eq": ts})
+    return result
+
+
+def _tighter(current: _Bound, bound: Tuple[int, bool], direction: int) -> Tuple[int, bool]:
+    """两个下界（direction=1）或上界（direction=-1）中更严格的一个；值相同时不含边界的更严格"""
+    if current is None:
+        return bound
+    if bound[0] == current[0]:
+        return bound[0], bound[1] and current[1]
+    return bound if (bound[0] - current[0]) * direction > 0 else current
+
+
+def _ts_bounds(where: Optional[Dict], strippable_only: bool = False) -> Tuple[_Bound, _Bound]:
+    """
+    从 where 条件提取 published_ts 的 (下界, 上界)，每个为 (值, 是否含边界) 或 None，用于裁剪分片
+    strippable_only: 只统计可以去掉的条件（运算符全部为 $gte / $lte），用于判断分片是否被整体覆盖
+    """
+    low, high = None, None
+    for ts in _ts_conditions(where):
+        if strippable_only and not set(ts) <= _STRIPPABLE_TS_OPS:
+            continue
+        for op, value in ts.items():
+            if op in ("$gte", "$gt", "$eq"):
+                low = _tighter(low, (value, op != "$gt"), 1)
+            if op in ("$lte", "$lt", "$eq"):
+                high = _tighter(high, (value, op != "$lt"), -1)
+            if op == "$in" and value:
+                low = _tighter(low, (min(value), True), 1)
+                high = _tighter(high, (max(value), True), -1)
+    return low, high
+
+
+def _above(ts: int, low: _Bound) -> bool:
+    """ts 满足下界"""
+    return low is None or ts > low[0] or (low[1] and ts == low[0])
+
+
+def _below(ts: int, high: _Bound) -> bool:
+    """ts 满足上界"""
+    return high is None or ts < high[0] or (high[1] and ts == high[0])
+
+
+def _strip_ts(where: Optional[Dict]) -> Optional[Dict]:
+    """
+    去掉 where 中可以去掉的 published_ts 条件（运算符全部为 $gte / $lte，分片整体落在该范围内时不再需要逐条过滤）
+    同一条件中带有其他运算符（$gt / $ne / $in 等）时整条保留
+    """
+    if not where:
+        return None
+    conditions = where["$and"] if "$and" in where else [where]
+    rest = [c for c in conditions
+            if not (isinstance(c, dict) and list(c) == ["published_ts"] and isinstance(c["published_ts"], dict)
+                    and set(c["published_ts"]) <= _STRIPPABLE_TS_OPS)]
+    if not rest:
+        return None
+    return rest[0] if len(rest) == 1 else {"$and": rest}
+
+
+class ShardedPaperCollection:
+    """按发布时间分片的论文集合（接口与单个集合一致）"""
+
+    def __init__(self, store, granularity: str = SHARD_BY_MONTH, legacy=None,
+                 collection_metadata: Optional[Dict] = None, max_workers: int = 4,
+                 base: str = DEFAULT_SHARD_BASE):
+        """
+        store: 向量存储后端（create_vector_store 的返回值）
+        legacy: 启用分片前的 papers 集合（非空时继续参与检索和按ID读写）
+        base: 分片名前缀，即所属的论文集合名（默认 papers，其他向量模型版本为 papers_v2 等）
+        collection_metadata: 创建分片集合时使用的集合元数据（如 {"hnsw:space": "cosine"}；
+                             HNSW_M 等参数由 chroma 后端在创建集合时补充，与其他集合一致）
+        max_workers: 并发查询分片的线程数
+        """
+        self.store = store
+        self.granularity = granularity
+        self.legacy = legacy
+        self.base = base
+        self.undated = f"{base}_{UNDATED_SUFFIX}"
+        self.collection_metadata = collection_metadata or {"hnsw:space": "cosine"}
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="paper-shard")
+        self._shards: Dict[str, object] = {}
+        self._lock = threading.Lock()
+        for name in store.list_collection_names():
+            if shard_base(name) == base:
+                self._shards[name] = store.get_or_create_collection(name, metadata=self.collection_metadata)
+        logger.info(f"论文向量按{'月' if granularity == SHARD_BY_MONTH else '季度'}分片，现有 {len(self._shards)} 个分片")
+
+    # ---------- 分片管理 ----------
+
+    def _get_shard(self, name: str):
+        with self._lock:
+            if name not in self._shards:
+                self._shards[name] = self.store.get_or_create_collection(name, metadata=self.collection_metadata)
+                logger.info(f"创建论文分片 {name}")
+            return self._shards[name]
+
+    def _all_collections(self) -> List[Tuple[str, object]]:
+        """全部分片（按名称排序）+ 非空的遗留集合"""
+        with self._lock:
+            collections = sorted(self._shards.items())
+        if self.legacy is not None and self.legacy.count() > 0:
+            collections.append((self.base, self.legacy))
+        return collections
+
+    def _pruned_collections(self, where: Optional[Dict]) -> List[Tuple[str, object]]:
+        """按 where 中的发布日期范围裁剪分片（无日期分片在有日期条件时也被裁剪，遗留集合不裁剪）"""
+        return [(name, collection) for name, collection, _ in self._plan(where)]
+
+    def _plan(self, where: Optional[Dict]) -> List[Tuple[str, object, Optional[Dict]]]:
+        """
+        查询计划：[(分片名, 集合, 该分片使用的 where)]
+        分片整体落在日期范围内时去掉日期条件：HNSW 带过滤条件的检索比不带时慢得多
+        """
+        low, high = _ts_bounds(where)
+        if low is None and high is None:
+            return [(name, collection, where) for name, collection in self._all_collections()]
+        # 只有被去掉的条件决定分片是否整体覆盖；保留下来的日期条件仍在 where 中逐条过滤
+        strip_low, strip_high = _ts_bounds(where, strippable_only=True)
+        stripped = _strip_ts(where)
+        plan = []
+        for name, collection in self._all_collections():
+            if name == self.undated:
+                continue
+            bounds = shard_range(name)
+            if bounds is None:
+                plan.append((name, collection, where))
+                continue
+            if not _above(bounds[1], low) or not _below(bounds[0], high):
+                continue
+            covered = _above(bounds[0], strip_low) and _below(bounds[1], strip_high)
+            plan.append((name, collection, stripped if covered else where))
+        return plan
+
+    def shard_stats(self) -> List[Dict]:
+        """各分片的名称、日期范围和向量数"""
+        return [{"name": name, "range": shard_range(name), "count": collection.count()}
+                for name, collection in self._all_collections()]
+
+    def _target_name(self, metadata: Optional[Dict]) -> str:
+        return shard_name((metadata or {}).get("published_ts"), self.granularity, self.base)
+
+    def _locate(self, ids: Sequence[str]) -> Dict[str, str]:
+        """ID -> 所在集合名"""
+        located = {}
+        for name, collection in self._all_collections():
+            for item_id in collection.get(ids=list(ids), include=[]).get("ids") or []:
+                located[item_id] = name
+        return located
+
+    def _collection_by_name(self, name: str):
+        return self.legacy if name == self.base else self._get_shard(name)
+
+    # ---------- 读取 ----------
+
+    def count(self) -> int:
+        return sum(collection.count() for _, collection in self._all_collections())
+
+    def get(self, ids: Optional[Sequence[str]] = None, include: Optional[Sequence[str]] = None,
+            limit: Optional[int] = None, offset: Optional[int] = None, where: Optional[Dict] = None) -> Dict:
+        """读取格式与单个集合一致；不带 where 的分页按分片名称顺序拼接"""
+        include = ["metadatas"] if include is None else list(include)
+        result = {"ids": []}
+        for key in ("metadatas", "embeddings"):
+            if key in include:
+                result[key] = []
+
+        def _extend(page: Dict) -> None:
+            result["ids"].extend(page.get("ids") or [])
+            for key in ("metadatas", "embeddings"):
+                if key in result:
+                    result[key].extend(list(page.get(key) if page.get(key) is not None else []))
+
+        if ids is not None:
+            ids = list(ids)
+            for _, collection in self._all_collections():
+                _extend(collection.get(ids=ids, include=include))
+            # 与单个集合一致：按传入ID的顺序返回
+            order = {item_id: i for i, item_id in enumerate(ids)}
+            positions = sorted(range(len(result["ids"])), key=lambda i: order.get(result["ids"][i], 0))
+            return {key: [values[i] for i in positions] for key, values in result.items()}
+
+        if where is not None:
+            collections = self._pruned_collections(where)
+            for _, collection in collections:
+                _extend(collection.get(where=where, include=include))
+            start = offset or 0
+            end = start + limit if limit is not None else None
+            return {key: values[start:end] for key, values in result.items()}
+
+        skip = offset or 0
+        remaining = limit
+        for _, collection in self._all_collections():
+            if remaining is not None and remaining <= 0:
+                break
+            count = collection.count()
+            if skip >= count:
+                skip -= count
+                continue
+            page = collection.get(include=include, limit=remaining, offset=skip)
+            skip = 0
+            _extend(page)
+            if remaining is not None:
+                remaining -= len(page.get("ids") or [])
+        return result
+
+    def query(self, query_embeddings, n_results: int = 10, where: Optional[Dict] = None,
+              include: Optional[Sequence[str]] = None) -> Dict:
+        """并发查询裁剪后的分片，按距离合并每条查询的 top-k"""
+        query_embeddings = [list(map(float, e)) for e in query_embeddings]
+        n_queries = len(query_embeddings)
+        plan = [(c, c.count(), shard_where) for _, c, shard_where in self._plan(where)]
+        plan = [step for step in plan if step[1] > 0]
+        merged = {"ids": [[] for _ in range(n_queries)], "distances": [[] for _ in range(n_queries)],
+                  "metadatas": [[] for _ in range(n_queries)]}
+        if not plan:
+            return merged
+
+        def _query(step):
+            collection, count, shard_where = step
+            kwargs = {"query_embeddings": query_embeddings, "n_results": min(n_results, count)}
+            if shard_where:
+                kwargs["where"] = shard_where
+            if include is not None:
+                kwargs["include"] = include
+            return collection.query(**kwargs)
+
+        if len(plan) == 1:
+            results = [_query(plan[0])]
+        else:
+            results = list(self._executor.map(_query, plan))
+
+        for q in range(n_queries):
+            hits = []
+            for result in results:
+                metadatas = (result.get("metadatas") or [None] * n_queries)[q] or [None] * len(result["ids"][q])
+                hits.extend(zip(result["distances"][q], result["ids"][q], metadatas))
+            hits.sort(key=lambda hit: hit[0])
+            for distance, item_id, metadata in hits[:n_results]:
+                merged["ids"][q].append(item_id)
+                merged["distances"][q].append(distance)
+                merged["metadatas"][q].append(metadata)
+        return merged
+
+    # ---------- 写入 ----------
+
+    def _write(self, ids: Sequence[str], embeddings, metadatas: Optional[Sequence[Dict]], overwrite: bool) -> None:
+        ids = list(ids)
+        embeddings = list(embeddings)
+        metadatas = list(metadatas) if metadatas is not None else [None] * len(ids)
+        located = self._locate(ids)
+
+        groups: Dict[str, List[int]] = {}
+        moved: Dict[str, List[str]] = {}
+        for i, item_id in enumerate(ids):
+            target = self._target_name(metadatas[i])
+            current = located.get(item_id)
+            if current is not None:
+                # 与单个集合一致：add 跳过已存在的ID
+                if not overwrite:
+                    continue
+                # 发布日期变化（如补写元数据）导致分片变化时，从原分片删除
+                if current != target:
+                    moved.setdefault(current, []).append(item_id)
+            groups.setdefault(target, []).append(i)
+
+        for name, positions in groups.items():
+            self._get_shard(name).upsert(
+                ids=[ids[i] for i in positions],
+                embeddings=[embeddings[i] for i in positions],
+                metadatas=[metadatas[i] for i in positions]
+            )
+        for name, moved_ids in moved.items():
+            self._collection_by_name(name).delete(ids=moved_ids)
+
+    def add(self, ids: Sequence[str], embeddings, metadatas: Optional[Sequence[Dict]] = None, **kwargs) -> None:
+        self._write(ids, embeddings, metadatas, overwrite=False)
+
+    def upsert(self, ids: Sequence[str], embeddings, metadatas: Optional[Sequence[Dict]] = None, **kwargs) -> None:
+        self._write(ids, embeddings, metadatas, overwrite=True)
+
+    def update(self, ids: Sequence[str], metadatas: Sequence[Dict], **kwargs) -> None:
+        """更新元数据；发布日期变化导致分片变化的条目连同向量迁移到新分片"""
+        ids = list(ids)
+        metadatas = list(metadatas)
+        located = self._locate(ids)
+        in_place: Dict[str, Tuple[List[str], List[Dict]]] = {}
+        moving = []
+        for item_id, metadata in zip(ids, metadatas):
+            current = located.get(item_id)
+            if current is None:
+                continue
+            if "published_ts" in (metadata or {}) and self._target_name(metadata) != current:
+                moving.append((item_id, metadata))
+            else:
+                in_place.setdefault(current, ([], []))
+                in_place[current][0].append(item_id)
+                in_place[current][1].append(metadata)
+
+        for name, (group_ids, group_metadatas) in in_place.items():
+            self._collection_by_name(name).update(ids=group_ids, metadatas=group_metadatas)
+
+        if moving:
+            moving_ids = [item_id for item_id, _ in moving]
+            existing = self.get(ids=moving_ids, include=["embeddings", "metadatas"])
+            by_id = {item_id: (embedding, metadata) for item_id, embedding, metadata
+                     in zip(existing["ids"], existing["embeddings"], existing["metadatas"])}
+            new_metadatas = [dict(by_id[item_id][1] or {}, **(metadata or {})) for item_id, metadata in moving]
+            self.upsert(ids=moving_ids, embeddings=[list(map(float, by_id[i][0])) for i in moving_ids],
+                        metadatas=new_metadatas)
+
+    def delete(self, ids: Sequence[str]) -> None:
+        ids = list(ids)
+        for name, collection in self._all_collections():
+            found = collection.get(ids=ids, include=[]).get("ids") or []
+            if found:
+                collection.delete(ids=found)
@@ -0,0 +1,392 @@
+"""
+多进程批量重新向量化（reindex）：论文、需求、发布需求、成果按主键范围分片，
+由编码进程池并行向量化，主进程作为唯一的写入方写入向量库
+
+- 分片：按主键顺序流式读取 SQLite 中的有效条目（与一致性检查相同的 ITEM_KINDS 定义），每 shard_size 条
+  为一个分片，分片为 [本分片起始主键, 下一分片起始主键)；首个分片不设下界、最后一个不设上界，规划后新增的条目也能覆盖
+- 编码进程（spawn）各自加载一份模型（torch 后端的权重按 EMBEDDING_MMAP 映射共享，见 model_store），
+  线程数限定为 threads（OMP / torch / onnxruntime），workers × threads 不应超过 CPU 核数；
+  进程按分片读取 SQLite 行，构建与 add_* 完全一致的文本和元数据（含 text_hash），编码后把向量传回主进程
+- 写入：主进程按完成顺序 upsert 到目标版本的集合并写入向量缓存，然后在检查点中把分片标记为完成；
+  在途分片数不超过 workers × 2，编码快于写入时不会在内存中堆积
+- 断点续跑：分片计划和完成状态保存在向量存储目录下的检查点文件（reindex_<版本>.db），
+  进程崩溃、Ctrl-C 或分片失败后重新运行只处理未完成的分片；upsert 是幂等的，写入后未来得及标记的分片重做即可
+- 目标：默认原地重建当前启用版本；指定与当前版本不同的模型时写入该模型的新版本（与 rebuild_embedding_version
+  复用同一版本），分片全部完成后由 rebuild_embedding_version 补齐期间新增的数据和全文分块，然后切换
+
+只重新写入 SQLite 中的有效条目，不删除向量库中多余的向量（孤立向量用 scripts/check_vector_consistency.py 清理）。
+"""
+import logging
+import multiprocessing
+import os
+import signal
+import sqlite3
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from database.database import get_db_connection
+from services.embedding_backends import BACKEND_TORCH
+from services.vector_consistency import ITEM_KINDS, _ItemKind
+from services.vector_service import VectorService, get_vector_service
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SHARD_SIZE = 2048
+DEFAULT_THREADS = 1
+
+# 分片状态
+SHARD_PENDING = "pending"
+SHARD_DONE = "done"
+SHARD_FAILED = "failed"
+
+
+class _Checkpoint:
+    """检查点文件：本次重建的参数、分片计划（类型, 序号, 起止主键, 条目数）和每个分片的状态"""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.conn = sqlite3.connect(str(self.path))
+        self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        # 主键列不声明类型：论文 / 需求为文本主键，发布需求 / 成果为整数主键，按原类型保存和比较
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS shards (
+                kind TEXT NOT NULL,
+                shard INTEGER NOT NULL,
+                first_key,
+                end_key,
+                rows INTEGER NOT NULL,
+                status TEXT NOT NULL,
+                error TEXT,
+                PRIMARY KEY (kind, shard)
+            )
+        """)
+        self.conn.commit()
+
+    def meta(self) -> Dict[str, str]:
+        return dict(self.conn.execute("SELECT key, value FROM meta").fetchall())
+
+    def reset(self, meta: Dict[str, str]) -> None:
+        """清空分片计划，写入本次参数（planned_at 在规划完成后写入，规划中断时重新规划）"""
+        self.conn.execute("DELETE FROM shards")
+        self.conn.execute("DELETE FROM meta")
+        self.conn.executemany("INSERT INTO meta VALUES (?, ?)", list(meta.items()))
+        self.conn.commit()
+
+    def add_shards(self, kind: str, shards: List[Tuple[object, object, int]]) -> None:
+        self.conn.executemany(
+            "INSERT INTO shards (kind, shard, first_key, end_key, rows, status) VALUES (?, ?, ?, ?, ?, ?)",
+            [(kind, index, first_key, end_key, rows, SHARD_PENDING)
+             for index, (first_key, end_key, rows) in enumerate(shards)]
+        )
+        self.conn.commit()
+
+    def mark_planned(self) -> None:
+        self.conn.execute("INSERT OR REPLACE INTO meta VALUES ('planned_at', ?)",
+                          (datetime.now().isoformat(timespec="seconds"),))
+        self.conn.commit()
+
+    def mark(self, kind: str, shard: int, status: str, error: Optional[str] = None) -> None:
+        self.conn.execute("UPDATE shards SET status = ?, error = ? WHERE kind = ? AND shard = ?",
+                          (status, error, kind, shard))
+        self.conn.commit()
+
+    def shards(self, kinds: List[str]) -> List[Tuple[str, int, object, object, int, str]]:
+        """按类型顺序、分片序号返回全部分片 (类型, 序号, 起始主键, 结束主键, 条目数, 状态)"""
+        order = {name: index for index, name in enumerate(kinds)}
+        rows = self.conn.execute(
+            "SELECT kind, shard, first_key, end_key, rows, status FROM shards ORDER BY shard").fetchall()
+        return sorted(rows, key=lambda row: (order.get(row[0], len(order)), row[1]))
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+def _plan_shards(checkpoint: _Checkpoint, kinds: List[_ItemKind], shard_size: int) -> None:
+    """按主键顺序流式读取有效条目的主键，每 shard_size 条记录一个分片边界（进程内只持有一页主键）"""
+    conn = get_db_connection()
+    try:
+        for kind in kinds:
+            cursor = conn.cursor()
+            cursor.execute(f"SELECT {kind.key_column} FROM {kind.table} WHERE {kind.where} ORDER BY {kind.key_column}")
+            shards = []
+            while True:
+                page = cursor.fetchmany(shard_size)
+                if not page:
+                    break
+                shards.append([page[0][0], None, len(page)])
+            for current, following in zip(shards, shards[1:]):
+                current[1] = following[0]
+            if shards:
+                shards[0][0] = None
+            checkpoint.add_shards(kind.name, [tuple(shard) for shard in shards])
+            logger.info(f"{kind.label}: {sum(shard[2] for shard in shards)} 条，{len(shards)} 个分片")
+    finally:
+        conn.close()
+    checkpoint.mark_planned()
+
+
+def _shard_query(kind: _ItemKind, first_key, end_key) -> Tuple[str, List]:
+    sql = f"SELECT {kind.columns} FROM {kind.table} WHERE {kind.where}"
+    params = []
+    if first_key is not None:
+        sql += f" AND {kind.key_column} >= ?"
+        params.append(first_key)
+    if end_key is not None:
+        sql += f" AND {kind.key_column} < ?"
+        params.append(end_key)
+    return sql, params
+
+
+# 编码进程中的模型（由 _init_worker 加载，每个进程一份）
+_worker_encoder = None
+
+
+def _init_worker(model_name: str, backend: str, threads: int) -> None:
+    """编码进程初始化：限定线程数后加载模型；Ctrl-C 由主进程处理（等待在途分片写入后退出），编码进程忽略"""
+    global _worker_encoder
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    for name in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "ONNX_NUM_THREADS"):
+        os.environ[name] = str(threads)
+    from services.embedding_server import load_encoder
+    _worker_encoder = load_encoder(model_name, backend)
+    if backend == BACKEND_TORCH:
+        import torch
+        torch.set_num_threads(threads)
+
+
+def _encode_shard(kind_name: str, first_key, end_key, batch_size: int) -> Dict:
+    """编码进程：读取一个分片的 SQLite 行，构建文本和元数据并向量化"""
+    kind = ITEM_KINDS[kind_name]
+    sql, params = _shard_query(kind, first_key, end_key)
+    conn = get_db_connection()
+    try:
+        rows = [dict(row) for row in conn.execute(sql, params).fetchall()]
+    finally:
+        conn.close()
+
+    ids = [kind.vector_id(row) for row in rows]
+    texts = [kind.text(row) for row in rows]
+    metadatas = [VectorService._with_text_hash(kind.metadata(row), text) for row, text in zip(rows, texts)]
+    start = time.perf_counter()
+    embeddings = np.zeros((0, 0), dtype=np.float32)
+    if texts:
+        embeddings = np.asarray(_worker_encoder.encode(texts, batch_size=batch_size, convert_to_numpy=True,
+                                                       show_progress_bar=False), dtype=np.float32)
+    return {"ids": ids, "texts": texts, "metadatas": metadatas, "embeddings": embeddings,
+            "encode_seconds": time.perf_counter() - start}
+
+
+def checkpoint_path(vector_service: VectorService, version: str) -> Path:
+    """版本的检查点文件（与 embedding_versions.json 同在向量存储目录下）"""
+    return vector_service.registry.path.parent / f"reindex_{version}.db"
+
+
+def reindex(
+    vector_service: Optional[VectorService] = None,
+    kinds: Optional[List[str]] = None,
+    model_name: Optional[str] = None,
+    workers: Optional[int] = None,
+    threads: int = DEFAULT_THREADS,
+    shard_size: int = DEFAULT_SHARD_SIZE,
+    batch_size: Optional[int] = None,
+    restart: bool = False,
+    activate: bool = True,
+    progress_callback: Optional[Callable[[Dict], None]] = None,
+    should_stop: Optional[Callable[[], bool]] = None
+) -> Dict:
+    """
+    多进程重新向量化论文、需求、发布需求、成果，中断后再次调用从检查点继续
+    kinds: 条目类型（papers / requirements / published_needs / achievements），默认全部
+    model_name: 默认原地重建当前启用版本；与当前版本不同时写入该模型的新版本，完成后补齐全文分块并切换（activate=False 时只标记 ready）
+    workers: 编码进程数，默认 CPU 核数 // threads
+    threads: 每个编码进程的推理线程数
+    shard_size: 每个分片的条目数（编码进程一次读取、向量化并传回的数量）
+    batch_size: 模型前向的批大小，默认 EMBEDDING_BATCH_SIZE
+    restart: 丢弃已有检查点，重新规划全部分片
+    progress_callback: 每个分片写入后调用，参数为当前统计信息
+    should_stop: 每次提交分片前调用，返回 True 时不再提交，等待在途分片写入后返回（下次运行继续）
+    返回: {"version", "model", "status", "workers", "threads", "total", "done", "written", "error",
+           "kinds": {类型: {"total", "written", "error", "rate"}}, "rate", "startup_seconds",
+           "encode_seconds", "write_seconds", "elapsed"}
+           rate 为编码进程就绪后的写入速度（条/s），规划分片和加载模型的耗时计入 startup_seconds
+    """
+    start_time = time.perf_counter()
+    vector_service = vector_service or get_vector_service()
+    names = kinds or list(ITEM_KINDS)
+    unknown = [name for name in names if name not in ITEM_KINDS]
+    if unknown:
+        raise ValueError(f"不支持的条目类型: {', '.join(unknown)}（可选: {', '.join(ITEM_KINDS)}）")
+    if threads < 1 or shard_size < 1 or (workers is not None and workers < 1):
+        raise ValueError("workers / threads / shard_size 必须大于 0")
+    selected = [ITEM_KINDS[name] for name in names]
+
+    new_version = bool(model_name) and model_name != vector_service.model_name
+    version = vector_service.registry.create(model_name) if new_version else vector_service.active_version
+    view = vector_service.version_view(version)
+    model_name = view.model_name
+    backend = vector_service.embedding_backend
+    workers = workers or max(1, (os.cpu_count() or 1) // threads)
+    batch_size = batch_size or vector_service.embed_batch_size
+
+    path = checkpoint_path(vector_service, version)
+    if restart and path.exists():
+        path.unlink()
+    checkpoint = _Checkpoint(path)
+    meta = {"version": version, "model": model_name, "backend": backend,
+            "kinds": ",".join(names), "shard_size": str(shard_size)}
+    recorded = checkpoint.meta()
+    if recorded.get("planned_at"):
+        mismatched = [key for key in meta if recorded.get(key) != meta[key]]
+        if mismatched:
+            checkpoint.close()
+            raise ValueError(f"检查点 {path} 属于参数不同的另一次重建（{', '.join(mismatched)} 不一致），"
+                             f"完成或使用 restart 重新开始")
+        logger.info(f"从检查点 {path} 继续（规划于 {recorded['planned_at']}）")
+    else:
+        checkpoint.reset(meta)
+        _plan_shards(checkpoint, selected, shard_size)
+
+    shards = checkpoint.shards(names)
+    pending = [shard for shard in shards if shard[5] != SHARD_DONE]
+    result = {
+        "version": version, "model": model_name, "backend": backend, "status": None,
+        "workers": workers, "threads": threads,
+        "total": sum(shard[4] for shard in shards),
+        "done": sum(shard[4] for shard in shards if shard[5] == SHARD_DONE),
+        "written": 0, "error": 0, "failed_shards": 0,
+        "kinds": {name: {"total": sum(shard[4] for shard in shards if shard[0] == name), "written": 0, "error": 0}
+                  for name in names},
+        "encode_seconds": 0.0, "write_seconds": 0.0, "startup_seconds": None,
+    }
+    # 编码进程就绪（模型加载完成）的时间：吞吐从这里开始计算，规划和模型加载计入 startup_seconds
+    ready_at = [None]
+    logger.info(f"重新向量化 {version}（{model_name}，后端 {backend}）：共 {result['total']} 条，"
+                f"已完成 {result['done']} 条，待处理 {len(pending)} 个分片；"
+                f"{workers} 个编码进程 × {threads} 线程")
+
+    kind_started: Dict[str, float] = {}
+    kind_finished: Dict[str, float] = {}
+    stopped = False
+    try:
+        if pending:
+            stopped = _run_pool(view, pending, result, checkpoint, workers, threads, batch_size, ready_at,
+                                kind_started, kind_finished, progress_callback, should_stop)
+    finally:
+        checkpoint.close()
+
+    end_time = time.perf_counter()
+    for name, stats in result["kinds"].items():
+        # 失败的分片也会记录 kind_finished；没有任何分片成功时 ready_at 仍为 None
+        if name in kind_finished and ready_at[0] is not None:
+            duration = kind_finished[name] - max(kind_started[name], ready_at[0])
+            stats["rate"] = round(stats["written"] / duration, 1) if duration > 0 else None
+        else:
+            stats["rate"] = None
+    result.update(elapsed=round(end_time - start_time, 1),
+                  encode_seconds=round(result["encode_seconds"], 1), write_seconds=round(result["write_seconds"], 1))
+    if ready_at[0] is not None:
+        result["startup_seconds"] = round(ready_at[0] - start_time, 1)
+        result["rate"] = round(result["written"] / (end_time - ready_at[0]), 1) if end_time > ready_at[0] else None
+    else:
+        result["rate"] = None
+
+    if stopped or result["failed_shards"]:
+        result["status"] = "stopped" if stopped else "incomplete"
+        logger.info(f"重新向量化未完成（{result['failed_shards']} 个分片失败），检查点保留在 {path}，重新运行继续")
+        return result
+
+    path.unlink(missing_ok=True)
+    result["status"] = "done"
+    # npy 压缩模式：行数达到阈值的集合在写完后训练 PQ 码本
+    vector_service.train_pending_pq()
+    if new_version:
+        # 补齐重建期间新增的论文 / 需求 / 成果和全文分块，标记 ready 并按 activate 切换
+        from services.paper_indexer import rebuild_embedding_version
+        finished = rebuild_embedding_version(model_name, vector_service, activate=activate)
+        result.update(status=finished["status"], counts=finished.get("counts"),
+                      elapsed=round(time.perf_counter() - start_time, 1))
+    logger.info(f"重新向量化完成：写入 {result['written']} 条，耗时 {result['elapsed']} 秒，{result['rate']} 条/s")
+    return result
+
+
+def _run_pool(view: VectorService, pending: List[Tuple], result: Dict, checkpoint: _Checkpoint,
+              workers: int, threads: int, batch_size: int, ready_at: List[Optional[float]],
+              kind_started: Dict[str, float], kind_finished: Dict[str, float],
+              progress_callback: Optional[Callable[[Dict], None]],
+              should_stop: Optional[Callable[[], bool]]) -> bool:
+    """编码进程池 + 单写入方主循环，返回是否因 should_stop 提前结束"""
+    queue = iter(pending)
+    in_flight = {}
+    stopped = False
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_worker,
+                             initargs=(view.model_name, result["backend"], threads)) as executor:
+
+        def submit_next() -> None:
+            nonlocal stopped
+            if stopped:
+                return
+            if should_stop and should_stop():
+                stopped = True
+                logger.info(f"收到停止请求，等待 {len(in_flight)} 个在途分片写入后退出")
+                return
+            shard = next(queue, None)
+            if shard is not None:
+                kind_name, index, first_key, end_key = shard[:4]
+                kind_started.setdefault(kind_name, time.perf_counter())
+                future = executor.submit(_encode_shard, kind_name, first_key, end_key, batch_size)
+                in_flight[future] = shard
+
+        for _ in range(workers * 2):
+            submit_next()
+
+        while in_flight:
+            finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in finished:
+                kind_name, index, _, _, rows, _ = in_flight.pop(future)
+                kind = ITEM_KINDS[kind_name]
+                stats = result["kinds"][kind_name]
+                try:
+                    encoded = future.result()
+                    if ready_at[0] is None:
+                        ready_at[0] = time.perf_counter() - encoded["encode_seconds"]
+                    write_start = time.perf_counter()
+                    if encoded["ids"]:
+                        getattr(view, kind.collection_attr).upsert(
+                            ids=encoded["ids"], embeddings=encoded["embeddings"].tolist(),
+                            metadatas=encoded["metadatas"]
+                        )
+                        view._cache_put(encoded["texts"], encoded["embeddings"], view.model_id)
+                    checkpoint.mark(kind_name, index, SHARD_DONE)
+                    result["write_seconds"] += time.perf_counter() - write_start
+                    result["encode_seconds"] += encoded["encode_seconds"]
+                    result["written"] += len(encoded["ids"])
+                    stats["written"] += len(encoded["ids"])
+                    result["done"] += rows
+                except BrokenProcessPool:
+                    raise RuntimeError("编码进程异常退出（可能是内存不足，可减少 workers 或 shard_size），"
+                                       "已写入的分片保存在检查点中，重新运行继续")
+                except Exception as e:
+                    checkpoint.mark(kind_name, index, SHARD_FAILED, str(e)[:500])
+                    result["error"] += rows
+                    result["failed_shards"] += 1
+                    stats["error"] += rows
+                    logger.error(f"{kind.label}分片 {index} 失败（{rows} 条）: {str(e)[:200]}")
+                kind_finished[kind_name] = time.perf_counter()
+
+                elapsed = time.perf_counter() - ready_at[0] if ready_at[0] is not None else 0
+                rate = result["written"] / elapsed if elapsed > 0 else 0
+                remaining = result["total"] - result["done"] - result["error"]
+                eta = f"，预计剩余 {remaining / rate:.0f} 秒" if rate > 0 else ""
+                logger.info(f"重新向量化进度 {result['done']}/{result['total']}（{kind.label}分片 {index}，"
+                            f"{rate:.1f} 条/s{eta}）")
+                if progress_callback:
+                    progress_callback({key: value for key, value in result.items() if key != "kinds"})
+                submit_next()
+    return stopped
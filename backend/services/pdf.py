@@ -85,6 +85,9 @@ class PDFService:
     def __init__(self):
         self.temp_dir = Path(tempfile.gettempdir()) / "arxiv_pdfs"
         self.temp_dir.mkdir(exist_ok=True)
+        # 新解析的全文在后台切块写入分块向量集合（CHUNK_INDEX=false 时关闭）
+        self.chunk_index_enabled = os.getenv("CHUNK_INDEX", "true").lower() == "true"
+        self._chunk_tasks = set()
     
     def download_pdf(self, pdf_url: str, arxiv_id: str) -> Optional[Path]:
         """
@@ -173,6 +176,7 @@ class PDFService:
             if text:
                 save_paper_content_cache(arxiv_id, pdf_url, text, max_pages)
                 logger.info(f"论文解析内容已保存到缓存: {arxiv_id}")
+                self._schedule_chunk_indexing(arxiv_id, text)
             
             return text
             
@@ -180,6 +184,24 @@ class PDFService:
             logger.error(f"获取论文内容失败 {arxiv_id}: {e}")
             return None
     
+    def _schedule_chunk_indexing(self, arxiv_id: str, text: str) -> None:
+        """后台将新解析的全文切块并写入分块集合，不阻塞 get_paper_content 返回"""
+        if not self.chunk_index_enabled:
+            return
+        task = asyncio.create_task(self._index_paper_chunks(arxiv_id, text))
+        # 保留任务引用，避免任务在完成前被回收
+        self._chunk_tasks.add(task)
+        task.add_done_callback(self._chunk_tasks.discard)
+    
+    async def _index_paper_chunks(self, arxiv_id: str, text: str) -> None:
+        try:
+            # 延迟导入：PDF 解析子进程不需要加载向量服务
+            from services.paper_indexer import aindex_paper_chunks
+            await aindex_paper_chunks(arxiv_id, text)
+        except Exception as e:
+            # 失败只记录日志，可运行 scripts/index_paper_chunks.py 补齐
+            logger.warning(f"论文 {arxiv_id} 全文分块索引失败: {e}")
+    
     def cleanup_temp_files(self, arxiv_id: Optional[str] = None):
         """
         清理临时文件
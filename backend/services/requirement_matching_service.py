@@ -1,30 +1,81 @@
 """
 需求匹配服务 - 科研成果找需求（优化版）
 """
+import asyncio
 import logging
 import time
-from typing import List, Dict
+from typing import List, Dict, Optional, Tuple
 from database.database import get_db_connection
 from services.vector_service import get_vector_service
 from services.llm_service import get_llm_service
 from services.matching_service import validate_user_input
+from services.requirement_similarity import get_similar_requirements, requirement_set_is_current
 
 logger = logging.getLogger(__name__)
 
+def _find_indexed_paper(paper_id: Optional[str], paper_title: str) -> Optional[Dict]:
+    """按 arxiv_id（优先）或完全相同的标题查找库中的论文，返回 {arxiv_id, title, abstract}"""
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        if paper_id:
+            cursor.execute("SELECT arxiv_id, title, abstract FROM papers WHERE arxiv_id = ?", (paper_id,))
+        elif paper_title and paper_title.strip() and paper_title != "论文":
+            cursor.execute("SELECT arxiv_id, title, abstract FROM papers WHERE title = ? LIMIT 1", (paper_title.strip(),))
+        else:
+            return None
+        row = cursor.fetchone()
+        return dict(row) if row else None
+    finally:
+        conn.close()
+
+def _precomputed_requirements(paper_id: str, top_k: int, vector_service) -> Optional[List[Tuple[str, float]]]:
+    """
+    读取论文的预计算近邻需求（requirement_similarity 物化表，同步，在线程中调用）
+    没有当前向量版本的结果、预计算后发布/下架过需求、或预计算的数量不足 top_k 时返回 None（回退到向量检索）
+    """
+    neighbours = get_similar_requirements(paper_id, limit=top_k, embedding_version=vector_service.active_version)
+    if not neighbours:
+        return None
+    if not requirement_set_is_current(vector_service):
+        logger.info("预计算后需求集合已变化，回退到向量检索（重新计算需求-论文相似度后恢复）")
+        return None
+    if len(neighbours) < top_k and len(neighbours) < vector_service.requirement_collection.count():
+        return None
+    return neighbours
+
 async def match_requirements_for_paper(
     paper_title: str, 
     paper_abstract: str,
     paper_categories: str = "",
-    top_k: int = 20
+    top_k: int = 20,
+    paper_id: Optional[str] = None
 ) -> List[Dict]:
     """
     为科研成果匹配需求（优化版：使用查询扩展，与需求匹配流程一致）
+    paper_id: 库中论文的 arxiv_id；成果是已索引的论文（按 paper_id 或标题找到）且已预计算近邻时，
+              直接读取预计算的近邻需求，跳过查询扩展和向量检索
     """
     try:
         start_time = time.time()
         llm_service = get_llm_service()
         vector_service = get_vector_service()
         
+        # ---------------------------------------------------------
+        # 已索引的论文：读取预计算的近邻需求
+        # ---------------------------------------------------------
+        similar_requirements = None
+        coarse_start_time = time.time()
+        indexed_paper = await asyncio.to_thread(_find_indexed_paper, paper_id, paper_title)
+        if indexed_paper:
+            similar_requirements = await asyncio.to_thread(
+                _precomputed_requirements, indexed_paper["arxiv_id"], top_k, vector_service
+            )
+            if paper_id and not (paper_abstract or "").strip():
+                # 只传了 paper_id：用库中的标题和摘要做 LLM 评估
+                paper_title = indexed_paper["title"]
+                paper_abstract = indexed_paper["abstract"] or ""
+        
         # 合并用户输入的成果文字
         achievement_text = f"{paper_title}\n{paper_abstract}".strip()
         
@@ -36,31 +87,36 @@ async def match_requirements_for_paper(
             logger.warning(f"输入质量检测失败: {reason}, 输入: {achievement_text[:50]}...")
             return []  # 直接返回空结果，不进行查询扩展和向量搜索
         
-        # ---------------------------------------------------------
-        # 步骤 1: 查询扩展 (Query Expansion) - 与需求匹配一致
-        # ---------------------------------------------------------
-        # 如果paper_title是默认值"论文"，只显示paper_abstract用于日志
-        if paper_title and paper_title.strip() and paper_title != "论文":
-            logger.info(f"原始成果: {achievement_text[:200]}...")
+        if similar_requirements is not None:
+            coarse_elapsed = time.time() - coarse_start_time
+            logger.info(f"论文 {indexed_paper['arxiv_id']} 使用预计算的近邻需求: {len(similar_requirements)} 个"
+                        f"（耗时 {coarse_elapsed:.3f} 秒，跳过查询扩展和向量搜索）")
         else:
-            logger.info(f"原始成果: {paper_abstract[:200]}...")
-        expanded_query = await llm_service.expand_query(achievement_text)
-        
-        # 检查LLM是否判断输入无意义
-        if expanded_query and expanded_query.strip().upper() == "[INVALID_INPUT]":
-            logger.warning(f"LLM判断输入无意义: {achievement_text[:50]}...")
-            return []  # 直接返回空结果
-        
-        # ---------------------------------------------------------
-        # 步骤 2: 向量搜索 (Coarse Ranking)
-        # ---------------------------------------------------------
-        logger.info(f"使用增强Query进行向量搜索...")
-        coarse_start_time = time.time()
-        similar_requirements = vector_service.search_requirements(expanded_query, top_k=top_k)
-        coarse_elapsed = time.time() - coarse_start_time
-        
-        logger.info(f"向量搜索（粗排）耗时: {coarse_elapsed:.2f} 秒")
-        logger.info(f"向量搜索返回: {len(similar_requirements)} 个需求")
+            # ---------------------------------------------------------
+            # 步骤 1: 查询扩展 (Query Expansion) - 与需求匹配一致
+            # ---------------------------------------------------------
+            # 如果paper_title是默认值"论文"，只显示paper_abstract用于日志
+            if paper_title and paper_title.strip() and paper_title != "论文":
+                logger.info(f"原始成果: {achievement_text[:200]}...")
+            else:
+                logger.info(f"原始成果: {paper_abstract[:200]}...")
+            expanded_query = await llm_service.expand_query(achievement_text)
+            
+            # 检查LLM是否判断输入无意义
+            if expanded_query and expanded_query.strip().upper() == "[INVALID_INPUT]":
+                logger.warning(f"LLM判断输入无意义: {achievement_text[:50]}...")
+                return []  # 直接返回空结果
+            
+            # ---------------------------------------------------------
+            # 步骤 2: 向量搜索 (Coarse Ranking)
+            # ---------------------------------------------------------
+            logger.info(f"使用增强Query进行向量搜索...")
+            coarse_start_time = time.time()
+            similar_requirements = await vector_service.asearch_requirements(expanded_query, top_k=top_k)
+            coarse_elapsed = time.time() - coarse_start_time
+            
+            logger.info(f"向量搜索（粗排）耗时: {coarse_elapsed:.2f} 秒")
+            logger.info(f"向量搜索返回: {len(similar_requirements)} 个需求")
         
         if not similar_requirements:
             return []
@@ -0,0 +1,327 @@
+"""
+需求-论文相似度预计算 - 双向 Top-N 近邻物化到 requirement_paper_similarity 表
+
+企业需求（requirements 表 + 已发布需求，通常几百条以内）相对固定，却会被反复拿来和论文匹配。
+这里把需求集合和论文集合中的向量读成矩阵，分块做矩阵乘法，一次算出两个方向的近邻：
+
+    direction = 'req2paper'   每条需求最相似的 N 篇论文（需求详情页）
+    direction = 'paper2req'   每篇论文最相似的 N 条需求（科研成果找需求）
+
+- 全量计算：论文向量按 block_size 分页读取，每页与需求矩阵相乘，内存中只保留一页论文向量
+  和两个方向的 Top-N（论文方向用 numpy 数组保存），算完后在一个事务中替换表内容
+- 增量刷新：只计算新索引的论文（表中还没有 paper2req 记录的论文），新论文的分数与每条需求
+  现有的 Top-N 合并（Top-N(旧 ∪ 新) = Top-N(旧 Top-N ∪ 新)），结果与全量计算一致；
+  需求集合变化、向量模型版本切换或表为空时自动改为全量计算
+- 向量集合为余弦空间，分数为余弦相似度（与向量检索返回的 1 - distance 一致）
+- 记录带 embedding_version，读取时只使用当前向量版本的结果，没有结果时由调用方回退到向量检索
+- 发布/下架需求后表中的需求集合与向量集合不一致，读取方用 requirement_set_is_current 检查，
+  不一致时回退到向量检索，直到下次刷新（自动改为全量计算）
+
+运行方式见 scripts/compute_requirement_similarity.py；/index-papers 新增论文后自动增量刷新。
+"""
+import logging
+import os
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from database.database import get_db_connection
+from services.vector_service import VectorService, get_vector_service
+
+logger = logging.getLogger(__name__)
+
+DIRECTION_REQ2PAPER = "req2paper"
+DIRECTION_PAPER2REQ = "paper2req"
+
+# 每条需求保留的论文数 / 每篇论文保留的需求数
+# 论文方向的行数 = 论文数 × N，是表大小的主要部分；请求的 top_k 超过保存的数量时回退到向量检索
+DEFAULT_TOP_PAPERS = int(os.getenv("REQUIREMENT_SIMILARITY_TOP_PAPERS", "50"))
+DEFAULT_TOP_REQUIREMENTS = int(os.getenv("REQUIREMENT_SIMILARITY_TOP_REQUIREMENTS", "20"))
+# 每次读取并参与矩阵乘法的论文向量数量
+DEFAULT_BLOCK_SIZE = 8192
+
+
+def _normalize(vectors) -> np.ndarray:
+    matrix = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def _top_k(scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """按行取分数最高的 k 列，返回 (列下标, 分数)，每行按分数降序"""
+    k = min(k, scores.shape[1])
+    if k <= 0:
+        empty = np.empty((scores.shape[0], 0))
+        return empty.astype(np.int64), empty.astype(np.float32)
+    if k < scores.shape[1]:
+        idx = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        idx = np.broadcast_to(np.arange(k), scores.shape).copy()
+    part = np.take_along_axis(scores, idx, axis=1)
+    order = np.argsort(-part, axis=1, kind="stable")
+    return np.take_along_axis(idx, order, axis=1), np.take_along_axis(part, order, axis=1)
+
+
+def _load_vectors(collection, ids: Optional[Sequence[str]] = None, page_size: int = DEFAULT_BLOCK_SIZE):
+    """
+    分页读取集合中的向量
+    ids: 只读取这些ID（None 为整个集合）
+    返回: 生成器，每次产出 (ID列表, 归一化后的向量矩阵)
+    """
+    if ids is not None:
+        ids = list(ids)
+        for start in range(0, len(ids), page_size):
+            page = collection.get(ids=ids[start:start + page_size], include=["embeddings"])
+            if page.get("ids"):
+                yield list(page["ids"]), _normalize(page["embeddings"])
+        return
+
+    offset = 0
+    while True:
+        page = collection.get(include=["embeddings"], limit=page_size, offset=offset)
+        page_ids = page.get("ids") or []
+        if not page_ids:
+            break
+        yield list(page_ids), _normalize(page["embeddings"])
+        if len(page_ids) < page_size:
+            break
+        offset += len(page_ids)
+
+
+class _NeighbourAccumulator:
+    """逐块累积两个方向的 Top-N"""
+
+    def __init__(self, requirement_ids: List[str], requirement_matrix: np.ndarray, top_papers: int, top_requirements: int):
+        self.requirement_ids = np.array(requirement_ids, dtype=object)
+        self.requirement_matrix = requirement_matrix
+        self.top_papers = top_papers
+        self.top_requirements = top_requirements
+        # 需求方向：每条需求当前的 Top-N（论文ID, 分数）
+        self.best_paper_ids = np.empty((len(requirement_ids), 0), dtype=object)
+        self.best_paper_scores = np.empty((len(requirement_ids), 0), dtype=np.float32)
+        # 论文方向：每块的 (论文ID, 需求下标, 分数)
+        self.paper_blocks: List[Tuple[List[str], np.ndarray, np.ndarray]] = []
+
+    def seed(self, existing: Dict[str, List[Tuple[str, float]]]) -> None:
+        """用表中已有的需求 Top-N 初始化（增量刷新）"""
+        width = max((len(v) for v in existing.values()), default=0)
+        ids = np.full((len(self.requirement_ids), width), None, dtype=object)
+        scores = np.full((len(self.requirement_ids), width), -np.inf, dtype=np.float32)
+        for row, requirement_id in enumerate(self.requirement_ids):
+            for col, (paper_id, score) in enumerate(existing.get(requirement_id, [])):
+                ids[row, col] = paper_id
+                scores[row, col] = score
+        self.best_paper_ids, self.best_paper_scores = ids, scores
+
+    def add_block(self, paper_ids: List[str], paper_matrix: np.ndarray) -> None:
+        scores = paper_matrix @ self.requirement_matrix.T  # (论文数, 需求数)
+
+        req_idx, req_scores = _top_k(scores, self.top_requirements)
+        self.paper_blocks.append((paper_ids, req_idx.astype(np.int32), req_scores.astype(np.float32)))
+
+        paper_idx, paper_scores = _top_k(scores.T, self.top_papers)
+        merged_ids = np.concatenate([self.best_paper_ids, np.array(paper_ids, dtype=object)[paper_idx]], axis=1)
+        merged_scores = np.concatenate([self.best_paper_scores, paper_scores], axis=1)
+        keep, self.best_paper_scores = _top_k(merged_scores, self.top_papers)
+        self.best_paper_ids = np.take_along_axis(merged_ids, keep, axis=1)
+
+    def req2paper_rows(self, version: str):
+        for row, requirement_id in enumerate(self.requirement_ids):
+            rank = 0
+            for paper_id, score in zip(self.best_paper_ids[row], self.best_paper_scores[row]):
+                if paper_id is None or not np.isfinite(score):
+                    continue
+                rank += 1
+                yield (DIRECTION_REQ2PAPER, requirement_id, paper_id, rank, float(score), version)
+
+    def paper2req_rows(self, version: str):
+        for paper_ids, req_idx, req_scores in self.paper_blocks:
+            for row, paper_id in enumerate(paper_ids):
+                for rank, (col, score) in enumerate(zip(req_idx[row], req_scores[row]), start=1):
+                    yield (DIRECTION_PAPER2REQ, self.requirement_ids[col], paper_id, rank, float(score), version)
+
+    @property
+    def paper_count(self) -> int:
+        return sum(len(block[0]) for block in self.paper_blocks)
+
+
+def _materialized_state(cursor) -> Dict:
+    """表中现有结果：向量版本集合、需求ID集合、已计算的论文ID集合"""
+    cursor.execute("SELECT DISTINCT embedding_version FROM requirement_paper_similarity")
+    versions = {row[0] for row in cursor.fetchall()}
+    cursor.execute("SELECT DISTINCT requirement_id FROM requirement_paper_similarity WHERE direction = ?",
+                   (DIRECTION_REQ2PAPER,))
+    requirement_ids = {row[0] for row in cursor.fetchall()}
+    cursor.execute("SELECT DISTINCT paper_id FROM requirement_paper_similarity WHERE direction = ?",
+                   (DIRECTION_PAPER2REQ,))
+    paper_ids = {row[0] for row in cursor.fetchall()}
+    return {"versions": versions, "requirement_ids": requirement_ids, "paper_ids": paper_ids}
+
+
+def is_materialized(embedding_version: Optional[str] = None) -> bool:
+    """表中是否有（指定向量版本的）预计算结果"""
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        if embedding_version:
+            cursor.execute("SELECT 1 FROM requirement_paper_similarity WHERE embedding_version = ? LIMIT 1",
+                           (embedding_version,))
+        else:
+            cursor.execute("SELECT 1 FROM requirement_paper_similarity LIMIT 1")
+        return cursor.fetchone() is not None
+    finally:
+        conn.close()
+
+
+def requirement_set_is_current(vector_service: Optional[VectorService] = None) -> bool:
+    """当前向量版本预计算时的需求集合是否与需求向量集合一致（发布/下架需求后不一致，paper2req 结果已过期）"""
+    vector_service = vector_service or get_vector_service()
+    embedding_version = vector_service.active_version
+    requirement_collection = vector_service.requirement_collection
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT DISTINCT requirement_id FROM requirement_paper_similarity
+            WHERE direction = ? AND embedding_version = ?
+        """, (DIRECTION_REQ2PAPER, embedding_version))
+        materialized = {row[0] for row in cursor.fetchall()}
+    finally:
+        conn.close()
+    if len(materialized) != requirement_collection.count():
+        return False
+    current = set()
+    for ids in vector_service.iter_ids(requirement_collection):
+        current.update(ids)
+    return current == materialized
+
+
+def refresh_requirement_paper_similarity(
+    vector_service: Optional[VectorService] = None,
+    full: bool = False,
+    top_papers: int = DEFAULT_TOP_PAPERS,
+    top_requirements: int = DEFAULT_TOP_REQUIREMENTS,
+    block_size: int = DEFAULT_BLOCK_SIZE
+) -> Dict:
+    """
+    计算并写入需求-论文双向 Top-N
+    full: 强制全量计算（需求内容修改后使用）；默认只计算新索引的论文
+    返回: {"mode": "full"/"incremental", "embedding_version", "requirements", "papers", "rows", "elapsed"}
+    """
+    start_time = time.time()
+    vector_service = vector_service or get_vector_service()
+    # 固定在当前版本上，计算期间切换版本不影响本次结果
+    version = vector_service.active_version
+    view = vector_service.version_view(version)
+
+    requirement_ids: List[str] = []
+    requirement_vectors = []
+    for ids, matrix in _load_vectors(view.requirement_collection, page_size=block_size):
+        requirement_ids.extend(ids)
+        requirement_vectors.append(matrix)
+
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        state = _materialized_state(cursor)
+        new_paper_ids = None
+        if not full:
+            if state["versions"] != {version} or state["requirement_ids"] != set(requirement_ids):
+                if state["versions"]:
+                    logger.info("需求集合或向量版本已变化，改为全量计算需求-论文相似度")
+                full = True
+            else:
+                new_paper_ids = []
+                for ids in view.iter_ids(page_size=max(block_size, 10000)):
+                    new_paper_ids.extend(i for i in ids if i not in state["paper_ids"])
+
+        if not requirement_ids:
+            cursor.execute("DELETE FROM requirement_paper_similarity")
+            conn.commit()
+            logger.info("需求集合为空，已清空需求-论文相似度表")
+            return {"mode": "full", "embedding_version": version, "requirements": 0, "papers": 0,
+                    "rows": 0, "elapsed": round(time.time() - start_time, 2)}
+
+        accumulator = _NeighbourAccumulator(requirement_ids, np.vstack(requirement_vectors),
+                                            top_papers, top_requirements)
+        if not full:
+            if not new_paper_ids:
+                logger.info("没有新索引的论文，需求-论文相似度无需刷新")
+                return {"mode": "incremental", "embedding_version": version, "requirements": len(requirement_ids),
+                        "papers": 0, "rows": 0, "elapsed": round(time.time() - start_time, 2)}
+            cursor.execute("""
+                SELECT requirement_id, paper_id, score FROM requirement_paper_similarity
+                WHERE direction = ? ORDER BY requirement_id, rank
+            """, (DIRECTION_REQ2PAPER,))
+            existing: Dict[str, List[Tuple[str, float]]] = {}
+            for row in cursor.fetchall():
+                existing.setdefault(row[0], []).append((row[1], row[2]))
+            accumulator.seed(existing)
+
+        for paper_ids, matrix in _load_vectors(view.collection, ids=new_paper_ids, page_size=block_size):
+            accumulator.add_block(paper_ids, matrix)
+            logger.info(f"需求-论文相似度计算进度: {accumulator.paper_count} 篇论文")
+        compute_elapsed = time.time() - start_time
+
+        # 计算完成后一次性写入（单个事务，读取方不会看到中间状态）
+        if full:
+            cursor.execute("DELETE FROM requirement_paper_similarity")
+        else:
+            cursor.execute("DELETE FROM requirement_paper_similarity WHERE direction = ?", (DIRECTION_REQ2PAPER,))
+        insert_sql = """
+            INSERT OR REPLACE INTO requirement_paper_similarity
+            (direction, requirement_id, paper_id, rank, score, embedding_version)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """
+        cursor.executemany(insert_sql, accumulator.req2paper_rows(version))
+        rows = cursor.rowcount if cursor.rowcount > 0 else 0
+        cursor.executemany(insert_sql, accumulator.paper2req_rows(version))
+        rows += cursor.rowcount if cursor.rowcount > 0 else 0
+        conn.commit()
+    finally:
+        conn.close()
+
+    elapsed = time.time() - start_time
+    mode = "full" if full else "incremental"
+    logger.info(f"需求-论文相似度{'全量计算' if full else '增量刷新'}完成: {len(requirement_ids)} 条需求 × "
+                f"{accumulator.paper_count} 篇论文，写入 {rows} 条，计算 {compute_elapsed:.2f} 秒，总耗时 {elapsed:.2f} 秒")
+    return {"mode": mode, "embedding_version": version, "requirements": len(requirement_ids),
+            "papers": accumulator.paper_count, "rows": rows, "elapsed": round(elapsed, 2)}
+
+
+def _query_neighbours(direction: str, key_column: str, key: str, limit: int,
+                      embedding_version: Optional[str]) -> Optional[List[Tuple[str, float]]]:
+    value_column = "paper_id" if key_column == "requirement_id" else "requirement_id"
+    embedding_version = embedding_version or get_vector_service().active_version
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(f"""
+            SELECT {value_column}, score FROM requirement_paper_similarity
+            WHERE direction = ? AND {key_column} = ? AND embedding_version = ?
+            ORDER BY rank LIMIT ?
+        """, (direction, key, embedding_version, limit))
+        rows = cursor.fetchall()
+    finally:
+        conn.close()
+    return [(row[0], row[1]) for row in rows] or None
+
+
+def get_similar_papers(requirement_id: str, limit: int = 10,
+                       embedding_version: Optional[str] = None) -> Optional[List[Tuple[str, float]]]:
+    """
+    读取需求的预计算近邻论文
+    返回: [(arxiv_id, score), ...]，按分数降序；没有当前向量版本的结果时返回 None
+    """
+    return _query_neighbours(DIRECTION_REQ2PAPER, "requirement_id", requirement_id, limit, embedding_version)
+
+
+def get_similar_requirements(paper_id: str, limit: int = 20,
+                             embedding_version: Optional[str] = None) -> Optional[List[Tuple[str, float]]]:
+    """
+    读取论文的预计算近邻需求
+    返回: [(requirement_id, score), ...]，按分数降序；没有当前向量版本的结果时返回 None
+    """
+    return _query_neighbours(DIRECTION_PAPER2REQ, "paper_id", paper_id, limit, embedding_version)
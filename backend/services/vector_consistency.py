@@ -0,0 +1,388 @@
+"""
+SQLite ↔ 向量库一致性检查与修复
+
+逐类比对 SQLite 与当前启用向量版本中的条目：论文（papers 集合）、需求（requirements 表 active）、
+发布需求（published_needs 表 published，向量ID published_need_<id>）、成果（published_achievements 表 published，
+向量ID achievement_<id>），分为四种问题：
+
+- missing：SQLite 中有、向量库中没有 -> 向量化后写入
+- orphaned：向量库中有、SQLite 中已删除或不再有效（需求非 active、发布需求 / 成果非 published）-> 删除
+- stale：两边都有，但向量化文本已变化 -> 重新向量化
+- unhashed：旧版本写入、元数据中没有 text_hash 的向量，按元数据中保存的字段（标题、截断的摘要/描述等）
+  与 SQLite 比对未变化 -> 只补写 text_hash，不重新向量化；比对不一致的算作 stale
+
+写入向量时元数据记录向量化文本的 sha256（text_hash，见 VectorService._with_text_hash），
+检查时按同样的方式从 SQLite 构建文本并计算哈希，不需要读取向量。
+
+内存有界：两边的 (ID, 哈希) 分页流式写入临时 SQLite 文件，差集用 SQL 计算，修复时再按ID顺序分页读取，
+进程内同时只持有一页数据，与条目总数无关。
+"""
+import logging
+import sqlite3
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from database.database import get_db_connection
+from services.embedding_cache import text_hash
+from services.vector_service import VectorService, get_vector_service
+
+logger = logging.getLogger(__name__)
+
+ISSUE_MISSING = "missing"
+ISSUE_ORPHANED = "orphaned"
+ISSUE_STALE = "stale"
+ISSUE_UNHASHED = "unhashed"
+ISSUES = (ISSUE_MISSING, ISSUE_ORPHANED, ISSUE_STALE, ISSUE_UNHASHED)
+
+DEFAULT_PAGE_SIZE = 5000
+DEFAULT_BATCH_SIZE = 256
+DEFAULT_SAMPLE_SIZE = 10
+
+# SQLite IN 查询每次的参数数量
+_QUERY_CHUNK_SIZE = 500
+
+
+class _ItemKind(NamedTuple):
+    """一类条目在 SQLite 与向量库中的对应关系"""
+    name: str
+    label: str
+    collection_attr: str  # VectorService 上的集合属性
+    owns: Callable[[str], bool]  # 向量ID是否属于该类（需求集合中同时有需求和发布需求）
+    table: str
+    key_column: str
+    columns: str
+    where: str
+    vector_id: Callable[[Dict], str]  # SQLite 行 -> 向量ID
+    key: Callable[[str], object]  # 向量ID -> SQLite 主键
+    text: Callable[[Dict], str]  # 与 add_* 完全一致的向量化文本
+    metadata: Callable[[Dict], Dict]  # 与 add_* 完全一致的元数据（不含 text_hash）
+    legacy_fields: Tuple[str, ...]  # 没有 text_hash 的旧向量用这些元数据字段比对
+
+
+_PUBLISHED_NEED_PREFIX = "published_need_"
+_ACHIEVEMENT_PREFIX = "achievement_"
+
+ITEM_KINDS: Dict[str, _ItemKind] = {
+    kind.name: kind for kind in (
+        _ItemKind(
+            name="papers", label="论文", collection_attr="collection", owns=lambda vector_id: True,
+            table="papers", key_column="arxiv_id",
+            columns="arxiv_id, title, abstract, categories, published_date",
+            where="arxiv_id IS NOT NULL AND title IS NOT NULL",
+            vector_id=lambda row: row["arxiv_id"], key=lambda vector_id: vector_id,
+            text=lambda row: VectorService._build_paper_text(row["title"], row["abstract"] or ""),
+            metadata=lambda row: VectorService._build_paper_metadata(
+                row["title"], row["abstract"] or "", row["categories"], row["published_date"]),
+            legacy_fields=("title", "abstract")
+        ),
+        _ItemKind(
+            name="requirements", label="需求", collection_attr="requirement_collection",
+            owns=lambda vector_id: not vector_id.startswith(_PUBLISHED_NEED_PREFIX),
+            table="requirements", key_column="requirement_id",
+            columns="requirement_id, title, description, industry, pain_points",
+            where="status = 'active'",
+            vector_id=lambda row: row["requirement_id"], key=lambda vector_id: vector_id,
+            text=lambda row: VectorService._build_requirement_text(
+                row["title"] or "", row["description"] or "", row["industry"] or "", row["pain_points"] or ""),
+            metadata=lambda row: VectorService._build_requirement_metadata(
+                row["title"] or "", row["description"] or "", row["industry"] or ""),
+            legacy_fields=("title", "description", "industry")
+        ),
+        _ItemKind(
+            name="published_needs", label="发布需求", collection_attr="requirement_collection",
+            owns=lambda vector_id: vector_id.startswith(_PUBLISHED_NEED_PREFIX),
+            table="published_needs", key_column="id",
+            columns="id, title, description, industry",
+            where="status = 'published'",
+            vector_id=lambda row: f"{_PUBLISHED_NEED_PREFIX}{row['id']}",
+            key=lambda vector_id: int(vector_id[len(_PUBLISHED_NEED_PREFIX):]),
+            text=lambda row: VectorService._build_published_need_text(
+                row["title"], row["description"] or "", row["industry"] or ""),
+            metadata=lambda row: VectorService._build_published_need_metadata(
+                row["title"], row["description"] or "", row["industry"] or ""),
+            legacy_fields=("title", "description", "industry")
+        ),
+        _ItemKind(
+            name="achievements", label="成果", collection_attr="achievement_collection",
+            owns=lambda vector_id: vector_id.startswith(_ACHIEVEMENT_PREFIX),
+            table="published_achievements", key_column="id",
+            columns="id, name, description, application, field",
+            where="status = 'published'",
+            vector_id=lambda row: f"{_ACHIEVEMENT_PREFIX}{row['id']}",
+            key=lambda vector_id: int(vector_id[len(_ACHIEVEMENT_PREFIX):]),
+            text=lambda row: VectorService._build_achievement_text(
+                row["name"], row["description"] or "", row["application"], row["field"]),
+            metadata=lambda row: VectorService._build_achievement_metadata(
+                row["name"], row["description"] or "", row["application"], row["field"]),
+            legacy_fields=("name", "description", "application", "field")
+        ),
+    )
+}
+
+
+def _legacy_fingerprint(metadata: Optional[Dict], fields: Tuple[str, ...]) -> str:
+    """旧向量（没有 text_hash）的比对指纹：元数据中保存的文本字段"""
+    metadata = metadata or {}
+    return text_hash("\x1f".join(str(metadata.get(field) or "") for field in fields))
+
+
+# 各类问题的ID查询：按ID顺序分页（keyset），返回 (向量ID, SQLite 侧文本哈希)
+_ISSUE_QUERIES = {
+    ISSUE_MISSING: """
+        SELECT d.id, d.text_hash FROM db_items d
+        WHERE d.kind = ? AND d.id > ?
+        AND NOT EXISTS (SELECT 1 FROM vector_items v WHERE v.kind = d.kind AND v.id = d.id)
+    """,
+    ISSUE_ORPHANED: """
+        SELECT v.id, NULL FROM vector_items v
+        WHERE v.kind = ? AND v.id > ?
+        AND NOT EXISTS (SELECT 1 FROM db_items d WHERE d.kind = v.kind AND d.id = v.id)
+    """,
+    ISSUE_STALE: """
+        SELECT d.id, d.text_hash FROM db_items d JOIN vector_items v ON v.kind = d.kind AND v.id = d.id
+        WHERE d.kind = ? AND d.id > ?
+        AND ((v.text_hash IS NOT NULL AND v.text_hash != d.text_hash)
+             OR (v.text_hash IS NULL AND v.legacy != d.legacy))
+    """,
+    ISSUE_UNHASHED: """
+        SELECT d.id, d.text_hash FROM db_items d JOIN vector_items v ON v.kind = d.kind AND v.id = d.id
+        WHERE d.kind = ? AND d.id > ?
+        AND v.text_hash IS NULL AND v.legacy = d.legacy
+    """,
+}
+
+
+class _Workspace:
+    """临时 SQLite 文件：两边的 (ID, 文本哈希, 旧向量指纹)，差集用 SQL 计算"""
+
+    def __init__(self, work_dir: Path):
+        self.conn = sqlite3.connect(str(Path(work_dir) / "consistency.db"))
+        self.conn.execute("PRAGMA journal_mode = OFF")
+        self.conn.execute("PRAGMA synchronous = OFF")
+        for table in ("vector_items", "db_items"):
+            self.conn.execute(f"""
+                CREATE TABLE {table} (
+                    kind TEXT NOT NULL,
+                    id TEXT NOT NULL,
+                    text_hash TEXT,
+                    legacy TEXT,
+                    PRIMARY KEY (kind, id)
+                ) WITHOUT ROWID
+            """)
+
+    def insert(self, table: str, rows: List[Tuple[str, str, Optional[str], str]]) -> None:
+        self.conn.executemany(f"INSERT OR REPLACE INTO {table} VALUES (?, ?, ?, ?)", rows)
+        self.conn.commit()
+
+    def count(self, table: str, kind: str) -> int:
+        return self.conn.execute(f"SELECT COUNT(*) FROM {table} WHERE kind = ?", (kind,)).fetchone()[0]
+
+    def count_issue(self, kind: str, issue: str) -> int:
+        query = _ISSUE_QUERIES[issue]
+        return self.conn.execute(f"SELECT COUNT(*) FROM ({query})", (kind, "")).fetchone()[0]
+
+    def iter_issue(self, kind: str, issue: str, page_size: int) -> Iterable[List[Tuple[str, Optional[str]]]]:
+        """按ID顺序分页读取某类问题的条目"""
+        query = f"{_ISSUE_QUERIES[issue]} ORDER BY 1 LIMIT ?"
+        last_id = ""
+        while True:
+            rows = self.conn.execute(query, (kind, last_id, page_size)).fetchall()
+            if not rows:
+                break
+            yield rows
+            last_id = rows[-1][0]
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+def _scan_vectors(view: VectorService, kinds: List[_ItemKind], workspace: _Workspace, page_size: int,
+                  progress_callback: Optional[Callable[[Dict], None]]) -> None:
+    """分页读取向量库的ID和元数据（不读取向量），按类写入工作区；同一集合只遍历一次"""
+    by_collection: Dict[str, List[_ItemKind]] = {}
+    for kind in kinds:
+        by_collection.setdefault(kind.collection_attr, []).append(kind)
+
+    for collection_attr, collection_kinds in by_collection.items():
+        collection = getattr(view, collection_attr)
+        scanned = 0
+        for page in view.iter_pages(collection, page_size=page_size, include=["metadatas"]):
+            rows = []
+            for vector_id, metadata in zip(page["ids"], page.get("metadatas") or [None] * len(page["ids"])):
+                kind = next((k for k in collection_kinds if k.owns(vector_id)), None)
+                if kind is None:
+                    continue
+                rows.append((kind.name, vector_id, (metadata or {}).get("text_hash"),
+                             _legacy_fingerprint(metadata, kind.legacy_fields)))
+            workspace.insert("vector_items", rows)
+            scanned += len(page["ids"])
+            if progress_callback:
+                progress_callback({"stage": "scan_vectors", "collection": collection_attr, "done": scanned})
+
+
+def _scan_database(kinds: List[_ItemKind], workspace: _Workspace, page_size: int,
+                   progress_callback: Optional[Callable[[Dict], None]]) -> None:
+    """流式读取 SQLite 中的有效条目，计算向量化文本哈希和旧向量指纹，写入工作区"""
+    conn = get_db_connection()
+    try:
+        for kind in kinds:
+            cursor = conn.cursor()
+            cursor.execute(f"SELECT {kind.columns} FROM {kind.table} WHERE {kind.where}")
+            scanned = 0
+            while True:
+                rows = cursor.fetchmany(page_size)
+                if not rows:
+                    break
+                workspace.insert("db_items", [
+                    (kind.name, kind.vector_id(row), text_hash(kind.text(row)),
+                     _legacy_fingerprint(kind.metadata(row), kind.legacy_fields))
+                    for row in rows
+                ])
+                scanned += len(rows)
+                if progress_callback:
+                    progress_callback({"stage": "scan_database", "kind": kind.name, "done": scanned})
+    finally:
+        conn.close()
+
+
+def _fetch_rows(kind: _ItemKind, vector_ids: List[str]) -> Dict[str, Dict]:
+    """按向量ID批量读取 SQLite 行，返回 {向量ID: 行}"""
+    rows = {}
+    keys = [kind.key(vector_id) for vector_id in vector_ids]
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        for start in range(0, len(keys), _QUERY_CHUNK_SIZE):
+            chunk = keys[start:start + _QUERY_CHUNK_SIZE]
+            placeholders = ",".join(["?"] * len(chunk))
+            cursor.execute(
+                f"SELECT {kind.columns} FROM {kind.table} WHERE {kind.where} AND {kind.key_column} IN ({placeholders})",
+                chunk
+            )
+            for row in cursor.fetchall():
+                row = dict(row)
+                rows[kind.vector_id(row)] = row
+    finally:
+        conn.close()
+    return rows
+
+
+def _repair_kind(view: VectorService, kind: _ItemKind, workspace: _Workspace, issues: Iterable[str],
+                 batch_size: int, stats: Dict[str, int],
+                 progress_callback: Optional[Callable[[Dict], None]],
+                 should_stop: Optional[Callable[[], bool]]) -> None:
+    """
+    按问题类型分批修复一类条目：删除 orphaned，向量化 missing / stale 并 upsert，为 unhashed 补写 text_hash
+    每批失败只计入 error，不影响后续批次；修复是幂等的，中断后重新运行即可继续
+    """
+    collection = getattr(view, kind.collection_attr)
+    for issue in (ISSUE_ORPHANED, ISSUE_MISSING, ISSUE_STALE, ISSUE_UNHASHED):
+        if issue not in issues:
+            continue
+        for page in workspace.iter_issue(kind.name, issue, batch_size):
+            if should_stop and should_stop():
+                logger.info(f"收到停止请求，{kind.label}修复中止（已修复 {stats['repaired']} 条）")
+                return
+            vector_ids = [vector_id for vector_id, _ in page]
+            try:
+                if issue == ISSUE_ORPHANED:
+                    collection.delete(ids=vector_ids)
+                elif issue == ISSUE_UNHASHED:
+                    collection.update(ids=vector_ids, metadatas=[{"text_hash": h} for _, h in page])
+                else:
+                    rows = _fetch_rows(kind, vector_ids)
+                    vector_ids = [vector_id for vector_id in vector_ids if vector_id in rows]
+                    if vector_ids:
+                        texts = [kind.text(rows[vector_id]) for vector_id in vector_ids]
+                        metadatas = [view._with_text_hash(kind.metadata(rows[vector_id]), text)
+                                     for vector_id, text in zip(vector_ids, texts)]
+                        collection.upsert(ids=vector_ids, embeddings=view.embed_texts(texts), metadatas=metadatas)
+                stats["repaired"] += len(vector_ids)
+                stats[issue] += len(vector_ids)
+            except Exception as e:
+                stats["error"] += len(page)
+                logger.error(f"修复{kind.label}失败（{issue}，{len(page)} 条）: {str(e)[:200]}")
+            if progress_callback:
+                progress_callback({"stage": "repair", "kind": kind.name, "issue": issue, **stats})
+
+
+def check_consistency(
+    vector_service: Optional[VectorService] = None,
+    kinds: Optional[List[str]] = None,
+    repair: bool = False,
+    repair_issues: Iterable[str] = ISSUES,
+    page_size: int = DEFAULT_PAGE_SIZE,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    sample_size: int = DEFAULT_SAMPLE_SIZE,
+    work_dir: Optional[Path] = None,
+    progress_callback: Optional[Callable[[Dict], None]] = None,
+    should_stop: Optional[Callable[[], bool]] = None,
+    embedding_version: Optional[str] = None
+) -> Dict:
+    """
+    检查（并可选修复）SQLite 与当前启用向量版本的一致性
+    kinds: 检查的条目类型（papers / requirements / published_needs / achievements），默认全部
+    repair: True 时按 repair_issues 修复；修复结果以检查时的快照为准，修复期间新写入的条目不受影响
+    page_size: 两边读取ID时每页的数量
+    batch_size: 修复时每批删除 / 向量化的条目数
+    sample_size: 每类问题在结果中列出的示例ID数量
+    work_dir: 临时工作区所在目录，默认系统临时目录
+    embedding_version: 检查指定向量版本（如重建中的版本），默认当前启用版本
+    返回: {"embedding_version", "kinds": {类型: {"db", "vector", "missing", "orphaned", "stale", "unhashed",
+           "samples": {问题: [ID]}, "repaired": {...}（repair=True 时）}}, "elapsed"}
+    """
+    start_time = time.time()
+    vector_service = vector_service or get_vector_service()
+    # 固定到开始时的启用版本：检查和修复期间切换版本不会写错集合
+    version = embedding_version or vector_service.active_version
+    view = vector_service.version_view(version)
+
+    names = kinds or list(ITEM_KINDS)
+    unknown = [name for name in names if name not in ITEM_KINDS]
+    if unknown:
+        raise ValueError(f"不支持的条目类型: {', '.join(unknown)}（可选: {', '.join(ITEM_KINDS)}）")
+    selected = [ITEM_KINDS[name] for name in names]
+
+    result = {"embedding_version": version, "kinds": {}}
+    with tempfile.TemporaryDirectory(prefix="vector_consistency_", dir=work_dir) as tmp_dir:
+        workspace = _Workspace(Path(tmp_dir))
+        try:
+            _scan_vectors(view, selected, workspace, page_size, progress_callback)
+            _scan_database(selected, workspace, page_size, progress_callback)
+            scan_elapsed = round(time.time() - start_time, 2)
+
+            for kind in selected:
+                report = {
+                    "db": workspace.count("db_items", kind.name),
+                    "vector": workspace.count("vector_items", kind.name),
+                    **{issue: workspace.count_issue(kind.name, issue) for issue in ISSUES},
+                    "samples": {}
+                }
+                for issue in ISSUES:
+                    if report[issue] and sample_size > 0:
+                        first_page = next(iter(workspace.iter_issue(kind.name, issue, sample_size)), [])
+                        report["samples"][issue] = [vector_id for vector_id, _ in first_page]
+                result["kinds"][kind.name] = report
+                logger.info(
+                    f"{kind.label}: SQLite {report['db']} 条，向量库 {report['vector']} 条，"
+                    f"缺失 {report[ISSUE_MISSING]}，孤立 {report[ISSUE_ORPHANED]}，"
+                    f"过期 {report[ISSUE_STALE]}，缺少哈希 {report[ISSUE_UNHASHED]}"
+                )
+
+            if repair:
+                repair_issues = [issue for issue in repair_issues if issue in ISSUES]
+                for kind in selected:
+                    stats = {"repaired": 0, "error": 0, **{issue: 0 for issue in ISSUES}}
+                    if any(result["kinds"][kind.name][issue] for issue in repair_issues):
+                        _repair_kind(view, kind, workspace, repair_issues, batch_size, stats,
+                                     progress_callback, should_stop)
+                        logger.info(f"{kind.label}修复完成: {stats}")
+                    result["kinds"][kind.name]["repaired"] = stats
+        finally:
+            workspace.close()
+
+    result["scan_elapsed"] = scan_elapsed
+    result["elapsed"] = round(time.time() - start_time, 2)
+    return result
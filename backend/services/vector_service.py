@@ -2,60 +2,186 @@
 向量化服务 - 使用 Sentence-Transformers 和 ChromaDB
 """
 
+import asyncio
+import copy
+import functools
 import logging
 import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 # 在导入任何库之前设置环境变量，禁用 TensorFlow
 # 这可以避免 transformers 库尝试加载 TensorFlow
 os.environ.setdefault('TRANSFORMERS_NO_TF', '1')  # 禁用 TensorFlow
 os.environ.setdefault('TF_CPP_MIN_LOG_LEVEL', '3')  # 禁用 TensorFlow 日志
 
-from typing import List, Dict, Tuple
+from typing import List, Dict, Tuple, Optional, Callable, Iterable, Union, NamedTuple
 from pathlib import Path
 
+import numpy as np
 
-import chromadb
-from chromadb.config import Settings
+
+from services.model_store import load_sentence_transformer, process_memory
+from services.embedding_cache import EmbeddingCache, QueryEmbeddingCache, DEFAULT_CACHE_PATH, normalize_query, text_hash
+from services.embedding_backends import BACKEND_TORCH, BACKEND_ONNX_INT8, SUPPORTED_BACKENDS
+from services.embedding_versions import (
+    DEFAULT_EMBEDDING_MODEL, REGISTRY_FILE_NAME, MODEL_METADATA_KEY, VERSIONED_COLLECTIONS,
+    EmbeddingModelMismatchError, EmbeddingVersionRegistry, collection_name
+)
+from services.paper_shards import SUPPORTED_SHARD_GRANULARITIES, ShardedPaperCollection, shard_base
+from services.vector_stores import (
+    VECTOR_STORE_CHROMA, SUPPORTED_VECTOR_STORES, NPY_COMPRESSION_NONE, SUPPORTED_NPY_COMPRESSIONS, create_vector_store
+)
 
 logger = logging.getLogger(__name__)
 
+# 多查询检索时倒数排名融合（RRF）的平滑常数：score = sum(1 / (RRF_K + rank))
+RRF_K = int(os.getenv("RRF_K", "60"))
+
+# 全文分块检索时，分块命中聚合到论文的方式：max（取最相似的块）/ sum（相似块越多得分越高）
+CHUNK_POOLING_MAX = "max"
+CHUNK_POOLING_SUM = "sum"
+SUPPORTED_CHUNK_POOLINGS = (CHUNK_POOLING_MAX, CHUNK_POOLING_SUM)
+
+
+class _VersionState(NamedTuple):
+    """一个向量模型版本的模型名和集合（切换版本时整体替换，保证模型与集合同时变化）"""
+    version: str
+    model_name: str
+    paper_collection: object  # 不分片的论文集合（分片时为遗留集合）
+    collection: object  # 论文检索使用的集合（分片时为 ShardedPaperCollection）
+    requirement_collection: object
+    achievement_collection: object
+    chunk_collection: object
+
+
+def _pinned_to_active_version(func):
+    """
+    在调用开始时的向量模型版本上执行整个方法：期间即使切换版本，
+    查询/文档向量的编码与读写的集合仍来自同一个版本，不会出现模型不一致
+    """
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        if self._pinned:
+            return func(self, *args, **kwargs)
+        return func(self._pinned_view(self._current()), *args, **kwargs)
+    return wrapper
+
+
 class VectorService:
-    def __init__(self):
-        """初始化向量服务"""
-        # 延迟导入 SentenceTransformer，避免启动时加载
-        self.model = None
-        self._model_name = 'paraphrase-multilingual-MiniLM-L12-v2'
-        
-        # 初始化 ChromaDB
-        db_path = Path(__file__).parent.parent.parent / "chroma_db"
-        db_path.mkdir(exist_ok=True)
-        
-        self.client = chromadb.PersistentClient(
-            path=str(db_path),
-            settings=Settings(anonymized_telemetry=False)
+    def __init__(self, db_path: Optional[Path] = None):
+        """
+        初始化向量服务
+        db_path: 向量存储目录，默认为项目根目录下的 chroma_db（VECTOR_STORE=npy 时为 vector_store），
+                 也可以通过 VECTOR_STORE_PATH 指定（基准测试等场景可指定临时目录）
+        """
+        # 延迟导入 SentenceTransformer，避免启动时加载；按模型名缓存（重建新版本期间新旧模型同时存在）
+        self._models: Dict[str, object] = {}
+        # 本进程加载的模型（未配置向量化服务时与 _models 相同；配置时只在服务不可用回退时加载）
+        self._local_models: Dict[str, object] = {}
+        # 各模型的加载统计：来源、耗时、是否内存映射、加载后的进程内存（见 model_store.load_sentence_transformer）
+        self.model_load_stats: Dict[str, Dict] = {}
+        # 期望使用的向量模型；实际编码查询和文档的是当前启用版本记录的模型（见 embedding_versions 模块）
+        self.configured_model = os.getenv("EMBEDDING_MODEL", DEFAULT_EMBEDDING_MODEL)
+        # 推理后端：torch（默认）/ onnx / onnx-int8
+        self.embedding_backend = os.getenv("EMBEDDING_BACKEND", BACKEND_TORCH).lower()
+        if self.embedding_backend not in SUPPORTED_BACKENDS:
+            logger.warning(f"不支持的 EMBEDDING_BACKEND: {self.embedding_backend}，使用 {BACKEND_TORCH}")
+            self.embedding_backend = BACKEND_TORCH
+        # 模型前向的批大小（批量向量化时使用）
+        self.embed_batch_size = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+        # 共享的本地向量化服务（unix:/path/to.sock 或 http://127.0.0.1:8765），设置后不在本进程加载模型
+        # 服务不可用时 EMBEDDING_SERVER_FALLBACK=true（默认）回退到本地模型，false 时直接报错
+        self.embedding_server = os.getenv("EMBEDDING_SERVER") or None
+        self.embedding_server_fallback = os.getenv("EMBEDDING_SERVER_FALLBACK", "true").lower() == "true"
+        self.embedding_server_timeout = float(os.getenv("EMBEDDING_SERVER_TIMEOUT", "30"))
+        
+        # 向量持久化缓存（按文本内容哈希，重建向量库时复用已有向量）
+        self.embedding_cache = None
+        if os.getenv("EMBEDDING_CACHE", "true").lower() == "true":
+            try:
+                self.embedding_cache = EmbeddingCache(os.getenv("EMBEDDING_CACHE_PATH", str(DEFAULT_CACHE_PATH)))
+            except Exception as e:
+                logger.warning(f"向量缓存初始化失败，将直接调用模型: {e}")
+        
+        # 查询向量 LRU 缓存（重复/相近的需求文本不再重复编码）
+        self.query_cache = QueryEmbeddingCache(int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "1024")))
+        
+        # 异步接口（asearch_* / aadd_*）使用的专用线程池：限制同时进入模型推理的线程数，
+        # 避免多个请求各自占满 CPU 核导致线程过度竞争；与 asyncio 默认线程池（数据库查询等）隔离
+        self.executor_workers = max(1, int(os.getenv("VECTOR_EXECUTOR_WORKERS", "2")))
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+        
+        # 向量存储后端：chroma（默认，ChromaDB HNSW）/ npy（本地内存映射矩阵，精确检索）
+        self.vector_store = os.getenv("VECTOR_STORE", VECTOR_STORE_CHROMA).lower()
+        if self.vector_store not in SUPPORTED_VECTOR_STORES:
+            logger.warning(f"不支持的 VECTOR_STORE: {self.vector_store}，使用 {VECTOR_STORE_CHROMA}")
+            self.vector_store = VECTOR_STORE_CHROMA
+        
+        # 初始化向量存储（两种后端的集合接口一致）
+        if not db_path:
+            default_dir = "chroma_db" if self.vector_store == VECTOR_STORE_CHROMA else "vector_store"
+            db_path = os.getenv("VECTOR_STORE_PATH") or Path(__file__).parent.parent.parent / default_dir
+        db_path = Path(db_path)
+        db_path.mkdir(parents=True, exist_ok=True)
+        
+        # npy 后端可选压缩检索：PQ 编码粗排 + 全精度向量精确重排（NPY_COMPRESSION=pq）
+        npy_compression = os.getenv("NPY_COMPRESSION", NPY_COMPRESSION_NONE).lower()
+        if npy_compression not in SUPPORTED_NPY_COMPRESSIONS:
+            logger.warning(f"不支持的 NPY_COMPRESSION: {npy_compression}，使用 {NPY_COMPRESSION_NONE}")
+            npy_compression = NPY_COMPRESSION_NONE
+        self.client = create_vector_store(
+            self.vector_store, db_path, npy_dtype=os.getenv("NPY_VECTOR_DTYPE", "float32"),
+            npy_compression=npy_compression,
+            pq_options={
+                "pq_subspaces": int(os.getenv("PQ_SUBSPACES", "48")),
+                "pq_rerank_factor": int(os.getenv("PQ_RERANK_FACTOR", "8")),
+                "pq_min_train_rows": int(os.getenv("PQ_MIN_TRAIN_ROWS", "10000")),
+            },
+            # chroma 后端的 HNSW 参数，未设置时使用 Chroma 默认值（M=16, construction_ef=100, search_ef=100）
+            hnsw_options={
+                "M": os.getenv("HNSW_M"),
+                "construction_ef": os.getenv("HNSW_CONSTRUCTION_EF"),
+                "search_ef": os.getenv("HNSW_SEARCH_EF"),
+            }
         )
 
-        # 原有的论文集合
-        self.paper_collection = self.client.get_or_create_collection(
-            name="papers",
-            metadata={"hnsw:space": "cosine"}
-        )
+        # 可选：论文向量按发布时间分片（PAPER_SHARDING=month / quarter），原 papers 集合作为遗留分片继续参与检索
+        self.paper_sharding = os.getenv("PAPER_SHARDING", "none").lower()
+        if self.paper_sharding not in SUPPORTED_SHARD_GRANULARITIES and self.paper_sharding != "none":
+            logger.warning(f"不支持的 PAPER_SHARDING: {self.paper_sharding}，不分片")
+            self.paper_sharding = "none"
+        self.paper_shard_workers = int(os.getenv("PAPER_SHARD_WORKERS", "4"))
         
-        # 新增需求集合
-        self.requirement_collection = self.client.get_or_create_collection(
-            name="requirements",
-            metadata={"hnsw:space": "cosine"}
-        )
+        # 向量模型版本：论文、需求、成果、分块集合按版本成组，版本信息保存在向量存储目录下
+        self.registry = EmbeddingVersionRegistry(db_path / REGISTRY_FILE_NAME)
+        self._active: Optional[_VersionState] = None
+        # version_view() 返回的视图固定在某个版本上，不跟随切换
+        self._pinned = False
+        self._registry_checked = 0.0
+        
+        # 分块大小和相邻块的重叠（字符数）；模型最大输入 128 个 token，约 500-600 个英文字符
+        self.chunk_size = int(os.getenv("CHUNK_SIZE", "600"))
+        self.chunk_overlap = int(os.getenv("CHUNK_OVERLAP", "150"))
         
-        # 获取或创建集合
+        # 获取或创建当前版本的集合
         try:
-            self.collection = self.client.get_or_create_collection(
-                name="papers",
-                metadata={"hnsw:space": "cosine"}
-            )
+            if not self.registry.exists():
+                self.registry.initialize(self._detect_legacy_model())
+            self.registry.reload_if_changed()
+            self._active = self._open_version(self.registry.active_version)
+            if self._active.model_name != self.configured_model:
+                logger.warning(
+                    f"EMBEDDING_MODEL={self.configured_model} 与当前启用的向量版本 {self._active.version} "
+                    f"的模型 {self._active.model_name} 不一致，检索继续使用 {self._active.model_name}；"
+                    f"请运行 python scripts/rebuild_embeddings.py rebuild 重建后切换"
+                )
             # 尝试检查集合状态（验证是否可用）
             try:
                 count = self.collection.count()
-                logger.info(f"ChromaDB 连接成功，集合中有 {count} 篇论文")
+                logger.info(f"向量存储（{self.vector_store}）连接成功，集合中有 {count} 篇论文")
             except Exception as check_err:
                 error_msg = str(check_err)
                 # 检测数据库结构不兼容错误
@@ -113,19 +239,260 @@ class VectorService:
             else:
                 logger.error(f"初始化 ChromaDB 集合失败: {e}")
                 raise
+        
+        self._migrate_legacy_achievements()
+    
+    def _migrate_legacy_achievements(self) -> None:
+        """将旧版本写在 papers 集合中的成果向量迁移到 achievements 集合（只在存在旧数据时生效）"""
+        try:
+            legacy = self.collection.get(where={"type": "achievement"}, include=["embeddings", "metadatas"])
+            ids = legacy.get("ids") or []
+            if not ids:
+                return
+            self.achievement_collection.upsert(
+                ids=ids,
+                embeddings=[list(map(float, e)) for e in legacy["embeddings"]],
+                metadatas=legacy["metadatas"]
+            )
+            self.collection.delete(ids=ids)
+            logger.info(f"已将 {len(ids)} 个成果向量从 papers 集合迁移到 achievements 集合")
+        except Exception as e:
+            logger.warning(f"迁移成果向量失败（不影响论文检索）: {e}")
     
-    def _load_model(self):
-        """延迟加载模型"""
-        if self.model is None:
+    # =======================
+    # 向量模型版本
+    # =======================
+    
+    def _detect_legacy_model(self) -> str:
+        """首次登记版本时判断现有集合的模型：集合元数据中有记录时以记录为准，有向量但未记录时为早期的默认模型"""
+        papers = self.client.get_or_create_collection(name="papers", metadata={"hnsw:space": "cosine"})
+        recorded = (papers.metadata or {}).get(MODEL_METADATA_KEY)
+        if recorded:
+            return recorded
+        return DEFAULT_EMBEDDING_MODEL if papers.count() > 0 else self.configured_model
+    
+    def _open_version(self, version: str) -> _VersionState:
+        """打开版本的全部集合，并校验集合元数据中记录的模型"""
+        info = self.registry.get(version)
+        if info is None:
+            raise ValueError(f"向量模型版本不存在: {version}")
+        model_name = info["model"]
+        metadata = {"hnsw:space": "cosine", MODEL_METADATA_KEY: model_name}
+        collections = {}
+        for base in VERSIONED_COLLECTIONS:
+            collection = self.client.get_or_create_collection(name=collection_name(base, version), metadata=metadata)
+            recorded = (collection.metadata or {}).get(MODEL_METADATA_KEY)
+            if recorded is None:
+                # 早期创建的集合没有记录模型，补写（hnsw:space 创建后不能修改，不重复写入）
+                collection.modify(metadata={
+                    **{k: v for k, v in (collection.metadata or {}).items() if not k.startswith("hnsw:")},
+                    MODEL_METADATA_KEY: model_name
+                })
+            elif recorded != model_name:
+                raise EmbeddingModelMismatchError(
+                    f"集合 {collection_name(base, version)} 的向量由 {recorded} 生成，"
+                    f"与版本 {version} 记录的模型 {model_name} 不一致"
+                )
+            collections[base] = collection
+        
+        paper_collection = collections["papers"]
+        search_collection = paper_collection
+        if self.paper_sharding in SUPPORTED_SHARD_GRANULARITIES:
+            search_collection = ShardedPaperCollection(
+                self.client, self.paper_sharding, legacy=paper_collection, collection_metadata=metadata,
+                max_workers=self.paper_shard_workers, base=collection_name("papers", version)
+            )
+        return _VersionState(
+            version=version,
+            model_name=model_name,
+            paper_collection=paper_collection,
+            collection=search_collection,
+            requirement_collection=collections["requirements"],
+            achievement_collection=collections["achievements"],
+            chunk_collection=collections["paper_chunks"],
+        )
+    
+    def _current(self) -> _VersionState:
+        """当前版本；其他进程切换版本后（版本文件变化，最多每秒检查一次）跟随切换"""
+        if not self._pinned:
+            now = time.monotonic()
+            if now - self._registry_checked >= 1.0:
+                self._registry_checked = now
+                if self.registry.reload_if_changed() and self.registry.active_version != self._active.version:
+                    self._switch_to(self.registry.active_version)
+        return self._active
+    
+    def _switch_to(self, version: str) -> None:
+        state = self._open_version(version)
+        # 单次赋值：正在执行的调用仍使用切换前的版本（见 _pinned_to_active_version）
+        self._active = state
+        logger.info(f"已切换到向量模型版本 {version}（{state.model_name}）")
+    
+    def _pinned_view(self, state: _VersionState) -> "VectorService":
+        view = copy.copy(self)
+        view._active = state
+        view._pinned = True
+        return view
+    
+    def version_view(self, version: str) -> "VectorService":
+        """
+        固定在指定版本上的服务视图：读写该版本的集合，用该版本的模型编码（后台重建未启用的版本时使用）
+        与原服务共享模型、缓存和线程池
+        """
+        return self._pinned_view(self._open_version(version))
+    
+    @property
+    def active_version(self) -> str:
+        return self._current().version
+    
+    @property
+    def collection(self):
+        return self._current().collection
+    
+    @property
+    def paper_collection(self):
+        return self._current().paper_collection
+    
+    @property
+    def requirement_collection(self):
+        return self._current().requirement_collection
+    
+    @property
+    def achievement_collection(self):
+        return self._current().achievement_collection
+    
+    @property
+    def chunk_collection(self):
+        return self._current().chunk_collection
+    
+    @property
+    def model_name(self) -> str:
+        """当前版本的模型名"""
+        return self._current().model_name
+    
+    @property
+    def _model_name(self) -> str:
+        return self._current().model_name
+    
+    @_model_name.setter
+    def _model_name(self, model_name: str) -> None:
+        # 基准测试脚本在临时向量库上替换模型
+        self._active = self._active._replace(model_name=model_name)
+    
+    def activate_version(self, version: str) -> Dict:
+        """
+        启用已重建完成的版本（原子切换），原版本保留为可回滚的 previous
+        切换前重新校验集合中记录的模型；新版本的模型在第一次编码时加载（重建时已加载则直接复用）
+        """
+        state = self._open_version(version)
+        previous = self.registry.activate(version)
+        self._active = state
+        logger.info(f"向量模型版本切换: {previous} -> {version}（{state.model_name}）")
+        return {"active": version, "previous": previous, "model": state.model_name}
+    
+    def rollback_version(self) -> Dict:
+        """回滚到上一个版本（再次回滚即回到当前版本）"""
+        previous = self.registry.previous_version
+        if not previous or self.registry.get(previous) is None:
+            raise ValueError("没有可回滚的向量模型版本")
+        return self.activate_version(previous)
+    
+    def drop_version(self, version: str) -> List[str]:
+        """删除版本及其集合（不能删除当前启用的版本；删除可回滚的版本后无法再回滚），返回删除的集合名"""
+        info = self.registry.remove(version)
+        names = {collection_name(base, version) for base in VERSIONED_COLLECTIONS}
+        paper_base = collection_name("papers", version)
+        names.update(name for name in self.client.list_collection_names() if shard_base(name) == paper_base)
+        for name in sorted(names):
+            try:
+                self.client.delete_collection(name)
+            except Exception as e:
+                logger.warning(f"删除集合 {name} 失败: {e}")
+        if info["model"] != self._model_name:
+            self._models.pop(info["model"], None)
+            self._local_models.pop(info["model"], None)
+        logger.info(f"已删除向量模型版本 {version}（{len(names)} 个集合）")
+        return sorted(names)
+    
+    def version_status(self) -> Dict:
+        """版本列表（含当前启用版本各集合的向量数）"""
+        state = self._current()
+        status = self.registry.to_dict()
+        status["configured_model"] = self.configured_model
+        status["counts"] = {
+            base: getattr(state, attr).count()
+            for base, attr in (("papers", "collection"), ("requirements", "requirement_collection"),
+                               ("achievements", "achievement_collection"), ("paper_chunks", "chunk_collection"))
+        }
+        return status
+    
+    # =======================
+    # 模型加载与向量化
+    # =======================
+    
+    def _model_id_for(self, model_name: str) -> str:
+        if self.embedding_backend == BACKEND_TORCH:
+            return model_name
+        return f"{model_name}@{self.embedding_backend}"
+    
+    @property
+    def model_id(self) -> str:
+        """模型标识（模型名 + 非默认推理后端），用于缓存键：不同后端产生的向量不混用"""
+        return self._model_id_for(self._model_name)
+    
+    @property
+    def model(self):
+        """当前版本的模型（未加载时为 None）"""
+        return self._models.get(self._model_name)
+    
+    def model_memory_stats(self) -> Dict:
+        """
+        当前版本模型的加载统计（未加载或非 torch 后端时为 None）和当前进程的内存占用
+        使用向量化服务时 embedding_server 为服务地址，本进程不加载模型（回退时才加载）
+        """
+        return {"load": self.model_load_stats.get(self._model_name), "process": process_memory(),
+                "embedding_server": self.embedding_server}
+    
+    def _load_model(self, model_name: Optional[str] = None):
+        """
+        延迟加载模型，返回模型对象；model_name 默认为当前版本的模型
+        配置了 EMBEDDING_SERVER 时返回向量化服务的客户端（encode 接口一致），不在本进程加载模型
+        """
+        model_name = model_name or self._model_name
+        if model_name not in self._models:
+            if self.embedding_server:
+                from services.embedding_server import EmbeddingServerClient
+                self._models[model_name] = EmbeddingServerClient(
+                    self.embedding_server, model_name, self.embedding_backend,
+                    timeout=self.embedding_server_timeout,
+                    fallback=(lambda: self._load_local_model(model_name)) if self.embedding_server_fallback else None
+                )
+                logger.info(f"向量模型 {model_name} 使用向量化服务: {self.embedding_server}")
+            else:
+                self._models[model_name] = self._load_local_model(model_name)
+        return self._models[model_name]
+    
+    def _load_local_model(self, model_name: str):
+        """在本进程加载模型（按模型名缓存）"""
+        if model_name not in self._local_models:
+            if self.embedding_backend != BACKEND_TORCH:
+                self._local_models[model_name] = self._load_onnx_model(model_name)
+                return self._local_models[model_name]
             try:
                 # 确保环境变量已设置（防止被其他代码修改）
                 os.environ['TRANSFORMERS_NO_TF'] = '1'
                 os.environ['TF_CPP_MIN_LOG_LEVEL'] = '3'
                 
-                from sentence_transformers import SentenceTransformer
-                logger.info(f"开始加载向量模型: {self._model_name} (延迟加载)")
-                self.model = SentenceTransformer(self._model_name)
-                logger.info(f"向量模型加载完成: {self._model_name}")
+                logger.info(f"开始加载向量模型: {model_name} (延迟加载)")
+                # 优先使用固定的本地模型目录，safetensors 权重以内存映射方式加载（多个进程共享页缓存）
+                model, stats = load_sentence_transformer(model_name)
+                self._local_models[model_name] = model
+                self.model_load_stats[model_name] = stats
+                logger.info(
+                    f"向量模型加载完成: {model_name}（来源 {stats['source']}，耗时 {stats['load_seconds']} 秒，"
+                    f"内存映射 {stats['mapped_mb'] if stats['mmap'] else '未启用'}"
+                    f"{' MB' if stats['mmap'] else ''}，进程 RSS {stats['rss_mb']} MB / PSS {stats['pss_mb']} MB）"
+                )
             except ImportError as e:
                 logger.error(f"无法导入 sentence_transformers: {e}")
                 raise ImportError(
@@ -159,19 +526,298 @@ class VectorService:
                 raise
         else:
             logger.debug(f"向量模型已加载，跳过加载步骤")
+        return self._local_models[model_name]
     
-    def embed_text(self, text: str) -> List[float]:
-        """将文本转换为向量"""
-        self._load_model()  # 如果模型未加载，这里会加载
-        embedding = self.model.encode(text, convert_to_numpy=True, show_progress_bar=False)
+    def _load_onnx_model(self, model_name: str):
+        """加载 ONNX Runtime 后端（首次使用时自动导出/量化）"""
+        try:
+            from services.embedding_backends import OnnxEncoder
+            threads = os.getenv("ONNX_NUM_THREADS")
+            logger.info(f"开始加载向量模型: {model_name} (后端: {self.embedding_backend})")
+            model = OnnxEncoder.load_or_export(
+                model_name,
+                quantized=self.embedding_backend == BACKEND_ONNX_INT8,
+                num_threads=int(threads) if threads else None
+            )
+            logger.info(f"向量模型加载完成: {model_name} (后端: {self.embedding_backend})")
+            return model
+        except ImportError as e:
+            logger.error(f"无法导入 ONNX 后端依赖: {e}")
+            raise ImportError(
+                "使用 EMBEDDING_BACKEND=onnx / onnx-int8 需要安装: pip install onnxruntime onnx"
+                "（首次导出还需要 torch 和 sentence-transformers）"
+            )
+    
+    def embed_text(self, text: str, use_cache: bool = True, model_name: Optional[str] = None) -> List[float]:
+        """
+        将文本转换为向量
+        use_cache: 是否先查询向量持久化缓存（文档向量化时使用；查询文本传 False）
+        model_name: 默认为当前版本的模型
+        """
+        model_name = model_name or self._model_name
+        model_id = self._model_id_for(model_name)
+        if use_cache:
+            cached = self._cache_get([text], model_id)
+            if text in cached:
+                return cached[text]
+        
+        model = self._load_model(model_name)  # 如果模型未加载，这里会加载
+        embedding = model.encode(text, convert_to_numpy=True, show_progress_bar=False)
+        if use_cache:
+            self._cache_put([text], [embedding], model_id)
         return embedding.tolist()
     
-    def add_paper(self, paper_id: str, title: str, abstract: str) -> bool:
+    def embed_texts(self, texts: List[str], batch_size: Optional[int] = None, use_cache: bool = True,
+                    model_name: Optional[str] = None) -> List[List[float]]:
+        """
+        批量将文本转换为向量（一次 encode 调用，由模型内部按 batch_size 分批前向）
+        texts: 待向量化的文本列表
+        batch_size: 模型前向的批大小，默认使用 EMBEDDING_BATCH_SIZE（64）
+        use_cache: 是否先查询向量持久化缓存，只对未命中的文本调用模型
+        model_name: 默认为当前版本的模型
+        返回: 与 texts 顺序一致的向量列表
+        """
+        if not texts:
+            return []
+        texts = list(texts)
+        model_name = model_name or self._model_name
+        model_id = self._model_id_for(model_name)
+        
+        vectors = self._cache_get(texts, model_id) if use_cache else {}
+        # 去重后只编码缓存未命中的文本
+        missing = [text for text in dict.fromkeys(texts) if text not in vectors]
+        
+        if missing:
+            model = self._load_model(model_name)
+            embeddings = model.encode(
+                missing,
+                batch_size=batch_size or self.embed_batch_size,
+                convert_to_numpy=True,
+                show_progress_bar=False
+            )
+            if use_cache:
+                self._cache_put(missing, embeddings, model_id)
+            vectors.update(zip(missing, embeddings.tolist()))
+        
+        if use_cache and len(missing) < len(texts):
+            logger.debug(f"向量缓存命中 {len(texts) - len(missing)}/{len(texts)} 条")
+        
+        return [vectors[text] for text in texts]
+    
+    def embed_query(self, query_text: str) -> List[float]:
+        """
+        将查询文本转换为向量（带进程内 LRU 缓存）
+        缓存键为规范化后的查询文本，编码时也使用规范化文本，保证命中与未命中的向量一致
+        """
+        key = normalize_query(query_text)
+        model_name = self._model_name
+        model_id = self._model_id_for(model_name)
+        vector = self.query_cache.get(model_id, key)
+        if vector is None:
+            vector = self.embed_text(key, use_cache=False, model_name=model_name)
+            self.query_cache.put(model_id, key, vector)
+        return vector
+    
+    def embed_queries(self, query_texts: List[str]) -> List[List[float]]:
+        """
+        批量将多条查询文本转换为向量（LRU 缓存未命中的文本在一次 encode 调用中编码）
+        返回: 与 query_texts 顺序一致的向量列表
+        """
+        keys = [normalize_query(text) for text in query_texts]
+        model_name = self._model_name
+        model_id = self._model_id_for(model_name)
+        vectors = {}
+        missing = []
+        for key in dict.fromkeys(keys):
+            vector = self.query_cache.get(model_id, key)
+            if vector is None:
+                missing.append(key)
+            else:
+                vectors[key] = vector
+        
+        if missing:
+            for key, vector in zip(missing, self.embed_texts(missing, use_cache=False, model_name=model_name)):
+                self.query_cache.put(model_id, key, vector)
+                vectors[key] = vector
+        
+        return [vectors[key] for key in keys]
+    
+    def _cache_get(self, texts: List[str], model_id: str) -> Dict[str, List[float]]:
+        """从向量持久化缓存读取（缓存不可用时返回空字典，不影响向量化）"""
+        if self.embedding_cache is None:
+            return {}
+        try:
+            return self.embedding_cache.get_many(model_id, texts)
+        except Exception as e:
+            logger.warning(f"读取向量缓存失败: {e}")
+            return {}
+    
+    def _cache_put(self, texts: List[str], embeddings, model_id: str) -> None:
+        """写入向量持久化缓存（失败只记录日志）"""
+        if self.embedding_cache is None:
+            return
+        try:
+            self.embedding_cache.put_many(model_id, texts, embeddings)
+        except Exception as e:
+            logger.warning(f"写入向量缓存失败: {e}")
+    
+    @staticmethod
+    def _build_paper_text(title: str, abstract: str) -> str:
+        """组合标题和摘要作为待向量化的文本（add_paper 与 add_papers_bulk 共用，保证向量一致）"""
+        return f"{title}\n{abstract}"
+    
+    @staticmethod
+    def _build_requirement_text(title: str, description: str, industry: str = "", pain_points: str = "") -> str:
+        """需求的向量化文本：标题 + 描述 + 行业 + 痛点"""
+        return f"{title}\n{description}\n行业:{industry}\n痛点:{pain_points}"
+    
+    @staticmethod
+    def _build_published_need_text(title: str, description: str, industry: str = "") -> str:
+        """发布需求的向量化文本：标题 + 描述 + 行业（published_needs 表没有 pain_points 字段）"""
+        text_parts = [title]
+        if description:
+            text_parts.append(description)
+        if industry:
+            text_parts.append(f"行业:{industry}")
+        return "\n".join(text_parts)
+    
+    @staticmethod
+    def _build_achievement_text(name: str, description: str, application: Optional[str] = None,
+                                field: Optional[str] = None) -> str:
+        """成果的向量化文本：名称 + 描述 + 应用场景 + 技术领域"""
+        text_parts = [name]
+        if description:
+            text_parts.append(description)
+        if application:
+            text_parts.append(application)
+        if field:
+            text_parts.append(field)
+        return "\n".join(text_parts)
+    
+    @staticmethod
+    def _build_requirement_metadata(title: str, description: str, industry: str = "") -> Dict:
+        return {
+            "title": title,
+            "description": description[:500],
+            "industry": industry,
+            "status": "active",
+            "type": "requirement"
+        }
+    
+    @staticmethod
+    def _build_published_need_metadata(title: str, description: str, industry: str = "") -> Dict:
+        return {
+            "title": title,
+            "description": description[:500] if description else "",
+            "industry": industry,
+            "status": "active",
+            "type": "published_need"
+        }
+    
+    @staticmethod
+    def _build_achievement_metadata(name: str, description: str, application: Optional[str] = None,
+                                    field: Optional[str] = None) -> Dict:
+        return {
+            "type": "achievement",
+            "name": name,
+            "description": description[:1500] if description else "",
+            "application": application[:500] if application else "",
+            "field": field if field else ""
+        }
+    
+    @staticmethod
+    def _with_text_hash(metadata: Dict, text: str) -> Dict:
+        """
+        在元数据中记录向量化文本的 sha256（text_hash），一致性检查据此判断向量是否过期
+        只在真正向量化该文本时写入：只补写元数据（不重新计算向量）时不能带上新文本的哈希
+        """
+        return dict(metadata, text_hash=text_hash(text))
+    
+    @staticmethod
+    def _build_paper_metadata(title: str, abstract: str, categories: Optional[str] = None,
+                              published_date: Optional[str] = None) -> Dict:
+        """
+        论文在 ChromaDB 中的元数据
+        categories: 逗号分隔的分类（如 "cs.CV,cs.LG"），每个分类存为布尔键 cat_<分类>，便于按分类过滤
+        published_date: YYYY-MM-DD，额外存一份整数 published_ts（YYYYMMDD），便于按日期范围过滤
+        """
+        metadata = {
+            "type": "paper",
+            "title": title,
+            "abstract": abstract[:1500]  # 限制摘要长度
+        }
+        if categories:
+            metadata["categories"] = categories
+            for category in categories.split(","):
+                if category.strip():
+                    metadata[f"cat_{category.strip()}"] = True
+        if published_date:
+            metadata["published_date"] = str(published_date)[:10]
+            try:
+                metadata["published_ts"] = int(str(published_date)[:10].replace("-", ""))
+            except ValueError:
+                pass
+        return metadata
+    
+    @staticmethod
+    def _record_value(record, key: str):
+        """读取论文记录中的可选字段（dict 或 sqlite3.Row，字段不存在时返回 None）"""
+        try:
+            return record[key]
+        except (KeyError, IndexError):
+            return None
+    
+    @staticmethod
+    def _date_to_ts(date_str: str) -> int:
+        return int(str(date_str)[:10].replace("-", ""))
+    
+    @classmethod
+    def build_where(cls, item_type: Optional[str] = None, categories: Optional[List[str]] = None,
+                    date_from: Optional[str] = None, date_to: Optional[str] = None) -> Optional[Dict]:
+        """
+        构建向量检索的元数据过滤条件（在向量查询内部执行，不需要多取再过滤）
+        item_type: 条目类型（paper）
+        categories: 分类列表，命中任意一个即可
+        date_from / date_to: 发布日期范围 YYYY-MM-DD（包含边界）
+        返回: Chroma where 条件，无过滤条件时返回 None
+        """
+        conditions = []
+        if item_type:
+            conditions.append({"type": item_type})
+        categories = [c.strip() for c in (categories or []) if c and c.strip()]
+        if len(categories) == 1:
+            conditions.append({f"cat_{categories[0]}": True})
+        elif categories:
+            conditions.append({"$or": [{f"cat_{c}": True} for c in categories]})
+        if date_from:
+            conditions.append({"published_ts": {"$gte": cls._date_to_ts(date_from)}})
+        if date_to:
+            conditions.append({"published_ts": {"$lte": cls._date_to_ts(date_to)}})
+        if not conditions:
+            return None
+        return conditions[0] if len(conditions) == 1 else {"$and": conditions}
+
+    @staticmethod
+    def merge_where(*wheres: Optional[Dict]) -> Optional[Dict]:
+        """用 $and 合并多个 where 条件（忽略 None）"""
+        conditions = []
+        for where in wheres:
+            if not where:
+                continue
+            conditions.extend(where["$and"] if list(where) == ["$and"] else [where])
+        if not conditions:
+            return None
+        return conditions[0] if len(conditions) == 1 else {"$and": conditions}
+    
+    @_pinned_to_active_version
+    def add_paper(self, paper_id: str, title: str, abstract: str,
+                  categories: Optional[str] = None, published_date: Optional[str] = None) -> bool:
         """
         将论文添加到向量数据库
         paper_id: 论文ID（如 arxiv_id 或数据库主键）
         title: 论文标题
         abstract: 论文摘要
+        categories / published_date: 可选，写入元数据用于检索过滤
         返回: True 如果成功添加，False 如果已存在
         """
         try:
@@ -185,7 +831,7 @@ class VectorService:
                 pass  # 不存在，继续添加
             
             # 组合标题和摘要作为待向量化的文本
-            text = f"{title}\n{abstract}"
+            text = self._build_paper_text(title, abstract)
             
             # 生成向量
             embedding = self.embed_text(text)
@@ -194,10 +840,7 @@ class VectorService:
             self.collection.add(
                 embeddings=[embedding],
                 ids=[paper_id],
-                metadatas=[{
-                    "title": title,
-                    "abstract": abstract[:1500]  # 限制摘要长度
-                }]
+                metadatas=[self._with_text_hash(self._build_paper_metadata(title, abstract, categories, published_date), text)]
             )
             
             logger.debug(f"论文 {paper_id} 已添加到向量数据库")
@@ -206,7 +849,169 @@ class VectorService:
         except Exception as e:
             logger.error(f"添加论文 {paper_id} 到向量数据库失败: {str(e)}")
             raise
+    
+    @_pinned_to_active_version
+    def add_papers_bulk(
+        self,
+        records: Iterable,
+        batch_size: int = 256,
+        skip_existing: bool = True,
+        progress_callback: Optional[Callable[[Dict], None]] = None,
+        should_stop: Optional[Callable[[], bool]] = None
+    ) -> Dict[str, int]:
+        """
+        批量将论文添加到向量数据库
+        records: 论文记录，每条包含 arxiv_id / title / abstract，可选 categories / published_date（dict 或 sqlite3.Row 均可）
+        batch_size: 每批向量化并写入 ChromaDB 的论文数量
+        skip_existing: True 时按批检查并跳过已存在的论文（add）；False 时覆盖写入（upsert）
+        progress_callback: 每批完成后调用，参数为当前统计信息
+        should_stop: 每批开始前调用，返回 True 时停止处理
+        返回: {"total": int, "added": int, "skipped": int, "error": int}
+        """
+        records = list(records)
+        stats = {"total": len(records), "added": 0, "skipped": 0, "error": 0}
+        if not records:
+            return stats
+        
+        # 先加载模型：模型加载失败时直接抛出，由调用方统一处理
+        self._load_model()
+        
+        for start in range(0, len(records), batch_size):
+            if should_stop and should_stop():
+                logger.info(f"收到停止请求，已批量向量化 {stats['added']} 篇论文，停止处理")
+                break
+            
+            chunk = records[start:start + batch_size]
+            
+            # 过滤无效记录，并去除批内重复ID（ChromaDB 不允许同一批出现重复ID）
+            batch = {}
+            for record in chunk:
+                paper_id = record["arxiv_id"]
+                title = record["title"]
+                if not paper_id or not title or paper_id in batch:
+                    stats["skipped"] += 1
+                    continue
+                batch[paper_id] = (
+                    title,
+                    record["abstract"] or "",
+                    self._record_value(record, "categories"),
+                    self._record_value(record, "published_date")
+                )
+            
+            try:
+                # 一次 get 检查整批是否已存在，替代逐条 get
+                if skip_existing and batch:
+                    existing = self.collection.get(ids=list(batch.keys()), include=[])
+                    for paper_id in existing.get("ids") or []:
+                        if batch.pop(paper_id, None) is not None:
+                            stats["skipped"] += 1
+                
+                if batch:
+                    ids = list(batch.keys())
+                    texts = [self._build_paper_text(fields[0], fields[1]) for fields in batch.values()]
+                    metadatas = [self._with_text_hash(self._build_paper_metadata(*fields), text)
+                                 for fields, text in zip(batch.values(), texts)]
+                    embeddings = self.embed_texts(texts)
+                    
+                    write = self.collection.add if skip_existing else self.collection.upsert
+                    write(embeddings=embeddings, ids=ids, metadatas=metadatas)
+                    stats["added"] += len(ids)
+            except Exception as e:
+                stats["error"] += len(batch)
+                logger.error(f"批量向量化论文失败（第 {start + 1}-{start + len(chunk)} 条）: {str(e)[:200]}")
+            
+            logger.info(f"已批量处理 {min(start + batch_size, len(records))}/{len(records)} 篇论文 "
+                        f"(新增 {stats['added']}, 跳过 {stats['skipped']}, 失败 {stats['error']})")
+            if progress_callback:
+                progress_callback(dict(stats, done=min(start + batch_size, len(records))))
+        
+        return stats
 
+    @staticmethod
+    def split_text_chunks(text: str, chunk_size: int = 600, overlap: int = 150) -> List[str]:
+        """
+        将全文切分为相邻有重叠的文本块（按字符数，尽量在空白处断开，避免截断单词）
+        返回: 文本块列表
+        """
+        text = re.sub(r"\s+", " ", text or "").strip()
+        chunks = []
+        start = 0
+        while start < len(text):
+            end = min(start + chunk_size, len(text))
+            if end < len(text):
+                # 在块的后半段找最后一个空白作为断点
+                space = text.rfind(" ", start + chunk_size // 2, end)
+                if space > start:
+                    end = space
+            chunks.append(text[start:end].strip())
+            if end >= len(text):
+                break
+            next_start = max(end - overlap, start + 1)
+            # 下一块从完整的单词开始
+            space = text.find(" ", next_start, end)
+            start = space + 1 if space != -1 else next_start
+        return [chunk for chunk in chunks if chunk]
+    
+    @_pinned_to_active_version
+    def add_paper_chunks(self, arxiv_id: str, content: str, categories: Optional[str] = None,
+                         published_date: Optional[str] = None, batch_size: Optional[int] = None) -> int:
+        """
+        将论文全文切块、批量向量化后写入分块集合（同一论文的旧分块先删除，重复调用结果一致）
+        content: PDF 解析文本（paper_content_cache.content）
+        categories / published_date: 写入每个分块的元数据，分块检索时同样支持 build_where 过滤
+        返回: 写入的分块数量
+        """
+        chunks = self.split_text_chunks(content, self.chunk_size, self.chunk_overlap)
+        
+        existing = self.chunk_collection.get(where={"arxiv_id": arxiv_id}, include=[])
+        if existing["ids"]:
+            self.chunk_collection.delete(ids=existing["ids"])
+        if not chunks:
+            return 0
+        
+        embeddings = self.embed_texts(chunks, batch_size=batch_size)
+        base_metadata = self._build_paper_metadata("", "", categories, published_date)
+        base_metadata.update({"type": "paper_chunk", "arxiv_id": arxiv_id})
+        for key in ("title", "abstract"):
+            base_metadata.pop(key, None)
+        
+        self.chunk_collection.upsert(
+            ids=[f"{arxiv_id}#{i}" for i in range(len(chunks))],
+            embeddings=embeddings,
+            metadatas=[dict(base_metadata, chunk_index=i, text=chunk) for i, chunk in enumerate(chunks)]
+        )
+        logger.info(f"论文 {arxiv_id} 全文已切分为 {len(chunks)} 个分块并写入向量数据库")
+        return len(chunks)
+    
+    def iter_pages(self, collection=None, page_size: int = 10000, include: Optional[List[str]] = None):
+        """
+        分页遍历集合中的全部条目
+        collection: 默认为论文集合
+        include: 传给 get 的 include（默认不读取向量和元数据，只有ID）
+        返回: 生成器，每次产出一页 get 结果（{"ids": [...], "metadatas": [...]}）
+        """
+        collection = collection if collection is not None else self.collection
+        offset = 0
+        while True:
+            page = collection.get(include=include or [], limit=page_size, offset=offset)
+            ids = page.get("ids") or []
+            if not ids:
+                break
+            yield page
+            if len(ids) < page_size:
+                break
+            offset += len(ids)
+    
+    def iter_ids(self, collection=None, page_size: int = 10000):
+        """
+        分页遍历集合中的全部向量ID（不读取向量和元数据）
+        collection: 默认为论文集合
+        返回: 生成器，每次产出一页ID列表
+        """
+        for page in self.iter_pages(collection, page_size):
+            yield page["ids"]
+
+    @_pinned_to_active_version
     def add_requirement(self, requirement_id: str, title: str, description: str, 
                        industry: str = "", pain_points: str = "") -> bool:
         """
@@ -214,7 +1019,7 @@ class VectorService:
         """
         try:
             # 组合文本：标题 + 描述 + 行业 + 痛点
-            text = f"{title}\n{description}\n行业:{industry}\n痛点:{pain_points}"
+            text = self._build_requirement_text(title, description, industry, pain_points)
             
             # 生成向量
             embedding = self.embed_text(text)
@@ -223,19 +1028,14 @@ class VectorService:
             self.requirement_collection.add(
                 embeddings=[embedding],
                 ids=[requirement_id],
-                metadatas=[{
-                    "title": title,
-                    "description": description[:500],
-                    "industry": industry,
-                    "status": "active",
-                    "type": "requirement"
-                }]
+                metadatas=[self._with_text_hash(self._build_requirement_metadata(title, description, industry), text)]
             )
             return True
         except Exception as e:
             logger.error(f"添加需求失败: {e}")
             return False
     
+    @_pinned_to_active_version
     def add_published_need(self, need_id: int, title: str, description: str, 
                           industry: str = "") -> bool:
         """
@@ -261,12 +1061,7 @@ class VectorService:
                 pass  # 不存在，继续添加
             
             # 组合文本：标题 + 描述 + 行业（注意：没有pain_points字段）
-            text_parts = [title]
-            if description:
-                text_parts.append(description)
-            if industry:
-                text_parts.append(f"行业:{industry}")
-            text = "\n".join(text_parts)
+            text = self._build_published_need_text(title, description, industry)
             
             # 生成向量
             embedding = self.embed_text(text)
@@ -275,13 +1070,7 @@ class VectorService:
             self.requirement_collection.add(
                 embeddings=[embedding],
                 ids=[vector_id],
-                metadatas=[{
-                    "title": title,
-                    "description": description[:500] if description else "",
-                    "industry": industry,
-                    "status": "active",
-                    "type": "published_need"
-                }]
+                metadatas=[self._with_text_hash(self._build_published_need_metadata(title, description, industry), text)]
             )
             logger.info(f"发布需求 {need_id} 已添加到向量数据库")
             return True
@@ -304,9 +1093,10 @@ class VectorService:
             logger.warning(f"删除发布需求 {need_id} 从向量数据库失败（可能不存在）: {str(e)}")
             return False
     
+    @_pinned_to_active_version
     def add_achievement(self, achievement_id: int, name: str, description: str, application: str = None, field: str = None) -> bool:
         """
-        将发布的成果添加到向量数据库（与论文共用同一个 collection）
+        将发布的成果添加到向量数据库（achievements 集合）
         achievement_id: 成果的数据库ID
         name: 成果名称
         description: 成果描述
@@ -320,7 +1110,7 @@ class VectorService:
             
             # 先检查是否已存在
             try:
-                results = self.collection.get(ids=[vector_id])
+                results = self.achievement_collection.get(ids=[vector_id])
                 if results and results.get('ids') and len(results['ids']) > 0:
                     logger.debug(f"成果 {achievement_id} 已存在于向量数据库，跳过")
                     return False
@@ -328,29 +1118,18 @@ class VectorService:
                 pass  # 不存在，继续添加
             
             # 组合文本：名称 + 描述 + 应用场景 + 技术领域
-            text_parts = [name]
-            if description:
-                text_parts.append(description)
-            if application:
-                text_parts.append(application)
-            if field:
-                text_parts.append(field)  # 包含技术领域
-            text = "\n".join(text_parts)
+            text = self._build_achievement_text(name, description, application, field)
             
             # 生成向量
             embedding = self.embed_text(text)
             
-            # 存储到 ChromaDB（与论文共用同一个 collection）
-            self.collection.add(
+            # 存储到成果集合
+            self.achievement_collection.add(
                 embeddings=[embedding],
                 ids=[vector_id],
-                metadatas=[{
-                    "type": "achievement",
-                    "name": name,
-                    "description": description[:1500] if description else "",
-                    "application": application[:500] if application else "",
-                    "field": field if field else ""
-                }]
+                metadatas=[self._with_text_hash(
+                    self._build_achievement_metadata(name, description, application, field), text
+                )]
             )
             
             logger.info(f"成果 {achievement_id} 已添加到向量数据库")
@@ -368,35 +1147,31 @@ class VectorService:
         """
         try:
             vector_id = f"achievement_{achievement_id}"
-            self.collection.delete(ids=[vector_id])
+            self.achievement_collection.delete(ids=[vector_id])
             logger.info(f"成果 {achievement_id} 已从向量数据库删除")
             return True
         except Exception as e:
             logger.warning(f"删除成果 {achievement_id} 从向量数据库失败（可能不存在）: {str(e)}")
             return False
     
-    def search_similar(self, query_text: str, top_k: int = 50) -> List[Tuple[str, float]]:
+    @_pinned_to_active_version
+    def search_similar(self, query_text: Union[str, List[str]], top_k: int = 50,
+                       where: Optional[Dict] = None, date_from: Optional[str] = None,
+                       date_to: Optional[str] = None) -> List[Tuple[str, float]]:
         """
         搜索相似论文
-        返回: [(paper_id, similarity_score), ...]
+        query_text: 查询文本；传入多条文本时批量编码，在一次向量查询中检索，再用 RRF 融合各路结果
+        where: 元数据过滤条件（见 build_where），在向量查询内部执行
+        date_from / date_to: 发布日期范围 YYYY-MM-DD，与 where 同时生效；论文按时间分片时只查询范围内的分片
+        返回: [(paper_id, similarity_score), ...]；多条查询时按融合排名排序，分数为该论文在各路中的最高相似度
         """
         try:
-            # 将查询文本转换为向量
-            query_embedding = self.embed_text(query_text)
-            
-            # 在 ChromaDB 中搜索
-            results = self.collection.query(
-                query_embeddings=[query_embedding],
-                n_results=top_k
-            )
-            
-            # 提取结果
-            paper_ids = results['ids'][0]
-            distances = results['distances'][0]
-            
-            # 将距离转换为相似度分数（cosine distance -> similarity）
-            # cosine distance = 1 - cosine similarity
-            similarities = [(pid, 1 - dist) for pid, dist in zip(paper_ids, distances)]
+            where = self.merge_where(where, self.build_where(date_from=date_from, date_to=date_to))
+            ranked_lists = self.search_ranked_lists(query_text, top_k=top_k, where=where)
+            if len(ranked_lists) == 1:
+                similarities = ranked_lists[0]
+            else:
+                similarities = self.reciprocal_rank_fusion(ranked_lists, top_k)
             
             logger.info(f"找到 {len(similarities)} 篇相似论文")
             
@@ -441,14 +1216,15 @@ class VectorService:
             
             raise
 
+    @_pinned_to_active_version
     def search_requirements(self, query_text: str, top_k: int = 50) -> List[Tuple[str, float]]:
         """
         搜索相似需求（完全复用search_similar的逻辑，只改变集合）
         返回: [(requirement_id, similarity_score), ...]
         """
         try:
-            # 将查询文本转换为向量（复用search_similar的embed_text调用）
-            query_embedding = self.embed_text(query_text)
+            # 将查询文本转换为向量（复用search_similar的embed_query调用）
+            query_embedding = self.embed_query(query_text)
             
             # 在 ChromaDB 中搜索（与search_similar完全一致的查询方式）
             results = self.requirement_collection.query(
@@ -507,6 +1283,312 @@ class VectorService:
             
             raise
     
+    @_pinned_to_active_version
+    def search_achievements(self, query_text: Union[str, List[str]], top_k: int = 50) -> List[Tuple[str, float]]:
+        """
+        搜索相似成果（achievements 集合）
+        query_text: 查询文本；多条文本时同 search_similar，用 RRF 融合各路结果
+        返回: [(vector_id, similarity_score), ...]，vector_id 形如 achievement_<id>
+        """
+        ranked_lists = self.search_ranked_lists(query_text, top_k=top_k, item_type="achievement")
+        if len(ranked_lists) == 1:
+            similarities = ranked_lists[0]
+        else:
+            similarities = self.reciprocal_rank_fusion(ranked_lists, top_k)
+        logger.info(f"找到 {len(similarities)} 个相似成果")
+        return similarities
+
+    @_pinned_to_active_version
+    def search_ranked_lists(self, query_text: Union[str, List[str]], top_k: int = 50,
+                            where: Optional[Dict] = None, item_type: str = "paper") -> List[List[Tuple[str, float]]]:
+        """
+        多查询检索：所有查询文本批量编码，作为多个 query_embeddings 在一次向量查询中检索
+        item_type: paper（论文集合）/ achievement（成果集合）
+        返回: 每条查询文本各自的有序结果 [[(id, similarity_score), ...], ...]
+        """
+        query_texts = [query_text] if isinstance(query_text, str) else list(query_text)
+        if item_type == "achievement":
+            collection = self.achievement_collection
+            if collection.count() == 0:
+                return [[] for _ in query_texts]
+        else:
+            collection = self.collection
+        
+        # 查询向量走 LRU 缓存，不写入持久化缓存
+        query_embeddings = self.embed_queries(query_texts)
+        # 有过滤条件时才传 where；只需要ID和距离，不读取元数据（分片查询时合并前每个分片都要取 top_k）
+        query_kwargs = {"where": where} if where else {}
+        results = collection.query(
+            query_embeddings=query_embeddings,
+            n_results=top_k,
+            include=["distances"],
+            **query_kwargs
+        )
+        
+        # 将距离转换为相似度分数（cosine distance = 1 - cosine similarity）
+        return [
+            [(item_id, 1 - dist) for item_id, dist in zip(ids, distances)]
+            for ids, distances in zip(results['ids'], results['distances'])
+        ]
+
+    @_pinned_to_active_version
+    def search_chunks(self, query_text: Union[str, List[str]], top_k: int = 50, where: Optional[Dict] = None,
+                      pooling: str = CHUNK_POOLING_MAX, chunk_top_k: Optional[int] = None) -> List[Tuple[str, float]]:
+        """
+        全文分块检索，并把分块命中聚合到论文级别
+        pooling: max（论文得分为最相似分块的相似度）/ sum（命中分块的相似度之和，方法在全文中多处出现的论文更靠前）
+        chunk_top_k: 每路查询检索的分块数，默认 top_k 的 5 倍（同一论文通常命中多个分块）
+        返回: [(arxiv_id, similarity_score), ...]，按聚合得分排序，分数为该论文最相似分块的相似度；
+              多条查询文本时各路先分别聚合，再用 RRF 融合
+        """
+        if pooling not in SUPPORTED_CHUNK_POOLINGS:
+            raise ValueError(f"不支持的分块聚合方式: {pooling}，可选: {', '.join(SUPPORTED_CHUNK_POOLINGS)}")
+        if self.chunk_collection.count() == 0:
+            return []
+        
+        query_texts = [query_text] if isinstance(query_text, str) else list(query_text)
+        query_kwargs = {"where": where} if where else {}
+        results = self.chunk_collection.query(
+            query_embeddings=self.embed_queries(query_texts),
+            n_results=chunk_top_k or top_k * 5,
+            include=["metadatas", "distances"],
+            **query_kwargs
+        )
+        
+        ranked_lists = []
+        for metadatas, distances in zip(results["metadatas"], results["distances"]):
+            pooled: Dict[str, float] = {}
+            best: Dict[str, float] = {}
+            for metadata, dist in zip(metadatas, distances):
+                paper_id = metadata["arxiv_id"]
+                similarity = 1 - dist
+                if pooling == CHUNK_POOLING_SUM:
+                    pooled[paper_id] = pooled.get(paper_id, 0.0) + similarity
+                else:
+                    pooled[paper_id] = max(pooled.get(paper_id, similarity), similarity)
+                best[paper_id] = max(best.get(paper_id, similarity), similarity)
+            order = sorted(pooled, key=pooled.get, reverse=True)[:top_k]
+            ranked_lists.append([(paper_id, best[paper_id]) for paper_id in order])
+        
+        similarities = ranked_lists[0] if len(ranked_lists) == 1 else self.reciprocal_rank_fusion(ranked_lists, top_k)
+        logger.info(f"全文分块检索找到 {len(similarities)} 篇论文（聚合方式: {pooling}）")
+        return similarities
+
+    @staticmethod
+    def reciprocal_rank_fusion(ranked_lists: List[List[Tuple[str, Optional[float]]]], top_k: int,
+                               k: int = RRF_K) -> List[Tuple[str, Optional[float]]]:
+        """
+        倒数排名融合（RRF）：每路结果中排名为 rank（从1开始）的条目得分 1 / (k + rank)，各路累加后排序
+        只依赖排名，不同查询文本（或 BM25 等不同检索通道）之间的分数尺度差异不影响融合
+        ranked_lists: 各路有序结果 [(id, similarity_score), ...]；没有相似度的通道（如 BM25）分数传 None
+        返回: 融合后的前 top_k 个 [(id, similarity_score), ...]，分数为该条目在各路中的最高相似度
+              （只在分数为 None 的通道中出现的条目分数为 None）
+        """
+        fused: Dict[str, float] = {}
+        best: Dict[str, Optional[float]] = {}
+        for ranked in ranked_lists:
+            for rank, (item_id, similarity) in enumerate(ranked, start=1):
+                fused[item_id] = fused.get(item_id, 0.0) + 1.0 / (k + rank)
+                current = best.get(item_id)
+                if current is None or (similarity is not None and similarity > current):
+                    best[item_id] = similarity
+        order = sorted(fused, key=lambda item_id: (fused[item_id], best[item_id] if best[item_id] is not None else -1.0),
+                       reverse=True)
+        return [(item_id, best[item_id]) for item_id in order[:top_k]]
+
+    @_pinned_to_active_version
+    def similarity_to_ids(self, query_text: Union[str, List[str]], ids: List[str],
+                          item_type: str = "paper") -> Dict[str, float]:
+        """
+        计算查询文本与指定条目的余弦相似度（多条查询文本时取最高值），用于给其他通道（如 BM25）召回的条目补算向量分
+        返回: {id: similarity_score}，不在向量库中的条目不出现在结果中
+        """
+        if not ids:
+            return {}
+        query_texts = [query_text] if isinstance(query_text, str) else list(query_text)
+        collection = self.achievement_collection if item_type == "achievement" else self.collection
+        result = collection.get(ids=list(ids), include=["embeddings"])
+        if not len(result["ids"]):
+            return {}
+        vectors = np.asarray(result["embeddings"], dtype=np.float32)
+        vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        queries = np.asarray(self.embed_queries(query_texts), dtype=np.float32)
+        queries /= np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+        similarities = (queries @ vectors.T).max(axis=0)
+        return {item_id: float(score) for item_id, score in zip(result["ids"], similarities)}
+
+    @_pinned_to_active_version
+    def get_embeddings(self, ids: List[str], item_type: str = "paper") -> Dict[str, np.ndarray]:
+        """
+        读取指定条目的向量（L2 归一化，点积即余弦相似度），用于候选去重等需要条目间相似度的场景
+        返回: {id: vector}，不在向量库中的条目不出现在结果中
+        """
+        if not ids:
+            return {}
+        collection = self.achievement_collection if item_type == "achievement" else self.collection
+        result = collection.get(ids=list(ids), include=["embeddings"])
+        if not len(result["ids"]):
+            return {}
+        vectors = np.asarray(result["embeddings"], dtype=np.float32)
+        vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        return dict(zip(result["ids"], vectors))
+
+    @_pinned_to_active_version
+    def search_similar_to_paper(self, paper_id: str, top_k: int = 10) -> Optional[List[Tuple[str, float]]]:
+        """
+        用库中论文自身的向量检索相似论文（不经过模型），结果中去掉论文自身
+        返回: [(arxiv_id, similarity_score), ...]；论文不在向量库中时返回 None
+        """
+        vector = self.get_embeddings([paper_id]).get(paper_id)
+        if vector is None:
+            return None
+        results = self.collection.query(
+            query_embeddings=[vector.tolist()],
+            n_results=top_k + 1,
+            include=["distances"]
+        )
+        return [
+            (item_id, 1 - dist)
+            for item_id, dist in zip(results["ids"][0], results["distances"][0])
+            if item_id != paper_id
+        ][:top_k]
+
+    # =======================
+    # 异步接口：在专用线程池中执行，不阻塞事件循环
+    # =======================
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.executor_workers,
+                        thread_name_prefix="vector"
+                    )
+        return self._executor
+
+    async def _run_in_executor(self, func: Callable, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_executor(), functools.partial(func, *args, **kwargs))
+
+    async def aembed_query(self, query_text: str) -> List[float]:
+        """embed_query 的异步版本（预先编码后，随后对多个集合的检索直接命中查询向量缓存）"""
+        return await self._run_in_executor(self.embed_query, query_text)
+
+    async def aembed_queries(self, query_texts: List[str]) -> List[List[float]]:
+        """embed_queries 的异步版本"""
+        return await self._run_in_executor(self.embed_queries, query_texts)
+
+    async def asearch_similar(self, query_text: Union[str, List[str]], top_k: int = 50, where: Optional[Dict] = None,
+                              date_from: Optional[str] = None, date_to: Optional[str] = None) -> List[Tuple[str, float]]:
+        """search_similar 的异步版本"""
+        return await self._run_in_executor(self.search_similar, query_text, top_k=top_k, where=where,
+                                           date_from=date_from, date_to=date_to)
+
+    async def asearch_achievements(self, query_text: Union[str, List[str]], top_k: int = 50) -> List[Tuple[str, float]]:
+        """search_achievements 的异步版本"""
+        return await self._run_in_executor(self.search_achievements, query_text, top_k=top_k)
+
+    async def asearch_ranked_lists(self, query_text: Union[str, List[str]], top_k: int = 50,
+                                   where: Optional[Dict] = None, item_type: str = "paper") -> List[List[Tuple[str, float]]]:
+        """search_ranked_lists 的异步版本"""
+        return await self._run_in_executor(self.search_ranked_lists, query_text, top_k=top_k,
+                                           where=where, item_type=item_type)
+
+    async def asearch_requirements(self, query_text: str, top_k: int = 50) -> List[Tuple[str, float]]:
+        """search_requirements 的异步版本"""
+        return await self._run_in_executor(self.search_requirements, query_text, top_k=top_k)
+
+    async def asimilarity_to_ids(self, query_text: Union[str, List[str]], ids: List[str],
+                                 item_type: str = "paper") -> Dict[str, float]:
+        """similarity_to_ids 的异步版本"""
+        return await self._run_in_executor(self.similarity_to_ids, query_text, ids, item_type=item_type)
+
+    async def aget_embeddings(self, ids: List[str], item_type: str = "paper") -> Dict[str, np.ndarray]:
+        """get_embeddings 的异步版本"""
+        return await self._run_in_executor(self.get_embeddings, ids, item_type=item_type)
+
+    async def asearch_similar_to_paper(self, paper_id: str, top_k: int = 10) -> Optional[List[Tuple[str, float]]]:
+        """search_similar_to_paper 的异步版本"""
+        return await self._run_in_executor(self.search_similar_to_paper, paper_id, top_k=top_k)
+
+    async def asearch_chunks(self, query_text: Union[str, List[str]], top_k: int = 50,
+                             where: Optional[Dict] = None, pooling: str = CHUNK_POOLING_MAX) -> List[Tuple[str, float]]:
+        """search_chunks 的异步版本"""
+        return await self._run_in_executor(self.search_chunks, query_text, top_k=top_k, where=where, pooling=pooling)
+
+    async def aadd_paper_chunks(self, arxiv_id: str, content: str, **kwargs) -> int:
+        """add_paper_chunks 的异步版本（参数同 add_paper_chunks）"""
+        return await self._run_in_executor(self.add_paper_chunks, arxiv_id, content, **kwargs)
+
+    async def aadd_paper(self, paper_id: str, title: str, abstract: str,
+                         categories: Optional[str] = None, published_date: Optional[str] = None) -> bool:
+        """add_paper 的异步版本"""
+        return await self._run_in_executor(
+            self.add_paper, paper_id, title, abstract,
+            categories=categories, published_date=published_date
+        )
+
+    async def aadd_papers_bulk(self, records: Iterable[Dict], **kwargs) -> Dict:
+        """add_papers_bulk 的异步版本（参数同 add_papers_bulk）"""
+        return await self._run_in_executor(self.add_papers_bulk, records, **kwargs)
+
+    async def aadd_requirement(self, requirement_id: str, title: str, description: str,
+                               industry: str = "", pain_points: str = "") -> bool:
+        """add_requirement 的异步版本"""
+        return await self._run_in_executor(
+            self.add_requirement, requirement_id, title, description,
+            industry=industry, pain_points=pain_points
+        )
+
+    async def aadd_published_need(self, need_id: int, title: str, description: str,
+                                  industry: str = "") -> bool:
+        """add_published_need 的异步版本"""
+        return await self._run_in_executor(self.add_published_need, need_id, title, description, industry=industry)
+
+    async def aadd_achievement(self, achievement_id: int, name: str, description: str,
+                               application: str = None, field: str = None) -> bool:
+        """add_achievement 的异步版本"""
+        return await self._run_in_executor(
+            self.add_achievement, achievement_id, name, description,
+            application=application, field=field
+        )
+
+    @_pinned_to_active_version
+    def warm_up(self) -> Dict:
+        """
+        预热：加载模型、执行一次编码（触发首次推理的初始化开销）、对各集合执行一次查询（加载 HNSW 索引）
+        同步执行，耗时数秒，应在线程池中调用
+        返回: 各步骤耗时（秒）
+        """
+        timings = {}
+        
+        start = time.perf_counter()
+        self._load_model()
+        timings["load_model"] = round(time.perf_counter() - start, 3)
+        
+        start = time.perf_counter()
+        embedding = self.embed_text("warm up", use_cache=False)
+        timings["encode"] = round(time.perf_counter() - start, 3)
+        
+        start = time.perf_counter()
+        for collection in (self.collection, self.requirement_collection, self.achievement_collection,
+                           self.chunk_collection):
+            if collection.count() > 0:
+                collection.query(query_embeddings=[embedding], n_results=1)
+        timings["query"] = round(time.perf_counter() - start, 3)
+        
+        logger.info(f"向量服务预热完成: {timings}")
+        return timings
+    
+    def train_pending_pq(self, force: bool = False) -> List[str]:
+        """
+        npy 压缩模式下为行数已达到 PQ_MIN_TRAIN_ROWS 的集合训练 PQ 码本（写入时不训练，索引任务结束时调用）
+        返回: 训练了的集合名；其他后端返回空列表
+        """
+        train = getattr(self.client, "train_pending_pq", None)
+        return train(force=force) if train is not None else []
+    
     def get_paper_count(self) -> int:
         """获取向量数据库中的论文数量"""
         try:
@@ -540,11 +1622,14 @@ class VectorService:
 
 # 全局单例
 _vector_service = None
+_vector_service_lock = threading.Lock()
 
 def get_vector_service() -> VectorService:
-    """获取向量服务单例"""
+    """获取向量服务单例（启动预热线程与请求可能并发获取，加锁避免重复初始化）"""
     global _vector_service
     if _vector_service is None:
-        _vector_service = VectorService()
+        with _vector_service_lock:
+            if _vector_service is None:
+                _vector_service = VectorService()
     return _vector_service
 
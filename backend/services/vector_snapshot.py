@@ -0,0 +1,309 @@
+"""
+向量快照 - 将向量集合（ID、向量、元数据、模型版本）导出为单个文件，新节点批量导入即可提供检索
+
+快照是一个 zip 文件：
+    manifest.json              格式版本、模型标识（model_id）、导出时间、各集合的条数和维度
+    <集合名>/vectors.npy       float16 向量矩阵（行顺序与 items.jsonl 一致，不压缩）
+    <集合名>/items.jsonl       每行 {"id": ..., "metadata": {...}}（deflate 压缩）
+
+float16 相对 float32 体积减半，对余弦相似度的影响在 1e-3 量级，不改变检索排序；
+导入时还原为 float32 写入当前向量存储后端（chroma / npy 均可，与导出端的后端无关）。
+导出和导入都按页流式处理，内存占用与集合大小无关。
+
+节点间拉取快照：/snapshot/latest 需要登录令牌或节点令牌（VECTOR_SNAPSHOT_TOKEN），
+download_snapshot 会携带节点令牌；通过接口导入的 URL 必须在 VECTOR_SNAPSHOT_PEERS 白名单内。
+"""
+import io
+import json
+import logging
+import os
+import tempfile
+import time
+import zipfile
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional
+from urllib.parse import urlsplit
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# 快照格式版本
+SNAPSHOT_FORMAT_VERSION = 1
+# 默认导出的集合（paper_chunks 可由 PDF 缓存重建，体积大，按需导出）
+DEFAULT_SNAPSHOT_COLLECTIONS = ("papers", "requirements", "achievements")
+# 每页读取 / 每批写入的条数（ChromaDB 单次写入上限约 5000 条）
+SNAPSHOT_PAGE_SIZE = 4096
+# 快照文件默认目录
+DEFAULT_SNAPSHOT_DIR = Path(__file__).parent.parent.parent / "snapshots"
+
+_MANIFEST_NAME = "manifest.json"
+
+
+class SnapshotModelMismatchError(ValueError):
+    """快照的模型标识与当前向量服务不一致（查询向量与文档向量不在同一空间）"""
+
+
+def get_snapshot_token() -> Optional[str]:
+    """节点令牌：VECTOR_SNAPSHOT_TOKEN 环境变量，下载快照时携带，/snapshot/latest 据此放行其他节点"""
+    return os.getenv("VECTOR_SNAPSHOT_TOKEN") or None
+
+
+def get_snapshot_peers() -> List[str]:
+    """允许拉取快照的节点（VECTOR_SNAPSHOT_PEERS，逗号分隔的 http(s)://host[:port]）"""
+    return [peer.strip().rstrip("/") for peer in os.getenv("VECTOR_SNAPSHOT_PEERS", "").split(",") if peer.strip()]
+
+
+def _origin(url: str) -> str:
+    """URL 的 scheme://host[:port]（小写，省略默认端口）"""
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    port = parts.port
+    if port is None or (scheme, port) in (("http", 80), ("https", 443)):
+        return f"{scheme}://{(parts.hostname or '').lower()}"
+    return f"{scheme}://{(parts.hostname or '').lower()}:{port}"
+
+
+def check_snapshot_url(url: str) -> None:
+    """校验快照 URL 属于 VECTOR_SNAPSHOT_PEERS 中的节点（防止通过导入接口请求任意内网地址），否则抛出 ValueError"""
+    parts = urlsplit(url)
+    if parts.scheme.lower() not in ("http", "https") or not parts.hostname:
+        raise ValueError(f"无效的快照 URL: {url}")
+    if parts.username or parts.password:
+        raise ValueError("快照 URL 不能包含用户名或密码")
+    peers = get_snapshot_peers()
+    if not peers:
+        raise ValueError("未配置 VECTOR_SNAPSHOT_PEERS，不允许从 URL 导入快照")
+    if _origin(url) not in {_origin(peer) for peer in peers}:
+        raise ValueError(f"快照 URL 不在 VECTOR_SNAPSHOT_PEERS 白名单内: {_origin(url)}")
+
+
+def get_snapshot_dir() -> Path:
+    """快照目录：SNAPSHOT_DIR 环境变量，默认为项目根目录下的 snapshots"""
+    return Path(os.getenv("SNAPSHOT_DIR") or DEFAULT_SNAPSHOT_DIR)
+
+
+def latest_snapshot_path(snapshot_dir: Optional[Path] = None) -> Optional[Path]:
+    """快照目录中最新的快照文件（按文件名中的时间戳），没有时返回 None"""
+    snapshot_dir = Path(snapshot_dir or get_snapshot_dir())
+    snapshots = sorted(snapshot_dir.glob("vectors-*.zip"))
+    return snapshots[-1] if snapshots else None
+
+
+def _get_collections(vector_service) -> Dict:
+    """集合名 -> 集合对象"""
+    return {
+        "papers": vector_service.collection,
+        "requirements": vector_service.requirement_collection,
+        "achievements": vector_service.achievement_collection,
+        "paper_chunks": vector_service.chunk_collection,
+    }
+
+
+def _write_npy_header(fp, rows: int, dim: int) -> None:
+    np.lib.format.write_array_header_1_0(
+        fp, {"descr": np.dtype(np.float16).str, "fortran_order": False, "shape": (rows, dim)}
+    )
+
+
+def _export_collection(zf: zipfile.ZipFile, name: str, collection, page_size: int,
+                       progress_callback: Optional[Callable[[str, int], None]] = None) -> Dict:
+    """分页读取一个集合写入快照：向量先写到临时文件（行数确定后才能写 .npy 头），元数据直接写入 zip"""
+    rows, dim = 0, 0
+    with tempfile.TemporaryFile() as raw_vectors:
+        with zf.open(f"{name}/items.jsonl", "w", force_zip64=True) as items_fp:
+            writer = io.TextIOWrapper(items_fp, encoding="utf-8")
+            offset = 0
+            while True:
+                page = collection.get(include=["embeddings", "metadatas"], limit=page_size, offset=offset)
+                ids = page.get("ids") or []
+                if not ids:
+                    break
+                vectors = np.asarray(page["embeddings"], dtype=np.float32)
+                dim = vectors.shape[1]
+                raw_vectors.write(vectors.astype(np.float16).tobytes())
+                for item_id, metadata in zip(ids, page.get("metadatas") or [None] * len(ids)):
+                    writer.write(json.dumps({"id": item_id, "metadata": metadata}, ensure_ascii=False) + "\n")
+                rows += len(ids)
+                offset += len(ids)
+                if progress_callback:
+                    progress_callback(name, rows)
+                if len(ids) < page_size:
+                    break
+            writer.flush()
+            writer.detach()
+
+        raw_vectors.seek(0)
+        with zf.open(f"{name}/vectors.npy", "w", force_zip64=True) as npy_fp:
+            _write_npy_header(npy_fp, rows, dim)
+            while True:
+                block = raw_vectors.read(16 * 1024 * 1024)
+                if not block:
+                    break
+                npy_fp.write(block)
+    return {"count": rows, "dim": dim, "dtype": "float16"}
+
+
+def export_snapshot(vector_service, path: Optional[Path] = None,
+                    collections: Iterable[str] = DEFAULT_SNAPSHOT_COLLECTIONS,
+                    page_size: int = SNAPSHOT_PAGE_SIZE,
+                    progress_callback: Optional[Callable[[str, int], None]] = None) -> Dict:
+    """
+    导出向量快照
+    path: 输出文件，默认为快照目录下的 vectors-<时间戳>.zip
+    collections: 要导出的集合名（papers / requirements / achievements / paper_chunks）
+    progress_callback: 每写完一页调用一次，参数为 (集合名, 已导出条数)
+    返回: manifest（另含 path、size_bytes、elapsed）
+    """
+    available = _get_collections(vector_service)
+    collections = list(collections)
+    unknown = [name for name in collections if name not in available]
+    if unknown:
+        raise ValueError(f"不支持的集合: {unknown}，可选: {list(available)}")
+
+    if path is None:
+        path = get_snapshot_dir() / f"vectors-{datetime.now().strftime('%Y%m%d-%H%M%S')}.zip"
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    start = time.perf_counter()
+    manifest = {
+        "format_version": SNAPSHOT_FORMAT_VERSION,
+        "model_id": vector_service.model_id,
+        "vector_store": vector_service.vector_store,
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "collections": {},
+    }
+    # 先写到临时文件，完成后再改名，避免导入方读到写了一半的快照
+    tmp_path = path.with_name(path.name + ".tmp")
+    with zipfile.ZipFile(tmp_path, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        for name in collections:
+            manifest["collections"][name] = _export_collection(
+                zf, name, available[name], page_size, progress_callback
+            )
+            logger.info(f"快照已导出集合 {name}: {manifest['collections'][name]['count']} 条")
+        zf.writestr(_MANIFEST_NAME, json.dumps(manifest, ensure_ascii=False, indent=2))
+    os.replace(tmp_path, path)
+
+    result = dict(manifest, path=str(path), size_bytes=path.stat().st_size,
+                  elapsed=round(time.perf_counter() - start, 3))
+    logger.info(f"向量快照已导出到 {path}（{result['size_bytes'] / 1024 / 1024:.1f} MB，耗时 {result['elapsed']} 秒）")
+    return result
+
+
+def read_snapshot_manifest(path: Path) -> Dict:
+    """读取快照的 manifest"""
+    with zipfile.ZipFile(path) as zf:
+        return json.loads(zf.read(_MANIFEST_NAME).decode("utf-8"))
+
+
+def _iter_snapshot_batches(zf: zipfile.ZipFile, name: str, batch_size: int):
+    """按批读取快照中一个集合的 (ids, 向量, 元数据)，不把整个矩阵读入内存"""
+    with zf.open(f"{name}/vectors.npy") as npy_fp, zf.open(f"{name}/items.jsonl") as items_fp:
+        np.lib.format.read_magic(npy_fp)
+        shape, _, dtype = np.lib.format.read_array_header_1_0(npy_fp)
+        rows, dim = shape
+        items = io.TextIOWrapper(items_fp, encoding="utf-8")
+        row_bytes = dim * dtype.itemsize
+        for start in range(0, rows, batch_size):
+            count = min(batch_size, rows - start)
+            vectors = np.frombuffer(npy_fp.read(count * row_bytes), dtype=dtype).reshape(count, dim)
+            records = [json.loads(items.readline()) for _ in range(count)]
+            yield [r["id"] for r in records], vectors.astype(np.float32), [r["metadata"] for r in records]
+
+
+def import_snapshot(vector_service, path: Path, collections: Optional[Iterable[str]] = None,
+                    replace: bool = True, force: bool = False, batch_size: int = SNAPSHOT_PAGE_SIZE,
+                    progress_callback: Optional[Callable[[str, int], None]] = None) -> Dict:
+    """
+    导入向量快照（批量写入当前向量存储后端）
+    collections: 只导入其中的集合，默认导入快照中的全部集合
+    replace: 导入后删除集合中快照里没有的ID，使集合与快照完全一致；False 时只新增/覆盖
+    force: 忽略模型标识不一致（不同模型的向量不可比较，只在确认模型等价时使用）
+    返回: {"model_id", "collections": {集合名: {"count", "deleted"}}, "elapsed"}
+    """
+    path = Path(path)
+    manifest = read_snapshot_manifest(path)
+    if manifest.get("format_version") != SNAPSHOT_FORMAT_VERSION:
+        raise ValueError(f"不支持的快照格式版本: {manifest.get('format_version')}")
+    if manifest.get("model_id") != vector_service.model_id and not force:
+        raise SnapshotModelMismatchError(
+            f"快照模型 {manifest.get('model_id')} 与当前模型 {vector_service.model_id} 不一致，"
+            f"查询向量与快照中的向量不可比较"
+        )
+
+    available = _get_collections(vector_service)
+    names = list(collections) if collections is not None else list(manifest["collections"])
+    missing = [name for name in names if name not in manifest["collections"] or name not in available]
+    if missing:
+        raise ValueError(f"快照中没有集合: {missing}")
+
+    start = time.perf_counter()
+    result = {"model_id": manifest["model_id"], "collections": {}}
+    with zipfile.ZipFile(path) as zf:
+        for name in names:
+            collection = available[name]
+            # 空集合（新节点）直接 add，省去逐条判断是否已存在
+            write = collection.add if collection.count() == 0 else collection.upsert
+            imported_ids = set()
+            imported = 0
+            for ids, vectors, metadatas in _iter_snapshot_batches(zf, name, batch_size):
+                write(ids=ids, embeddings=vectors.tolist(), metadatas=metadatas)
+                imported += len(ids)
+                if replace:
+                    imported_ids.update(ids)
+                if progress_callback:
+                    progress_callback(name, imported)
+
+            deleted = 0
+            if replace:
+                stale = [item_id for page in vector_service.iter_ids(collection)
+                         for item_id in page if item_id not in imported_ids]
+                for i in range(0, len(stale), batch_size):
+                    collection.delete(ids=stale[i:i + batch_size])
+                deleted = len(stale)
+            result["collections"][name] = {"count": manifest["collections"][name]["count"], "deleted": deleted}
+            logger.info(f"快照已导入集合 {name}: {manifest['collections'][name]['count']} 条，删除多余 {deleted} 条")
+
+    vector_service.train_pending_pq()
+    result["elapsed"] = round(time.perf_counter() - start, 3)
+    logger.info(f"向量快照 {path} 导入完成，耗时 {result['elapsed']} 秒")
+    return result
+
+
+def download_snapshot(url: str, snapshot_dir: Optional[Path] = None, timeout: int = 60) -> Path:
+    """
+    下载快照文件（如其他节点的 /api/matching/snapshot/latest）到快照目录，返回本地路径
+    配置了 VECTOR_SNAPSHOT_TOKEN 时以 Bearer 方式携带；不跟随重定向（避免绕过 URL 白名单）
+    """
+    import requests
+
+    snapshot_dir = Path(snapshot_dir or get_snapshot_dir())
+    snapshot_dir.mkdir(parents=True, exist_ok=True)
+    path = snapshot_dir / f"vectors-{datetime.now().strftime('%Y%m%d-%H%M%S')}-downloaded.zip"
+    tmp_path = path.with_name(path.name + ".tmp")
+    token = get_snapshot_token()
+    headers = {"Authorization": f"Bearer {token}"} if token else {}
+    with requests.get(url, stream=True, timeout=timeout, headers=headers, allow_redirects=False) as response:
+        response.raise_for_status()
+        if response.is_redirect:
+            raise ValueError(f"快照 URL 返回了重定向，拒绝跟随: {url}")
+        with open(tmp_path, "wb") as f:
+            for block in response.iter_content(chunk_size=1024 * 1024):
+                f.write(block)
+    os.replace(tmp_path, path)
+    logger.info(f"已下载向量快照 {url} -> {path}")
+    return path
+
+
+def restore_snapshot_if_empty(vector_service, source: str) -> Optional[Dict]:
+    """
+    新节点启动时从快照恢复：论文集合为空时导入 source（本地路径或 http(s) URL），否则跳过
+    返回: import_snapshot 的结果，跳过时返回 None
+    """
+    if vector_service.get_paper_count() > 0:
+        logger.info("论文集合非空，跳过快照恢复")
+        return None
+    path = download_snapshot(source) if source.startswith(("http://", "https://")) else Path(source)
+    return import_snapshot(vector_service, path)
@@ -0,0 +1,978 @@
+"""
+向量存储后端
+
+VectorService 只使用集合对象的以下接口（ChromaDB Collection 的子集）：
+    count() / add(ids, embeddings, metadatas) / upsert(...) / update(ids, metadatas)
+    get(ids, include, limit, offset, where) / query(query_embeddings, n_results, where) / delete(ids)
+所有后端的 get_or_create_collection() 返回的集合都实现这组接口，VectorService 的其余代码不区分后端。
+后端还提供 list_collection_names()，用于发现已有的论文时间分片（见 paper_shards 模块）；
+delete_collection(name) 和集合的 modify(metadata) 用于向量模型版本管理（见 embedding_versions 模块）。
+
+通过环境变量 VECTOR_STORE 选择：
+- chroma（默认）：ChromaDB PersistentClient（HNSW 近似检索）。HNSW 参数（HNSW_M / HNSW_CONSTRUCTION_EF /
+  HNSW_SEARCH_EF）在创建集合时写入集合元数据；M 和 construction_ef 只对新建的集合生效，
+  search_ef 在打开已有集合时同步到集合配置，修改后重启即可生效。召回率与延迟的取舍见 scripts/benchmark_hnsw.py
+- npy：本地内存映射矩阵，精确检索。每个集合一个目录：
+    vectors.npy  向量矩阵（已归一化，按行存储，容量不足时成倍扩容）
+    ids.db       SQLite：行号 <-> 向量ID、元数据
+  检索时分块计算矩阵-向量乘积，argpartition 取 top-k。几十万条 384 维向量的精确扫描在几十毫秒级，
+  没有 HNSW 索引文件，也就不存在索引文件损坏的问题。
+  矩阵默认 float32；float16 磁盘和内存减半，但 NumPy 的 float16 -> float32 转换比矩阵乘法本身慢得多，
+  检索延迟约为 float32 的 5-8 倍，只建议在内存紧张时使用（NPY_VECTOR_DTYPE=float16）。
+  压缩检索（NPY_COMPRESSION=pq）：额外保存乘积量化（PQ）码本和每行 m 字节的编码，
+    pq_codebook.npy  码本（m 段 × 256 个中心）
+    pq_codes.npy     编码矩阵（uint8，行号与 vectors.npy 一致）
+  粗排只扫描编码（384 维、m=48 时每条 48 字节，是 float32 的 1/32），
+  再从磁盘上的全精度矩阵读取候选行精确重排，检索时常驻内存的只有编码和少量候选向量。
+  码本不在写入时训练：索引任务结束时（VectorService.train_pending_pq）或 scripts/train_vector_pq.py 训练，
+  训练前为精确检索；k-means 不持有锁，只有替换编码和码本文件时持有写入锁。
+  多进程（多个 uvicorn worker、索引 / 重建脚本）共享同一集合：写入持有集合目录下 write.lock 的排他文件锁，
+  检索持有共享锁；扩容使用唯一的临时文件名；删除时的行移动先记入 pending_moves 再复制向量，中断后由下一次加锁重放。
+"""
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows：只有进程内的线程锁
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# 支持的存储后端
+VECTOR_STORE_CHROMA = "chroma"
+VECTOR_STORE_NPY = "npy"
+SUPPORTED_VECTOR_STORES = (VECTOR_STORE_CHROMA, VECTOR_STORE_NPY)
+
+# npy 后端的压缩检索模式
+NPY_COMPRESSION_NONE = "none"
+NPY_COMPRESSION_PQ = "pq"
+SUPPORTED_NPY_COMPRESSIONS = (NPY_COMPRESSION_NONE, NPY_COMPRESSION_PQ)
+
+# chroma 后端可配置的 HNSW 参数（集合元数据键为 hnsw:<参数名>）
+HNSW_PARAMS = ("M", "construction_ef", "search_ef")
+
+# SQLite IN 查询每次的参数数量
+_QUERY_CHUNK_SIZE = 500
+# 初始容量（行）
+_INITIAL_CAPACITY = 1024
+# PQ 每段的中心数（编码为 uint8）、训练采样行数、k-means 迭代次数
+_PQ_CENTROIDS = 256
+_PQ_TRAIN_SAMPLE = 65536
+_PQ_TRAIN_ITERS = 15
+
+
+class ChromaVectorStore:
+    """ChromaDB 后端：Chroma 的 Collection 本身就实现了上述接口，直接返回"""
+
+    def __init__(self, path: Path, hnsw_options: Optional[Dict] = None):
+        """hnsw_options: {"M": int, "construction_ef": int, "search_ef": int}，未设置的参数使用 Chroma 默认值"""
+        import chromadb
+        from chromadb.config import Settings
+
+        self.client = chromadb.PersistentClient(
+            path=str(path),
+            settings=Settings(anonymized_telemetry=False)
+        )
+        self.hnsw_options = {key: int(value) for key, value in (hnsw_options or {}).items()
+                             if key in HNSW_PARAMS and value}
+
+    def get_or_create_collection(self, name: str, metadata: Optional[Dict] = None):
+        metadata = dict(metadata or {})
+        for key, value in self.hnsw_options.items():
+            metadata.setdefault(f"hnsw:{key}", value)
+        collection = self.client.get_or_create_collection(name=name, metadata=metadata or None)
+        if "search_ef" in self.hnsw_options:
+            self._sync_search_ef(collection, self.hnsw_options["search_ef"])
+        return collection
+
+    @staticmethod
+    def _sync_search_ef(collection, search_ef: int) -> None:
+        """已有集合的 search_ef 与配置不一致时更新集合配置（M / construction_ef 创建后不能修改）"""
+        configuration = getattr(collection, "configuration", None) or {}
+        if (configuration.get("hnsw") or {}).get("ef_search", search_ef) == search_ef:
+            return
+        try:
+            collection.modify(configuration={"hnsw": {"ef_search": search_ef}})
+            logger.info(f"集合 {collection.name} 的 HNSW search_ef 已调整为 {search_ef}")
+        except Exception as e:
+            logger.warning(f"调整集合 {collection.name} 的 HNSW search_ef 失败（继续使用原设置）: {e}")
+
+    def list_collection_names(self) -> List[str]:
+        # 旧版本 list_collections() 返回集合对象，新版本返回名称
+        return [c if isinstance(c, str) else c.name for c in self.client.list_collections()]
+
+    def delete_collection(self, name: str) -> None:
+        self.client.delete_collection(name)
+
+
+class NpyVectorStore:
+    """本地内存映射矩阵后端"""
+
+    def __init__(self, path: Path, block_rows: int = 32768, dtype: str = "float32",
+                 compression: str = NPY_COMPRESSION_NONE, pq_options: Optional[Dict] = None):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.block_rows = block_rows
+        self.dtype = dtype
+        self.compression = compression
+        self.pq_options = pq_options or {}
+        self._collections: Dict[str, "NpyCollection"] = {}
+        self._lock = threading.Lock()
+
+    def get_or_create_collection(self, name: str, metadata: Optional[Dict] = None) -> "NpyCollection":
+        with self._lock:
+            if name not in self._collections:
+                self._collections[name] = NpyCollection(
+                    self.path / name, name, metadata, block_rows=self.block_rows, dtype=self.dtype,
+                    compression=self.compression, **self.pq_options
+                )
+            return self._collections[name]
+
+    def list_collection_names(self) -> List[str]:
+        return sorted(p.name for p in self.path.iterdir() if (p / "ids.db").exists())
+
+    def delete_collection(self, name: str) -> None:
+        with self._lock:
+            self._collections.pop(name, None)
+            shutil.rmtree(self.path / name, ignore_errors=True)
+
+    def train_pending_pq(self, force: bool = False) -> List[str]:
+        """为行数已达到阈值、还没有码本的集合训练 PQ 码本（force 时重新训练全部压缩集合），返回训练了的集合名"""
+        if self.compression != NPY_COMPRESSION_PQ:
+            return []
+        trained = []
+        for name in self.list_collection_names():
+            collection = self.get_or_create_collection(name)
+            if (force or collection.needs_pq_training()) and collection.train_pq(force=force):
+                trained.append(name)
+        return trained
+
+
+def _normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.clip(norms, 1e-12, None)
+
+
+class ProductQuantizer:
+    """
+    乘积量化：向量切成 m 段，每段用 256 个中心之一的下标（uint8）表示
+    内积近似为各段查询子向量与对应中心的内积之和（查表），不需要还原向量
+    """
+
+    def __init__(self, codebook: np.ndarray):
+        self.codebook = np.ascontiguousarray(codebook, dtype=np.float32)  # (m, 256, dsub)
+        self.m, self.n_centroids, self.dsub = self.codebook.shape
+
+    @staticmethod
+    def choose_subspaces(dim: int, m: int) -> int:
+        """不超过 m 且能整除维度的最大段数"""
+        return max(d for d in range(1, min(m, dim) + 1) if dim % d == 0)
+
+    @classmethod
+    def train(cls, vectors: np.ndarray, m: int, iters: int = _PQ_TRAIN_ITERS, seed: int = 0) -> "ProductQuantizer":
+        """在样本向量上对每一段分别做 k-means"""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        n, dim = vectors.shape
+        dsub = dim // m
+        n_centroids = min(_PQ_CENTROIDS, n)
+        rng = np.random.default_rng(seed)
+        codebook = np.zeros((m, _PQ_CENTROIDS, dsub), dtype=np.float32)
+        for j in range(m):
+            sub = vectors[:, j * dsub:(j + 1) * dsub]
+            centroids = sub[rng.choice(n, n_centroids, replace=False)].copy()
+            for _ in range(iters):
+                assign = cls._nearest(sub, centroids)
+                counts = np.bincount(assign, minlength=n_centroids)
+                sums = np.stack([np.bincount(assign, weights=sub[:, d], minlength=n_centroids)
+                                 for d in range(dsub)], axis=1)
+                empty = counts == 0
+                centroids[~empty] = sums[~empty] / counts[~empty, None]
+                # 空簇重新随机取点
+                if empty.any():
+                    centroids[empty] = sub[rng.choice(n, int(empty.sum()), replace=False)]
+            # 样本少于 256 条时重复已有中心填满码本，避免全零中心被选中
+            codebook[j] = centroids[np.arange(_PQ_CENTROIDS) % n_centroids]
+        return cls(codebook)
+
+    @staticmethod
+    def _nearest(sub: np.ndarray, centroids: np.ndarray, block_rows: int = 2048) -> np.ndarray:
+        """
+        最近中心下标：argmin ||x - c||^2 = argmax (x·c - ||c||^2 / 2)
+        把 -||c||^2 / 2 拼成增广列，一次矩阵乘法得到结果；分小块计算，距离矩阵留在 CPU 缓存内
+        """
+        augmented = np.concatenate([centroids, -(centroids ** 2).sum(axis=1, keepdims=True) / 2], axis=1).T
+        augmented = np.ascontiguousarray(augmented, dtype=np.float32)
+        dsub = sub.shape[1]
+        result = np.empty(sub.shape[0], dtype=np.intp)
+        block = np.ones((block_rows, dsub + 1), dtype=np.float32)
+        for start in range(0, sub.shape[0], block_rows):
+            end = min(start + block_rows, sub.shape[0])
+            block[:end - start, :dsub] = sub[start:end]
+            result[start:end] = np.argmax(block[:end - start] @ augmented, axis=1)
+        return result
+
+    def encode(self, vectors: np.ndarray, block_rows: int = 65536) -> np.ndarray:
+        """向量 -> (n, m) uint8 编码"""
+        vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        codes = np.empty((vectors.shape[0], self.m), dtype=np.uint8)
+        for start in range(0, vectors.shape[0], block_rows):
+            block = vectors[start:start + block_rows]
+            for j in range(self.m):
+                codes[start:start + len(block), j] = self._nearest(
+                    block[:, j * self.dsub:(j + 1) * self.dsub], self.codebook[j]
+                )
+        return codes
+
+    def lookup_table(self, queries: np.ndarray) -> np.ndarray:
+        """查询子向量与各段中心的内积：(n_queries, m, 256)"""
+        sub_queries = queries.reshape(queries.shape[0], self.m, self.dsub)
+        return np.einsum("qmd,mcd->qmc", sub_queries, self.codebook)
+
+    def score(self, table: np.ndarray, codes: np.ndarray) -> np.ndarray:
+        """近似内积：(n_queries, n)"""
+        # 按段连续存放后逐段 take，比二维花式索引快约一倍
+        codes_by_subspace = np.ascontiguousarray(codes.T)
+        scores = np.zeros((table.shape[0], codes.shape[0]), dtype=np.float32)
+        for q in range(table.shape[0]):
+            for j in range(self.m):
+                scores[q] += np.take(table[q, j], codes_by_subspace[j])
+        return scores
+
+
+class NpyCollection:
+    """
+    内存映射向量集合（余弦相似度）
+    向量按行紧密存储：第 0..count-1 行有效，删除时用最后一行填补空位
+    写入顺序为先写向量再提交 SQLite，其他进程只会看到已提交的行；
+    写入（含扩容、删除）全程持有排他文件锁，检索持有共享文件锁，多进程写入不会分配到同一行
+    compression="pq" 时：行数达到 pq_min_train_rows 后由 train_pq 训练码本（pq_subspaces 段），之后写入同时维护编码；
+    检索时用编码粗排取 k * pq_rerank_factor 个候选，再用全精度向量精确重排
+    """
+
+    def __init__(self, path: Path, name: str, metadata: Optional[Dict] = None,
+                 block_rows: int = 32768, dtype: str = "float32", compression: str = NPY_COMPRESSION_NONE,
+                 pq_subspaces: int = 48, pq_rerank_factor: int = 8, pq_min_train_rows: int = 10000):
+        self.name = name
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.block_rows = block_rows
+        self._vectors_file = self.path / "vectors.npy"
+        self._db_file = self.path / "ids.db"
+        self._codebook_file = self.path / "pq_codebook.npy"
+        self._codes_file = self.path / "pq_codes.npy"
+        self._lock_file = self.path / "write.lock"
+        self._lock = threading.RLock()
+        self._lock_depth = 0
+        self._matrix: Optional[np.memmap] = None
+        self._matrix_key = None
+        self._codes: Optional[np.memmap] = None
+        self._codes_key = None
+        self._pq: Optional[ProductQuantizer] = None
+        self._pq_key = None
+        self.pq_subspaces = pq_subspaces
+        self.pq_rerank_factor = max(1, pq_rerank_factor)
+        self.pq_min_train_rows = pq_min_train_rows
+
+        conn = self._connect()
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS items (
+                    row INTEGER PRIMARY KEY,
+                    id TEXT NOT NULL UNIQUE,
+                    metadata TEXT
+                )
+            """)
+            # 删除时的行移动日志：先与行号变更一起提交，复制完向量后清除
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS pending_moves (
+                    dst INTEGER PRIMARY KEY,
+                    src INTEGER NOT NULL
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS collection_info (
+                    key TEXT PRIMARY KEY,
+                    value TEXT
+                )
+            """)
+            if metadata:
+                conn.execute(
+                    "INSERT OR IGNORE INTO collection_info (key, value) VALUES ('metadata', ?)",
+                    (json.dumps(metadata, ensure_ascii=False),)
+                )
+            # 存储精度在集合创建时确定，之后以已有集合为准
+            conn.execute("INSERT OR IGNORE INTO collection_info (key, value) VALUES ('dtype', ?)", (dtype,))
+            # 压缩模式可以在已有集合上开启（之后所有写入方都维护 PQ 编码），不能关闭
+            if compression == NPY_COMPRESSION_PQ:
+                conn.execute("INSERT OR REPLACE INTO collection_info (key, value) VALUES ('compression', ?)",
+                             (compression,))
+            conn.commit()
+            row = conn.execute("SELECT value FROM collection_info WHERE key = 'metadata'").fetchone()
+            self.metadata = json.loads(row[0]) if row else (metadata or {})
+            self.dtype = np.dtype(conn.execute("SELECT value FROM collection_info WHERE key = 'dtype'").fetchone()[0])
+            row = conn.execute("SELECT value FROM collection_info WHERE key = 'compression'").fetchone()
+            self.compression = row[0] if row else NPY_COMPRESSION_NONE
+            has_pending = conn.execute("SELECT 1 FROM pending_moves LIMIT 1").fetchone() is not None
+        finally:
+            conn.close()
+        self._pq_training_logged = False
+        if has_pending:
+            # 上次删除在复制向量前中断：加锁时重放
+            with self._exclusive():
+                pass
+
+    def modify(self, metadata: Dict) -> None:
+        """替换集合元数据（与 Chroma 的 Collection.modify 一致）"""
+        conn = self._connect()
+        try:
+            conn.execute("INSERT OR REPLACE INTO collection_info (key, value) VALUES ('metadata', ?)",
+                         (json.dumps(metadata, ensure_ascii=False),))
+            conn.commit()
+        finally:
+            conn.close()
+        self.metadata = dict(metadata)
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(str(self._db_file), timeout=30)
+
+    # ---------- 进程间锁 ----------
+
+    def _flock(self, mode: int):
+        if fcntl is None:
+            return None
+        f = open(self._lock_file, "a+")
+        fcntl.flock(f.fileno(), mode)
+        return f
+
+    @contextmanager
+    def _exclusive(self):
+        """
+        写入锁：线程锁 + 排他文件锁（同一线程可重入），保证 行数 -> 扩容 -> 写矩阵 -> 提交 在进程间串行
+        加锁后先重放未完成的行移动
+        """
+        with self._lock:
+            if self._lock_depth:
+                self._lock_depth += 1
+                try:
+                    yield
+                finally:
+                    self._lock_depth -= 1
+                return
+            f = self._flock(fcntl.LOCK_EX) if fcntl is not None else None
+            self._lock_depth = 1
+            try:
+                self._replay_pending_moves()
+                yield
+            finally:
+                self._lock_depth = 0
+                if f is not None:
+                    f.close()
+
+    @contextmanager
+    def _shared(self):
+        """
+        读取锁：共享文件锁，与写入（本进程其他线程或其他进程，各自打开锁文件，flock 互斥）串行，读取之间并发
+        线程锁只在检查写入深度、重放行移动时持有，读取期间不持有；本线程已持有写入锁时直接读取
+        """
+        f = None
+        with self._lock:
+            if self._lock_depth or fcntl is None:
+                # 本线程在写入锁内，或没有文件锁（Windows）只能用线程锁串行
+                yield
+                return
+            f = self._flock(fcntl.LOCK_SH)
+            try:
+                conn = self._connect()
+                try:
+                    pending = conn.execute("SELECT 1 FROM pending_moves LIMIT 1").fetchone() is not None
+                finally:
+                    conn.close()
+                if pending:
+                    f.close()
+                    f = None
+                    with self._exclusive():
+                        pass
+                    f = self._flock(fcntl.LOCK_SH)
+            except BaseException:
+                if f is not None:
+                    f.close()
+                raise
+        try:
+            yield
+        finally:
+            f.close()
+
+    def _replay_pending_moves(self) -> None:
+        """把已提交但未复制的行移动（src -> dst）复制到位；src 行在清除日志前不会被再次分配（持有写入锁）"""
+        conn = self._connect()
+        try:
+            moves = conn.execute("SELECT src, dst FROM pending_moves ORDER BY dst DESC").fetchall()
+            if not moves:
+                return
+            matrix = self._open_matrix()
+            codes = self._open_codes() if self._open_pq() is not None else None
+            for src, dst in moves:
+                matrix[dst] = matrix[src]
+                if codes is not None:
+                    codes[dst] = codes[src]
+            matrix.flush()
+            if codes is not None:
+                codes.flush()
+            conn.execute("DELETE FROM pending_moves")
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _temp_file(self, prefix: str) -> Path:
+        """集合目录下唯一的临时文件名（扩容 / 训练时写入，完成后原子替换）"""
+        fd, name = tempfile.mkstemp(dir=self.path, prefix=prefix, suffix=".tmp.npy")
+        os.close(fd)
+        return Path(name)
+
+    # ---------- 矩阵文件 ----------
+
+    def _open_matrix(self) -> Optional[np.memmap]:
+        """打开（或在文件被其他进程扩容替换后重新打开）向量矩阵"""
+        try:
+            st = os.stat(self._vectors_file)
+        except FileNotFoundError:
+            self._matrix, self._matrix_key = None, None
+            return None
+        key = (st.st_ino, st.st_size)
+        matrix = self._matrix
+        if matrix is None or key != self._matrix_key:
+            # 读取方并发打开时各自使用本地引用，不依赖实例属性在返回前未被其他线程替换
+            matrix = np.load(self._vectors_file, mmap_mode="r+")
+            self._matrix, self._matrix_key = matrix, key
+        return matrix
+
+    def _ensure_capacity(self, rows: int, dim: int, used: int) -> np.memmap:
+        """保证矩阵至少有 rows 行，不足时成倍扩容（写入新文件后原子替换，调用方持有写入锁，used 为当前行数）"""
+        matrix = self._open_matrix()
+        if matrix is not None:
+            if matrix.shape[1] != dim:
+                raise ValueError(f"向量维度不匹配: 集合 {self.name} 为 {matrix.shape[1]} 维，写入的是 {dim} 维")
+            if matrix.shape[0] >= rows:
+                return matrix
+
+        capacity = max(rows, _INITIAL_CAPACITY, 2 * (matrix.shape[0] if matrix is not None else 0))
+        tmp_file = self._temp_file("vectors.")
+        new_matrix = np.lib.format.open_memmap(tmp_file, mode="w+", dtype=self.dtype, shape=(capacity, dim))
+        if matrix is not None:
+            new_matrix[:used] = matrix[:used]
+        new_matrix.flush()
+        del new_matrix
+        os.replace(tmp_file, self._vectors_file)
+        logger.info(f"向量集合 {self.name} 扩容至 {capacity} 行")
+        return self._open_matrix()
+
+    # ---------- PQ 编码 ----------
+
+    def _open_pq(self) -> Optional[ProductQuantizer]:
+        """加载（或在其他进程重新训练后重新加载）PQ 码本，未训练时返回 None"""
+        try:
+            st = os.stat(self._codebook_file)
+        except FileNotFoundError:
+            self._pq, self._pq_key = None, None
+            return None
+        key = (st.st_ino, st.st_mtime_ns)
+        pq = self._pq
+        if pq is None or key != self._pq_key:
+            pq = ProductQuantizer(np.load(self._codebook_file))
+            self._pq, self._pq_key = pq, key
+        return pq
+
+    def _open_codes(self) -> Optional[np.memmap]:
+        try:
+            st = os.stat(self._codes_file)
+        except FileNotFoundError:
+            self._codes, self._codes_key = None, None
+            return None
+        key = (st.st_ino, st.st_size)
+        codes = self._codes
+        if codes is None or key != self._codes_key:
+            codes = np.load(self._codes_file, mmap_mode="r+")
+            self._codes, self._codes_key = codes, key
+        return codes
+
+    def _ensure_code_capacity(self, rows: int, m: int, used: int) -> np.memmap:
+        """保证编码矩阵至少有 rows 行，扩容方式与向量矩阵相同"""
+        codes = self._open_codes()
+        if codes is not None and codes.shape[0] >= rows:
+            return codes
+        capacity = max(rows, _INITIAL_CAPACITY, 2 * (codes.shape[0] if codes is not None else 0))
+        tmp_file = self._temp_file("pq_codes.")
+        new_codes = np.lib.format.open_memmap(tmp_file, mode="w+", dtype=np.uint8, shape=(capacity, m))
+        if codes is not None:
+            new_codes[:used] = codes[:used]
+        new_codes.flush()
+        del new_codes
+        os.replace(tmp_file, self._codes_file)
+        return self._open_codes()
+
+    def _generation(self, conn: Optional[sqlite3.Connection] = None) -> int:
+        """向量写入代数：每次写入 / 删除向量时加一（训练 PQ 时据此判断编码期间是否有写入）"""
+        own = conn is None
+        conn = conn or self._connect()
+        try:
+            row = conn.execute("SELECT value FROM collection_info WHERE key = 'generation'").fetchone()
+            return int(row[0]) if row else 0
+        finally:
+            if own:
+                conn.close()
+
+    @staticmethod
+    def _bump_generation(conn: sqlite3.Connection) -> None:
+        """在写入 / 删除的事务中调用"""
+        conn.execute("""
+            INSERT INTO collection_info (key, value) VALUES ('generation', '1')
+            ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + 1
+        """)
+
+    def needs_pq_training(self) -> bool:
+        """压缩模式下行数已达到 pq_min_train_rows 但还没有码本"""
+        return (self.compression == NPY_COMPRESSION_PQ and self._open_pq() is None
+                and self._count() >= self.pq_min_train_rows)
+
+    def _encode_codes(self, pq: ProductQuantizer, matrix: np.memmap, used: int) -> Path:
+        """把前 used 行编码到临时编码文件，返回文件路径（调用方持有读取或写入锁）"""
+        tmp_file = self._temp_file("pq_codes.")
+        codes = np.lib.format.open_memmap(
+            tmp_file, mode="w+", dtype=np.uint8, shape=(max(matrix.shape[0], _INITIAL_CAPACITY), pq.m)
+        )
+        for start in range(0, used, self.block_rows):
+            end = min(start + self.block_rows, used)
+            codes[start:end] = pq.encode(np.asarray(matrix[start:end], dtype=np.float32))
+        codes.flush()
+        del codes
+        return tmp_file
+
+    def train_pq(self, force: bool = False) -> bool:
+        """
+        训练 PQ 码本并为全部向量编码（写入时不会自动训练：由索引任务结束时的 VectorService.train_pending_pq
+        或 scripts/train_vector_pq.py 调用）
+        采样在读取锁内复制，k-means 不持有任何锁；全量编码在读取锁内进行（检索照常，写入等待），
+        只有替换编码和码本文件时持有写入锁；编码期间有写入时在写入锁内重新编码
+        force: 已有码本时重新训练（数据分布变化较大时使用）
+        返回: 是否训练
+        """
+        with self._shared():
+            if self._open_pq() is not None and not force:
+                return False
+            used = self._count()
+            matrix = self._open_matrix()
+            if matrix is None or used == 0:
+                return False
+            dim = matrix.shape[1]
+            rng = np.random.default_rng(0)
+            sample_rows = np.sort(rng.choice(used, min(used, _PQ_TRAIN_SAMPLE), replace=False))
+            sample = np.array(matrix[sample_rows], dtype=np.float32)
+
+        m = ProductQuantizer.choose_subspaces(dim, self.pq_subspaces)
+        start_time = time.perf_counter()
+        pq = ProductQuantizer.train(sample, m)
+        train_seconds = time.perf_counter() - start_time
+
+        with self._shared():
+            generation = self._generation()
+            used = self._count()
+            tmp_codes = self._encode_codes(pq, self._open_matrix(), used)
+
+        try:
+            with self._exclusive():
+                if self._open_pq() is not None and not force:
+                    return False
+                if self._generation() != generation:
+                    # 编码后、加写入锁前有写入：在写入锁内重新编码
+                    os.unlink(tmp_codes)
+                    used = self._count()
+                    tmp_codes = self._encode_codes(pq, self._open_matrix(), used)
+                os.replace(tmp_codes, self._codes_file)
+                # 码本最后写入：其他进程看到码本时编码已经完整
+                tmp_file = self._temp_file("pq_codebook.")
+                np.save(tmp_file, pq.codebook)
+                os.replace(tmp_file, self._codebook_file)
+                self._open_codes()
+                self._open_pq()
+        finally:
+            if tmp_codes.exists():
+                tmp_codes.unlink()
+        logger.info(f"向量集合 {self.name} 已训练 PQ 码本（{m} 段，k-means {train_seconds:.1f} 秒）"
+                    f"并编码 {used} 条向量，耗时 {time.perf_counter() - start_time:.1f} 秒")
+        return True
+
+    # ---------- 读取 ----------
+
+    def _count(self, conn: Optional[sqlite3.Connection] = None) -> int:
+        own = conn is None
+        conn = conn or self._connect()
+        try:
+            # 行号紧密连续，MAX(row) 走主键索引，比 COUNT(*) 全表扫描快
+            return conn.execute("SELECT COALESCE(MAX(row) + 1, 0) FROM items").fetchone()[0]
+        finally:
+            if own:
+                conn.close()
+
+    def count(self) -> int:
+        return self._count()
+
+    def _lookup_rows(self, conn: sqlite3.Connection, ids: Sequence[str]) -> Dict[str, int]:
+        found = {}
+        ids = list(ids)
+        for start in range(0, len(ids), _QUERY_CHUNK_SIZE):
+            chunk = ids[start:start + _QUERY_CHUNK_SIZE]
+            placeholders = ",".join(["?"] * len(chunk))
+            for row, item_id in conn.execute(f"SELECT row, id FROM items WHERE id IN ({placeholders})", chunk):
+                found[item_id] = row
+        return found
+
+    def _fetch_by_rows(self, conn: sqlite3.Connection, rows: Sequence[int],
+                       with_metadata: bool = True) -> Dict[int, tuple]:
+        found = {}
+        rows = [int(r) for r in rows]
+        column = "metadata" if with_metadata else "NULL"
+        for start in range(0, len(rows), _QUERY_CHUNK_SIZE):
+            chunk = rows[start:start + _QUERY_CHUNK_SIZE]
+            placeholders = ",".join(["?"] * len(chunk))
+            for row, item_id, metadata in conn.execute(
+                f"SELECT row, id, {column} FROM items WHERE row IN ({placeholders})", chunk
+            ):
+                found[row] = (item_id, json.loads(metadata) if metadata else None)
+        return found
+
+    def _where_rows(self, conn: sqlite3.Connection, where: Dict) -> np.ndarray:
+        """满足 where 条件的行号（升序）"""
+        sql, params = _where_to_sql(where)
+        rows = conn.execute(f"SELECT row FROM items WHERE {sql} ORDER BY row", params).fetchall()
+        return np.array([r[0] for r in rows], dtype=np.int64)
+
+    def get(self, ids: Optional[Sequence[str]] = None, include: Optional[Sequence[str]] = None,
+            limit: Optional[int] = None, offset: Optional[int] = None, where: Optional[Dict] = None) -> Dict:
+        """按ID、where 条件或分页读取，返回格式与 Chroma 一致：{"ids": [...], "metadatas": [...], "embeddings": [...]}"""
+        include = ["metadatas"] if include is None else list(include)
+        # 读取向量时，行号查询和矩阵读取在同一个共享锁内（其他进程删除时会把末行移入空位）
+        with (self._shared() if "embeddings" in include else nullcontext()):
+            conn = self._connect()
+            try:
+                if ids is not None:
+                    ids = list(ids)
+                    items = []
+                    for start in range(0, len(ids), _QUERY_CHUNK_SIZE):
+                        chunk = ids[start:start + _QUERY_CHUNK_SIZE]
+                        placeholders = ",".join(["?"] * len(chunk))
+                        items += conn.execute(
+                            f"SELECT row, id, metadata FROM items WHERE id IN ({placeholders})", chunk
+                        ).fetchall()
+                    order = {item_id: i for i, item_id in enumerate(ids)}
+                    items.sort(key=lambda item: order[item[1]])
+                else:
+                    sql, params = _where_to_sql(where) if where else ("1", [])
+                    items = conn.execute(
+                        f"SELECT row, id, metadata FROM items WHERE {sql} ORDER BY row LIMIT ? OFFSET ?",
+                        [*params, limit if limit is not None else -1, offset or 0]
+                    ).fetchall()
+            finally:
+                conn.close()
+
+            result = {"ids": [item[1] for item in items]}
+            if "metadatas" in include:
+                result["metadatas"] = [json.loads(item[2]) if item[2] else None for item in items]
+            if "embeddings" in include:
+                matrix = self._open_matrix()
+                result["embeddings"] = [matrix[item[0]].astype(np.float32).tolist() for item in items]
+        return result
+
+    def query(self, query_embeddings, n_results: int = 10, where: Optional[Dict] = None,
+              include: Optional[Sequence[str]] = None) -> Dict:
+        """
+        top-k 检索：分块计算相似度，每块用 argpartition 取候选，最后合并
+        压缩模式（已训练 PQ 码本）下先用 PQ 编码粗排，再对候选精确重排；否则为精确检索
+        where: 元数据过滤条件（Chroma where 语法），先在 SQLite 中筛出行号，只扫描这些行
+        返回格式与 Chroma 一致：{"ids": [[...]], "distances": [[...]], "metadatas": [[...]]}，distance = 1 - cosine
+        include: 不含 "metadatas" 时不读取元数据（metadatas 中为 None）
+        """
+        with_metadata = include is None or "metadatas" in include
+        queries = _normalize_rows(np.atleast_2d(np.asarray(query_embeddings, dtype=np.float32)))
+        n_queries = queries.shape[0]
+
+        with self._shared():
+            conn = self._connect()
+            try:
+                used = self._count(conn)
+                matrix = self._open_matrix()
+                candidates = self._where_rows(conn, where) if where else None
+                total = used if candidates is None else len(candidates)
+                k = min(n_results, total)
+                if matrix is None or k == 0:
+                    return {"ids": [[] for _ in range(n_queries)],
+                            "distances": [[] for _ in range(n_queries)],
+                            "metadatas": [[] for _ in range(n_queries)]}
+
+                pq = self._open_pq() if self.compression == NPY_COMPRESSION_PQ else None
+                codes = self._open_codes() if pq is not None else None
+                if pq is not None and codes is not None:
+                    # 粗排只扫描 PQ 编码，取 k * pq_rerank_factor 个候选，再读取候选行的全精度向量精确重排
+                    table = pq.lookup_table(queries)
+                    _, candidate_rows = self._scan_top_k(
+                        n_queries, total, candidates, min(k * self.pq_rerank_factor, total),
+                        lambda index: pq.score(table, np.asarray(codes[index]))
+                    )
+                    best_scores, best_rows = self._rescore(queries, matrix, candidate_rows, k)
+                else:
+                    best_scores, best_rows = self._scan_top_k(
+                        n_queries, total, candidates, k,
+                        lambda index: queries @ np.asarray(matrix[index], dtype=np.float32).T
+                    )
+
+                order = np.argsort(-best_scores, axis=1, kind="stable")
+                best_scores = np.take_along_axis(best_scores, order, axis=1)
+                best_rows = np.take_along_axis(best_rows, order, axis=1)
+                items = self._fetch_by_rows(conn, np.unique(best_rows), with_metadata=with_metadata)
+            finally:
+                conn.close()
+
+        result = {"ids": [], "distances": [], "metadatas": []}
+        for scores, rows in zip(best_scores, best_rows):
+            result["ids"].append([items[int(r)][0] for r in rows])
+            result["distances"].append([float(1 - s) for s in scores])
+            result["metadatas"].append([items[int(r)][1] for r in rows])
+        return result
+
+    def _scan_top_k(self, n_queries: int, total: int, candidates: Optional[np.ndarray], k: int, score_block):
+        """
+        分块扫描取 top-k：score_block(index) 返回 (n_queries, 块大小) 的分数，index 为切片或行号数组
+        返回: (分数, 行号)，均为 (n_queries, k)，未排序
+        """
+        best_scores = np.full((n_queries, 0), -np.inf, dtype=np.float32)
+        best_rows = np.zeros((n_queries, 0), dtype=np.int64)
+        for start in range(0, total, self.block_rows):
+            end = min(start + self.block_rows, total)
+            if candidates is None:
+                index = slice(start, end)
+                block_rows = np.arange(start, end)
+            else:
+                index = block_rows = candidates[start:end]
+            scores = score_block(index)
+            if scores.shape[1] > k:
+                top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            else:
+                top = np.broadcast_to(np.arange(scores.shape[1]), scores.shape)
+            best_scores = np.concatenate([best_scores, np.take_along_axis(scores, top, axis=1)], axis=1)
+            best_rows = np.concatenate([best_rows, block_rows[top]], axis=1)
+            if best_scores.shape[1] > k:
+                keep = np.argpartition(-best_scores, k - 1, axis=1)[:, :k]
+                best_scores = np.take_along_axis(best_scores, keep, axis=1)
+                best_rows = np.take_along_axis(best_rows, keep, axis=1)
+        return best_scores, best_rows
+
+    def _read_rows(self, matrix: np.memmap, rows: np.ndarray) -> np.ndarray:
+        """
+        用 pread 从磁盘读取指定行（按行号升序）
+        不通过内存映射读取：随机访问内存映射会按预读窗口把整片页面映射进进程，常驻内存随查询次数不断增长
+        """
+        row_bytes = matrix.shape[1] * matrix.dtype.itemsize
+        buffer = bytearray(len(rows) * row_bytes)
+        with open(self._vectors_file, "rb", buffering=0) as f:
+            fd = f.fileno()
+            for i, row in enumerate(rows):
+                buffer[i * row_bytes:(i + 1) * row_bytes] = os.pread(fd, row_bytes, matrix.offset + int(row) * row_bytes)
+        return np.frombuffer(buffer, dtype=matrix.dtype).reshape(len(rows), matrix.shape[1])
+
+    def _rescore(self, queries: np.ndarray, matrix: np.memmap, candidate_rows: np.ndarray, k: int):
+        """用磁盘上的全精度向量为候选行精确打分，取 top-k（候选行按行号顺序读取，减少随机读）"""
+        rows = np.unique(candidate_rows)
+        scores = queries @ self._read_rows(matrix, rows).astype(np.float32).T
+        exact = np.take_along_axis(scores, np.searchsorted(rows, candidate_rows), axis=1)
+        if exact.shape[1] > k:
+            keep = np.argpartition(-exact, k - 1, axis=1)[:, :k]
+            return np.take_along_axis(exact, keep, axis=1), np.take_along_axis(candidate_rows, keep, axis=1)
+        return exact, candidate_rows
+
+    # ---------- 写入 ----------
+
+    def _write(self, ids: Sequence[str], embeddings, metadatas: Optional[Sequence[Dict]], overwrite: bool) -> None:
+        ids = list(ids)
+        if not ids:
+            return
+        if len(set(ids)) != len(ids):
+            raise ValueError("同一批写入中存在重复ID")
+        vectors = _normalize_rows(np.atleast_2d(np.asarray(embeddings, dtype=np.float32))).astype(self.dtype)
+        metadatas = list(metadatas) if metadatas is not None else [None] * len(ids)
+
+        with self._exclusive():
+            conn = self._connect()
+            try:
+                existing = self._lookup_rows(conn, ids)
+                used = self._count(conn)
+
+                updates, inserts = [], []
+                next_row = used
+                for i, item_id in enumerate(ids):
+                    if item_id in existing:
+                        if overwrite:
+                            updates.append((existing[item_id], i))
+                        else:
+                            logger.warning(f"向量集合 {self.name} 中已存在ID {item_id}，跳过")
+                    else:
+                        inserts.append((next_row, i))
+                        next_row += 1
+
+                if not updates and not inserts:
+                    return
+                matrix = self._ensure_capacity(next_row, vectors.shape[1], used)
+                for row, i in updates + inserts:
+                    matrix[row] = vectors[i]
+                matrix.flush()
+
+                pq = self._open_pq() if self.compression == NPY_COMPRESSION_PQ else None
+                if pq is not None:
+                    codes = self._ensure_code_capacity(next_row, pq.m, used)
+                    written = updates + inserts
+                    codes[[row for row, _ in written]] = pq.encode(vectors[[i for _, i in written]])
+                    codes.flush()
+
+                conn.executemany(
+                    "UPDATE items SET metadata = ? WHERE row = ?",
+                    [(json.dumps(metadatas[i], ensure_ascii=False) if metadatas[i] is not None else None, row)
+                     for row, i in updates]
+                )
+                conn.executemany(
+                    "INSERT INTO items (row, id, metadata) VALUES (?, ?, ?)",
+                    [(row, ids[i], json.dumps(metadatas[i], ensure_ascii=False) if metadatas[i] is not None else None)
+                     for row, i in inserts]
+                )
+                self._bump_generation(conn)
+                conn.commit()
+            finally:
+                conn.close()
+
+            if (self.compression == NPY_COMPRESSION_PQ and self._pq is None
+                    and next_row >= self.pq_min_train_rows and not self._pq_training_logged):
+                # 训练在写入路径之外进行（见 train_pq），训练前仍为精确检索
+                self._pq_training_logged = True
+                logger.info(f"向量集合 {self.name} 已有 {next_row} 条向量，等待训练 PQ 码本"
+                            f"（索引任务结束时自动训练，或运行 scripts/train_vector_pq.py）")
+
+    def add(self, ids: Sequence[str], embeddings, metadatas: Optional[Sequence[Dict]] = None, **kwargs) -> None:
+        """新增向量（与 Chroma 一致：已存在的ID跳过）"""
+        self._write(ids, embeddings, metadatas, overwrite=False)
+
+    def upsert(self, ids: Sequence[str], embeddings, metadatas: Optional[Sequence[Dict]] = None, **kwargs) -> None:
+        """新增或覆盖向量"""
+        self._write(ids, embeddings, metadatas, overwrite=True)
+
+    def update(self, ids: Sequence[str], metadatas: Sequence[Dict], **kwargs) -> None:
+        """更新已存在ID的元数据（与 Chroma 一致：不存在的ID忽略，已有的键被覆盖，其余键保留）"""
+        with self._exclusive():
+            conn = self._connect()
+            try:
+                rows = self._lookup_rows(conn, ids)
+                current = self._fetch_by_rows(conn, list(rows.values()))
+                updates = []
+                for item_id, metadata in zip(ids, metadatas):
+                    if item_id not in rows:
+                        continue
+                    merged = dict(current[rows[item_id]][1] or {})
+                    merged.update(metadata or {})
+                    updates.append((json.dumps(merged, ensure_ascii=False), rows[item_id]))
+                conn.executemany("UPDATE items SET metadata = ? WHERE row = ?", updates)
+                conn.commit()
+            finally:
+                conn.close()
+
+    def delete(self, ids: Sequence[str]) -> None:
+        """
+        删除向量：用最后一行填补被删除的行，保持矩阵紧密
+        按行号从大到小删除：移入空位的最后一行一定不在待删除集合中，预先查出的行号始终有效
+        行号变更与行移动日志（目标行 <- 原始行）在同一事务中提交后才复制向量，中断后由下一次加锁重放；
+        目标行都小于删除后的行数、原始行都不小于它，两者不相交，重放与顺序无关且可重复
+        """
+        with self._exclusive():
+            conn = self._connect()
+            try:
+                used = self._count(conn)
+                source_of = {}
+                for row in sorted(self._lookup_rows(conn, ids).values(), reverse=True):
+                    last = used - 1
+                    conn.execute("DELETE FROM items WHERE row = ?", (row,))
+                    if row != last:
+                        conn.execute("UPDATE items SET row = ? WHERE row = ?", (row, last))
+                        source_of[row] = source_of.pop(last, last)
+                    else:
+                        source_of.pop(last, None)
+                    used -= 1
+                conn.executemany("INSERT INTO pending_moves (dst, src) VALUES (?, ?)",
+                                 [(dst, src) for dst, src in source_of.items() if dst < used])
+                self._bump_generation(conn)
+                conn.commit()
+            finally:
+                conn.close()
+            self._replay_pending_moves()
+
+
+_COMPARISON_OPERATORS = {"$eq": "=", "$ne": "!=", "$gt": ">", "$gte": ">=", "$lt": "<", "$lte": "<="}
+
+
+def _sql_value(value):
+    # JSON 中的 true/false 经 json_extract 后为 1/0
+    return int(value) if isinstance(value, bool) else value
+
+
+def _where_to_sql(where: Dict):
+    """
+    将 Chroma where 条件转换为 SQLite 条件（对 metadata JSON 列做 json_extract）
+    支持 $and / $or / $eq / $ne / $gt / $gte / $lt / $lte / $in / $nin，以及 {"key": value} 简写
+    返回: (sql, params)
+    """
+    clauses, params = [], []
+    for key, condition in where.items():
+        if key in ("$and", "$or"):
+            parts = [_where_to_sql(sub) for sub in condition]
+            joiner = " AND " if key == "$and" else " OR "
+            clauses.append("(" + joiner.join(part[0] for part in parts) + ")")
+            for part in parts:
+                params.extend(part[1])
+            continue
+
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+        path = '$."' + key.replace('"', '\\"') + '"'
+        for op, value in condition.items():
+            if op in ("$in", "$nin"):
+                placeholders = ",".join(["?"] * len(value)) or "NULL"
+                negate = "NOT " if op == "$nin" else ""
+                clauses.append(f"json_extract(metadata, ?) {negate}IN ({placeholders})")
+                params.extend([path, *[_sql_value(v) for v in value]])
+            elif op in _COMPARISON_OPERATORS:
+                clauses.append(f"json_extract(metadata, ?) {_COMPARISON_OPERATORS[op]} ?")
+                params.extend([path, _sql_value(value)])
+            else:
+                raise ValueError(f"不支持的 where 操作符: {op}")
+    return " AND ".join(clauses) or "1", params
+
+
+def create_vector_store(store_type: str, path: Path, npy_dtype: str = "float32",
+                        npy_compression: str = NPY_COMPRESSION_NONE, pq_options: Optional[Dict] = None,
+                        hnsw_options: Optional[Dict] = None):
+    """
+    按类型创建存储后端
+    npy_compression / pq_options: npy 后端的压缩检索模式和 PQ 参数
+        （pq_subspaces / pq_rerank_factor / pq_min_train_rows，见 NpyCollection）
+    hnsw_options: chroma 后端的 HNSW 参数（M / construction_ef / search_ef，见 ChromaVectorStore）
+    """
+    if store_type == VECTOR_STORE_NPY:
+        return NpyVectorStore(path, dtype=npy_dtype, compression=npy_compression, pq_options=pq_options)
+    return ChromaVectorStore(path, hnsw_options=hnsw_options)